@@ -0,0 +1,44 @@
+"""
+重建作業 studentStatus 摘要表 Management Command
+
+使用方式：
+    python manage.py rebuild_assignment_status
+    python manage.py rebuild_assignment_status --assignment 12 --assignment 13
+    python manage.py rebuild_assignment_status --course 3
+"""
+
+from django.core.management.base import BaseCommand
+from assignments.models import Assignments
+from assignments.student_status import rebuild_assignment_status
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-student assignment status summary from submissions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignment',
+            type=int,
+            action='append',
+            help='Assignment ID to rebuild (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--course',
+            type=int,
+            help='Only rebuild assignments of this course',
+        )
+    
+    def handle(self, *args, **options):
+        """執行命令"""
+        assignments = Assignments.objects.order_by('id')
+        if options['assignment']:
+            assignments = assignments.filter(id__in=options['assignment'])
+        if options['course']:
+            assignments = assignments.filter(course_id=options['course'])
+        
+        total = 0
+        for assignment in assignments:
+            written = rebuild_assignment_status(assignment)
+            total += written
+            self.stdout.write(f"Assignment {assignment.id}: {written} rows")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} assignment status rows"))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 10:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assignments', '0004_assignments_ip_whitelist'),
+        ('problems', '0007_testcase_package'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Assignment_student_status',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_score', models.IntegerField(default=0)),
+                ('best_status', models.CharField(blank=True, max_length=32, null=True)),
+                ('submission_ids', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_status', to='assignments.assignments')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='problems.problems')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignment_status', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'assignment_student_status',
+                'constraints': [models.UniqueConstraint(fields=('assignment', 'user', 'problem'), name='uq_assignment_student_problem')],
+            },
+        ),
+    ]
@@ -116,6 +116,23 @@ class Assignments(models.Model):
     def __str__(self):
         return f"{self.title} ({self.course_id})"
 
+    def allows_ip(self, ip) -> bool:
+        """IP 是否在 ip_whitelist 內；白名單為空代表不限制"""
+        from submissions.ip_ranges import ip_in_networks, parse_cidr_list
+
+        networks = parse_cidr_list(self.ip_whitelist)
+        return not networks or ip_in_networks(ip, networks)
+
+    def whitelisted_submissions_q(self):
+        """
+        提交來源 IP 在白名單內的查詢條件（以 Submission.ip_sort_key 的範圍比較）
+        白名單為空時不限制
+        """
+        from submissions.ip_ranges import cidr_q, parse_cidr_list
+
+        networks = parse_cidr_list(self.ip_whitelist)
+        return cidr_q(networks) if networks else Q()
+
 
 class Assignment_problems(models.Model):
     """作業包含的題目與配置"""
@@ -192,3 +209,44 @@ class Assignment_tags(models.Model):
 
     def __str__(self):
         return f"{self.assignment_id}-{self.tag_id}"
+
+
+class Assignment_student_status(models.Model):
+    """
+    作業每位學生每題的提交摘要（HomeworkDetailView 的 studentStatus）
+
+    由判題 callback 與建立提交時更新（見 assignments/student_status.py），
+    讀取時只需依 assignment 查一次；rebuild_assignment_status 指令可回填
+    """
+
+    assignment = models.ForeignKey(
+        Assignments, on_delete=models.CASCADE, related_name="student_status"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="assignment_status",
+    )
+    problem = models.ForeignKey(
+        "problems.Problems", on_delete=models.CASCADE, related_name="+"
+    )
+
+    best_score = models.IntegerField(default=0)
+    # 與 studentStatus 的 problemStatus 相同的文字狀態（None = 尚未有可判斷的提交）
+    best_status = models.CharField(max_length=32, null=True, blank=True)
+    # 依建立時間排序的所有提交 ID
+    submission_ids = models.JSONField(default=list)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "assignment_student_status"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["assignment", "user", "problem"],
+                name="uq_assignment_student_problem",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.assignment_id} - {self.user_id} - P{self.problem_id}"
@@ -0,0 +1,215 @@
+# assignments/student_status.py
+"""
+維護 Assignment_student_status（作業 studentStatus 的摘要表）
+
+每筆 (assignment, user, problem) 保存最高分、最佳狀態與依時間排序的提交 ID，
+HomeworkDetailView 讀取時不必再掃過全班的所有提交。
+
+- schedule_student_status_refresh：提交建立、判題完成、重新判題或刪除時，
+  在 commit 後重算該使用者在該題的摘要，寫入所有包含此題的作業
+  （只讀這位使用者這題的提交，走 (user, problem_id, created_at) 索引）
+- refresh_student_statuses：一次重算多組 (使用者, 題目)，批次重新判題使用
+- rebuild_assignment_status：整份作業重建（回填、rebuild_assignment_status 指令），只讀課程成員的提交
+- schedule_assignment_rebuild：新增或替換作業題目時，commit 後交給 Celery 重建
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from assignments.models import Assignment_problems, Assignment_student_status
+from courses.models import Course_members
+from submissions.models import Submission
+
+# NOJ status code -> studentStatus 的 problemStatus
+STATUS_TEXT = {
+    "-2": None,
+    "-1": "pending",
+    "0": "accepted",
+    "1": "wrong_answer",
+    "2": "compilation_error",
+    "3": "time_limit_exceeded",
+    "4": "memory_limit_exceeded",
+    "5": "runtime_error",
+    "6": "judge_error",
+    "7": "output_limit_exceeded",
+}
+
+# 「最好狀態」：只要出現 accepted 就是 accepted，
+# 否則取最後一次非 pending 的狀態（若都 pending -> pending）
+STATUS_RANK = {
+    None: 0,
+    "pending": 1,
+    "wrong_answer": 2,
+    "compilation_error": 2,
+    "runtime_error": 2,
+    "time_limit_exceeded": 2,
+    "memory_limit_exceeded": 2,
+    "output_limit_exceeded": 2,
+    "judge_error": 2,
+    "accepted": 3,
+}
+
+SUMMARY_FIELDS = ["best_score", "best_status", "submission_ids"]
+BATCH_SIZE = 1000
+
+
+class _Summary:
+    """依建立時間累加一位使用者一題的提交"""
+
+    def __init__(self):
+        self.best_score = 0
+        self.best_status = None
+        self.submission_ids = []
+
+    def add(self, submission_id, status_code, score):
+        self.submission_ids.append(str(submission_id))
+        self.best_score = max(self.best_score, int(score or 0))
+        text = STATUS_TEXT.get(str(status_code))
+        if STATUS_RANK.get(text, 0) >= STATUS_RANK.get(self.best_status, 0):
+            self.best_status = text
+
+    def row(self, assignment_id, user_id, problem_id):
+        return Assignment_student_status(
+            assignment_id=assignment_id,
+            user_id=user_id,
+            problem_id=problem_id,
+            best_score=self.best_score,
+            best_status=self.best_status,
+            submission_ids=self.submission_ids,
+        )
+
+
+def _upsert(rows):
+    Assignment_student_status.objects.bulk_create(
+        rows,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["assignment", "user", "problem"],
+        update_fields=SUMMARY_FIELDS + ["updated_at"],
+    )
+
+
+def refresh_student_statuses(pairs):
+    """
+    重算多組 (使用者, 題目) 的摘要並寫入包含該題的所有作業
+
+    讀取時以 SELECT ... FOR UPDATE 鎖住這些提交（與批次重新判題同樣依 created_at, id 排序），
+    同一組的平行重算會依序執行，後執行者一定讀到前者已 commit 的狀態，不會以舊資料覆蓋。
+    須在變更提交的交易 commit 後呼叫（見 schedule_student_status_refresh）。
+    已沒有任何提交的組合（提交被刪除）會移除摘要。
+
+    Args:
+        pairs: (user_id, problem_id) 的 iterable
+
+    Returns:
+        寫入的摘要筆數
+    """
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+
+    assignments_by_problem = defaultdict(list)
+    for assignment_id, problem_id in Assignment_problems.objects.filter(
+        problem_id__in={problem_id for _, problem_id in pairs}
+    ).values_list("assignment_id", "problem_id"):
+        assignments_by_problem[problem_id].append(assignment_id)
+    pairs = {pair for pair in pairs if pair[1] in assignments_by_problem}
+    if not pairs:
+        return 0
+
+    summaries = {pair: _Summary() for pair in pairs}
+    with transaction.atomic():
+        for user_id, problem_id, submission_id, status_code, score in (
+            Submission.objects.select_for_update()
+            .filter(user_id__in={u for u, _ in pairs}, problem_id__in={p for _, p in pairs})
+            .order_by("created_at", "id")
+            .values_list("user_id", "problem_id", "id", "status", "score")
+        ):
+            summary = summaries.get((user_id, problem_id))
+            if summary is not None:
+                summary.add(submission_id, status_code, score)
+
+        removed = [pair for pair, summary in summaries.items() if not summary.submission_ids]
+        if removed:
+            condition = Q()
+            for user_id, problem_id in removed:
+                condition |= Q(user_id=user_id, problem_id=problem_id)
+            Assignment_student_status.objects.filter(condition).delete()
+
+        rows = [
+            summary.row(assignment_id, user_id, problem_id)
+            for (user_id, problem_id), summary in summaries.items() if summary.submission_ids
+            for assignment_id in assignments_by_problem[problem_id]
+        ]
+        _upsert(rows)
+    return len(rows)
+
+
+def refresh_student_status(user_id, problem_id):
+    """
+    重算使用者在某題的摘要並寫入包含此題的所有作業
+
+    Args:
+        user_id: 提交者 ID
+        problem_id: 題目 ID
+
+    Returns:
+        寫入的摘要筆數
+    """
+    return refresh_student_statuses([(user_id, problem_id)])
+
+
+def schedule_student_status_refresh(user_id, problem_id):
+    """在目前交易 commit 後重算摘要（不在交易內時立即執行）"""
+    transaction.on_commit(lambda: refresh_student_status(user_id, problem_id))
+
+
+def rebuild_assignment_status(assignment, problem_ids=None):
+    """
+    重建整份作業（或其中幾題）的摘要，只計入作業所屬課程成員的提交
+
+    Args:
+        assignment: Assignments 實例
+        problem_ids: 只重建這些題目，None 表示作業內全部題目並清除已移除題目的資料
+
+    Returns:
+        寫入的摘要筆數
+    """
+    assignment_problem_ids = set(
+        Assignment_problems.objects.filter(assignment=assignment).values_list("problem_id", flat=True)
+    )
+    targets = assignment_problem_ids if problem_ids is None else assignment_problem_ids & set(problem_ids)
+
+    summaries = {}
+    if targets:
+        for user_id, problem_id, submission_id, status_code, score in (
+            Submission.objects.filter(
+                problem_id__in=targets,
+                user_id__in=Course_members.objects.filter(course_id=assignment.course_id).values("user_id"),
+            )
+            .order_by("created_at", "id")
+            .values_list("user_id", "problem_id", "id", "status", "score")
+            .iterator(chunk_size=2000)
+        ):
+            summaries.setdefault((user_id, problem_id), _Summary()).add(submission_id, status_code, score)
+
+    with transaction.atomic():
+        stale = Assignment_student_status.objects.filter(assignment=assignment)
+        if problem_ids is not None:
+            stale = stale.filter(problem_id__in=problem_ids)
+        stale.delete()
+        _upsert([
+            summary.row(assignment.id, user_id, problem_id)
+            for (user_id, problem_id), summary in summaries.items()
+        ])
+    return len(summaries)
+
+
+def schedule_assignment_rebuild(assignment, problem_ids=None):
+    """在目前交易 commit 後以 Celery 重建作業摘要（見 rebuild_assignment_status_task）"""
+    from assignments.tasks import rebuild_assignment_status_task
+
+    problem_ids = list(problem_ids) if problem_ids is not None else None
+    transaction.on_commit(lambda: rebuild_assignment_status_task.delay(assignment.id, problem_ids=problem_ids))
@@ -0,0 +1,31 @@
+"""
+Assignments 異步任務
+
+新增或替換作業題目後，由 rebuild_assignment_status_task 在背景重建 studentStatus 摘要，
+不在 API 請求內掃描提交
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=30)
+def rebuild_assignment_status_task(self, assignment_id, problem_ids=None):
+    """重建整份作業（或其中幾題）的 studentStatus 摘要"""
+    from .models import Assignments
+    from .student_status import rebuild_assignment_status
+
+    assignment = Assignments.objects.filter(pk=assignment_id).first()
+    if assignment is None:
+        logger.info(f'Assignment {assignment_id} no longer exists, skip rebuilding student status')
+        return 0
+    try:
+        written = rebuild_assignment_status(assignment, problem_ids=problem_ids)
+    except Exception as exc:
+        logger.error(f'Failed to rebuild student status of assignment {assignment_id}: {str(exc)}')
+        raise self.retry(exc=exc)
+
+    logger.info(f'Rebuilt {written} student status rows for assignment {assignment_id}')
+    return written
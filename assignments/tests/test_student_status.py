@@ -0,0 +1,187 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from assignments.models import Assignments, Assignment_problems, Assignment_student_status
+from assignments.student_status import rebuild_assignment_status
+from assignments.tasks import rebuild_assignment_status_task
+from submissions.models import Submission
+from submissions.rejudge import create_rejudge_job
+from submissions.test_file.test_submission_views_api import SubmissionAPITestSetup
+
+
+@pytest.mark.django_db
+class AssignmentStudentStatusTest(SubmissionAPITestSetup, TestCase):
+    """studentStatus 由摘要表提供，callback 與建立提交時維護"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.hw = Assignments.objects.create(
+            title="HW1", course=self.course1, creator=self.teacher,
+            status=Assignments.Status.ACTIVE,
+        )
+        Assignment_problems.objects.create(assignment=self.hw, problem=self.problem1, order_index=1)
+        self.client = APIClient()
+
+    def submit(self, user):
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/submission/", {
+                "problem_id": self.problem1.id,
+                "language_type": 2,
+                "source_code": "print(1)",
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Submission.objects.get(id=response.data["message"].split(".")[-1])
+
+    def callback(self, submission, judge_status, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post("/submission/callback/", {
+                "submission_id": str(submission.id),
+                "status": judge_status,
+                "score": score,
+                "execution_time": 10,
+                "memory_usage": 100,
+                "test_results": [],
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def student_status(self, user):
+        self.client.force_authenticate(user=self.teacher)
+        url = reverse("assignments:homework-detail", kwargs={"homework_id": self.hw.id})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["data"]["studentStatus"][user.username][str(self.problem1.id)]
+
+    def test_callback_updates_summary(self):
+        first = self.submit(self.student1)
+        cell = self.student_status(self.student1)
+        self.assertEqual(cell["submissionIds"], [str(first.id)])
+        self.assertIsNone(cell["problemStatus"])
+
+        self.callback(first, "accepted", 100)
+        second = self.submit(self.student1)
+        self.callback(second, "wrong_answer", 40)
+
+        cell = self.student_status(self.student1)
+        self.assertEqual(cell["problemStatus"], "accepted")
+        self.assertEqual(cell["score"], 100)
+        self.assertEqual(cell["submissionIds"], [str(first.id), str(second.id)])
+
+    def test_detail_query_count_independent_of_submissions(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.submit(self.student1)
+        with CaptureQueriesContext(connection) as before:
+            self.student_status(self.student1)
+        for _ in range(5):
+            self.submit(self.student1)
+        with CaptureQueriesContext(connection) as after:
+            self.assertEqual(len(self.student_status(self.student1)["submissionIds"]), 6)
+
+        self.assertEqual(len(before), len(after))
+        self.assertFalse(any('FROM "submissions"' in q["sql"] for q in after.captured_queries))
+
+    def test_rebuild_matches_incremental(self):
+        for judge_status, score in [("wrong_answer", 30), ("accepted", 100), ("time_limit_exceeded", 0)]:
+            self.callback(self.submit(self.student1), judge_status, score)
+        incremental = self.student_status(self.student1)
+
+        Assignment_student_status.objects.all().delete()
+        call_command("rebuild_assignment_status", "--assignment", str(self.hw.id), stdout=open("/dev/null", "w"))
+        self.assertEqual(self.student_status(self.student1), incremental)
+
+    def test_added_problem_is_backfilled(self):
+        other = Assignments.objects.create(title="HW2", course=self.course1, creator=self.teacher)
+        submission = self.submit(self.student1)
+
+        self.client.force_authenticate(user=self.teacher)
+        url = reverse("assignments:homework-add-problems", kwargs={"homework_id": other.id})
+        with patch("assignments.tasks.rebuild_assignment_status_task.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(url, {"problem_ids": [self.problem1.id]}, format="json")
+                # 請求內不重建，commit 後才交給 Celery
+                delay.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delay.assert_called_once_with(other.id, problem_ids=[self.problem1.id])
+        self.assertFalse(Assignment_student_status.objects.filter(assignment=other).exists())
+
+        rebuild_assignment_status_task.apply(args=delay.call_args.args, kwargs=delay.call_args.kwargs)
+        row = Assignment_student_status.objects.get(assignment=other, user=self.student1)
+        self.assertEqual(row.submission_ids, [str(submission.id)])
+
+    def test_rebuild_only_counts_course_members(self):
+        member = self.submit(self.student1)
+        outsider = Submission.objects.create(
+            problem_id=self.problem1.id, user=self.student2, language_type=2,
+            source_code="print(1)", status="0", score=100,
+        )
+        self.assertEqual(rebuild_assignment_status(self.hw), 1)
+        row = Assignment_student_status.objects.get(assignment=self.hw)
+        self.assertEqual(row.user_id, self.student1.id)
+        self.assertEqual(row.submission_ids, [str(member.id)])
+        self.assertNotIn(str(outsider.id), row.submission_ids)
+
+    def test_rebuild_drops_removed_problems(self):
+        self.submit(self.student1)
+        Assignment_problems.objects.filter(assignment=self.hw).delete()
+        self.assertEqual(rebuild_assignment_status(self.hw), 0)
+        self.assertFalse(Assignment_student_status.objects.filter(assignment=self.hw).exists())
+
+    def test_summary_refreshed_after_commit(self):
+        submission = self.submit(self.student1)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = APIClient().post("/submission/callback/", {
+                "submission_id": str(submission.id),
+                "status": "accepted",
+                "score": 100,
+                "execution_time": 10,
+                "memory_usage": 100,
+                "test_results": [],
+            }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # callback 的交易 commit 前不讀取提交，避免以未看到其他 callback 的舊資料覆蓋
+        self.assertIsNone(self.student_status(self.student1)["problemStatus"])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.student_status(self.student1)["problemStatus"], "accepted")
+
+    def test_rejudge_resets_summary(self):
+        first = self.submit(self.student1)
+        self.callback(first, "accepted", 100)
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                patch("submissions.tasks.enqueue_submission"):
+            self.client.force_authenticate(user=self.teacher)
+            response = self.client.get(f"/submission/{first.id}/rejudge/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.student_status(self.student1)["problemStatus"], "pending")
+
+        self.callback(first, "accepted", 100)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_rejudge_job(problem_id=self.problem1.id, dispatch=False)
+        self.assertEqual(self.student_status(self.student1)["problemStatus"], "pending")
+        self.assertEqual(self.student_status(self.student1)["score"], 0)
+
+    def test_deleted_submission_removed_from_summary(self):
+        first = self.submit(self.student1)
+        second = self.submit(self.student1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.student_status(self.student1)["submissionIds"], [str(second.id)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Assignment_student_status.objects.filter(user=self.student1).exists())
@@ -17,7 +17,8 @@ from .serializers import to_epoch_from_dt
 import datetime
 import math
 
-from assignments.models import Assignments, Assignment_problems
+from assignments.models import Assignments, Assignment_problems, Assignment_student_status
+from assignments.student_status import schedule_assignment_rebuild
 from courses.models import Courses, Course_members
 from problems.models import Problems
 from submissions.models import UserProblemStats 
@@ -128,6 +129,8 @@ class HomeworkCreateView(APIView):
                 weight="1.00",
                 special_judge=False,
             )
+        if pids:
+            schedule_assignment_rebuild(hw)
 
         return Response("Add homework Success", status=status.HTTP_200_OK)
 
@@ -179,80 +182,21 @@ class HomeworkDetailView(APIView):
                     "submissionIds": [],
                 }
 
-        # 2) 查 submissions（只查：本作業題目 + 本課程成員）
+        # 2) 讀取摘要表（由判題 callback 維護，見 assignments/student_status.py）
         if problem_ids and users:
-            qs = (
-                Submission.objects
-                .filter(problem_id__in=problem_ids, user__in=users)
-                .select_related("user")
-                .only("id", "problem_id", "user_id", "status", "score", "created_at")
-                .order_by("created_at")  # 讓 submissionIds 按時間排序（可改 -created_at）
-                .iterator(chunk_size=2000)  # 使用 iterator 分批讀取，避免一次載入所有 submissions
+            rows = (
+                Assignment_student_status.objects
+                .filter(assignment=hw, problem_id__in=problem_ids, user__in=users)
+                .values_list("user__username", "problem_id", "best_score", "best_status", "submission_ids")
             )
-
-            # NOJ status code -> text（你要 problemStatus 有值）
-            def status_text(code: str):
-                m = {
-                    "-2": None,
-                    "-1": "pending",
-                    "0": "accepted",
-                    "1": "wrong_answer",
-                    "2": "compilation_error",
-                    "3": "time_limit_exceeded",
-                    "4": "memory_limit_exceeded",
-                    "5": "runtime_error",
-                    "6": "judge_error",
-                    "7": "output_limit_exceeded",
-                }
-                return m.get(str(code), None)
-
-            # 我們用「最好狀態」概念來填 problemStatus：
-            # - 只要出現 accepted -> 就是 accepted
-            # - 否則取最後一次非 pending 的狀態（若都 pending -> pending）
-            status_rank = {
-                None: 0,
-                "pending": 1,
-                "wrong_answer": 2,
-                "compilation_error": 2,
-                "runtime_error": 2,
-                "time_limit_exceeded": 2,
-                "memory_limit_exceeded": 2,
-                "output_limit_exceeded": 2,
-                "judge_error": 2,
-                "accepted": 3,
-            }
-
-            best_score = {}       # (uname, pid) -> int
-            best_status = {}      # (uname, pid) -> str|None
-
-            for sub in qs:
-                uname = sub.user.username
-                pid = str(sub.problem_id)
-
+            for uname, pid, best_score, best_status, submission_ids in rows:
                 # 保護：如果某人/題目不在骨架（理論上不會）
-                cell = student_status.get(uname, {}).get(pid)
+                cell = student_status.get(uname, {}).get(str(pid))
                 if cell is None:
                     continue
-
-                # submissionIds 全部列出
-                cell["submissionIds"].append(str(sub.id))
-
-                # score：取最高分（最直覺）
-                sc = int(sub.score or 0)
-                prev_sc = best_score.get((uname, pid), 0)
-                if sc > prev_sc:
-                    best_score[(uname, pid)] = sc
-                    cell["score"] = sc
-
-                # problemStatus：用 rank 選「最好」的
-                st = status_text(sub.status)
-                prev_st = best_status.get((uname, pid))
-                if status_rank.get(st, 0) >= status_rank.get(prev_st, 0):
-                    best_status[(uname, pid)] = st
-
-            # 回填 problemStatus
-            for (uname, pid), st in best_status.items():
-                student_status[uname][pid]["problemStatus"] = st
+                cell["problemStatus"] = best_status
+                cell["score"] = best_score
+                cell["submissionIds"] = submission_ids
 
         payload = {
             "end": to_epoch_from_dt(hw.due_time),
@@ -373,6 +317,7 @@ class HomeworkDetailView(APIView):
                     weight=Decimal("1.00"),
                     special_judge=False,
                 )
+            schedule_assignment_rebuild(hw)
 
         payload = {
             "id": hw.id,
@@ -562,6 +507,7 @@ class AddProblemsToHomeworkView(APIView):
         with transaction.atomic():
             if to_create:
                 Assignment_problems.objects.bulk_create(to_create)
+                schedule_assignment_rebuild(hw, problem_ids=[ap.problem_id for ap in to_create])
 
         # 9) 回傳結果
         return Response("Add problems Success", status=status.HTTP_200_OK)
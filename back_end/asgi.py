@@ -3,6 +3,10 @@ ASGI config for back_end project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The submission status stream (/submission/stream/) is an async streaming
+view and should be served by an ASGI server, e.g.
+``uvicorn back_end.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -5,7 +5,7 @@ Celery 配置文件
 """
 
 import os
-from celery import Celery
+from celery import Celery, signals
 
 # 設定 Django settings 模組
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'back_end.settings')
@@ -20,6 +20,30 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@signals.celeryd_init.connect
+def apply_queue_worker_options(sender=None, conf=None, options=None, **kwargs):
+    """
+    依 settings.WORKER_QUEUE_OPTIONS 設定單一佇列 worker 的併發數與 prefetch
+
+    只在以 -Q 指定單一佇列時套用；命令列的 -c / --prefetch-multiplier 優先
+    """
+    from django.conf import settings
+
+    options = options or {}
+    queues = options.get('queues') or []
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    if len(queues) != 1:
+        return
+    tuning = getattr(settings, 'WORKER_QUEUE_OPTIONS', {}).get(queues[0])
+    if not tuning:
+        return
+    if options.get('concurrency') is None and 'concurrency' in tuning:
+        conf.worker_concurrency = tuning['concurrency']
+    if options.get('prefetch_multiplier') is None and 'prefetch_multiplier' in tuning:
+        conf.worker_prefetch_multiplier = tuning['prefetch_multiplier']
+
+
 @app.task(bind=True, ignore_result=True)
 def debug_task(self):
     """測試用的 task"""
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import json
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -151,6 +152,31 @@ CACHES = {
     }
 }
 
+# 提交 ID 布隆過濾器使用的 Redis（bitmap 不可被淘汰，需 noeviction 或 volatile-* 策略）
+# 未設定時與 cache 共用 REDIS_URL 的連線
+BLOOM_FILTER_REDIS_URL = os.getenv('BLOOM_FILTER_REDIS_URL', '')
+
+# 自訂測試紀錄與完成事件使用的 Redis（database 2，避免與 Celery 和 cache 衝突）
+CUSTOM_TEST_REDIS_URL = os.getenv('CUSTOM_TEST_REDIS_URL', 'redis://127.0.0.1:6379/2')
+# 查詢自訂測試結果時 ?wait= 最多可等待的秒數
+CUSTOM_TEST_LONG_POLL_TIMEOUT = int(os.getenv('CUSTOM_TEST_LONG_POLL_TIMEOUT', 25))
+
+# 判題狀態推播（SSE，需以 ASGI 伺服器執行）：callback 透過 Redis pub/sub 通知，
+# 每個 process 只建立一條訂閱連線，再分送給本機的串流連線
+SUBMISSION_STREAM_REDIS_URL = os.getenv('SUBMISSION_STREAM_REDIS_URL', os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'))
+SUBMISSION_STREAM = {
+    'max_clients': int(os.getenv('SUBMISSION_STREAM_MAX_CLIENTS', 2000)),  # 每個 process 的連線上限
+    'max_per_user': 5,       # 每位使用者同時開啟的串流上限
+    'queue_size': 16,        # 每條連線暫存的事件數，滿了丟棄最舊的
+    'heartbeat': 15,         # 無事件時送出 keepalive 的間隔（秒）
+    'max_duration': 300,     # 單一連線最長存活時間（秒），到期由客戶端重連
+    'subscribe_timeout': 5,  # 等待 Redis 確認訂閱的時間（秒），逾時回 503
+}
+
+# GET /submission/ 沒有分頁參數（cursor / page / page_size）時是否分頁。
+# 關閉時維持舊版回傳全部提交的格式；前端都改用分頁後開啟
+SUBMISSION_LIST_PAGINATE_BY_DEFAULT = os.getenv('SUBMISSION_LIST_PAGINATE_BY_DEFAULT', 'False').lower() == 'true'
+
 # Cache TTL settings
 CACHE_TIMEOUTS = {
     'submission_list': 30,        # 30秒
@@ -159,7 +185,17 @@ CACHE_TIMEOUTS = {
     'high_score': 600,            # 10分鐘
     'permission': 60,             # 1分鐘
     'ranking': 300,               # 5分鐘
+    'problem_stats': 60,          # 1分鐘
+}
+
+# 提交類端點的速率限制（token bucket：period 秒內最多 limit 次，token 連續回補）
+RATE_LIMITS = {
+    'submission': {'limit': 10, 'period': 60},
+    'custom_test': {'limit': 5, 'period': 60},
 }
+# 課程層級覆寫，例如考試課程放寬或收緊：
+# {"<course_id>": {"submission": {"limit": 30, "period": 60}}}
+RATE_LIMIT_COURSE_OVERRIDES = json.loads(os.getenv('RATE_LIMIT_COURSE_OVERRIDES', '{}'))
 
 
 # Password validation
@@ -245,6 +281,75 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Taipei'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 分鐘硬限制
+# 判題任務優先級（Redis broker：0~9，數字越小越優先）
+# 自訂測試對應 Sandbox 的 priority = -1，排在正式提交之後
+JUDGE_TASK_PRIORITIES = {
+    'deadline': 0,    # 作業截止前的提交
+    'submission': 3,  # 一般提交
+    'rejudge': 6,     # 重新判題
+    'selftest': 8,    # 自訂測試
+}
+# 作業截止前多少秒內的提交視為 deadline 提交
+JUDGE_DEADLINE_WINDOW = int(os.getenv('JUDGE_DEADLINE_WINDOW', 60 * 60))
+# 重新判題使用獨立佇列，大量 rejudge 不會擠壓正式提交
+REJUDGE_QUEUE = 'rejudge'
+# 批次重新判題每批送出的提交數與批次間隔（秒）
+REJUDGE_CHUNK_SIZE = int(os.getenv('REJUDGE_CHUNK_SIZE', 50))
+REJUDGE_CHUNK_INTERVAL = int(os.getenv('REJUDGE_CHUNK_INTERVAL', 5))
+# 作業統計（UserProblemStats）聚合：callback 的事件在 Redis 緩衝 flush_delay 秒後，
+# 每次最多取 batch_size 筆一起重算
+USER_PROBLEM_STATS = {
+    'batch_size': int(os.getenv('USER_PROBLEM_STATS_BATCH_SIZE', 500)),
+    'flush_delay': int(os.getenv('USER_PROBLEM_STATS_FLUSH_DELAY', 2)),
+}
+# 題目計數器（提交數、通過數、瀏覽數）在 Redis 緩衝，每隔多少秒寫回資料庫
+PROBLEM_COUNTER_FLUSH_INTERVAL = int(os.getenv('PROBLEM_COUNTER_FLUSH_INTERVAL', 30))
+# 定期任務，啟動: celery -A back_end beat -l info
+CELERY_BEAT_SCHEDULE = {
+    'flush-problem-counters': {
+        'task': 'problems.tasks.flush_problem_counters_task',
+        'schedule': PROBLEM_COUNTER_FLUSH_INTERVAL,
+    },
+}
+# 判題、自訂測試、MOSS 比對各自使用獨立佇列
+# 啟動: celery -A back_end worker -Q judge -l info（其餘佇列同理）
+CELERY_TASK_ROUTES = {
+    'copycat.tasks.run_moss_check_task': {'queue': 'copycat'},
+    'submissions.tasks.submit_to_sandbox_task': {
+        'queue': 'judge', 'priority': JUDGE_TASK_PRIORITIES['submission'],
+    },
+    'submissions.tasks.submit_selftest_to_sandbox_task': {
+        'queue': 'selftest', 'priority': JUDGE_TASK_PRIORITIES['selftest'],
+    },
+    'submissions.tasks.dispatch_rejudge_job_task': {'queue': REJUDGE_QUEUE},
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'queue_order_strategy': 'priority',
+    'priority_steps': list(range(10)),
+    'sep': ':',
+}
+# 優先級只在 worker 不預取大量任務時有效
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+# 以 -Q 啟動單一佇列的 worker 時套用的併發數與 prefetch（命令列參數優先）
+WORKER_QUEUE_OPTIONS = {
+    'judge': {
+        'concurrency': int(os.getenv('CELERY_JUDGE_CONCURRENCY', 8)),
+        'prefetch_multiplier': 1,
+    },
+    'rejudge': {
+        'concurrency': int(os.getenv('CELERY_REJUDGE_CONCURRENCY', 2)),
+        'prefetch_multiplier': 1,
+    },
+    'selftest': {
+        'concurrency': int(os.getenv('CELERY_SELFTEST_CONCURRENCY', 4)),
+        'prefetch_multiplier': 1,
+    },
+    'copycat': {
+        'concurrency': int(os.getenv('CELERY_COPYCAT_CONCURRENCY', 1)),
+        'prefetch_multiplier': 1,
+    },
+}
 
 # ====================
 # Sandbox Configuration
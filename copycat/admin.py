@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import CopycatReport
+from .models import CopycatReport, CopycatPairScore
 @admin.register(CopycatReport)
 class CopycatReportAdmin(admin.ModelAdmin):
     list_display = (
-        'id', 'problem_id', 'requester', 'status', 
+        'id', 'problem_id', 'requester', 'status', 'local_only',
         'created_at', 'updated_at'
     )
     list_filter = ('status', 'created_at')
@@ -17,4 +17,17 @@ class CopycatReportAdmin(admin.ModelAdmin):
         return False  
     
     def has_change_permission(self, request, obj=None):
-        return False  
\ No newline at end of file
+        return False
+
+
+@admin.register(CopycatPairScore)
+class CopycatPairScoreAdmin(admin.ModelAdmin):
+    list_display = ('id', 'report', 'submission_a', 'submission_b', 'similarity', 'shared_fingerprints')
+    list_filter = ('report',)
+    raw_id_fields = ('report', 'submission_a', 'submission_b')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
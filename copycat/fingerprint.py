@@ -0,0 +1,246 @@
+"""
+本地相似度預篩引擎 (Winnowing)
+
+在上傳 MOSS 之前先於本機找出可疑的提交配對：
+1. 將原始碼正規化為 token 序列 (識別字 -> V、數字 -> N、字串 -> S、移除註解)
+2. 對 token k-gram 計算 64-bit hash，以 winnowing 選出指紋
+3. 建立「指紋 -> 提交」反向索引，只比較共享指紋的提交，
+   計算 Jaccard 相似度並回傳超過門檻的配對
+
+參考: Schleimer et al., "Winnowing: Local Algorithms for Document Fingerprinting"
+"""
+
+import keyword
+import logging
+import multiprocessing
+import re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import combinations
+
+import xxhash
+
+logger = logging.getLogger(__name__)
+
+# 各語言保留原樣的關鍵字，其餘識別字一律正規化為 V
+_C_KEYWORDS = {
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do',
+    'double', 'else', 'enum', 'extern', 'float', 'for', 'goto', 'if', 'int',
+    'long', 'register', 'return', 'short', 'signed', 'sizeof', 'static',
+    'struct', 'switch', 'typedef', 'union', 'unsigned', 'void', 'volatile', 'while',
+}
+_CPP_KEYWORDS = _C_KEYWORDS | {
+    'bool', 'catch', 'class', 'delete', 'false', 'friend', 'inline', 'namespace',
+    'new', 'operator', 'private', 'protected', 'public', 'template', 'this',
+    'throw', 'true', 'try', 'typename', 'using', 'virtual', 'auto', 'nullptr',
+}
+_JAVA_KEYWORDS = {
+    'abstract', 'boolean', 'break', 'byte', 'case', 'catch', 'char', 'class',
+    'continue', 'default', 'do', 'double', 'else', 'extends', 'final', 'finally',
+    'float', 'for', 'if', 'implements', 'import', 'instanceof', 'int',
+    'interface', 'long', 'new', 'null', 'private', 'protected', 'public',
+    'return', 'short', 'static', 'super', 'switch', 'this', 'throw', 'throws',
+    'try', 'void', 'while', 'true', 'false',
+}
+_JS_KEYWORDS = {
+    'break', 'case', 'catch', 'class', 'const', 'continue', 'default', 'delete',
+    'do', 'else', 'export', 'extends', 'false', 'finally', 'for', 'function',
+    'if', 'import', 'in', 'instanceof', 'let', 'new', 'null', 'of', 'return',
+    'switch', 'this', 'throw', 'true', 'try', 'typeof', 'undefined', 'var',
+    'void', 'while', 'yield', 'async', 'await',
+}
+
+# key 與 services.MOSSPY_LANG_MAP 的值一致
+LANGUAGE_KEYWORDS = {
+    'c': _C_KEYWORDS,
+    'cc': _CPP_KEYWORDS,
+    'python': set(keyword.kwlist),
+    'java': _JAVA_KEYWORDS,
+    'javascript': _JS_KEYWORDS,
+}
+
+_C_STYLE_TOKEN_RE = re.compile(r'''
+      (?P<comment>//[^\n]*|/\*[\s\S]*?\*/)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`[^`]*`)
+    | (?P<number>\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?[uUlLfF]*\b)
+    | (?P<name>[A-Za-z_$][\w$]*)
+    | (?P<op>\S)
+''', re.VERBOSE)
+
+_PYTHON_TOKEN_RE = re.compile(r'''
+      (?P<comment>\#[^\n]*)
+    | (?P<string>"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<number>\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?j?\b)
+    | (?P<name>[A-Za-z_]\w*)
+    | (?P<op>\S)
+''', re.VERBOSE)
+
+
+def normalize_tokens(source_code, language):
+    """
+    將原始碼轉為正規化的 token 序列
+
+    改名、改數值、改字串或增刪註解與空白都不會影響結果。
+    """
+    token_re = _PYTHON_TOKEN_RE if language == 'python' else _C_STYLE_TOKEN_RE
+    keywords = LANGUAGE_KEYWORDS.get(language, set())
+
+    tokens = []
+    for match in token_re.finditer(source_code):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        if kind == 'string':
+            tokens.append('S')
+        elif kind == 'number':
+            tokens.append('N')
+        elif kind == 'name':
+            value = match.group()
+            tokens.append(value if value in keywords else 'V')
+        else:
+            tokens.append(match.group())
+    return tokens
+
+
+def kgram_hashes(tokens, k):
+    """計算每個 token k-gram 的 64-bit hash"""
+    return [
+        xxhash.xxh64_intdigest('\x1f'.join(tokens[i:i + k]))
+        for i in range(len(tokens) - k + 1)
+    ]
+
+
+def winnow(hashes, window):
+    """
+    Winnowing：每個長度為 window 的視窗取最小 hash (相同時取最右邊)
+
+    Returns:
+        frozenset: 選出的指紋
+    """
+    if not hashes:
+        return frozenset()
+    if len(hashes) <= window:
+        return frozenset([min(hashes)])
+
+    fingerprints = set()
+    last_pos = -1
+    for start in range(len(hashes) - window + 1):
+        min_pos = start
+        for pos in range(start + 1, start + window):
+            if hashes[pos] <= hashes[min_pos]:
+                min_pos = pos
+        if min_pos != last_pos:
+            fingerprints.add(hashes[min_pos])
+            last_pos = min_pos
+    return frozenset(fingerprints)
+
+
+def fingerprint(source_code, language, k=5, window=4):
+    """計算單份原始碼的 winnowing 指紋"""
+    return winnow(kgram_hashes(normalize_tokens(source_code, language), k), window)
+
+
+def fingerprint_sources(sources, language, k=5, window=4, executor=None):
+    """
+    計算多份原始碼的指紋
+
+    Args:
+        sources: 原始碼字串 list
+        language: 語言 (LANGUAGE_KEYWORDS 的 key)
+        executor: ProcessPoolExecutor，None 則在目前程序中計算
+
+    Returns:
+        list[frozenset]: 與 sources 順序相同的指紋集合
+    """
+    worker = partial(fingerprint, language=language, k=k, window=window)
+    if executor is not None and len(sources) > 1:
+        try:
+            return list(executor.map(worker, sources, chunksize=max(1, len(sources) // 16)))
+        except Exception as e:
+            logger.warning(f"[Copycat] 多程序計算指紋失敗，改為單程序: {e}")
+    return [worker(source) for source in sources]
+
+
+def create_fingerprint_executor(processes):
+    """
+    建立計算指紋用的 process pool
+
+    Celery prefork worker 本身是 daemon 程序，不允許再建立子程序，
+    此時回傳 None 改為單程序計算。
+    """
+    if processes <= 1:
+        return None
+    if multiprocessing.current_process().daemon:
+        logger.info("[Copycat] 目前程序為 daemon，指紋改為單程序計算")
+        return None
+    return ProcessPoolExecutor(max_workers=processes)
+
+
+def find_candidate_pairs(fingerprints, threshold, max_postings=200):
+    """
+    透過反向索引找出 Jaccard 相似度超過門檻的配對
+
+    只忽略出現在超過 max_postings 份提交中的指紋，限制單一 posting list 產生的配對數。
+    門檻是固定的絕對數量而不是比例，班上多數人繳交同一份程式碼時仍會被找出來；
+    被忽略的指紋同時從兩邊的集合中扣除，相似度以相同的指紋集合計算。
+
+    Args:
+        fingerprints: dict，key -> 指紋集合
+        threshold: Jaccard 門檻 (0-1)
+        max_postings: 單一指紋最多出現在幾份提交中，None 表示不限制
+
+    Returns:
+        list[tuple]: (key_a, key_b, similarity, shared) 依相似度由高到低
+    """
+    index = defaultdict(list)
+    for key, fps in fingerprints.items():
+        for fp in fps:
+            index[fp].append(key)
+
+    shared_counts = Counter()
+    ignored_counts = Counter()
+    for postings in index.values():
+        if max_postings is not None and len(postings) > max_postings:
+            ignored_counts.update(postings)
+        elif len(postings) >= 2:
+            shared_counts.update(combinations(postings, 2))
+
+    pairs = []
+    for (key_a, key_b), shared in shared_counts.items():
+        size_a = len(fingerprints[key_a]) - ignored_counts[key_a]
+        size_b = len(fingerprints[key_b]) - ignored_counts[key_b]
+        union = size_a + size_b - shared
+        similarity = shared / union if union else 0.0
+        if similarity >= threshold:
+            pairs.append((key_a, key_b, similarity, shared))
+
+    pairs.sort(key=lambda pair: pair[2], reverse=True)
+    return pairs
+
+
+def cluster_pairs(pairs):
+    """
+    將可疑配對以 union-find 合併為群組
+
+    Returns:
+        list[set]: 每個群組包含的 key
+    """
+    parent = {}
+
+    def find(key):
+        parent.setdefault(key, key)
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key_a, key_b, *_ in pairs:
+        root_a, root_b = find(key_a), find(key_b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+
+    clusters = defaultdict(set)
+    for key in parent:
+        clusters[find(key)].add(key)
+    return list(clusters.values())
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copycat', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='copycatreport',
+            name='processed_submissions',
+            field=models.IntegerField(default=0, verbose_name='已處理提交數'),
+        ),
+        migrations.AddField(
+            model_name='copycatreport',
+            name='total_submissions',
+            field=models.IntegerField(default=0, verbose_name='提交總數'),
+        ),
+    ]
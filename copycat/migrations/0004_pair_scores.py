@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('copycat', '0003_report_progress'),
+        ('submissions', '0006_user_ranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='copycatreport',
+            name='local_only',
+            field=models.BooleanField(default=False, verbose_name='僅本地比對'),
+        ),
+        migrations.CreateModel(
+            name='CopycatPairScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('similarity', models.FloatField(verbose_name='Jaccard 相似度')),
+                ('shared_fingerprints', models.IntegerField(default=0, verbose_name='共同指紋數')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pair_scores', to='copycat.copycatreport')),
+                ('submission_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='submissions.submission')),
+                ('submission_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='submissions.submission')),
+            ],
+            options={
+                'db_table': 'copycat_pair_scores',
+                'ordering': ['-similarity'],
+                'indexes': [models.Index(fields=['report', '-similarity'], name='copycat_pai_report__050a63_idx')],
+            },
+        ),
+    ]
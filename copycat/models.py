@@ -21,6 +21,14 @@ class CopycatReport(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     
     error_message = models.TextField(blank=True)
+
+    # 進度追蹤：待比對的提交數與已寫入暫存檔的提交數
+    total_submissions = models.IntegerField(default=0, verbose_name="提交總數")
+
+    processed_submissions = models.IntegerField(default=0, verbose_name="已處理提交數")
+
+    # 未上傳 MOSS，僅有本地預篩結果 (無可疑配對或 MOSS 無法使用)
+    local_only = models.BooleanField(default=False, verbose_name="僅本地比對")
     
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -31,4 +39,38 @@ class CopycatReport(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['problem_id', 'status']),
-        ] 
\ No newline at end of file
+        ]
+
+    @property
+    def progress(self):
+        """
+        回傳完成百分比 (0-100)
+        檔案全部準備好後仍需等待 MOSS 上傳，因此完成前最多顯示 99
+        """
+        if self.status == 'success':
+            return 100
+        if not self.total_submissions:
+            return 0
+        return min(99, int(self.processed_submissions * 100 / self.total_submissions))
+
+
+class CopycatPairScore(models.Model):
+    """
+    本地預篩 (winnowing) 找出的可疑提交配對與相似度
+    """
+    report = models.ForeignKey(CopycatReport, on_delete=models.CASCADE, related_name='pair_scores')
+
+    submission_a = models.ForeignKey('submissions.Submission', on_delete=models.CASCADE, related_name='+')
+
+    submission_b = models.ForeignKey('submissions.Submission', on_delete=models.CASCADE, related_name='+')
+
+    similarity = models.FloatField(verbose_name="Jaccard 相似度")
+
+    shared_fingerprints = models.IntegerField(default=0, verbose_name="共同指紋數")
+
+    class Meta:
+        db_table = 'copycat_pair_scores'
+        ordering = ['-similarity']
+        indexes = [
+            models.Index(fields=['report', '-similarity']),
+        ]
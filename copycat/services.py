@@ -3,7 +3,13 @@ import os
 import tempfile
 import logging
 from django.conf import settings
-from .models import CopycatReport
+from django.db import connection
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from .fingerprint import (
+    cluster_pairs, create_fingerprint_executor, find_candidate_pairs, fingerprint_sources,
+)
+from .models import CopycatReport, CopycatPairScore
 from submissions.models import Submission
 from django.core.exceptions import ImproperlyConfigured
 
@@ -14,6 +20,18 @@ except AttributeError:
 
 logger = logging.getLogger(__name__)
 
+# 每批寫入暫存檔的提交數，每批結束後更新一次報告進度
+COPYCAT_CHUNK_SIZE = getattr(settings, 'COPYCAT_CHUNK_SIZE', 200)
+
+# 本地預篩 (winnowing)：只把相似度超過門檻的提交群組上傳 MOSS
+COPYCAT_PREFILTER_ENABLED = getattr(settings, 'COPYCAT_PREFILTER_ENABLED', True)
+COPYCAT_JACCARD_THRESHOLD = getattr(settings, 'COPYCAT_JACCARD_THRESHOLD', 0.5)
+COPYCAT_KGRAM_SIZE = getattr(settings, 'COPYCAT_KGRAM_SIZE', 5)
+COPYCAT_WINNOW_SIZE = getattr(settings, 'COPYCAT_WINNOW_SIZE', 4)
+# 出現在超過此數量提交中的指紋視為樣板而忽略（固定數量，不隨提交數比例縮放）
+COPYCAT_MAX_POSTINGS = getattr(settings, 'COPYCAT_MAX_POSTINGS', 200)
+COPYCAT_PREFILTER_PROCESSES = getattr(settings, 'COPYCAT_PREFILTER_PROCESSES', os.cpu_count() or 1)
+
 
 # 1. 語言映射表 (API 字串 -> 資料庫 Integer)
 # 參考 Submission.LANGUAGE_CHOICES: 0=C, 1=C++, 2=Python, 3=Java, 4=JS
@@ -43,9 +61,145 @@ MOSSPY_LANG_MAP = {
     'javascript': 'javascript', 'js': 'javascript'
 }
 
+def latest_submissions_per_user(problem_id, language_type):
+    """
+    取得每位使用者在該題、該語言的「最新」一份提交
+
+    去重在資料庫端完成：PostgreSQL 使用 DISTINCT ON，
+    其他資料庫使用 ROW_NUMBER() 視窗函數，不必把所有提交載入記憶體。
+    """
+    submissions = Submission.objects.filter(
+        problem_id=problem_id,
+        language_type=language_type
+    )
+
+    if connection.features.can_distinct_on_fields:
+        return submissions.order_by('user_id', '-created_at', '-id').distinct('user_id')
+
+    return submissions.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('user_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(row_number=1).order_by('user_id')
+
+
+def _update_progress(report_id, **fields):
+    """只更新進度欄位，避免覆蓋其他欄位"""
+    CopycatReport.objects.filter(id=report_id).update(**fields)
+
+
+def run_local_prefilter(report_id, submissions, moss_lang):
+    """
+    以 winnowing 指紋在本機找出可疑配對，並寫入 CopycatPairScore
+
+    提交分批串流計算指紋 (可使用 process pool)，每批更新一次報告進度。
+
+    Returns:
+        list[tuple]: (submission_a_id, submission_b_id, similarity, shared)
+    """
+    fingerprints = {}
+    processed = 0
+    executor = create_fingerprint_executor(COPYCAT_PREFILTER_PROCESSES)
+
+    def flush(ids, sources):
+        nonlocal processed
+        results = fingerprint_sources(
+            sources, moss_lang,
+            k=COPYCAT_KGRAM_SIZE, window=COPYCAT_WINNOW_SIZE, executor=executor,
+        )
+        fingerprints.update(zip(ids, results))
+        processed += len(ids)
+        _update_progress(report_id, processed_submissions=processed)
+
+    try:
+        chunk_ids, chunk_sources = [], []
+        rows = submissions.values_list('id', 'source_code')
+        for sub_id, source_code in rows.iterator(chunk_size=COPYCAT_CHUNK_SIZE):
+            chunk_ids.append(sub_id)
+            chunk_sources.append(source_code)
+            if len(chunk_ids) >= COPYCAT_CHUNK_SIZE:
+                flush(chunk_ids, chunk_sources)
+                chunk_ids, chunk_sources = [], []
+        if chunk_ids:
+            flush(chunk_ids, chunk_sources)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    pairs = find_candidate_pairs(fingerprints, COPYCAT_JACCARD_THRESHOLD, max_postings=COPYCAT_MAX_POSTINGS)
+
+    # 任務重試時先清除舊結果
+    CopycatPairScore.objects.filter(report_id=report_id).delete()
+    CopycatPairScore.objects.bulk_create(
+        [
+            CopycatPairScore(
+                report_id=report_id,
+                submission_a_id=sub_a,
+                submission_b_id=sub_b,
+                similarity=similarity,
+                shared_fingerprints=shared,
+            )
+            for sub_a, sub_b, similarity, shared in pairs
+        ],
+        batch_size=COPYCAT_CHUNK_SIZE,
+    )
+
+    logger.info(f"[Copycat] 本地預篩完成: {processed} 份提交, {len(pairs)} 組可疑配對")
+    return pairs
+
+
+def _send_to_moss(m, submissions, target_ext, report_id=None):
+    """
+    分批串流提交寫入暫存檔並上傳 MOSS
+
+    Args:
+        report_id: 若提供則每批更新一次報告進度
+
+    Returns:
+        str: MOSS 報告網址
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        rows = submissions.values_list('id', 'user__username', 'source_code')
+        processed = 0
+        for sub_id, username, source_code in rows.iterator(chunk_size=COPYCAT_CHUNK_SIZE):
+            file_name = f"{username}_{sub_id}{target_ext}"
+            file_path = os.path.join(temp_dir, file_name)
+            
+            with open(file_path, "w", encoding='utf-8') as f:
+                f.write(source_code)
+            
+            m.addFile(file_path)
+            processed += 1
+
+            if report_id and processed % COPYCAT_CHUNK_SIZE == 0:
+                _update_progress(report_id, processed_submissions=processed)
+
+        if report_id:
+            _update_progress(report_id, processed_submissions=processed)
+
+        # 上傳可能耗時數分鐘，期間不需要資料庫，先釋放連線 (交易中則保留)
+        if not connection.in_atomic_block:
+            connection.close()
+
+        logger.info(f"[Copycat] 正在上傳 {processed} 份提交至 MOSS 伺服器，請稍候...")
+        return m.send()
+
+
+def _finish_local_report(report, note):
+    """不經 MOSS，以本地預篩結果完成報告"""
+    logger.info(f"[Copycat] 報告 {report.id} 僅提供本地比對結果: {note}")
+    report.refresh_from_db()
+    report.status = 'success'
+    report.local_only = True
+    report.error_message = note
+    report.save()
+
+
 def run_moss_check(report_id, problem_id, language='python'):
     """
-    背景執行的 MOSS 檢測任務
+    執行 MOSS 檢測 (由 copycat.tasks.run_moss_check_task 在 Celery worker 中呼叫)
     """
     logger.info(f"[Copycat] 開始執行 MOSS 檢測 (Report: {report_id}, Problem: {problem_id}, Lang: {language})")
     
@@ -65,45 +219,46 @@ def run_moss_check(report_id, problem_id, language='python'):
 
         m = mosspy.Moss(MOSS_USER_ID, target_moss_lang)
 
-        # 3. 從資料庫撈取 Submission
-        raw_submissions = Submission.objects.filter(
-            problem_id=problem_id,
-            language_type=target_db_val
-        ).select_related('user').order_by('-created_at')
-
-        # 4. 過濾：只保留每位使用者的「最新」一份提交
-        latest_submissions = {}
-        for sub in raw_submissions:
-            if sub.user_id not in latest_submissions:
-                latest_submissions[sub.user_id] = sub
-        
-        final_list = list(latest_submissions.values())
+        # 3. 從資料庫撈取每位使用者最新的提交 (資料庫端去重)
+        latest = latest_submissions_per_user(problem_id, target_db_val)
+        total = latest.count()
 
-        if len(final_list) < 2:
+        if total == 0:
+            raise Exception("沒有找到任何提交")
+        if total < 2:
             raise Exception("提交數量不足 (至少需要 2 位不同的使用者才能比對)")
 
-        logger.info(f"[Copycat] 找到 {len(final_list)} 份有效提交 (已過濾重複使用者)...")
+        logger.info(f"[Copycat] 找到 {total} 份有效提交 (已過濾重複使用者)...")
+        _update_progress(report_id, total_submissions=total, processed_submissions=0)
 
-        # 5. 準備暫存檔案並加入 MOSS
-        with tempfile.TemporaryDirectory() as temp_dir:
-            for sub in final_list:
-                file_name = f"{sub.user.username}_{sub.id}{target_ext}"
-                file_path = os.path.join(temp_dir, file_name)
-                
-                with open(file_path, "w", encoding='utf-8') as f:
-                    f.write(sub.source_code)
-                
-                m.addFile(file_path)
+        if COPYCAT_PREFILTER_ENABLED:
+            # 4. 本地預篩，只上傳可疑群組
+            pairs = run_local_prefilter(report_id, latest, target_moss_lang)
+            suspicious_ids = set().union(*cluster_pairs(pairs))
 
-            # 6. 發送給 MOSS 伺服器
-            logger.info("[Copycat] 正在上傳至 MOSS 伺服器，請稍候...")
-            url = m.send() 
-            
-            # 7. 更新資料庫
-            logger.info(f"[Copycat] 成功！報告網址: {url}")
-            report.moss_url = url
-            report.status = 'success'
-            report.save()
+            if len(suspicious_ids) < 2:
+                _finish_local_report(report, "本地比對未發現相似度超過門檻的提交")
+                return
+            if not MOSS_USER_ID:
+                _finish_local_report(report, "未設定 MOSS_USER_ID，僅提供本地比對結果")
+                return
+
+            # 5. 上傳可疑提交給 MOSS，失敗時退回本地報告
+            try:
+                url = _send_to_moss(m, Submission.objects.filter(id__in=suspicious_ids), target_ext)
+            except Exception as e:
+                _finish_local_report(report, f"MOSS 無法使用，僅提供本地比對結果: {e}")
+                return
+        else:
+            # 4-5. 未啟用預篩時上傳全部提交
+            url = _send_to_moss(m, latest, target_ext, report_id=report_id)
+
+        # 6. 更新資料庫
+        logger.info(f"[Copycat] 成功！報告網址: {url}")
+        report.refresh_from_db()
+        report.moss_url = url
+        report.status = 'success'
+        report.save()
 
     except Exception as e:
         error_msg = str(e)
@@ -0,0 +1,35 @@
+"""
+Copycat 異步任務
+
+MOSS 比對耗時且需上傳所有提交，交由獨立的 copycat 佇列執行，
+不佔用 web worker 的執行緒與資料庫連線
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, acks_late=True)
+def run_moss_check_task(self, report_id, problem_id, language='python'):
+    """
+    異步執行 MOSS 抄襲比對
+
+    Args:
+        report_id: CopycatReport 的 ID
+        problem_id: 題目 ID
+        language: 語言字串 (例如 'python', 'cpp')
+
+    Returns:
+        dict: 報告 ID 與最終狀態
+    """
+    from .models import CopycatReport
+    from .services import run_moss_check
+
+    # run_moss_check 會自行捕捉錯誤並將報告標記為 failed
+    run_moss_check(report_id, problem_id, language)
+
+    report_status = CopycatReport.objects.filter(id=report_id).values_list('status', flat=True).first()
+    logger.info(f'[Copycat] Task finished for report {report_id}: {report_status}')
+    return {'report_id': report_id, 'status': report_status}
@@ -0,0 +1,115 @@
+# copycat/tests/test_fingerprint.py
+"""
+測試本地 winnowing 指紋引擎
+"""
+from django.test import SimpleTestCase
+from copycat.fingerprint import (
+    cluster_pairs,
+    create_fingerprint_executor,
+    find_candidate_pairs,
+    fingerprint,
+    fingerprint_sources,
+    normalize_tokens,
+    winnow,
+)
+
+
+class NormalizeTokensTest(SimpleTestCase):
+    """測試原始碼正規化"""
+
+    def test_python_identifiers_literals_and_comments(self):
+        """識別字、數字、字串正規化，註解被移除"""
+        tokens = normalize_tokens('x = 1  # comment\nprint("hi")', 'python')
+        self.assertEqual(tokens, ['V', '=', 'N', 'V', '(', 'S', ')'])
+
+    def test_c_keywords_are_kept(self):
+        """C 關鍵字保留原樣，區塊註解被移除"""
+        tokens = normalize_tokens('int main() { /* x */ return 0; }', 'c')
+        self.assertEqual(tokens, ['int', 'V', '(', ')', '{', 'return', 'N', ';', '}'])
+
+    def test_renaming_does_not_change_fingerprint(self):
+        """改名與改註解不影響指紋"""
+        original = 'for (int i = 0; i < n; i++) { sum += a[i]; }\nprintf("%d", sum);'
+        renamed = '// copy\nfor (int k = 0; k < m; k++) { total += b[k]; }\nprintf("%d", total);'
+        self.assertEqual(fingerprint(original, 'c'), fingerprint(renamed, 'c'))
+
+
+class WinnowTest(SimpleTestCase):
+    """測試 winnowing 指紋挑選"""
+
+    def test_selects_window_minimums(self):
+        """每個視窗的最小值都會被選到"""
+        hashes = [77, 74, 42, 17, 98, 50, 17, 98, 8, 88, 67, 39, 77, 74, 42, 17, 98]
+        self.assertEqual(winnow(hashes, 4), {17, 8, 39})
+
+    def test_short_input(self):
+        """少於一個視窗時取最小值，空序列沒有指紋"""
+        self.assertEqual(winnow([5, 3, 9], 4), {3})
+        self.assertEqual(winnow([], 4), frozenset())
+
+    def test_fingerprint_sources_without_executor(self):
+        """單程序計算結果與逐份計算一致"""
+        sources = ['a = b + c * d - e', 'x = y + z * w - v']
+        self.assertEqual(
+            fingerprint_sources(sources, 'python'),
+            [fingerprint(source, 'python') for source in sources],
+        )
+
+    def test_single_process_executor_is_none(self):
+        """processes <= 1 時不建立 process pool"""
+        self.assertIsNone(create_fingerprint_executor(1))
+
+
+class CandidatePairsTest(SimpleTestCase):
+    """測試反向索引配對與分群"""
+
+    def test_pairs_above_threshold(self):
+        """只回傳超過門檻的配對，並依相似度排序"""
+        fingerprints = {
+            'a': {1, 2, 3, 4},
+            'b': {1, 2, 3, 5},
+            'c': {1, 2, 3, 4},
+            'd': {9, 10},
+        }
+        pairs = find_candidate_pairs(fingerprints, threshold=0.5)
+
+        self.assertEqual(pairs[0][:3], ('a', 'c', 1.0))
+        self.assertEqual({(a, b) for a, b, *_ in pairs}, {('a', 'c'), ('a', 'b'), ('b', 'c')})
+        self.assertNotIn('d', {key for pair in pairs for key in pair[:2]})
+
+    def test_fingerprints_over_cap_are_ignored(self):
+        """出現在超過 max_postings 份提交中的指紋不會產生配對"""
+        fingerprints = {f'sub{i}': {0, i + 100} for i in range(10)}
+        self.assertEqual(find_candidate_pairs(fingerprints, threshold=0.1, max_postings=5), [])
+
+    def test_ignored_fingerprints_excluded_from_union(self):
+        """被忽略的指紋從兩邊扣除，相似度以相同集合計算"""
+        fingerprints = {f'sub{i}': {0, i + 100} for i in range(10)}
+        fingerprints['sub0'] = fingerprints['sub1'] = {0, 1, 2}
+        pairs = find_candidate_pairs(fingerprints, threshold=0.5, max_postings=5)
+        self.assertEqual(pairs, [('sub0', 'sub1', 1.0, 2)])
+
+    def test_majority_copy_ring_is_found(self):
+        """班上多數人繳交同一份程式碼時，所有抄襲配對都要被找出來"""
+        copied = "n = int(input())\nprint(sum(i * i for i in range(n)))\n"
+        others = [
+            "s = input()\nprint(s[::-1])\n",
+            "a, b = map(int, input().split())\nprint(a + b)\n",
+            "x = [int(v) for v in input().split()]\nx.sort()\nprint(*x)\n",
+            "import math\nprint(math.factorial(int(input())))\n",
+        ]
+        sources = {f'copy{i}': copied for i in range(6)}
+        sources.update({f'other{i}': source for i, source in enumerate(others)})
+        fingerprints = {key: fingerprint(source, 'python') for key, source in sources.items()}
+
+        pairs = find_candidate_pairs(fingerprints, threshold=0.5)
+
+        copy_pairs = [pair for pair in pairs if pair[0].startswith('copy') and pair[1].startswith('copy')]
+        self.assertEqual(len(copy_pairs), 15)
+        self.assertTrue(all(pair[2] == 1.0 for pair in copy_pairs))
+        self.assertEqual(cluster_pairs(pairs), [set(f'copy{i}' for i in range(6))])
+
+    def test_cluster_pairs(self):
+        """相連的配對合併為同一群組"""
+        clusters = cluster_pairs([('a', 'b', 0.9, 5), ('b', 'c', 0.8, 4), ('x', 'y', 0.7, 3)])
+        self.assertCountEqual(clusters, [{'a', 'b', 'c'}, {'x', 'y'}])
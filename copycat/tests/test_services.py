@@ -19,8 +19,10 @@ if __name__ == "__main__":
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from unittest.mock import patch, MagicMock
+from datetime import timedelta
 from copycat.models import CopycatReport
-from copycat.services import run_moss_check, LANG_DB_MAP
+from copycat.services import run_moss_check, latest_submissions_per_user, LANG_DB_MAP
+from submissions.models import Submission
 
 User = get_user_model()
 
@@ -42,13 +44,27 @@ class MossServicesTest(TestCase):
             status='pending'
         )
 
+    def create_submission(self, user, source_code, language_type=2, problem_id=101):
+        return Submission.objects.create(
+            problem_id=problem_id,
+            user=user,
+            language_type=language_type,
+            source_code=source_code,
+        )
+
+    def create_students(self, count):
+        return [
+            User.objects.create_user(
+                username=f'student{i}',
+                email=f'student{i}@example.com',
+                password='student123'
+            )
+            for i in range(1, count + 1)
+        ]
+
     @patch('copycat.services.mosspy.Moss')
-    @patch('copycat.services.Submission.objects.filter')
-    def test_run_moss_check_with_no_submissions(self, mock_submissions, mock_moss):
+    def test_run_moss_check_with_no_submissions(self, mock_moss):
         """測試沒有提交時的 MOSS 檢查"""
-        # 模擬沒有提交
-        mock_submissions.return_value.values.return_value.annotate.return_value = []
-        
         run_moss_check(self.report.id, 101, 'python')
         
         # 報告應該更新為失敗
@@ -57,8 +73,20 @@ class MossServicesTest(TestCase):
         self.assertIn('沒有找到任何提交', self.report.error_message)
 
     @patch('copycat.services.mosspy.Moss')
-    @patch('copycat.services.Submission.objects.filter')
-    def test_run_moss_check_with_invalid_language(self, mock_submissions, mock_moss):
+    def test_run_moss_check_with_single_user(self, mock_moss):
+        """測試只有一位使用者提交時無法比對"""
+        student = self.create_students(1)[0]
+        self.create_submission(student, 'print(1)')
+        self.create_submission(student, 'print(2)')
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'failed')
+        self.assertIn('提交數量不足', self.report.error_message)
+
+    @patch('copycat.services.mosspy.Moss')
+    def test_run_moss_check_with_invalid_language(self, mock_moss):
         """測試使用無效語言的 MOSS 檢查"""
         run_moss_check(self.report.id, 101, 'invalid_language')
         
@@ -66,41 +94,45 @@ class MossServicesTest(TestCase):
         self.assertEqual(self.report.status, 'failed')
         self.assertIn('不支援的語言', self.report.error_message)
 
+    @patch('copycat.services.COPYCAT_PREFILTER_ENABLED', False)
     @patch('copycat.services.mosspy.Moss')
-    @patch('copycat.services.Submission.objects.filter')
-    @patch('copycat.services.tempfile.NamedTemporaryFile')
-    def test_run_moss_check_success(self, mock_tempfile, mock_submissions, mock_moss):
-        """測試成功的 MOSS 檢查"""
-        # 模擬提交數據
-        mock_submission = MagicMock()
-        mock_submission.user__username = 'student1'
-        mock_submission.code = 'print("Hello")'
-        mock_submission.language = 2  # Python
-        
-        mock_submissions.return_value.values.return_value.annotate.return_value = [
-            {
-                'user__username': 'student1',
-                'code': 'print("Hello")',
-                'language': 2,
-                'latest_created_at': '2025-01-01'
-            }
-        ]
+    def test_run_moss_check_success(self, mock_moss):
+        """測試成功的 MOSS 檢查，並記錄進度"""
+        student1, student2 = self.create_students(2)
+        self.create_submission(student1, 'print("Hello")')
+        self.create_submission(student2, 'print("World")')
         
         # 模擬 MOSS 實例
         mock_moss_instance = MagicMock()
         mock_moss_instance.send.return_value = 'http://moss.stanford.edu/results/123/'
         mock_moss.return_value = mock_moss_instance
         
-        # 模擬臨時文件
-        mock_file = MagicMock()
-        mock_tempfile.return_value.__enter__.return_value = mock_file
-        
         run_moss_check(self.report.id, 101, 'python')
         
         # 檢查報告狀態
         self.report.refresh_from_db()
         self.assertEqual(self.report.status, 'success')
-        self.assertIsNotNone(self.report.moss_url)
+        self.assertEqual(self.report.moss_url, 'http://moss.stanford.edu/results/123/')
+        self.assertEqual(self.report.total_submissions, 2)
+        self.assertEqual(self.report.processed_submissions, 2)
+        self.assertEqual(self.report.progress, 100)
+        self.assertEqual(mock_moss_instance.addFile.call_count, 2)
+
+    @patch('copycat.services.COPYCAT_PREFILTER_ENABLED', False)
+    @patch('copycat.services.COPYCAT_CHUNK_SIZE', 2)
+    @patch('copycat.services.mosspy.Moss')
+    def test_run_moss_check_streams_in_chunks(self, mock_moss):
+        """測試提交數超過一批時全部都會被加入 MOSS"""
+        for student in self.create_students(5):
+            self.create_submission(student, f'print("{student.username}")')
+        mock_moss.return_value.send.return_value = 'http://moss.stanford.edu/results/456/'
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'success')
+        self.assertEqual(self.report.processed_submissions, 5)
+        self.assertEqual(mock_moss.return_value.addFile.call_count, 5)
 
     @patch('copycat.services.CopycatReport.objects.get')
     def test_run_moss_check_with_nonexistent_report(self, mock_get):
@@ -111,19 +143,13 @@ class MossServicesTest(TestCase):
         # 不應該拋出異常
         run_moss_check(999, 101, 'python')
 
+    @patch('copycat.services.COPYCAT_PREFILTER_ENABLED', False)
     @patch('copycat.services.mosspy.Moss')
-    @patch('copycat.services.Submission.objects.filter')
-    def test_run_moss_check_handles_moss_exception(self, mock_submissions, mock_moss):
+    def test_run_moss_check_handles_moss_exception(self, mock_moss):
         """測試處理 MOSS 異常"""
-        # 模擬提交
-        mock_submissions.return_value.values.return_value.annotate.return_value = [
-            {
-                'user__username': 'student1',
-                'code': 'print("Hello")',
-                'language': 2,
-                'latest_created_at': '2025-01-01'
-            }
-        ]
+        student1, student2 = self.create_students(2)
+        self.create_submission(student1, 'print("Hello")')
+        self.create_submission(student2, 'print("World")')
         
         # 模擬 MOSS 拋出異常
         mock_moss.return_value.send.side_effect = Exception('MOSS server error')
@@ -135,6 +161,195 @@ class MossServicesTest(TestCase):
         self.assertIn('MOSS server error', self.report.error_message)
 
 
+SOLUTION_CODE = """
+def solve(numbers):
+    total = 0
+    for value in numbers:
+        if value % 2 == 0:
+            total += value * value
+    return total
+
+data = list(map(int, input().split()))
+print(solve(data))
+"""
+
+RENAMED_CODE = """
+# 換了變數名稱與註解
+def answer(arr):
+    acc = 0
+    for x in arr:
+        if x % 2 == 0:
+            acc += x * x
+    return acc
+
+items = list(map(int, input().split()))
+print(answer(items))
+"""
+
+DIFFERENT_CODE = """
+import sys
+n = int(sys.stdin.readline())
+memo = {0: 0, 1: 1}
+while len(memo) <= n:
+    memo[len(memo)] = memo[len(memo) - 1] + memo[len(memo) - 2]
+sys.stdout.write(str(memo[n]))
+"""
+
+
+class LocalPrefilterTest(TestCase):
+    """測試 MOSS 前的本地 winnowing 預篩"""
+
+    def setUp(self):
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@example.com', password='teacher123'
+        )
+        self.report = CopycatReport.objects.create(
+            problem_id=101, requester=self.teacher, status='pending'
+        )
+        self.students = [
+            User.objects.create_user(
+                username=f'student{i}', email=f'student{i}@example.com', password='student123'
+            )
+            for i in range(1, 4)
+        ]
+
+    def create_submission(self, user, source_code):
+        return Submission.objects.create(
+            problem_id=101, user=user, language_type=2, source_code=source_code
+        )
+
+    @patch('copycat.services.MOSS_USER_ID', 12345)
+    @patch('copycat.services.mosspy.Moss')
+    def test_only_suspicious_submissions_sent_to_moss(self, mock_moss):
+        """只有可疑群組會上傳 MOSS，配對分數會被記錄"""
+        copied_a = self.create_submission(self.students[0], SOLUTION_CODE)
+        copied_b = self.create_submission(self.students[1], RENAMED_CODE)
+        self.create_submission(self.students[2], DIFFERENT_CODE)
+        mock_moss.return_value.send.return_value = 'http://moss.stanford.edu/results/789/'
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'success')
+        self.assertFalse(self.report.local_only)
+        self.assertEqual(self.report.processed_submissions, 3)
+        self.assertEqual(mock_moss.return_value.addFile.call_count, 2)
+
+        pair = self.report.pair_scores.get()
+        self.assertEqual({pair.submission_a_id, pair.submission_b_id}, {copied_a.id, copied_b.id})
+        self.assertEqual(pair.similarity, 1.0)
+
+    @patch('copycat.services.MOSS_USER_ID', 12345)
+    @patch('copycat.services.mosspy.Moss')
+    def test_majority_copy_ring_sent_to_moss(self, mock_moss):
+        """多數學生繳交同一份程式碼時，整個群組都會上傳 MOSS"""
+        others = [
+            DIFFERENT_CODE,
+            "s = input()\nprint(s[::-1])\n",
+            "a, b = map(int, input().split())\nprint(a + b)\n",
+            "import math\nprint(math.factorial(int(input())))\n",
+        ]
+        students = [
+            User.objects.create_user(username=f'ring{i}', email=f'ring{i}@example.com', password='ring123')
+            for i in range(10)
+        ]
+        for student in students[:6]:
+            self.create_submission(student, SOLUTION_CODE)
+        for student, source in zip(students[6:], others):
+            self.create_submission(student, source)
+        mock_moss.return_value.send.return_value = 'http://moss.stanford.edu/results/790/'
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertFalse(self.report.local_only)
+        self.assertEqual(self.report.pair_scores.filter(similarity=1.0).count(), 15)
+        self.assertEqual(mock_moss.return_value.addFile.call_count, 6)
+
+    @patch('copycat.services.MOSS_USER_ID', 12345)
+    @patch('copycat.services.mosspy.Moss')
+    def test_no_suspicious_pairs_skips_moss(self, mock_moss):
+        """沒有可疑配對時不上傳 MOSS，直接回傳本地報告"""
+        self.create_submission(self.students[0], SOLUTION_CODE)
+        self.create_submission(self.students[1], DIFFERENT_CODE)
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'success')
+        self.assertTrue(self.report.local_only)
+        self.assertIsNone(self.report.moss_url)
+        self.assertFalse(self.report.pair_scores.exists())
+        mock_moss.return_value.send.assert_not_called()
+
+    @patch('copycat.services.MOSS_USER_ID', 12345)
+    @patch('copycat.services.mosspy.Moss')
+    def test_moss_unavailable_falls_back_to_local_report(self, mock_moss):
+        """MOSS 失敗時回傳本地報告"""
+        self.create_submission(self.students[0], SOLUTION_CODE)
+        self.create_submission(self.students[1], RENAMED_CODE)
+        mock_moss.return_value.send.side_effect = Exception('MOSS server error')
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.status, 'success')
+        self.assertTrue(self.report.local_only)
+        self.assertIn('MOSS server error', self.report.error_message)
+        self.assertEqual(self.report.pair_scores.count(), 1)
+
+    @patch('copycat.services.MOSS_USER_ID', 0)
+    @patch('copycat.services.mosspy.Moss')
+    def test_moss_not_configured_returns_local_report(self, mock_moss):
+        """未設定 MOSS_USER_ID 時直接回傳本地報告"""
+        self.create_submission(self.students[0], SOLUTION_CODE)
+        self.create_submission(self.students[1], RENAMED_CODE)
+
+        run_moss_check(self.report.id, 101, 'python')
+
+        self.report.refresh_from_db()
+        self.assertTrue(self.report.local_only)
+        mock_moss.return_value.send.assert_not_called()
+
+
+class LatestSubmissionsPerUserTest(TestCase):
+    """測試資料庫端的「每位使用者最新提交」查詢"""
+
+    def setUp(self):
+        self.student1 = User.objects.create_user(
+            username='student1', email='student1@example.com', password='student123'
+        )
+        self.student2 = User.objects.create_user(
+            username='student2', email='student2@example.com', password='student123'
+        )
+
+    def create_submission(self, user, source_code, language_type=2, problem_id=101):
+        return Submission.objects.create(
+            problem_id=problem_id,
+            user=user,
+            language_type=language_type,
+            source_code=source_code,
+        )
+
+    def test_returns_latest_submission_per_user(self):
+        """每位使用者只保留最新一份"""
+        old = self.create_submission(self.student1, 'print("old")')
+        new = self.create_submission(self.student1, 'print("new")')
+        Submission.objects.filter(id=old.id).update(created_at=new.created_at - timedelta(minutes=5))
+        other = self.create_submission(self.student2, 'print("other")')
+
+        ids = set(latest_submissions_per_user(101, 2).values_list('id', flat=True))
+
+        self.assertEqual(ids, {new.id, other.id})
+
+    def test_filters_problem_and_language(self):
+        """只包含指定題目與語言的提交"""
+        self.create_submission(self.student1, 'int main(){}', language_type=1)
+        self.create_submission(self.student2, 'print(1)', problem_id=202)
+
+        self.assertEqual(latest_submissions_per_user(101, 2).count(), 0)
+
+
 class LanguageMappingTest(TestCase):
     """測試語言映射"""
 
@@ -129,8 +129,8 @@ class CopycatViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         self.assertIn('老師或助教', response.data['message'])
 
-    @patch('copycat.views.threading.Thread')
-    def test_trigger_check_allowed_for_course_teacher(self, mock_thread):
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_allowed_for_course_teacher(self, mock_delay):
         """測試課程主要老師可以觸發檢測"""
         self.client.force_authenticate(user=self.teacher)
         
@@ -140,8 +140,8 @@ class CopycatViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(response.data['status'], 'ok')
 
-    @patch('copycat.views.threading.Thread')
-    def test_trigger_check_allowed_for_ta(self, mock_thread):
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_allowed_for_ta(self, mock_delay):
         """測試助教可以觸發檢測"""
         self.client.force_authenticate(user=self.ta)
         
@@ -151,8 +151,8 @@ class CopycatViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(response.data['status'], 'ok')
 
-    @patch('copycat.views.threading.Thread')
-    def test_trigger_check_allowed_for_course_member_teacher_role(self, mock_thread):
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_allowed_for_course_member_teacher_role(self, mock_delay):
         """測試課程成員中角色為老師的使用者可以觸發檢測"""
         # 創建另一位老師並加入課程成員
         another_teacher = User.objects.create_user(
@@ -288,8 +288,8 @@ class CopycatViewTest(TestCase):
     # 功能測試 - POST
     # ===========================================
 
-    @patch('copycat.views.threading.Thread')
-    def test_trigger_check_success(self, mock_thread):
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_success(self, mock_delay):
         """測試成功觸發檢測"""
         self.client.force_authenticate(user=self.teacher)
         
@@ -303,11 +303,25 @@ class CopycatViewTest(TestCase):
         # 確認報告已創建
         self.assertTrue(CopycatReport.objects.filter(problem_id=101).exists())
         
-        # 確認線程已啟動
-        mock_thread.assert_called_once()
+        # 確認任務已排入 Celery
+        report = CopycatReport.objects.get(problem_id=101)
+        mock_delay.assert_called_once_with(report.id, 101, 'python')
 
-    @patch('copycat.views.threading.Thread')
-    def test_trigger_check_with_pending_task(self, mock_thread):
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_queue_unavailable(self, mock_delay):
+        """測試無法排入任務時回傳 503 並將報告標記為失敗"""
+        mock_delay.side_effect = Exception('broker down')
+        self.client.force_authenticate(user=self.teacher)
+
+        data = {'problem_id': 101, 'language': 'python'}
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        report = CopycatReport.objects.get(problem_id=101)
+        self.assertEqual(report.status, 'failed')
+
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_with_pending_task(self, mock_delay):
         """測試已有進行中的任務"""
         # 創建一個 pending 的報告
         CopycatReport.objects.create(
@@ -324,8 +338,8 @@ class CopycatViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
         self.assertIn('正在進行中', response.data['message'])
 
-    @patch('copycat.views.threading.Thread')
-    def test_trigger_check_default_language(self, mock_thread):
+    @patch('copycat.views.run_moss_check_task.delay')
+    def test_trigger_check_default_language(self, mock_delay):
         """測試預設語言為 python"""
         self.client.force_authenticate(user=self.teacher)
         
@@ -363,6 +377,24 @@ class CopycatViewTest(TestCase):
         self.assertEqual(response.data['data']['status'], 'pending')
         self.assertIsNone(response.data['data']['moss_url'])
 
+    def test_query_report_pending_progress(self):
+        """測試查詢處理中的報告會回傳完成百分比"""
+        CopycatReport.objects.create(
+            problem_id=101,
+            requester=self.teacher,
+            status='pending',
+            total_submissions=8,
+            processed_submissions=2
+        )
+
+        self.client.force_authenticate(user=self.teacher)
+
+        response = self.client.get(f'{self.url}?problem_id=101')
+
+        self.assertEqual(response.data['data']['progress'], 25)
+        self.assertEqual(response.data['data']['total_submissions'], 8)
+        self.assertEqual(response.data['data']['processed_submissions'], 2)
+
     def test_query_report_success(self):
         """測試查詢成功的報告"""
         moss_url = 'http://moss.stanford.edu/results/123/'
@@ -1,4 +1,4 @@
-import threading
+import logging
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -7,11 +7,17 @@ from rest_framework.authentication import SessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from api_tokens.authentication import ApiTokenAuthentication
 
-from .models import CopycatReport
+from .models import CopycatReport, CopycatPairScore
 from submissions.models import Submission
 from problems.models import Problems
 from courses.models import Course_members
-from .services import run_moss_check, LANG_DB_MAP
+from .services import LANG_DB_MAP
+from .tasks import run_moss_check_task
+
+logger = logging.getLogger(__name__)
+
+# GET 回傳的本地預篩配對上限 (依相似度由高到低)
+REPORT_PAIR_LIMIT = 100
 
 
 # ===================================================================
@@ -63,6 +69,24 @@ class CopycatView(APIView):
         
         return False, "您必須是該題所屬課程的老師或助教才能執行此操作"
 
+    def _serialize_pairs(self, report):
+        """本地預篩找出的可疑配對"""
+        pair_scores = CopycatPairScore.objects.filter(report=report).select_related(
+            'submission_a__user', 'submission_b__user'
+        ).order_by('-similarity')[:REPORT_PAIR_LIMIT]
+
+        return [
+            {
+                "submission_a": str(pair.submission_a_id),
+                "user_a": pair.submission_a.user.username,
+                "submission_b": str(pair.submission_b_id),
+                "user_b": pair.submission_b.user.username,
+                "similarity": round(pair.similarity, 4),
+                "shared_fingerprints": pair.shared_fingerprints,
+            }
+            for pair in pair_scores
+        ]
+
     def post(self, request):
         problem_id = request.data.get('problem_id')
         language = request.data.get('language', 'python')
@@ -104,13 +128,15 @@ class CopycatView(APIView):
                 status_code=429
             )
 
-        # 5. 啟動背景執行緒
-        thread = threading.Thread(
-            target=run_moss_check,
-            args=(report.id, problem_id, language)
-        )
-        thread.daemon = True
-        thread.start()
+        # 5. 交給 Celery copycat 佇列執行
+        try:
+            run_moss_check_task.delay(report.id, problem_id, language)
+        except Exception as e:
+            logger.error(f"[Copycat] 無法排入比對任務 (Report: {report.id}): {e}")
+            report.status = 'failed'
+            report.error_message = f"無法排入比對任務: {e}"
+            report.save(update_fields=['status', 'error_message', 'updated_at'])
+            return api_response(None, "無法啟動抄襲比對任務，請稍後再試", status_code=503)
 
         return api_response(
             {"report_id": report.id, "status": "pending"},
@@ -150,7 +176,12 @@ class CopycatView(APIView):
             "status": report.status,
             "moss_url": report.moss_url,
             "created_at": report.created_at,
-            "error_message": report.error_message
+            "error_message": report.error_message,
+            "progress": report.progress,
+            "total_submissions": report.total_submissions,
+            "processed_submissions": report.processed_submissions,
+            "local_only": report.local_only,
+            "pairs": self._serialize_pairs(report)
         }
         
         msg = "成功取得報告" if report.status == 'success' else f"報告狀態：{report.get_status_display()}"
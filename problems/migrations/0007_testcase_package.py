@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 08:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0006_merge_20251228_1914'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemTestcasePackage',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('testcase_hash', models.CharField(max_length=64)),
+                ('meta', models.JSONField(default=dict)),
+                ('tasks', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('problem', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='testcase_package', to='problems.problems')),
+            ],
+            options={
+                'db_table': 'problem_testcase_packages',
+            },
+        ),
+    ]
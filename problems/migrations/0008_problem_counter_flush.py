@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('problems', '0007_testcase_package'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemCounterFlush',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=32, unique=True)),
+                ('applied_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'db_table': 'problem_counter_flushes',
+            },
+        ),
+    ]
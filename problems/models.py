@@ -393,3 +393,42 @@ class ProblemLike(models.Model):
 
     def __str__(self):
         return f"Like Problem {self.problem.id} by {self.user.username}" 
+
+
+class ProblemTestcasePackage(models.Model):
+    """測資包（problem.zip）的解析結果
+
+    上傳測資時由 `problems.services.testcase_package` 建立，記錄 meta.json 與 .in/.out 檔案列表，
+    讓題目詳情與 Sandbox meta 端點不必重新讀取 zip。
+    `testcase_hash` 與 `Problems.testcase_hash` 不一致時視為過期，會從 zip 的目錄區重新解析。
+    """
+
+    id = models.AutoField(primary_key=True)
+    problem = models.OneToOneField(Problems, on_delete=models.CASCADE, related_name='testcase_package')
+    testcase_hash = models.CharField(max_length=64)
+    meta = models.JSONField(default=dict)
+    tasks = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'problem_testcase_packages'
+
+    def __str__(self):
+        return f"Testcase package of Problem {self.problem_id} ({self.testcase_hash[:8]})"
+
+
+class ProblemCounterFlush(models.Model):
+    """已套用的題目計數器批次
+
+    `problems.services.counters` 在套用增量的同一個交易內寫入批次 ID，
+    套用後清除 Redis 失敗而重試時，同一批不會再加一次。
+    """
+
+    batch_id = models.CharField(max_length=32, unique=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'problem_counter_flushes'
+
+    def __str__(self):
+        return f"Problem counter batch {self.batch_id}"
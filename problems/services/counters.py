@@ -0,0 +1,203 @@
+"""
+題目計數器的 write-behind 緩衝
+
+total_submissions / accepted_submissions / view_count 在建立提交、判題與瀏覽時
+以 HINCRBY 累加到 Redis（problem_counters:pending，欄位為 "<problem_id>:<counter>"），
+不直接 UPDATE 題目列，熱門題目不會因此序列化所有提交。
+
+flush_problem_counters_task 定期（PROBLEM_COUNTER_FLUSH_INTERVAL 秒）以 RENAME 取出目前的增量，
+用一次 CASE UPDATE 套用到所有題目，再以 recompute_acceptance_rate 更新通過率。
+flush 全程持有 Redis 鎖；每批增量帶有批次 ID，與增量在同一個交易內寫入 ProblemCounterFlush，
+套用後清除 Redis 失敗而重試時會略過已套用的批次。
+Redis 無法使用時改為直接以 F() 更新該題。
+"""
+
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from problems.models import ProblemCounterFlush, Problems
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'problem_counters:pending'
+# 正在套用的增量；套用失敗時保留，下次 flush 先處理
+FLUSHING_KEY = 'problem_counters:flushing'
+# flushing hash 內記錄批次 ID 的欄位
+BATCH_FIELD = '__batch__'
+LOCK_KEY = 'problem_counters:flush_lock'
+LOCK_TIMEOUT = 5 * 60
+# 已套用批次的紀錄保留時間
+APPLIED_BATCH_RETENTION = timedelta(days=7)
+
+COUNTERS = ('total_submissions', 'accepted_submissions', 'view_count')
+FLUSH_CHUNK_SIZE = 500
+
+AC_STATUS = '0'
+
+
+class ProblemCounterBuffer:
+    """題目計數器的 Redis 增量緩衝"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis client，None 則使用 django-redis 的 default 連線
+        """
+        self._client = client
+
+    @property
+    def redis(self):
+        if self._client is None:
+            self._client = get_redis_connection("default")
+        return self._client
+
+    def incr(self, problem_id, counter, amount=1):
+        """
+        累加題目計數器
+
+        Args:
+            problem_id: 題目 ID
+            counter: COUNTERS 其中之一
+            amount: 增量（可為負）
+        """
+        if counter not in COUNTERS:
+            raise ValueError(f'Unknown problem counter: {counter}')
+        if not amount:
+            return
+        try:
+            self.redis.hincrby(PENDING_KEY, f'{problem_id}:{counter}', amount)
+        except Exception as e:
+            logger.warning(f'Problem counter buffer unavailable, updating problem {problem_id} directly: {e}')
+            Problems.objects.filter(pk=problem_id).update(**{counter: F(counter) + amount})
+
+    def record_submission(self, problem_id):
+        self.incr(problem_id, 'total_submissions')
+
+    def record_judge_result(self, problem_id, old_status, new_status):
+        """判題或重新判題使提交進入 / 離開 AC 時調整通過數"""
+        delta = int(new_status == AC_STATUS) - int(old_status == AC_STATUS)
+        self.incr(problem_id, 'accepted_submissions', delta)
+
+    def record_rejudge_reset(self, accepted_by_problem):
+        """
+        批次重新判題把 AC 提交重設為 Pending 時扣除通過數
+
+        Args:
+            accepted_by_problem: {problem_id: 被重設的 AC 提交數}
+        """
+        for problem_id, count in accepted_by_problem.items():
+            self.incr(problem_id, 'accepted_submissions', -count)
+
+    def record_view(self, problem_id):
+        self.incr(problem_id, 'view_count')
+
+    def _take_pending(self):
+        """
+        取出待套用的增量（RENAME 為原子操作，之後的 HINCRBY 寫入新的 pending）
+
+        Returns:
+            (批次 ID, {field: value})；沒有增量時為 (None, {})
+        """
+        if not self.redis.exists(FLUSHING_KEY):
+            try:
+                self.redis.rename(PENDING_KEY, FLUSHING_KEY)
+            except Exception as e:
+                # pending 不存在（沒有任何增量）時 RENAME 會失敗
+                if self.redis.exists(PENDING_KEY):
+                    raise
+                logger.debug(f'No pending problem counters: {e}')
+                return None, {}
+        # 上一次 flush 中斷時沿用同一個批次 ID
+        self.redis.hsetnx(FLUSHING_KEY, BATCH_FIELD, uuid.uuid4().hex)
+        fields = {
+            (field.decode() if isinstance(field, bytes) else field): value
+            for field, value in self.redis.hgetall(FLUSHING_KEY).items()
+        }
+        batch_id = fields.pop(BATCH_FIELD)
+        return (batch_id.decode() if isinstance(batch_id, bytes) else batch_id), fields
+
+    def flush(self):
+        """
+        把緩衝的增量套用到 Problems
+
+        Returns:
+            更新的題目數；另一個 flush 正在執行時為 0
+        """
+        token = uuid.uuid4().hex
+        if not self.redis.set(LOCK_KEY, token, nx=True, ex=LOCK_TIMEOUT):
+            logger.info('Problem counter flush already running, skipped')
+            return 0
+        try:
+            return self._flush_locked()
+        finally:
+            lock = self.redis.get(LOCK_KEY)
+            if (lock.decode() if isinstance(lock, bytes) else lock) == token:
+                self.redis.delete(LOCK_KEY)
+
+    def _flush_locked(self):
+        batch_id, fields = self._take_pending()
+        if batch_id is None:
+            return 0
+
+        deltas = defaultdict(dict)
+        for field, value in fields.items():
+            problem_id, counter = field.split(':', 1)
+            if counter in COUNTERS and int(value):
+                deltas[int(problem_id)][counter] = int(value)
+
+        applied = False
+        with transaction.atomic():
+            if not ProblemCounterFlush.objects.filter(batch_id=batch_id).exists():
+                ProblemCounterFlush.objects.create(batch_id=batch_id)
+                apply_counter_deltas(deltas)
+                applied = True
+        if not applied:
+            logger.warning(f'Problem counter batch {batch_id} already applied, discarded')
+        self.redis.delete(FLUSHING_KEY)
+        ProblemCounterFlush.objects.filter(
+            applied_at__lt=timezone.now() - APPLIED_BATCH_RETENTION
+        ).delete()
+        return len(deltas) if applied else 0
+
+
+def apply_counter_deltas(deltas):
+    """
+    以 CASE UPDATE 批次套用增量並重算通過率
+
+    Args:
+        deltas: {problem_id: {counter: delta}}
+    """
+    problem_ids = sorted(deltas)
+    for start in range(0, len(problem_ids), FLUSH_CHUNK_SIZE):
+        chunk = problem_ids[start:start + FLUSH_CHUNK_SIZE]
+        updates = {}
+        for counter in COUNTERS:
+            whens = [
+                When(pk=pid, then=Value(deltas[pid][counter]))
+                for pid in chunk if deltas[pid].get(counter)
+            ]
+            if whens:
+                updates[counter] = F(counter) + Case(*whens, default=Value(0), output_field=IntegerField())
+        Problems.objects.filter(pk__in=chunk).update(**updates)
+
+        affects_rate = [
+            pid for pid in chunk
+            if deltas[pid].get('total_submissions') or deltas[pid].get('accepted_submissions')
+        ]
+        problems = list(
+            Problems.objects.filter(pk__in=affects_rate)
+            .only('id', 'total_submissions', 'accepted_submissions', 'acceptance_rate')
+        )
+        for problem in problems:
+            problem.recompute_acceptance_rate(save=False)
+        Problems.objects.bulk_update(problems, ['acceptance_rate'])
+
+
+problem_counters = ProblemCounterBuffer()
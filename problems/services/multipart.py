@@ -0,0 +1,282 @@
+"""
+題目測資分片上傳（multipart upload）
+
+上傳狀態存在 cache 的 `prob_tc_multipart:<upload_id>` 紀錄，分片檔案存在
+`MEDIA_ROOT/tmp_uploads/<upload_id>/part_<n>`。
+分片可平行、亂序上傳，每片寫入時同步計算 SHA256 並與用戶端提供的值比對；
+完成時依序串流拼接到 problem.zip 旁的暫存檔，不在記憶體中緩衝整個檔案。
+"""
+
+import hashlib
+import logging
+import math
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# 上傳紀錄的存活時間（秒），每上傳一個分片就重新計時，斷線後可在期限內續傳
+MULTIPART_TTL = getattr(settings, 'TESTCASE_MULTIPART_TTL', 600)
+
+# 測資包大小上限（bytes）
+MULTIPART_MAX_LENGTH = getattr(settings, 'TESTCASE_MULTIPART_MAX_LENGTH', 1024 * 1024 * 1024)
+# 分片大小下限；整個檔案只有一片時不受限制
+MULTIPART_MIN_PART_SIZE = getattr(settings, 'TESTCASE_MULTIPART_MIN_PART_SIZE', 256 * 1024)
+# 分片數量上限
+MULTIPART_MAX_PARTS = getattr(settings, 'TESTCASE_MULTIPART_MAX_PARTS', 10000)
+
+# 串流複製的緩衝區大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 平行上傳分片時更新紀錄用的鎖
+_RECORD_LOCK_TIMEOUT = 5
+_RECORD_LOCK_WAIT = 0.02
+_RECORD_LOCK_RETRIES = 250
+
+
+class MultipartUploadError(Exception):
+    """分片上傳失敗，status_code 對應回應的 HTTP 狀態碼"""
+
+    def __init__(self, message, status_code=400, data=None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.data = data
+
+
+def multipart_key(upload_id: str) -> str:
+    return f"prob_tc_multipart:{upload_id}"
+
+
+def upload_dir(upload_id: str) -> str:
+    return os.path.join(settings.MEDIA_ROOT, "tmp_uploads", upload_id)
+
+
+def part_path(upload_id: str, part_number: int) -> str:
+    return os.path.join(upload_dir(upload_id), f"part_{part_number:05d}")
+
+
+def part_count(info: dict) -> int:
+    return max(1, math.ceil(info['length'] / info['part_size']))
+
+
+def expected_part_size(info: dict, part_number: int) -> int:
+    """除了最後一片，每片大小都必須等於 part_size"""
+    count = part_count(info)
+    if part_number < count:
+        return info['part_size']
+    return info['length'] - info['part_size'] * (count - 1)
+
+
+def missing_parts(info: dict) -> list:
+    return [n for n in range(1, part_count(info) + 1) if n not in info['parts']]
+
+
+def validate_upload_size(length: int, part_size: int):
+    """
+    檢查初始化時宣告的檔案與分片大小
+
+    Raises:
+        MultipartUploadError: 超過大小上限 (413)、分片太小或分片數過多 (422)
+    """
+    if length <= 0 or part_size <= 0:
+        raise MultipartUploadError("length and part_size must be positive", status_code=422)
+    if length > MULTIPART_MAX_LENGTH:
+        raise MultipartUploadError(
+            f"length must not exceed {MULTIPART_MAX_LENGTH} bytes", status_code=413,
+            data={"max_length": MULTIPART_MAX_LENGTH},
+        )
+    if part_size < min(MULTIPART_MIN_PART_SIZE, length):
+        raise MultipartUploadError(
+            f"part_size must be at least {MULTIPART_MIN_PART_SIZE} bytes", status_code=422,
+            data={"min_part_size": MULTIPART_MIN_PART_SIZE},
+        )
+    if math.ceil(length / part_size) > MULTIPART_MAX_PARTS:
+        raise MultipartUploadError(
+            f"part count must not exceed {MULTIPART_MAX_PARTS}", status_code=422,
+            data={"max_parts": MULTIPART_MAX_PARTS},
+        )
+
+
+def create_upload(problem_id: int, user_id, length: int, part_size: int) -> str:
+    """
+    建立上傳紀錄，回傳 upload_id
+
+    Raises:
+        MultipartUploadError: 大小不符限制，見 validate_upload_size
+    """
+    validate_upload_size(length, part_size)
+    upload_id = str(uuid.uuid4())
+    cache.set(multipart_key(upload_id), {
+        "problem_id": problem_id,
+        "user_id": user_id,
+        "length": length,
+        "part_size": part_size,
+        "parts": {},
+    }, MULTIPART_TTL)
+    return upload_id
+
+
+def get_upload(upload_id, problem_id: int) -> dict:
+    """
+    取得上傳紀錄
+
+    Raises:
+        MultipartUploadError: upload_id 格式錯誤 (422)、已過期或不屬於此題目 (410)
+    """
+    if not upload_id:
+        raise MultipartUploadError("upload_id is required", status_code=422)
+    try:
+        # upload_id 會用在暫存路徑上，必須是 UUID
+        uuid.UUID(str(upload_id))
+    except ValueError:
+        raise MultipartUploadError("upload_id is invalid", status_code=422)
+    info = cache.get(multipart_key(upload_id))
+    if not info or info.get('problem_id') != problem_id:
+        raise MultipartUploadError("upload_id expired or invalid", status_code=410)
+    return info
+
+
+@contextmanager
+def _record_lock(upload_id: str):
+    """以 cache.add 實作的互斥鎖，避免平行上傳的分片互相覆蓋紀錄"""
+    lock_key = f"{multipart_key(upload_id)}:lock"
+    for _ in range(_RECORD_LOCK_RETRIES):
+        if cache.add(lock_key, 1, _RECORD_LOCK_TIMEOUT):
+            break
+        time.sleep(_RECORD_LOCK_WAIT)
+    else:
+        raise MultipartUploadError("Upload record is busy, please retry", status_code=409)
+    try:
+        yield
+    finally:
+        cache.delete(lock_key)
+
+
+def save_part(upload_id: str, problem_id: int, part_number: int, fileobj, checksum: str) -> dict:
+    """
+    保存一個分片
+
+    邊寫入暫存檔邊計算 SHA256，大小與 checksum 都相符才放到正式位置並寫入紀錄；
+    重複上傳同一分片會覆蓋舊的（續傳）
+
+    Returns:
+        dict: {"part_number", "size", "sha256"}
+    """
+    info = get_upload(upload_id, problem_id)
+    count = part_count(info)
+    if not 1 <= part_number <= count:
+        raise MultipartUploadError(f"part_number must be between 1 and {count}", status_code=422)
+    expected_size = expected_part_size(info, part_number)
+    checksum = (checksum or '').strip().lower()
+    if not checksum:
+        raise MultipartUploadError("sha256 is required", status_code=422)
+
+    directory = upload_dir(upload_id)
+    os.makedirs(directory, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.part_')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for chunk in iter(lambda: fileobj.read(COPY_BUFFER_SIZE), b''):
+                size += len(chunk)
+                if size > expected_size:
+                    break
+                hasher.update(chunk)
+                fh.write(chunk)
+        if size != expected_size:
+            raise MultipartUploadError(
+                f"Part {part_number} size mismatch: expected {expected_size} bytes",
+                status_code=400,
+            )
+        digest = hasher.hexdigest()
+        if digest != checksum:
+            raise MultipartUploadError(
+                f"Part {part_number} checksum mismatch",
+                status_code=400,
+                data={"expected": checksum, "actual": digest},
+            )
+        os.replace(tmp_path, part_path(upload_id, part_number))
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    part = {"part_number": part_number, "size": size, "sha256": digest}
+    with _record_lock(upload_id):
+        info = get_upload(upload_id, problem_id)
+        info['parts'][part_number] = {"size": size, "sha256": digest}
+        cache.set(multipart_key(upload_id), info, MULTIPART_TTL)
+    return part
+
+
+def verify_manifest(info: dict, parts) -> None:
+    """
+    比對用戶端在 complete 時送出的分片清單（S3 風格 PartNumber / ETag）與伺服器紀錄
+
+    ETag 為分片的 SHA256；未送出清單時略過
+    """
+    for item in parts or []:
+        try:
+            number = int(item.get('PartNumber', item.get('part_number')))
+        except (AttributeError, TypeError, ValueError):
+            raise MultipartUploadError("parts must be a list of {PartNumber, ETag}", status_code=422)
+        etag = str(item.get('ETag', item.get('sha256', '')) or '').strip('"').lower()
+        recorded = info['parts'].get(number)
+        if recorded is None or (etag and etag != recorded['sha256']):
+            raise MultipartUploadError(
+                "Part list does not match uploaded parts",
+                status_code=400,
+                data={"part_number": number},
+            )
+
+
+def assemble_parts(upload_id: str, info: dict, dst_dir: str):
+    """
+    依序將所有分片串流拼接到 dst_dir 下的暫存檔，並同步計算整體 SHA256
+
+    Returns:
+        (tmp_path, sha256)：呼叫端驗證後以 os.replace 放到正式位置，失敗時自行刪除
+    """
+    missing = missing_parts(info)
+    if missing:
+        raise MultipartUploadError("Missing uploaded parts", status_code=422, data={"missing_parts": missing})
+
+    os.makedirs(dst_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=dst_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for number in range(1, part_count(info) + 1):
+                path = part_path(upload_id, number)
+                if not os.path.exists(path) or os.path.getsize(path) != info['parts'][number]['size']:
+                    raise MultipartUploadError(
+                        "Missing uploaded parts", status_code=422, data={"missing_parts": [number]}
+                    )
+                with open(path, 'rb') as src:
+                    for chunk in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+                        hasher.update(chunk)
+                        out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return tmp_path, hasher.hexdigest()
+
+
+def discard_upload(upload_id: str) -> None:
+    """刪除分片暫存檔與上傳紀錄"""
+    shutil.rmtree(upload_dir(upload_id), ignore_errors=True)
+    cache.delete(multipart_key(upload_id))
@@ -2,10 +2,10 @@ import hashlib
 import os
 from typing import BinaryIO, Tuple
 
-from django.conf import settings
 from django.core.files.storage import FileSystemStorage
 
-_storage = FileSystemStorage(location=settings.MEDIA_ROOT)
+# 不指定 location，使用當下的 MEDIA_ROOT（測試時可用 settings 覆寫）
+_storage = FileSystemStorage()
 
 
 def _sha256_of_fileobj(f: BinaryIO) -> str:
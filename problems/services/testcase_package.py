@@ -0,0 +1,368 @@
+"""
+測資包（problem.zip）解析
+
+上傳時解析一次 zip 的檔案列表與 meta.json，存入 ProblemTestcasePackage（以 testcase_hash 為版本），
+題目詳情與 Sandbox meta 端點直接讀取解析結果，不再重複開啟 zip。
+zip 內沒有 meta.json（分片上傳）時只保存檔案列表，meta 於每次讀取時依目前的子題設定產生，
+老師修改子題的時間、記憶體限制或配分後 Sandbox 立即取得新設定。
+解析結果不存在或過期時，只讀取 zip 的目錄區（central directory）重建，不載入整個檔案。
+
+上傳的 zip 以串流方式重打包（加入 meta.json），記憶體用量與檔案大小無關。
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from contextlib import contextmanager
+
+from .storage import _storage
+
+logger = logging.getLogger(__name__)
+
+# 子題設定缺漏時 meta.json 使用的預設值（與 Sandbox 約定）
+DEFAULT_TIME_LIMIT_MS = 1000
+DEFAULT_MEMORY_LIMIT_KB = 134218
+
+# 串流複製的緩衝區大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# zip local file header 固定長度（不含檔名與 extra field）
+_LOCAL_HEADER_SIZE = 30
+
+
+def problem_zip_path(problem_id: int) -> str:
+    """測資包在 storage 中的相對路徑"""
+    return os.path.join("testcases", f"p{problem_id}", "problem.zip")
+
+
+def collect_pairs(names) -> dict:
+    """
+    依檔名規則 sstt.in / sstt.out（兩位子題、兩位測資，從 00 開始）分組
+
+    Returns:
+        dict: subtask_index -> {'in': set(tt), 'out': set(tt)}
+    """
+    pairs_map = {}
+    for n in names:
+        base = os.path.basename(n)
+        stem, ext = os.path.splitext(base)
+        if ext not in ('.in', '.out'):
+            continue
+        if len(stem) != 4 or not stem.isdigit():
+            continue
+        ss = int(stem[:2])
+        tt = int(stem[2:])
+        entry = pairs_map.setdefault(ss, {'in': set(), 'out': set()})
+        entry['in' if ext == '.in' else 'out'].add(tt)
+    return pairs_map
+
+
+def build_testcases_list(pairs_map: dict, max_ss: int) -> list:
+    """
+    建立 testcases 列表，記錄每個測資檔案的詳細資訊
+
+    Args:
+        pairs_map (dict): 映射 subtask_index -> {'in': set(tt), 'out': set(tt)}
+        max_ss (int): 最大的 subtask index
+
+    Returns:
+        list: 包含每個測資詳細資訊的列表，每個元素包含 stem, no, in, out, subtask 欄位
+    """
+    testcases = []
+    testcase_no = 1
+    for ss in range(max_ss + 1):
+        entry = pairs_map.get(ss, {'in': set(), 'out': set()})
+        matched_tts = sorted(entry['in'] & entry['out'])
+        for tt in matched_tts:
+            stem = f"{ss:02d}{tt:02d}"
+            testcases.append({
+                "stem": stem,
+                "no": testcase_no,
+                "in": f"{stem}.in",
+                "out": f"{stem}.out",
+                "subtask": ss + 1  # subtask 從 1 開始
+            })
+            testcase_no += 1
+    return testcases
+
+
+def build_meta(problem, names) -> dict:
+    """
+    由 zip 檔案列表與資料庫子題設定（time/memory/score）產生 meta.json 結構
+
+    子題索引 ss 對應 subtask_no = ss + 1，以「同時存在 in/out」的測資數量作為 caseCount
+    """
+    from ..models import Problem_subtasks
+
+    pairs_map = collect_pairs(names)
+    case_counts = {ss: len(entry['in'] & entry['out']) for ss, entry in pairs_map.items()}
+    subtask_map = {st.subtask_no - 1: st for st in Problem_subtasks.objects.filter(problem_id=problem)}
+
+    def build_meta_entry(ss_idx: int):
+        st = subtask_map.get(ss_idx)
+        time_limit = getattr(st, 'time_limit_ms', None) or DEFAULT_TIME_LIMIT_MS
+        mem_mb = getattr(st, 'memory_limit_mb', None)
+        memory_limit = (mem_mb * 1024) if mem_mb is not None else DEFAULT_MEMORY_LIMIT_KB
+        return {
+            "caseCount": case_counts.get(ss_idx, 0),
+            "memoryLimit": memory_limit // 1024,  # Sandbox uses MB for memoryLimit in meta
+            "memoryLimitKB": memory_limit,
+            "taskScore": getattr(st, 'weight', None) or 0,
+            "timeLimit": time_limit,
+        }
+
+    max_ss = max(case_counts.keys()) if case_counts else -1
+    return {
+        "tasks": [build_meta_entry(ss) for ss in range(max_ss + 1)],
+        "testcases": build_testcases_list(pairs_map, max_ss),
+    }
+
+
+def build_tasks(names) -> list:
+    """題目詳情的 testCase 列表：[{ no, stem, in, out }]，不成對的檔名對應欄位為 None"""
+    def stem(n):
+        return os.path.splitext(os.path.basename(n))[0]
+
+    in_map = {stem(n): n for n in names if n.endswith('.in')}
+    out_map = {stem(n): n for n in names if n.endswith('.out')}
+    all_stems = sorted(set(in_map) | set(out_map))
+    return [
+        {'no': idx, 'stem': s, 'in': in_map.get(s), 'out': out_map.get(s)}
+        for idx, s in enumerate(all_stems, start=1)
+    ]
+
+
+def scan_archive(rel: str):
+    """
+    讀取 zip 的檔案列表與 meta.json
+
+    ZipFile 直接開在檔案上只會讀取結尾的目錄區與 meta.json 這個成員，不會載入整個 zip。
+
+    Returns:
+        (names, meta)：meta.json 不存在時 meta 為 None
+
+    Raises:
+        zipfile.BadZipFile: zip 損毀
+    """
+    with _storage.open(rel, 'rb') as fh:
+        with zipfile.ZipFile(fh) as zf:
+            names = zf.namelist()
+            meta = None
+            if 'meta.json' in names:
+                with zf.open('meta.json') as mf:
+                    meta = json.loads(mf.read().decode('utf-8'))
+    return names, meta
+
+
+def record_package(problem, names, meta=None):
+    """
+    保存解析結果，以目前的 problem.testcase_hash 作為版本
+
+    Args:
+        meta: zip 內的 meta.json；None 表示沒有，讀取時由 package_meta 依子題設定產生
+
+    題目尚無 testcase_hash 時無法判斷版本，只回傳未保存的物件
+    """
+    from ..models import ProblemTestcasePackage
+
+    tasks = build_tasks(names)
+    meta = meta or {}
+    if not problem.testcase_hash:
+        return ProblemTestcasePackage(problem=problem, testcase_hash='', meta=meta, tasks=tasks)
+    package, _ = ProblemTestcasePackage.objects.update_or_create(
+        problem=problem,
+        defaults={'testcase_hash': problem.testcase_hash, 'meta': meta, 'tasks': tasks},
+    )
+    return package
+
+
+def get_testcase_package(problem):
+    """
+    取得題目的測資包解析結果
+
+    優先使用已保存且 hash 相符的結果；否則從 zip 目錄區重新解析並保存
+
+    Returns:
+        ProblemTestcasePackage 或 None（沒有測資包）
+
+    Raises:
+        zipfile.BadZipFile: zip 損毀
+    """
+    from ..models import ProblemTestcasePackage
+
+    package = ProblemTestcasePackage.objects.filter(problem=problem).first()
+    if package is not None and problem.testcase_hash and package.testcase_hash == problem.testcase_hash:
+        return package
+
+    rel = problem_zip_path(problem.id)
+    if not _storage.exists(rel):
+        return None
+    logger.info(f"Testcase package of problem {problem.id} missing or stale, rebuilding from archive")
+    names, meta = scan_archive(rel)
+    return record_package(problem, names, meta)
+
+
+def package_meta(problem, package) -> dict:
+    """
+    Sandbox 使用的 meta：zip 內有 meta.json 時直接回傳，否則由保存的檔案列表與目前的子題設定產生
+    """
+    if package.meta:
+        return package.meta
+    names = [name for task in package.tasks for name in (task['in'], task['out']) if name]
+    return build_meta(problem, names)
+
+
+class _HashingWriter:
+    """
+    只寫入的檔案包裝，寫入同時累計 SHA256
+
+    刻意不提供 tell/seek，讓 ZipFile 以串流模式（data descriptor）寫入、不回頭改寫 header，
+    累計的 hash 因此等於最終檔案內容的 hash
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.hasher = hashlib.sha256()
+
+    def write(self, data):
+        self.hasher.update(data)
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
+
+
+@contextmanager
+def spooled_upload(upload):
+    """
+    取得上傳檔案在磁碟上的路徑
+
+    大檔案 Django 已寫入暫存檔（TemporaryUploadedFile）直接使用；
+    記憶體中的小檔案以 chunks() 寫到暫存檔，離開時刪除
+    """
+    if hasattr(upload, 'temporary_file_path'):
+        yield upload.temporary_file_path()
+        return
+    fd, path = tempfile.mkstemp(suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            for chunk in upload.chunks():
+                fh.write(chunk)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _can_copy_raw(zinfo) -> bool:
+    """已壓縮（deflate）、未加密且不需 ZIP64 的成員可直接複製壓縮資料"""
+    return (
+        zinfo.compress_type == zipfile.ZIP_DEFLATED
+        and not zinfo.flag_bits & 0x1
+        and zinfo.file_size < zipfile.ZIP64_LIMIT
+        and zinfo.compress_size < zipfile.ZIP64_LIMIT
+        and zinfo.header_offset < zipfile.ZIP64_LIMIT
+    )
+
+
+def _copy_raw_member(src_zip, zinfo, out_zip):
+    """
+    不解壓直接複製成員的壓縮資料
+
+    CRC 與大小已知，寫入完整的 local header（不使用 data descriptor），
+    再把壓縮資料以固定大小的緩衝區複製過去
+    """
+    src_fp = src_zip.fp
+    src_fp.seek(zinfo.header_offset)
+    header = src_fp.read(_LOCAL_HEADER_SIZE)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    src_fp.seek(zinfo.header_offset + _LOCAL_HEADER_SIZE + name_len + extra_len)
+
+    dst_info = copy.copy(zinfo)
+    dst_info.flag_bits &= ~0x08
+    dst_info.extra = b''
+    dst_info.header_offset = out_zip.fp.tell()
+    out_zip.fp.write(dst_info.FileHeader(zip64=False))
+
+    remaining = zinfo.compress_size
+    while remaining > 0:
+        chunk = src_fp.read(min(COPY_BUFFER_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member {zinfo.filename}")
+        out_zip.fp.write(chunk)
+        remaining -= len(chunk)
+
+    out_zip.filelist.append(dst_info)
+    out_zip.NameToInfo[dst_info.filename] = dst_info
+    out_zip.start_dir = out_zip.fp.tell()
+    out_zip._didModify = True
+
+
+def _copy_member(src_zip, zinfo, out_zip):
+    """解壓後以 deflate 串流寫入（未壓縮或無法直接複製的成員）"""
+    dst_info = zipfile.ZipInfo(zinfo.filename, date_time=zinfo.date_time)
+    dst_info.external_attr = zinfo.external_attr
+    if zinfo.is_dir():
+        out_zip.writestr(dst_info, b'')
+        return
+    dst_info.compress_type = zipfile.ZIP_DEFLATED
+    dst_info.file_size = zinfo.file_size  # 讓 ZipFile 依大小判斷是否需要 ZIP64
+    with src_zip.open(zinfo, 'r') as fsrc, out_zip.open(dst_info, 'w') as fdst:
+        shutil.copyfileobj(fsrc, fdst, COPY_BUFFER_SIZE)
+
+
+def repack_archive(src_zip, rel: str, extra_files: dict) -> str:
+    """
+    將來源 zip 的所有成員加上 extra_files 寫成新的測資包，以原子替換方式存到 rel
+
+    已 deflate 的成員直接複製壓縮資料，其餘成員以固定緩衝區串流壓縮；
+    SHA256 於寫入時同步計算，不需重新讀取檔案
+
+    Args:
+        src_zip: 已開啟的來源 ZipFile（需開在磁碟檔案上）
+        rel: storage 中的目標相對路徑
+        extra_files: 檔名 -> 內容（str 或 bytes），例如 meta.json
+
+    Returns:
+        str: 新測資包的 SHA256
+    """
+    dst_path = _storage.path(rel)
+    dst_dir = os.path.dirname(dst_path)
+    os.makedirs(dst_dir, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=dst_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            writer = _HashingWriter(fh)
+            with zipfile.ZipFile(writer, mode='w', compression=zipfile.ZIP_DEFLATED) as out_zip:
+                for zinfo in src_zip.infolist():
+                    if zinfo.filename in extra_files:
+                        continue
+                    if _can_copy_raw(zinfo):
+                        _copy_raw_member(src_zip, zinfo, out_zip)
+                    else:
+                        _copy_member(src_zip, zinfo, out_zip)
+                for name, content in extra_files.items():
+                    out_zip.writestr(name, content)
+        if _storage.file_permissions_mode is not None:
+            os.chmod(tmp_path, _storage.file_permissions_mode)
+        # 覆蓋舊檔，確保下載端永遠拿到最新版本
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return writer.hexdigest()
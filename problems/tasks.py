@@ -0,0 +1,27 @@
+"""
+Problems 異步任務
+
+題目計數器（提交數、通過數、瀏覽數）在 Redis 緩衝，
+由 Celery beat 定期執行 flush_problem_counters_task 批次寫回資料庫
+"""
+
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def flush_problem_counters_task(self):
+    """把緩衝的題目計數器增量寫回 Problems 並重算通過率"""
+    from .services.counters import problem_counters
+
+    try:
+        updated = problem_counters.flush()
+    except Exception as exc:
+        # 未套用的增量保留在 flushing key，重試或下一次排程會再處理
+        logger.error(f'Failed to flush problem counters: {str(exc)}')
+        raise self.retry(exc=exc)
+
+    logger.info(f'Flushed counters for {updated} problems')
+    return updated
@@ -438,7 +438,8 @@ def test_checker_settings_passed_to_sandbox(api_client, teacher, course):
     mock_submission.source_code = "print('hello')"
     mock_submission.language_type = 2  # Python
     
-    with patch('submissions.sandbox_client.requests.post') as mock_post:
+    with patch('submissions.sandbox_client.get_session') as mock_session:
+        mock_post = mock_session.return_value.post
         mock_post.return_value.status_code = 202
         mock_post.return_value.json.return_value = {"status": "queued"}
         
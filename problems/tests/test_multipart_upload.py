@@ -0,0 +1,201 @@
+import hashlib
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+
+from problems.models import ProblemTestcasePackage
+from problems.services import multipart
+from problems.services.storage import _storage
+from problems.services.testcase_package import problem_zip_path
+from .test_api import teacher, student, course, make_problem  # noqa: F401
+
+
+PART_SIZE = 64
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """測資檔與分片暫存檔寫到 tmp_path，不污染實際的 MEDIA_ROOT"""
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    return settings.MEDIA_ROOT
+
+
+@pytest.fixture(autouse=True)
+def small_parts(monkeypatch):
+    """測試用的小檔案以 PART_SIZE 分片，放寬分片大小下限"""
+    monkeypatch.setattr(multipart, 'MULTIPART_MIN_PART_SIZE', PART_SIZE)
+
+
+def build_zip_bytes(files):
+    mem = BytesIO()
+    with zipfile.ZipFile(mem, 'w') as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    return mem.getvalue()
+
+
+def split(data, size=PART_SIZE):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.fixture
+def problem(api_client, teacher, course):
+    cache.clear()
+    api_client.force_authenticate(user=teacher)
+    return make_problem(title="MultipartTC", creator=teacher, course=course, is_public="public")
+
+
+def initiate(api_client, problem, data):
+    res = api_client.post(
+        f"/problem/{problem.id}/initiate-test-case-upload",
+        {'length': len(data), 'part_size': PART_SIZE},
+        format='json',
+    )
+    assert res.status_code == 200
+    return res.json()['data']
+
+
+def upload_part(api_client, problem, upload_id, number, chunk, checksum=None):
+    return api_client.post(
+        f"/problem/{problem.id}/test-case-upload-part",
+        {
+            'upload_id': upload_id,
+            'part_number': number,
+            'sha256': checksum or hashlib.sha256(chunk).hexdigest(),
+            'file': BytesIO(chunk),
+        },
+        format='multipart',
+    )
+
+
+@pytest.mark.django_db
+def test_parts_out_of_order_then_complete(api_client, problem):
+    data = build_zip_bytes({'0001.in': 'a' * 100, '0001.out': 'b' * 100, '0002.in': 'c', '0002.out': 'd'})
+    parts = split(data)
+    init = initiate(api_client, problem, data)
+    assert init['part_count'] == len(parts)
+
+    for number in reversed(range(1, len(parts) + 1)):
+        res = upload_part(api_client, problem, init['upload_id'], number, parts[number - 1])
+        assert res.status_code == 200
+        assert res.json()['data']['etag'] == hashlib.sha256(parts[number - 1]).hexdigest()
+
+    res = api_client.post(
+        f"/problem/{problem.id}/complete-test-case-upload",
+        {'upload_id': init['upload_id']},
+        format='json',
+    )
+    assert res.status_code == 201
+    sha = hashlib.sha256(data).hexdigest()
+    assert res.json()['data']['testcase_hash'] == sha
+
+    with _storage.open(problem_zip_path(problem.id), 'rb') as fh:
+        assert fh.read() == data
+    problem.refresh_from_db()
+    assert problem.testcase_hash == sha
+    assert [t['stem'] for t in ProblemTestcasePackage.objects.get(problem=problem).tasks] == ['0001', '0002']
+    assert not os.path.exists(multipart.upload_dir(init['upload_id']))
+    assert cache.get(multipart.multipart_key(init['upload_id'])) is None
+
+
+@pytest.mark.django_db
+def test_checksum_mismatch_rejected(api_client, problem):
+    data = build_zip_bytes({'0001.in': '1', '0001.out': '1'})
+    init = initiate(api_client, problem, data)
+
+    res = upload_part(api_client, problem, init['upload_id'], 1, split(data)[0], checksum='0' * 64)
+
+    assert res.status_code == 400
+    assert not os.path.exists(multipart.part_path(init['upload_id'], 1))
+
+
+@pytest.mark.django_db
+def test_wrong_part_size_rejected(api_client, problem):
+    data = build_zip_bytes({'0001.in': '1', '0001.out': '1'})
+    init = initiate(api_client, problem, data)
+
+    res = upload_part(api_client, problem, init['upload_id'], 1, split(data)[0][:10])
+    assert res.status_code == 400
+
+    res = upload_part(api_client, problem, init['upload_id'], init['part_count'] + 1, b'x')
+    assert res.status_code == 422
+
+
+@pytest.mark.django_db
+def test_resume_lists_missing_parts(api_client, problem):
+    data = build_zip_bytes({'0001.in': 'a' * 200, '0001.out': 'b' * 200})
+    parts = split(data)
+    init = initiate(api_client, problem, data)
+    upload_part(api_client, problem, init['upload_id'], 2, parts[1])
+
+    status = api_client.get(f"/problem/{problem.id}/test-case-upload-part", {'upload_id': init['upload_id']})
+    assert status.status_code == 200
+    body = status.json()['data']
+    assert [p['part_number'] for p in body['parts']] == [2]
+    assert body['missing_parts'] == [n for n in range(1, len(parts) + 1) if n != 2]
+
+    res = api_client.post(
+        f"/problem/{problem.id}/complete-test-case-upload",
+        {'upload_id': init['upload_id']},
+        format='json',
+    )
+    assert res.status_code == 422
+    assert res.json()['data']['missing_parts'] == body['missing_parts']
+
+
+@pytest.mark.django_db
+def test_complete_verifies_part_manifest(api_client, problem):
+    data = build_zip_bytes({'0001.in': '1', '0001.out': '1'})
+    parts = split(data)
+    init = initiate(api_client, problem, data)
+    for number, chunk in enumerate(parts, start=1):
+        upload_part(api_client, problem, init['upload_id'], number, chunk)
+
+    res = api_client.post(
+        f"/problem/{problem.id}/complete-test-case-upload",
+        {'upload_id': init['upload_id'], 'parts': [{'PartNumber': 1, 'ETag': 'f' * 64}]},
+        format='json',
+    )
+    assert res.status_code == 400
+
+
+@pytest.mark.django_db
+def test_invalid_upload_id(api_client, problem):
+    res = upload_part(api_client, problem, '../../etc', 1, b'x')
+    assert res.status_code == 422
+
+    res = api_client.post(
+        f"/problem/{problem.id}/complete-test-case-upload",
+        {'upload_id': '00000000-0000-0000-0000-000000000000'},
+        format='json',
+    )
+    assert res.status_code == 410
+
+
+@pytest.mark.django_db
+def test_initiate_enforces_size_limits(api_client, problem, monkeypatch):
+    monkeypatch.setattr(multipart, 'MULTIPART_MAX_LENGTH', 1000)
+    monkeypatch.setattr(multipart, 'MULTIPART_MAX_PARTS', 10)
+    url = f"/problem/{problem.id}/initiate-test-case-upload"
+
+    res = api_client.post(url, {'length': 1001, 'part_size': 1001}, format='json')
+    assert res.status_code == 413
+    assert res.json()['data'] == {'max_length': 1000}
+
+    # 分片太小
+    res = api_client.post(url, {'length': 1000, 'part_size': PART_SIZE - 1}, format='json')
+    assert res.status_code == 422
+    # 分片數超過上限
+    res = api_client.post(url, {'length': 1000, 'part_size': 99}, format='json')
+    assert res.status_code == 422
+    assert res.json()['data'] == {'max_parts': 10}
+
+    # 整個檔案只有一片時可以小於下限
+    res = api_client.post(url, {'length': 10, 'part_size': 10}, format='json')
+    assert res.status_code == 200
+    res = api_client.post(url, {'length': 1000, 'part_size': 100}, format='json')
+    assert res.status_code == 200
+    assert res.json()['data']['part_count'] == 10
@@ -0,0 +1,219 @@
+"""
+測試題目計數器的 write-behind 緩衝：
+提交、判題與瀏覽只累加 Redis，flush 以批次 UPDATE 寫回並重算通過率
+
+測試環境沒有 Redis，使用只實作緩衝用到 hash 指令的記憶體替身
+"""
+
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from problems.models import ProblemCounterFlush, Problems
+from problems.services.counters import FLUSHING_KEY, LOCK_KEY, PENDING_KEY, ProblemCounterBuffer
+from problems.tasks import flush_problem_counters_task
+from .test_api import teacher, student, course, make_problem  # noqa: F401
+
+
+class FakeRedis:
+    """只支援緩衝用到的 hash、RENAME 與 SET NX 指令"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.values = {}
+
+    def hincrby(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = bucket.get(field, 0) + amount
+
+    def hsetnx(self, key, field, value):
+        bucket = self.hashes.setdefault(key, {})
+        if field in bucket:
+            return 0
+        bucket[field] = value
+        return 1
+
+    def hgetall(self, key):
+        return {f.encode(): str(v).encode() for f, v in self.hashes.get(key, {}).items()}
+
+    def exists(self, key):
+        return int(key in self.hashes)
+
+    def rename(self, src, dst):
+        if src not in self.hashes:
+            raise Exception('ERR no such key')
+        self.hashes[dst] = self.hashes.pop(src)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        value = self.values.get(key)
+        return value.encode() if value is not None else None
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.values.pop(key, None)
+
+
+@pytest.fixture
+def buffer():
+    return ProblemCounterBuffer(client=FakeRedis())
+
+
+@pytest.fixture
+def problems(teacher, course):
+    return [
+        make_problem(title=f"Counter{i}", creator=teacher, course=course, is_public=True)
+        for i in range(2)
+    ]
+
+
+@pytest.mark.django_db
+def test_increments_stay_in_buffer_until_flush(buffer, problems):
+    first, second = problems
+    for _ in range(3):
+        buffer.record_submission(first.id)
+    buffer.record_judge_result(first.id, '-1', '0')
+    buffer.record_judge_result(first.id, '-1', '1')
+    buffer.record_view(first.id)
+    buffer.record_view(second.id)
+
+    first.refresh_from_db()
+    assert first.total_submissions == 0
+
+    assert buffer.flush() == 2
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.total_submissions == 3
+    assert first.accepted_submissions == 1
+    assert first.acceptance_rate == Decimal("33.33")
+    assert first.view_count == 1
+    assert second.view_count == 1
+    assert second.acceptance_rate == Decimal("0.00")
+    assert buffer.redis.hashes == {}
+    assert buffer.redis.values == {}
+
+
+@pytest.mark.django_db
+def test_rejudge_moves_accepted_count(buffer, problems):
+    problem = problems[0]
+    Problems.objects.filter(pk=problem.pk).update(total_submissions=4, accepted_submissions=3)
+
+    # 單筆重新判題：AC -> Pending -> WA
+    buffer.record_judge_result(problem.id, '0', '-1')
+    buffer.record_judge_result(problem.id, '-1', '1')
+    # 批次重新判題重設兩筆 AC
+    buffer.record_rejudge_reset({problem.id: 2})
+    buffer.flush()
+
+    problem.refresh_from_db()
+    assert problem.accepted_submissions == 0
+    assert problem.acceptance_rate == Decimal("0.00")
+
+
+@pytest.mark.django_db
+def test_flush_uses_constant_queries(buffer, problems, django_assert_num_queries):
+    for problem in problems:
+        buffer.record_submission(problem.id)
+        buffer.record_judge_result(problem.id, '-1', '0')
+
+    # 檢查並記錄批次、UPDATE、讀回計數、bulk_update 通過率、清除過期批次（外加 savepoint）
+    with django_assert_num_queries(8):
+        buffer.flush()
+
+
+@pytest.mark.django_db
+def test_cleanup_failure_does_not_double_apply(buffer, problems):
+    """套用已 commit 但清除 flushing key 失敗時，重試不會再加一次"""
+    problem = problems[0]
+    buffer.record_submission(problem.id)
+    buffer.record_judge_result(problem.id, '-1', '0')
+    real_delete = buffer.redis.delete
+
+    def failing_delete(key):
+        if key == FLUSHING_KEY:
+            raise ConnectionError('redis down')
+        real_delete(key)
+
+    with patch.object(buffer.redis, 'delete', failing_delete):
+        with pytest.raises(ConnectionError):
+            buffer.flush()
+    assert FLUSHING_KEY in buffer.redis.hashes
+    assert LOCK_KEY not in buffer.redis.values
+
+    buffer.record_submission(problem.id)
+    assert buffer.flush() == 0
+    assert buffer.flush() == 1
+
+    problem.refresh_from_db()
+    assert problem.total_submissions == 2
+    assert problem.accepted_submissions == 1
+    assert ProblemCounterFlush.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_concurrent_flush_is_skipped(buffer, problems):
+    problem = problems[0]
+    buffer.record_submission(problem.id)
+    buffer.redis.set(LOCK_KEY, 'other-worker', nx=True, ex=60)
+
+    assert buffer.flush() == 0
+    problem.refresh_from_db()
+    assert problem.total_submissions == 0
+    assert buffer.redis.values[LOCK_KEY] == 'other-worker'
+
+
+@pytest.mark.django_db
+def test_failed_flush_is_retried(buffer, problems):
+    problem = problems[0]
+    buffer.record_submission(problem.id)
+
+    with patch('problems.services.counters.apply_counter_deltas', side_effect=RuntimeError('db down')):
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+    # 未套用的增量留在 flushing key，期間新的增量寫入 pending
+    buffer.record_submission(problem.id)
+    assert FLUSHING_KEY in buffer.redis.hashes
+
+    buffer.flush()
+    problem.refresh_from_db()
+    assert problem.total_submissions == 1
+
+    buffer.flush()
+    problem.refresh_from_db()
+    assert problem.total_submissions == 2
+    assert PENDING_KEY not in buffer.redis.hashes
+
+
+@pytest.mark.django_db
+def test_flush_task(buffer, problems):
+    buffer.record_view(problems[0].id)
+    with patch('problems.services.counters.problem_counters', buffer):
+        assert flush_problem_counters_task.apply().get() == 1
+    problems[0].refresh_from_db()
+    assert problems[0].view_count == 1
+
+
+@pytest.mark.django_db
+def test_without_redis_updates_directly(problems):
+    # 測試環境的快取不是 Redis，get_redis_connection 失敗時直接以 F() 更新
+    problem = problems[0]
+    ProblemCounterBuffer().record_submission(problem.id)
+    problem.refresh_from_db()
+    assert problem.total_submissions == 1
+
+
+@pytest.mark.django_db
+def test_problem_detail_records_view(api_client, teacher, problems, buffer):
+    problem = problems[0]
+    api_client.force_authenticate(user=teacher)
+    with patch('problems.views.api.problem_counters', buffer):
+        assert api_client.get(f"/problem/{problem.id}").status_code == 200
+        assert api_client.get(f"/problem/{problem.id}").status_code == 200
+    assert buffer.redis.hashes[PENDING_KEY] == {f"{problem.id}:view_count": 2}
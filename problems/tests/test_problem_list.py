@@ -0,0 +1,118 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from submissions.models import Submission, UserProblemSolveStatus
+from .test_api import teacher, student, course, make_problem  # noqa: F401
+
+
+def list_items(res):
+    return res.json()["data"]["results"]
+
+
+@pytest.fixture
+def problems(teacher, course):
+    return [
+        make_problem(title=f"P{i}", creator=teacher, course=course, is_public=True)
+        for i in range(5)
+    ]
+
+
+@pytest.mark.django_db
+def test_problem_list_keyset_pages(api_client, problems):
+    res = api_client.get("/problem/", {"page_size": 2, "ordering": "id"})
+    assert res.status_code == 200
+    body = res.json()["data"]
+    assert body["count"] == 5
+    seen = [item["id"] for item in body["results"]]
+
+    next_url = body["next"]
+    while next_url:
+        body = api_client.get(next_url).json()["data"]
+        seen.extend(item["id"] for item in body["results"])
+        next_url = body["next"]
+
+    assert seen == sorted(p.id for p in problems)
+
+
+@pytest.mark.django_db
+def test_problem_list_legacy_page_number(api_client, problems):
+    res = api_client.get("/problem/", {"page": 2, "page_size": 2, "ordering": "id"})
+    assert res.status_code == 200
+    body = res.json()["data"]
+    assert body["count"] == 5
+    assert [item["id"] for item in body["results"]] == [problems[2].id, problems[3].id]
+
+
+@pytest.mark.django_db
+def test_problem_list_invalid_ordering(api_client, problems):
+    res = api_client.get("/problem/", {"ordering": "creator_id__password"})
+    assert res.status_code == 400
+
+
+@pytest.mark.django_db
+def test_problem_list_keyset_ties_broken_by_id(api_client, problems):
+    # 所有題目 difficulty 相同，翻頁時依 id 排序且不重複、不遺漏
+    seen = []
+    next_url, params = "/problem/", {"page_size": 2, "ordering": "-difficulty"}
+    while next_url:
+        body = api_client.get(next_url, params).json()["data"]
+        seen.extend(item["id"] for item in body["results"])
+        next_url, params = body["next"], None
+
+    assert seen == sorted((p.id for p in problems), reverse=True)
+
+
+@pytest.mark.django_db
+def test_problem_list_mutable_ordering_uses_page_numbers(api_client, problems):
+    from problems.models import Problems
+
+    Problems.objects.filter(pk=problems[3].pk).update(total_submissions=5)
+    res = api_client.get("/problem/", {"page_size": 2, "ordering": "-total_submissions"})
+    body = res.json()["data"]
+    assert "count_capped" not in body
+    assert "page=2" in body["next"]
+    assert body["results"][0]["id"] == problems[3].id
+
+
+@pytest.mark.django_db
+def test_problem_list_default_request_keeps_count(api_client, problems):
+    res = api_client.get("/problem/")
+    assert res.status_code == 200
+    body = res.json()["data"]
+    assert body["count"] == 5
+    assert body["count_capped"] is False
+
+
+@pytest.mark.django_db
+def test_problem_list_user_summary(api_client, student, problems):
+    for _ in range(3):
+        Submission.objects.create(problem_id=problems[0].id, user=student, language_type=2, source_code='print(1)')
+    Submission.objects.create(problem_id=problems[1].id, user=student, language_type=2, source_code='print(1)')
+    UserProblemSolveStatus.objects.create(user=student, problem_id=problems[0].id, solve_status='fully_solved')
+
+    api_client.force_authenticate(user=student)
+    res = api_client.get("/problem/", {"ordering": "id"})
+    items = {item["id"]: item for item in list_items(res)}
+
+    assert items[problems[0].id]["submit_count"] == 3
+    assert items[problems[0].id]["solve_status"] == "fully_solved"
+    assert items[problems[1].id]["submit_count"] == 1
+    assert items[problems[1].id]["solve_status"] == "never_tried"
+    assert items[problems[2].id]["submit_count"] == 0
+
+
+@pytest.mark.django_db
+def test_problem_list_summary_queries_do_not_grow_with_page(api_client, teacher, student, course):
+    def count_queries(n):
+        for i in range(n):
+            problem = make_problem(title=f"Q{i}", creator=teacher, course=course, is_public=True)
+            Submission.objects.create(problem_id=problem.id, user=student, language_type=2, source_code='print(1)')
+        with CaptureQueriesContext(connection) as ctx:
+            api_client.get("/problem/", {"page_size": 50})
+        return len(ctx.captured_queries)
+
+    api_client.force_authenticate(user=student)
+    small = count_queries(2)
+    large = count_queries(10)
+    assert small == large
@@ -0,0 +1,138 @@
+import math
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from courses.models import Course_members
+from submissions.models import Submission
+from submissions.cache.keys import CacheKeys
+from .test_api import teacher, student, course, make_problem  # noqa: F401
+
+
+def make_submission(problem, user, status, score, **extra):
+    return Submission.objects.create(
+        problem_id=problem.id,
+        user=user,
+        language_type=2,
+        source_code='print(1)',
+        status=status,
+        score=score,
+        **extra,
+    )
+
+
+@pytest.fixture
+def stats_problem(teacher, student, course):
+    cache.clear()
+    Course_members.objects.create(course_id=course, user_id=student, role='student')
+    return make_problem(title="StatsProblem", creator=teacher, course=course, is_public=True)
+
+
+@pytest.mark.django_db
+def test_problem_stats_values(api_client, teacher, student, stats_problem):
+    make_submission(stats_problem, student, '1', 20, execution_time=30, memory_usage=300)
+    make_submission(stats_problem, student, '0', 100, execution_time=10, memory_usage=100)
+    make_submission(stats_problem, teacher, '1', 20, execution_time=20, memory_usage=200)
+
+    api_client.force_authenticate(user=student)
+    res = api_client.get(f"/problem/{stats_problem.id}/stats")
+    assert res.status_code == 200
+    data = res.json()["data"]
+
+    scores = [20, 100, 20]
+    mean = sum(scores) / len(scores)
+    assert data["acUserRatio"] == [1, 1]
+    assert data["triedUserCount"] == 2
+    assert data["average"] == pytest.approx(mean)
+    assert data["std"] == pytest.approx(math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores)))
+    assert data["scoreDistribution"] == [{"score": 20, "count": 2}, {"score": 100, "count": 1}]
+    assert data["statusCount"] == {"1": 2, "0": 1}
+    assert [s["execution_time"] for s in data["top10RunTime"]] == [10, 20, 30]
+    assert [s["memory_usage"] for s in data["top10MemoryUsage"]] == [100, 200, 300]
+
+
+@pytest.mark.django_db
+def test_problem_stats_empty(api_client, student, stats_problem):
+    api_client.force_authenticate(user=student)
+    data = api_client.get(f"/problem/{stats_problem.id}/stats").json()["data"]
+    assert data["average"] == 0
+    assert data["std"] == 0
+    assert data["scoreDistribution"] == []
+    assert data["statusCount"] == {}
+
+
+@pytest.mark.django_db
+def test_problem_stats_query_count_and_cache(api_client, student, stats_problem, django_assert_num_queries):
+    for score in range(0, 100, 10):
+        make_submission(stats_problem, student, '1', score)
+
+    api_client.force_authenticate(user=student)
+    # 信箱驗證、題目、課程學生數、使用者 aggregate、分組統計、top10 x2
+    with django_assert_num_queries(7):
+        first = api_client.get(f"/problem/{stats_problem.id}/stats")
+    # 快取命中後只剩信箱驗證與題目存在性檢查
+    with django_assert_num_queries(2):
+        second = api_client.get(f"/problem/{stats_problem.id}/stats")
+    assert second.json()["data"] == first.json()["data"]
+
+
+@pytest.mark.django_db
+def test_problem_stats_invalidated_on_submission_update(
+    api_client, student, stats_problem, django_capture_on_commit_callbacks
+):
+    submission = make_submission(stats_problem, student, '1', 20)
+    api_client.force_authenticate(user=student)
+    assert api_client.get(f"/problem/{stats_problem.id}/stats").json()["data"]["acUserRatio"] == [0, 1]
+    assert cache.get(CacheKeys.problem_stats(stats_problem.id)) is not None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        submission.status = '0'
+        submission.score = 100
+        submission.save()
+
+    assert cache.get(CacheKeys.problem_stats(stats_problem.id)) is None
+    data = api_client.get(f"/problem/{stats_problem.id}/stats").json()["data"]
+    assert data["acUserRatio"] == [1, 1]
+    assert data["average"] == 100
+
+
+@pytest.mark.django_db
+def test_problem_stats_window(api_client, teacher, student, stats_problem):
+    old = make_submission(stats_problem, teacher, '0', 100)
+    Submission.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+    make_submission(stats_problem, student, '1', 40)
+
+    api_client.force_authenticate(user=student)
+    week = api_client.get(f"/problem/{stats_problem.id}/stats", {"window": "7d"}).json()["data"]
+    assert week["window"] == "7d"
+    assert week["triedUserCount"] == 1
+    assert week["scoreDistribution"] == [{"score": 40, "count": 1}]
+
+    month = api_client.get(f"/problem/{stats_problem.id}/stats", {"window": "30d"}).json()["data"]
+    assert month["triedUserCount"] == 2
+
+
+@pytest.mark.django_db
+def test_problem_stats_invalid_window(api_client, student, stats_problem):
+    api_client.force_authenticate(user=student)
+    res = api_client.get(f"/problem/{stats_problem.id}/stats", {"window": "1y"})
+    assert res.status_code == 400
+
+
+@pytest.mark.django_db
+def test_problem_stats_every_window_invalidated(
+    api_client, student, stats_problem, django_capture_on_commit_callbacks
+):
+    submission = make_submission(stats_problem, student, '1', 20)
+    api_client.force_authenticate(user=student)
+    for window in CacheKeys.PROBLEM_STATS_WINDOWS:
+        assert api_client.get(f"/problem/{stats_problem.id}/stats", {"window": window}).status_code == 200
+        assert cache.get(CacheKeys.problem_stats(stats_problem.id, window)) is not None
+
+    with django_capture_on_commit_callbacks(execute=True):
+        submission.status = '0'
+        submission.save()
+
+    assert cache.get_many(CacheKeys.problem_stats_all_windows(stats_problem.id)) == {}
@@ -0,0 +1,162 @@
+import hashlib
+import zipfile
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+
+from problems.models import Problem_subtasks, ProblemTestcasePackage
+from problems.services.storage import _storage
+from problems.services import testcase_package
+from problems.services.testcase_package import problem_zip_path, repack_archive
+from .test_api import teacher, student, course, make_problem  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    """測資檔與分片暫存檔寫到 tmp_path，不污染實際的 MEDIA_ROOT"""
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    return settings.MEDIA_ROOT
+
+
+def build_zip(files):
+    mem = BytesIO()
+    with zipfile.ZipFile(mem, 'w') as zf:
+        for name, content in files.items():
+            zf.writestr(name, content)
+    mem.seek(0)
+    return mem
+
+
+def save_archive(problem, mem):
+    """直接寫入 problem.zip（模擬舊資料），回傳 SHA256"""
+    rel = problem_zip_path(problem.id)
+    if _storage.exists(rel):
+        _storage.delete(rel)
+    _storage.save(rel, mem)
+    with _storage.open(rel, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+@pytest.fixture
+def sandbox_token(settings):
+    settings.SANDBOX_TOKEN = "sandbox-token"
+    return settings.SANDBOX_TOKEN
+
+
+@pytest.fixture
+def uploaded_problem(api_client, teacher, course):
+    problem = make_problem(title="PackageTC", creator=teacher, course=course, is_public="public")
+    api_client.force_authenticate(user=teacher)
+    res = api_client.post(
+        f"/problem/{problem.id}/test-cases/upload-zip",
+        {'file': build_zip({'0001.in': '1', '0001.out': '1', '0101.in': '2', '0101.out': '2'})},
+        format='multipart',
+    )
+    assert res.status_code == 201
+    api_client.force_authenticate(user=None)
+    problem.refresh_from_db()
+    return problem
+
+
+@pytest.mark.django_db
+def test_upload_records_package(uploaded_problem):
+    package = ProblemTestcasePackage.objects.get(problem=uploaded_problem)
+    assert package.testcase_hash == uploaded_problem.testcase_hash
+    assert len(package.meta['tasks']) == 2
+    assert [t['stem'] for t in package.tasks] == ['0001', '0101']
+
+
+@pytest.mark.django_db
+def test_detail_and_meta_do_not_open_archive(api_client, uploaded_problem, sandbox_token):
+    with patch('problems.services.testcase_package.scan_archive') as scan:
+        detail = api_client.get(f"/problem/{uploaded_problem.id}")
+        meta = api_client.get(f"/problem/{uploaded_problem.id}/meta", {'token': sandbox_token})
+
+    scan.assert_not_called()
+    assert [t['stem'] for t in detail.json()['data']['testCase']] == ['0001', '0101']
+    assert [tc['stem'] for tc in meta.json()['data']['testcases']] == ['0001', '0101']
+
+
+@pytest.mark.django_db
+def test_stale_package_rebuilt_from_archive(api_client, teacher, course, sandbox_token):
+    problem = make_problem(title="LegacyTC", creator=teacher, course=course, is_public="public")
+    ProblemTestcasePackage.objects.create(problem=problem, testcase_hash='old', meta={'tasks': []}, tasks=[])
+    problem.testcase_hash = save_archive(problem, build_zip({'0001.in': 'a', '0001.out': 'b', '0002.in': 'c'}))
+    problem.save(update_fields=['testcase_hash'])
+
+    res = api_client.get(f"/problem/{problem.id}/meta", {'token': sandbox_token})
+    assert res.status_code == 200
+    assert [tc['stem'] for tc in res.json()['data']['testcases']] == ['0001']
+
+    package = ProblemTestcasePackage.objects.get(problem=problem)
+    assert package.testcase_hash == problem.testcase_hash
+    assert package.tasks[1] == {'no': 2, 'stem': '0002', 'in': '0002.in', 'out': None}
+
+
+@pytest.mark.django_db
+def test_meta_follows_subtask_edits(api_client, teacher, course, sandbox_token):
+    """沒有 meta.json 的 zip（分片上傳）不保存 meta，子題設定修改後立即生效"""
+    problem = make_problem(title="SubtaskTC", creator=teacher, course=course, is_public="public")
+    subtask = Problem_subtasks.objects.create(problem_id=problem, subtask_no=1, weight=100, time_limit_ms=1000)
+    problem.testcase_hash = save_archive(problem, build_zip({'0000.in': '1', '0000.out': '1'}))
+    problem.save(update_fields=['testcase_hash'])
+
+    res = api_client.get(f"/problem/{problem.id}/meta", {'token': sandbox_token})
+    assert res.json()['data']['tasks'][0]['timeLimit'] == 1000
+
+    subtask.time_limit_ms = 3000
+    subtask.memory_limit_mb = 512
+    subtask.save()
+    with patch('problems.services.testcase_package.scan_archive') as scan:
+        res = api_client.get(f"/problem/{problem.id}/meta", {'token': sandbox_token})
+    scan.assert_not_called()
+    task = res.json()['data']['tasks'][0]
+    assert task['timeLimit'] == 3000
+    assert task['memoryLimit'] == 512
+    assert ProblemTestcasePackage.objects.get(problem=problem).meta == {}
+
+
+@pytest.mark.django_db
+def test_meta_without_archive_returns_404(api_client, teacher, course, sandbox_token):
+    problem = make_problem(title="NoTC", creator=teacher, course=course, is_public="public")
+    rel = problem_zip_path(problem.id)
+    if _storage.exists(rel):
+        _storage.delete(rel)
+
+    res = api_client.get(f"/problem/{problem.id}/meta", {'token': sandbox_token})
+    assert res.status_code == 404
+
+
+def test_repack_archive_streams_members(tmp_path):
+    src_path = tmp_path / 'src.zip'
+    payload = b'1 2 3\n' * 50000
+    with zipfile.ZipFile(src_path, 'w') as zf:
+        zf.writestr('0001.in', payload, compress_type=zipfile.ZIP_DEFLATED)
+        zf.writestr('0001.out', b'6\n', compress_type=zipfile.ZIP_STORED)
+        zf.writestr('meta.json', b'{"stale": true}')
+
+    rel = 'testcases/repack-test/problem.zip'
+    with zipfile.ZipFile(src_path) as src_zip:
+        deflated_size = src_zip.getinfo('0001.in').compress_size
+        with patch.object(testcase_package, '_copy_member', wraps=testcase_package._copy_member) as copy_member:
+            sha = repack_archive(src_zip, rel, {'meta.json': '{"tasks":[]}'})
+
+    # 已 deflate 的成員直接複製，只有 STORED 成員重新壓縮
+    assert [call.args[1].filename for call in copy_member.call_args_list] == ['0001.out']
+    with _storage.open(rel, 'rb') as fh:
+        assert hashlib.sha256(fh.read()).hexdigest() == sha
+    with _storage.open(rel, 'rb') as fh, zipfile.ZipFile(fh) as zf:
+        assert zf.testzip() is None
+        assert zf.namelist() == ['0001.in', '0001.out', 'meta.json']
+        assert zf.read('0001.in') == payload
+        assert zf.getinfo('0001.in').compress_size == deflated_size
+        assert zf.getinfo('0001.out').compress_type == zipfile.ZIP_DEFLATED
+        assert zf.read('meta.json') == b'{"tasks":[]}'
+    _storage.delete(rel)
+
+
+@pytest.mark.django_db
+def test_upload_hash_matches_saved_archive(uploaded_problem):
+    with _storage.open(problem_zip_path(uploaded_problem.id), 'rb') as fh:
+        assert hashlib.sha256(fh.read()).hexdigest() == uploaded_problem.testcase_hash
@@ -7,7 +7,8 @@ from .views.api import (
     problem_like_toggle, problem_likes_count, UserLikedProblemsView,
     TagListCreateView, ProblemTagAddView, ProblemTagRemoveView,
     ProblemCloneView,
-    ProblemTestCaseUploadInitiateView, ProblemTestCaseUploadCompleteView, ProblemTestCaseDownloadView,
+    ProblemTestCaseUploadInitiateView, ProblemTestCaseUploadPartView, ProblemTestCaseUploadCompleteView,
+    ProblemTestCaseDownloadView,
     ProblemTestCaseChecksumView, ProblemTestCaseMetaView,
     ProblemSubtaskListCreateView, ProblemSubtaskDetailView,
     ProblemTestCaseListCreateView, ProblemTestCaseDetailView, ProblemTestCaseZipUploadView,
@@ -36,6 +37,7 @@ urlpatterns = [
     path("", ProblemListView.as_view(), name="problem-list"),
     # 問題層級測資上傳/完成/下載
     path("<int:pk>/initiate-test-case-upload", ProblemTestCaseUploadInitiateView.as_view(), name="problem-initiate-testcase"),
+    path("<int:pk>/test-case-upload-part", ProblemTestCaseUploadPartView.as_view(), name="problem-testcase-upload-part"),
     path("<int:pk>/complete-test-case-upload", ProblemTestCaseUploadCompleteView.as_view(), name="problem-complete-testcase"),
     path("<int:pk>/test-case", ProblemTestCaseDownloadView.as_view(), name="problem-testcase-download"),
     path("<int:pk>/test-cases/upload-zip", ProblemTestCaseZipUploadView.as_view(), name="problem-testcases-upload-zip"),
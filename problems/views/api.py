@@ -31,10 +31,20 @@ from ..serializers import (
     SubtaskSerializer, TestCaseSerializer, TagSerializer
 )
 from ..permissions import IsOwnerOrReadOnly, IsTeacherOrAdmin
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Count, Max
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from django.db.models import Count, Max, Q
 from submissions.models import Submission
+from submissions.cache.utils import get_high_score_with_cache
+from submissions.cache.keys import CacheKeys
+from submissions.cache.fallback import cache_fallback
 from ..models import ProblemLike
+from ..services import multipart
+from ..services.storage import _storage
+from ..services.counters import problem_counters
+from ..services.testcase_package import (
+    build_meta, get_testcase_package, package_meta, problem_zip_path, record_package, repack_archive,
+    spooled_upload,
+)
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.db import models as dj_models
@@ -407,25 +417,69 @@ class ProblemTestCaseUploadInitiateView(APIView):
             part_size = int(request.data.get('part_size'))
         except (TypeError, ValueError):
             return api_response(None, "length and part_size are required integers", status_code=422)
-        upload_id = str(uuid.uuid4())
-        ttl_seconds = 600
-        cache.set(f"prob_tc_multipart:{upload_id}", {
-            "problem_id": problem.id,
-            "user_id": request.user.id,
-            "length": length,
-            "part_size": part_size,
-            "parts": [],
-        }, ttl_seconds)
-        # 本地 storage 無 presigned URL，提供本服務的分片上傳端點占位
-        part_endpoint = f"/problem/{problem.id}/test-case-upload-part"
+        try:
+            upload_id = multipart.create_upload(problem.id, request.user.id, length, part_size)
+        except multipart.MultipartUploadError as e:
+            return api_response(e.data, e.message, status_code=e.status_code)
         return api_response({
             "upload_id": upload_id,
-            "ttl": ttl_seconds,
-            "part_endpoint": part_endpoint,
+            "ttl": multipart.MULTIPART_TTL,
+            "part_count": multipart.part_count({"length": length, "part_size": part_size}),
+            "part_endpoint": f"/problem/{problem.id}/test-case-upload-part",
         }, "Upload initiated", status_code=200)
 
 
-# 移除本地分片端點，改以三端點規格運作：initiate、complete、download
+class ProblemTestCaseUploadPartView(APIView):
+    """
+    /problem/<pk>/test-case-upload-part — 測資分片上傳
+
+    POST（multipart form-data）：upload_id、part_number（從 1 開始）、sha256（分片的 SHA256）、file
+      分片可平行、亂序上傳；重傳同一分片會覆蓋。回傳的 etag 即 sha256。
+    GET ?upload_id=：查詢已上傳與缺少的分片，供斷線後續傳
+    """
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get(self, request, pk: int):
+        problem = get_object_or_404(Problems, pk=pk)
+        if not _has_problem_manage_permission(problem, request.user):
+            return api_response(None, "Not enough permission", status_code=403)
+        try:
+            info = multipart.get_upload(request.query_params.get('upload_id'), problem.id)
+        except multipart.MultipartUploadError as e:
+            return api_response(e.data, e.message, status_code=e.status_code)
+        return api_response({
+            "length": info['length'],
+            "part_size": info['part_size'],
+            "part_count": multipart.part_count(info),
+            "parts": [
+                {"part_number": n, "size": part['size'], "etag": part['sha256']}
+                for n, part in sorted(info['parts'].items())
+            ],
+            "missing_parts": multipart.missing_parts(info),
+        }, "OK", status_code=200)
+
+    def post(self, request, pk: int):
+        problem = get_object_or_404(Problems, pk=pk)
+        if not _has_problem_manage_permission(problem, request.user):
+            return api_response(None, "Not enough permission", status_code=403)
+        upload = request.FILES.get('file')
+        if not upload:
+            return api_response({"errors": {"file": "required"}}, "Validation error", status_code=422)
+        try:
+            part_number = int(request.data.get('part_number'))
+        except (TypeError, ValueError):
+            return api_response(None, "part_number is a required integer", status_code=422)
+        try:
+            part = multipart.save_part(
+                request.data.get('upload_id'), problem.id, part_number, upload, request.data.get('sha256')
+            )
+        except multipart.MultipartUploadError as e:
+            return api_response(e.data, e.message, status_code=e.status_code)
+        return api_response({
+            "part_number": part['part_number'],
+            "size": part['size'],
+            "etag": part['sha256'],
+        }, "Part uploaded", status_code=200)
 
 
 class ProblemTestCaseUploadCompleteView(APIView):
@@ -435,60 +489,49 @@ class ProblemTestCaseUploadCompleteView(APIView):
         if not _has_problem_manage_permission(problem, request.user):
             return api_response(None, "Not enough permission", status_code=403)
         upload_id = request.data.get('upload_id')
-        if not upload_id:
-            return api_response(None, "upload_id is required", status_code=422)
-        info = cache.get(f"prob_tc_multipart:{upload_id}")
-        if not info:
-            return api_response(None, "upload_id expired or invalid", status_code=410)
-        # 合併所有分片為一個 zip 或原始檔（此處直接存為完整檔，並驗證檔名成對）
-        tmp_dir = os.path.join(settings.MEDIA_ROOT, "tmp_uploads", upload_id)
-        part_files = sorted([os.path.join(tmp_dir, f) for f in os.listdir(tmp_dir) if f.startswith('part_')])
-        if not part_files:
-            return api_response(None, "No uploaded parts", status_code=422)
-        from io import BytesIO
-        buffer = BytesIO()
-        for p in part_files:
-            with open(p, 'rb') as f:
-                buffer.write(f.read())
-        buffer.seek(0)
-        # 驗證同名成對：內容為 zip，檢查內部包含 .in/.out 配對（僅驗證，不產生 meta）
-        import zipfile
         try:
-            with zipfile.ZipFile(buffer) as zf:
-                names = zf.namelist()
-                ins = {n for n in names if n.endswith('.in')}
-                outs = {n for n in names if n.endswith('.out')}
-                def stem(n):
-                    base = os.path.basename(n)
-                    return os.path.splitext(base)[0]
-                ins_stems = {stem(n) for n in ins}
-                outs_stems = {stem(n) for n in outs}
-                missing_pairs = sorted(list(ins_stems ^ outs_stems))
-                if missing_pairs:
-                    return api_response({"missing_pairs": missing_pairs}, "Validation error: missing paired .in/.out", status_code=400)
-        except zipfile.BadZipFile:
-            return api_response(None, "Uploaded content must be a valid zip", status_code=400)
+            info = multipart.get_upload(upload_id, problem.id)
+            multipart.verify_manifest(info, request.data.get('parts'))
+            # 依序串流拼接分片到 problem.zip 旁的暫存檔，同時計算 SHA256
+            zip_rel = problem_zip_path(problem.id)
+            zip_path = _storage.path(zip_rel)
+            tmp_path, sha256_hash = multipart.assemble_parts(upload_id, info, os.path.dirname(zip_path))
+        except multipart.MultipartUploadError as e:
+            return api_response(e.data, e.message, status_code=e.status_code)
 
-        # 保存 zip 到本地 storage（不包含 meta.json；完整分片合併結果）
-        from ..services.storage import _storage
-        zip_rel = os.path.join("testcases", f"p{problem.id}", "problem.zip")
-        buffer.seek(0)
-        # 覆蓋舊檔，確保下載端永遠拿到最新版本
-        try:
-            if _storage.exists(zip_rel):
-                _storage.delete(zip_rel)
-        except Exception:
-            pass
-        saved = _storage.save(zip_rel, buffer)
-        # 清理臨時檔
+        # 驗證同名成對：內容為 zip，檢查內部包含 .in/.out 配對（僅驗證，不產生 meta）
+        import zipfile
         try:
-            for p in part_files:
-                os.remove(p)
-            os.rmdir(tmp_dir)
-        except Exception:
-            pass
-        cache.delete(f"prob_tc_multipart:{upload_id}")
-        return api_response({"path": saved.replace('\\','/')}, "Upload completed", status_code=201)
+            try:
+                with zipfile.ZipFile(tmp_path) as zf:
+                    names = zf.namelist()
+            except zipfile.BadZipFile:
+                return api_response(None, "Uploaded content must be a valid zip", status_code=400)
+            def stem(n):
+                base = os.path.basename(n)
+                return os.path.splitext(base)[0]
+            ins_stems = {stem(n) for n in names if n.endswith('.in')}
+            outs_stems = {stem(n) for n in names if n.endswith('.out')}
+            missing_pairs = sorted(list(ins_stems ^ outs_stems))
+            if missing_pairs:
+                return api_response({"missing_pairs": missing_pairs}, "Validation error: missing paired .in/.out", status_code=400)
+
+            # 覆蓋舊檔，確保下載端永遠拿到最新版本（不包含 meta.json；完整分片合併結果）
+            if _storage.file_permissions_mode is not None:
+                os.chmod(tmp_path, _storage.file_permissions_mode)
+            os.replace(tmp_path, zip_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # 更新 testcase_hash 並保存檔案列表，避免沿用舊測資包的解析結果
+        # zip 內沒有 meta.json，meta 於 Sandbox 讀取時依當下的子題設定產生
+        problem.testcase_hash = sha256_hash
+        problem.save(update_fields=['testcase_hash'])
+        record_package(problem, names)
+        # 清理分片暫存檔與上傳紀錄
+        multipart.discard_upload(upload_id)
+        return api_response({"path": zip_rel.replace('\\','/'), "testcase_hash": sha256_hash}, "Upload completed", status_code=201)
 
 
 class ProblemTestCaseDownloadView(APIView):
@@ -508,35 +551,6 @@ class ProblemTestCaseDownloadView(APIView):
         return resp
 
 
-def _build_testcases_list(pairs_map: dict, max_ss: int) -> list:
-    """
-    建立 testcases 列表，記錄每個測資檔案的詳細資訊
-    
-    Args:
-        pairs_map (dict): 映射 subtask_index -> {'in': set(tt), 'out': set(tt)}
-        max_ss (int): 最大的 subtask index
-    
-    Returns:
-        list: 包含每個測資詳細資訊的列表，每個元素包含 stem, no, in, out, subtask 欄位
-    """
-    testcases = []
-    testcase_no = 1
-    for ss in range(max_ss + 1):
-        entry = pairs_map.get(ss, {'in': set(), 'out': set()})
-        matched_tts = sorted(entry['in'] & entry['out'])
-        for tt in matched_tts:
-            stem = f"{ss:02d}{tt:02d}"
-            testcases.append({
-                "stem": stem,
-                "no": testcase_no,
-                "in": f"{stem}.in",
-                "out": f"{stem}.out",
-                "subtask": ss + 1  # subtask 從 1 開始
-            })
-            testcase_no += 1
-    return testcases
-
-
 class ProblemTestCaseZipUploadView(APIView):
     """
     POST /problem/<pk>/test-cases/upload-zip
@@ -561,113 +575,53 @@ class ProblemTestCaseZipUploadView(APIView):
         if not upload:
             return api_response({"errors": {"file": "required"}}, "Validation error", status_code=422)
 
-        # 讀取 zip、解析檔名規則 sstt.in/out，生成 meta.json 並一併寫入 zip
+        # 解析檔名規則 sstt.in/out，生成 meta.json 並一併寫入 zip
+        # 上傳檔與新測資包都在磁碟上串流處理，記憶體用量不隨 zip 大小增加
         import zipfile
-        from io import BytesIO
-        data = upload.read()
-        try:
-            src_zip = zipfile.ZipFile(BytesIO(data))
-        except zipfile.BadZipFile:
-            return api_response(None, "Uploaded file must be a valid zip", status_code=400)
-
-        names = src_zip.namelist()
-        # 映射：subtask_index -> { 'in': set(tt), 'out': set(tt) }
-        pairs_map = {}
-        for n in names:
-            base = os.path.basename(n)
-            stem, ext = os.path.splitext(base)
-            # 規則：四位數 sstt，兩位子題、兩位測資，從 00 開始
-            if ext not in ('.in', '.out'):
-                continue
-            if len(stem) != 4 or not stem.isdigit():
-                continue
-            ss = int(stem[:2])
-            tt = int(stem[2:])
-            entry = pairs_map.setdefault(ss, {'in': set(), 'out': set()})
-            entry['in' if ext == '.in' else 'out'].add(tt)
-
-        # 以「同時存在 in/out」的 tt 數量作為 caseCount
-        case_counts = {}
-        for ss, entry in pairs_map.items():
-            count = len(entry['in'] & entry['out'])
-            case_counts[ss] = count
-
-        # 從資料庫讀取既有子題設定（time/memory/score），對應 ss -> subtask_no = ss+1
-        subtask_map = {st.subtask_no - 1: st for st in Problem_subtasks.objects.filter(problem_id=problem)}
-
-        def build_meta_entry(ss_idx: int):
-            st = subtask_map.get(ss_idx)
-            case_count = case_counts.get(ss_idx, 0)
-            time_limit = getattr(st, 'time_limit_ms', None) or 1000
-            mem_mb = getattr(st, 'memory_limit_mb', None)
-            memory_limit = (mem_mb * 1024) if mem_mb is not None else 134218
-            task_score = getattr(st, 'weight', None) or 0
-            return {
-                "caseCount": case_count,
-                "memoryLimit": memory_limit // 1024,  # Sandbox uses MB for memoryLimit in meta
-                "memoryLimitKB": memory_limit,
-                "taskScore": task_score,
-                "timeLimit": time_limit,
-            }
-
-        # 產生 meta.json 結構，子題索引由 0..max(ss)
-        if case_counts:
-            max_ss = max(case_counts.keys())
-        else:
-            max_ss = -1
-        
-        meta = {
-            "tasks": [build_meta_entry(ss) for ss in range(max_ss + 1)],
-            "testcases": _build_testcases_list(pairs_map, max_ss)
-        }
-
-        # 重打包 zip：複製原檔案並加入 meta.json
-        out_buf = BytesIO()
-        with zipfile.ZipFile(out_buf, mode='w', compression=zipfile.ZIP_DEFLATED) as out_zip:
-            for n in names:
-                with src_zip.open(n, 'r') as f:
-                    out_zip.writestr(n, f.read())
-            import json
-            out_zip.writestr('meta.json', json.dumps(meta, ensure_ascii=False, separators=(",", ":")))
-            # 若題目有 solution code，依語言加入對應副檔名的檔案
+        import json
+        with spooled_upload(upload) as src_path:
             try:
-                sol_code = getattr(problem, 'solution_code', None)
-                if sol_code and str(sol_code).strip():
-                    lang = (getattr(problem, 'solution_code_language', '') or '').lower()
-                    ext_map = {
-                        'python': 'py', 'py': 'py',
-                        'cpp': 'cpp', 'c++': 'cpp',
-                        'c': 'c',
-                        'java': 'java',
-                        'javascript': 'js', 'js': 'js',
-                        'go': 'go',
-                    }
-                    ext = ext_map.get(lang, 'txt')
-                    out_zip.writestr(f'solution.{ext}', sol_code)
-            except Exception:
-                # 寫入解答失敗不影響上傳流程
-                pass
-        out_buf.seek(0)
-
-        # 保存 zip 到本地 storage
-        from ..services.storage import _storage
-        rel = os.path.join("testcases", f"p{problem.id}", "problem.zip")
-        # 覆蓋舊檔，確保下載端永遠拿到最新版本
-        try:
-            if _storage.exists(rel):
-                _storage.delete(rel)
-        except Exception:
-            pass
-        saved = _storage.save(rel, out_buf)
-        
-        # 計算已儲存檔案的 SHA256 hash 並儲存到 problem
-        import hashlib
-        with _storage.open(rel, 'rb') as fh:
-            sha256_hash = hashlib.sha256(fh.read()).hexdigest()
+                src_zip = zipfile.ZipFile(src_path)
+            except zipfile.BadZipFile:
+                return api_response(None, "Uploaded file must be a valid zip", status_code=400)
+
+            with src_zip:
+                names = src_zip.namelist()
+                # 依檔名規則 sstt.in/out 與資料庫子題設定產生 meta.json
+                meta = build_meta(problem, names)
+                extra_files = {'meta.json': json.dumps(meta, ensure_ascii=False, separators=(",", ":"))}
+                # 若題目有 solution code，依語言加入對應副檔名的檔案
+                try:
+                    sol_code = getattr(problem, 'solution_code', None)
+                    if sol_code and str(sol_code).strip():
+                        lang = (getattr(problem, 'solution_code_language', '') or '').lower()
+                        ext_map = {
+                            'python': 'py', 'py': 'py',
+                            'cpp': 'cpp', 'c++': 'cpp',
+                            'c': 'c',
+                            'java': 'java',
+                            'javascript': 'js', 'js': 'js',
+                            'go': 'go',
+                        }
+                        ext = ext_map.get(lang, 'txt')
+                        extra_files[f'solution.{ext}'] = sol_code
+                except Exception:
+                    # 寫入解答失敗不影響上傳流程
+                    pass
+
+                # 重打包 zip 到 MEDIA_ROOT/testcases/p<id>/problem.zip，同時計算 SHA256
+                rel = problem_zip_path(problem.id)
+                try:
+                    sha256_hash = repack_archive(src_zip, rel, extra_files)
+                except zipfile.BadZipFile:
+                    return api_response(None, "Uploaded file must be a valid zip", status_code=400)
+
         problem.testcase_hash = sha256_hash
         problem.save(update_fields=['testcase_hash'])
-        
-        return api_response({"path": saved.replace('\\','/'), "testcase_hash": sha256_hash}, "Zip uploaded with meta", status_code=201)
+        # 保存檔案列表與 meta，題目詳情與 Sandbox meta 端點不必再開啟 zip
+        record_package(problem, names, meta)
+
+        return api_response({"path": rel.replace('\\','/'), "testcase_hash": sha256_hash}, "Zip uploaded with meta", status_code=201)
 
 
 class ProblemTestCaseChecksumView(APIView):
@@ -705,68 +659,15 @@ class ProblemTestCaseMetaView(APIView):
         if not token_expected or token_req != token_expected:
             return api_response(None, "Invalid sandbox token", status_code=401)
         problem = get_object_or_404(Problems, pk=pk)
-        from ..services.storage import _storage
-        rel = os.path.join("testcases", f"p{problem.id}", "problem.zip")
-        if not _storage.exists(rel):
-            raise Http404("Test case archive not found")
-        import zipfile, json
-        with _storage.open(rel, 'rb') as fh:
-            data = fh.read()
-        from io import BytesIO
-        buffer = BytesIO(data)
-        # 優先讀取 zip 內的 meta.json；若不存在則回退為檔名掃描
+        import zipfile
+        # 優先使用上傳時保存的 meta（zip 內 meta.json）；沒有 meta.json 的 zip 以檔案列表與目前子題設定組出相同格式
         try:
-            with zipfile.ZipFile(buffer) as zf:
-                # 先嘗試 meta.json
-                if 'meta.json' in zf.namelist():
-                    with zf.open('meta.json') as mf:
-                        meta = json.loads(mf.read().decode('utf-8'))
-                    # 依需求直接回傳 meta.json 的 JSON 結構
-                    return api_response(meta, "OK", status_code=200)
-                # fallback：掃描 .in/.out，組出與 meta.json 相同格式
-                names = zf.namelist()
-                # 計算各子題的成對數量
-                pairs_map = {}
-                for n in names:
-                    base = os.path.basename(n)
-                    stem, ext = os.path.splitext(base)
-                    if ext not in ('.in', '.out'):
-                        continue
-                    if len(stem) != 4 or not stem.isdigit():
-                        continue
-                    ss = int(stem[:2])
-                    tt = int(stem[2:])
-                    entry = pairs_map.setdefault(ss, {'in': set(), 'out': set()})
-                    entry['in' if ext == '.in' else 'out'].add(tt)
-
-                case_counts = {ss: len(entry['in'] & entry['out']) for ss, entry in pairs_map.items()}
-
-                # 從資料庫讀取子題設定，與 upload-zip 的預設一致
-                subtask_map = {st.subtask_no - 1: st for st in Problem_subtasks.objects.filter(problem_id=problem)}
-                def build_meta_entry(ss_idx: int):
-                    st = subtask_map.get(ss_idx)
-                    case_count = case_counts.get(ss_idx, 0)
-                    time_limit = getattr(st, 'time_limit_ms', None) or 1000
-                    mem_mb = getattr(st, 'memory_limit_mb', None)
-                    memory_limit = (mem_mb * 1024) if mem_mb is not None else 134218
-                    task_score = getattr(st, 'weight', None) or 0
-                    return {
-                        "caseCount": case_count,
-                        "memoryLimit": memory_limit // 1024,
-                        "memoryLimitKB": memory_limit,
-                        "taskScore": task_score,
-                        "timeLimit": time_limit,
-                    }
-                max_ss = max(case_counts.keys()) if case_counts else -1
-                
-                meta = {
-                    "tasks": [build_meta_entry(ss) for ss in range(max_ss + 1)],
-                    "testcases": _build_testcases_list(pairs_map, max_ss)
-                }
+            package = get_testcase_package(problem)
         except zipfile.BadZipFile:
             return api_response(None, "Corrupted test case archive", status_code=500)
-        # 回傳 fallback 生成的 meta 結構
-        return api_response(meta, "OK", status_code=200)
+        if package is None:
+            raise Http404("Test case archive not found")
+        return api_response(package_meta(problem, package), "OK", status_code=200)
 
 
 class ProblemTagAddView(APIView):
@@ -873,11 +774,96 @@ class ProblemPagination(PageNumberPagination):
         }, "OK", status_code=200)
 
 
+class ProblemCursorPagination(CursorPagination):
+    """
+    題目列表的 keyset 分頁：以排序欄位的值定位下一頁，深分頁不需 OFFSET 掃描
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+
+    def get_ordering(self, request, queryset, view):
+        return problem_list_ordering(getattr(view, 'ordering', None) or self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # 沿用頁碼分頁回應中的 count，避免既有前端讀不到；超過上限只回傳上限值
+        self.count = queryset.order_by()[:PROBLEM_LIST_COUNT_CAP + 1].count()
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return api_response({
+            "count": min(self.count, PROBLEM_LIST_COUNT_CAP),
+            "count_capped": self.count > PROBLEM_LIST_COUNT_CAP,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }, "OK", status_code=200)
+
+
+# 題目列表可排序的欄位
+PROBLEM_LIST_SORT_FIELDS = (
+    'created_at', 'updated_at', 'id', 'title', 'difficulty', 'max_score',
+    'total_submissions', 'accepted_submissions', 'acceptance_rate', 'like_count', 'view_count',
+)
+
+# 可使用 keyset 分頁的排序欄位：值穩定且幾乎唯一。
+# 計數欄位隨提交與瀏覽持續變動（cursor 以排序值定位，翻頁時會跳過或重複題目），
+# title、difficulty 等重複值多的欄位 cursor 也會退化為 offset 掃描，這些排序一律使用頁碼分頁
+PROBLEM_LIST_CURSOR_FIELDS = ('created_at', 'updated_at', 'id')
+
+# keyset 分頁回應中 count 的上限，避免大表上的完整 COUNT
+PROBLEM_LIST_COUNT_CAP = 10000
+
+
+def problem_list_ordering(ordering):
+    """排序欄位不唯一時補上 id 作為次要排序，讓同值的題目順序固定"""
+    if ordering.lstrip('-') == 'id':
+        return (ordering,)
+    return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+
+def inject_user_problem_summary(user, data):
+    """
+    為題目列表的每一題加上目前使用者的提交次數與解題狀態
+
+    提交次數以單次 GROUP BY problem_id 查詢取得，
+    解題狀態（solved/attempted 標記）讀取 UserProblemSolveStatus
+    """
+    from submissions.models import Submission, UserProblemSolveStatus
+
+    problem_ids = [item['id'] for item in data]
+    if not problem_ids:
+        return data
+
+    submit_counts = dict(
+        Submission.objects.filter(user=user, problem_id__in=problem_ids)
+        .order_by()
+        .values('problem_id')
+        .annotate(cnt=Count('id'))
+        .values_list('problem_id', 'cnt')
+    )
+    solve_statuses = dict(
+        UserProblemSolveStatus.objects.filter(user=user, problem_id__in=problem_ids)
+        .order_by()
+        .values_list('problem_id', 'solve_status')
+    )
+    for item in data:
+        item['submit_count'] = submit_counts.get(item['id'], 0)
+        item['solve_status'] = solve_statuses.get(item['id'], 'never_tried')
+    return data
+
+
 class ProblemListView(APIView):
     """
     GET /api/problem/ — 題目列表
     支援篩選: ?difficulty=easy&is_public=public|course|hidden&course_id=3
-    支援分頁: ?page=1&page_size=20
+    支援排序: ?ordering=<PROBLEM_LIST_SORT_FIELDS 之一>，前綴 - 為遞減；同值時以 id 排序
+    分頁（一律分頁）:
+      - 預設 keyset 分頁: ?page_size=20，以回傳的 next/previous 連結（?cursor=）翻頁；
+        僅限 PROBLEM_LIST_CURSOR_FIELDS 排序
+      - 頁碼分頁: ?page=1&page_size=20（既有前端），以及依其他欄位（計數、標題、難度等）排序時
+    登入時每題附上 submit_count 與 solve_status
     """
     permission_classes = []
 
@@ -889,7 +875,16 @@ class ProblemListView(APIView):
 
     def get(self, request):
         queryset = Problems.objects.all().select_related('creator_id', 'course_id').prefetch_related('tags', 'subtasks')
-        
+
+        # 排序
+        self.ordering = request.query_params.get('ordering', '-created_at')
+        if self.ordering.lstrip('-') not in PROBLEM_LIST_SORT_FIELDS:
+            return api_response(
+                None,
+                f"Invalid ordering. Use one of: {', '.join(PROBLEM_LIST_SORT_FIELDS)} (prefix '-' for descending).",
+                status_code=400
+            )
+
         # 篩選：difficulty
         difficulty = request.query_params.get('difficulty')
         if difficulty:
@@ -935,45 +930,20 @@ class ProblemListView(APIView):
                 Q(is_public__in=['public', True, 1]) | Q(creator_id=user) | Q(is_public='course', course_id__in=user_courses)
             )
         
-        # 排序
-        ordering = request.query_params.get('ordering', '-created_at')
-        queryset = queryset.order_by(ordering)
-        
-        # 分頁
-        paginator = ProblemPagination()
-        page = paginator.paginate_queryset(queryset, request)
-        if page is not None:
-            serializer = ProblemSerializer(page, many=True)
-            data = serializer.data
-            # Inject per-user submit_count
-            if request.user.is_authenticated:
-                from submissions.models import Submission
-                problem_ids = [item['id'] for item in data]
-                user_submissions = Submission.objects.filter(
-                    user=request.user, problem_id__in=problem_ids
-                ).values_list('problem_id', flat=True)
-                submit_counts = {}
-                for pid in problem_ids:
-                    submit_counts[pid] = list(user_submissions).count(pid)
-                for item in data:
-                    item['submit_count'] = submit_counts.get(item['id'], 0)
-            return paginator.get_paginated_response(data)
-        
-        serializer = ProblemSerializer(queryset, many=True)
-        data = serializer.data
-        # Inject per-user submit_count
+        # 分頁：帶 page 參數或排序欄位不適合 keyset 時使用頁碼分頁，其餘使用 keyset 分頁
+        if 'page' in request.query_params or self.ordering.lstrip('-') not in PROBLEM_LIST_CURSOR_FIELDS:
+            paginator = ProblemPagination()
+            page = paginator.paginate_queryset(
+                queryset.order_by(*problem_list_ordering(self.ordering)), request, view=self
+            )
+        else:
+            paginator = ProblemCursorPagination()
+            page = paginator.paginate_queryset(queryset, request, view=self)
+
+        data = ProblemSerializer(page, many=True).data
         if request.user.is_authenticated:
-            from submissions.models import Submission
-            problem_ids = [item['id'] for item in data]
-            user_submissions = Submission.objects.filter(
-                user=request.user, problem_id__in=problem_ids
-            ).values_list('problem_id', flat=True)
-            submit_counts = {}
-            for pid in problem_ids:
-                submit_counts[pid] = list(user_submissions).count(pid)
-            for item in data:
-                item['submit_count'] = submit_counts.get(item['id'], 0)
-        return api_response(data, "OK", status_code=200)
+            inject_user_problem_summary(request.user, data)
+        return paginator.get_paginated_response(data)
 
     # 重要：不允許在 /problem/ 進行建立，統一走 /problem/manage
     # 若誤用 POST /problem/，回傳 405，請改用 /problem/manage
@@ -1019,37 +989,11 @@ class ProblemDetailView(APIView):
         return mask
 
     def _build_testcase_tasks(self, problem):
-        from ..services.storage import _storage
-        rel = os.path.join('testcases', f'p{problem.id}', 'problem.zip')
-        if not _storage.exists(rel):
-            return []
         try:
-            with _storage.open(rel, 'rb') as fh:
-                data = fh.read()
-            from io import BytesIO
-            import zipfile, os as _os
-            buf = BytesIO(data)
-            tasks = []
-            with zipfile.ZipFile(buf) as zf:
-                names = zf.namelist()
-                ins = [n for n in names if n.endswith('.in')]
-                outs = [n for n in names if n.endswith('.out')]
-                def stem(n):
-                    b = _os.path.basename(n)
-                    return _os.path.splitext(b)[0]
-                in_map = {stem(n): n for n in ins}
-                out_map = {stem(n): n for n in outs}
-                all_stems = sorted(set(list(in_map.keys()) + list(out_map.keys())))
-                for idx, s in enumerate(all_stems, start=1):
-                    tasks.append({
-                        'no': idx,
-                        'stem': s,
-                        'in': in_map.get(s),
-                        'out': out_map.get(s),
-                    })
-            return tasks
+            package = get_testcase_package(problem)
         except Exception:
             return []
+        return package.tasks if package is not None else []
 
     def get(self, request, pk):
         try:
@@ -1161,106 +1105,139 @@ class ProblemDetailView(APIView):
             'static_analysis_config': problem.get_static_analysis_config() if hasattr(problem, 'get_static_analysis_config') else {'enabled': False},
         }
 
+        # 瀏覽數先累加在 Redis，由 flush_problem_counters_task 批次寫回
+        problem_counters.record_view(problem.id)
         return api_response(data, "Problem can view.", status_code=200)
 
 
 import math
+from django.utils import timezone
+
 
 class ProblemStatsView(APIView):
     """
     GET /problem/<id>/stats — 題目統計資訊
     權限：需要登入
+    參數：window（選填）— all / 24h / 7d / 30d，只統計該時間範圍內的提交
     回傳：AC 用戶、嘗試用戶、平均分數、標準差、分數分布、狀態統計、top10執行時間/記憶體
+    結果依題目與時間範圍快取，提交判題完成時由 submissions.cache.signals 清除
     """
 
     def get(self, request, pk):
         # Defensive: some dependent apps/tables may be missing while local migrations are being fixed.
         # Wrap DB access in OperationalError to return a clear 503 instead of crashing the server.
         from django.db.utils import OperationalError
-        try:
-            from courses.models import Course_members
-            from submissions.models import Submission
 
+        window = request.query_params.get('window', 'all')
+        if window not in CacheKeys.PROBLEM_STATS_WINDOWS:
+            return api_response(
+                None,
+                f"Invalid window. Use one of: {', '.join(CacheKeys.PROBLEM_STATS_WINDOWS)}.",
+                status_code=400
+            )
+
+        try:
             # 1. 題目存在性
             try:
                 problem = Problems.objects.get(pk=pk)
             except Problems.DoesNotExist:
                 return api_response(None, "Problem not found.", status_code=404)
 
-            # 2. 總學生數（該課程所有學生）
-            course_id = getattr(problem, 'course_id', None)
-            total_students = 0
-            if course_id:
-                total_students = Course_members.objects.filter(course_id=course_id, role='student').count()
-
-            # 3. 所有提交
-            submissions = Submission.objects.filter(problem_id=pk)
-
-            # 4. 嘗試過的用戶數（distinct count 避免載入整批資料）
-            tried_user_count = submissions.values('user').distinct().count()
-
-            # 5. AC 用戶數
-            # Submission.status 以 NOJ 代碼字串儲存，AC 為 '0'
-            ac_user_count = submissions.filter(status='0').values('user').distinct().count()
-
-            # 6. 分數統計
-            scores = list(submissions.values_list('score', flat=True))
-            average = sum(scores) / len(scores) if scores else 0
-            std = math.sqrt(sum((s - average) ** 2 for s in scores) / len(scores)) if scores else 0
-
-            # 7. 分數分布
-            score_distribution = {}
-            for s in scores:
-                score_distribution[s] = score_distribution.get(s, 0) + 1
-            score_distribution = [ {'score': k, 'count': v} for k, v in sorted(score_distribution.items()) ]
-
-            # 8. 狀態統計
-            status_count = {}
-            for row in submissions.values('status').annotate(cnt=Count('id')):
-                status_count[row['status']] = row['cnt']
-
-            # 9. top10執行時間（含使用者 username，方便前端顯示）
-            runtime_qs = submissions.filter(execution_time__gt=0).select_related('user').order_by('execution_time')[:10]
-            top10_runtime = [
-                {
-                    'id': s.id,
-                    'user': s.user_id,
-                    'username': getattr(s.user, 'username', ''),
-                    'execution_time': s.execution_time,
-                    'score': s.score,
-                    'status': s.status,
-                }
-                for s in runtime_qs
-            ]
-
-            # 10. top10記憶體（含使用者 username）
-            memory_qs = submissions.filter(memory_usage__gt=0).select_related('user').order_by('memory_usage')[:10]
-            top10_memory = [
-                {
-                    'id': s.id,
-                    'user': s.user_id,
-                    'username': getattr(s.user, 'username', ''),
-                    'memory_usage': s.memory_usage,
-                    'score': s.score,
-                    'status': s.status,
-                }
-                for s in memory_qs
-            ]
-
-            return api_response({
-                "acUserRatio": [ac_user_count, total_students],
-                "triedUserCount": tried_user_count,
-                "average": average,
-                "std": std,
-                "scoreDistribution": score_distribution,
-                "statusCount": status_count,
-                "top10RunTime": top10_runtime,
-                "top10MemoryUsage": top10_memory,
-            }, "OK", status_code=200)
+            data = cache_fallback.get_safe(
+                CacheKeys.problem_stats(problem.id, window),
+                lambda: self.compute_stats(problem, window),
+                settings.CACHE_TIMEOUTS.get('problem_stats', 60)
+            )
+            return api_response(data, "OK", status_code=200)
         except OperationalError as e:
             # Helpful diagnostic for local dev when migrations/tables are missing
             return api_response({"error": str(e)}, "Service temporarily unavailable: dependent database tables appear to be missing.", status_code=503)
 
+    def compute_stats(self, problem, window='all'):
+        """計算題目統計（分數與狀態統計以單次 GROUP BY 查詢完成）"""
+        from courses.models import Course_members
+        from submissions.models import Submission
+
+        # 2. 總學生數（該課程所有學生）
+        # 使用 course_id_id 避免為了取 id 再載入整個課程
+        course_id = problem.course_id_id
+        total_students = 0
+        if course_id:
+            total_students = Course_members.objects.filter(course_id=course_id, role='student').count()
+
+        # 3. 所有提交（可限制時間範圍）
+        submissions = Submission.objects.filter(problem_id=problem.id)
+        window_delta = CacheKeys.PROBLEM_STATS_WINDOWS[window]
+        if window_delta is not None:
+            submissions = submissions.filter(created_at__gte=timezone.now() - window_delta)
+
+        # 4-5. 嘗試過的用戶數與 AC 用戶數（同一個 aggregate）
+        # Submission.status 以 NOJ 代碼字串儲存，AC 為 '0'
+        user_counts = submissions.aggregate(
+            tried=Count('user', distinct=True),
+            ac=Count('user', distinct=True, filter=Q(status='0')),
+        )
+
+        # 6-8. 依 (status, score) 分組計數，平均、變異數、分數分布與狀態統計都由分組結果得出，
+        # 不需把每筆分數載入記憶體
+        total = 0
+        score_sum = 0
+        score_sq_sum = 0
+        score_distribution = {}
+        status_count = {}
+        grouped = submissions.order_by().values('status', 'score').annotate(cnt=Count('id'))
+        for row in grouped:
+            score, cnt = row['score'], row['cnt']
+            total += cnt
+            score_sum += score * cnt
+            score_sq_sum += score * score * cnt
+            score_distribution[score] = score_distribution.get(score, 0) + cnt
+            status_count[row['status']] = status_count.get(row['status'], 0) + cnt
+
+        average = score_sum / total if total else 0
+        std = math.sqrt(max(score_sq_sum / total - average ** 2, 0)) if total else 0
+        score_distribution = [{'score': k, 'count': v} for k, v in sorted(score_distribution.items())]
+
+        # 9. top10執行時間（含使用者 username，方便前端顯示）
+        runtime_qs = submissions.filter(execution_time__gt=0).select_related('user').order_by('execution_time')[:10]
+        top10_runtime = [
+            {
+                'id': s.id,
+                'user': s.user_id,
+                'username': getattr(s.user, 'username', ''),
+                'execution_time': s.execution_time,
+                'score': s.score,
+                'status': s.status,
+            }
+            for s in runtime_qs
+        ]
+
+        # 10. top10記憶體（含使用者 username）
+        memory_qs = submissions.filter(memory_usage__gt=0).select_related('user').order_by('memory_usage')[:10]
+        top10_memory = [
+            {
+                'id': s.id,
+                'user': s.user_id,
+                'username': getattr(s.user, 'username', ''),
+                'memory_usage': s.memory_usage,
+                'score': s.score,
+                'status': s.status,
+            }
+            for s in memory_qs
+        ]
+
+        return {
+            "acUserRatio": [user_counts['ac'], total_students],
+            "triedUserCount": user_counts['tried'],
+            "average": average,
+            "std": std,
+            "scoreDistribution": score_distribution,
+            "statusCount": status_count,
+            "window": window,
+            "top10RunTime": top10_runtime,
+            "top10MemoryUsage": top10_memory,
+        }
+
 class ProblemHighScoreView(APIView):
     """
     GET /api/problem/<id>/high-score — 取得使用者在該題目的最高分數
@@ -1274,14 +1251,17 @@ class ProblemHighScoreView(APIView):
             return api_response(None, "Problem not found.", status_code=404)
         
         user = request.user
-        high_score = Submission.objects.filter(
-            problem_id=problem.id,
-            user=user
-        ).aggregate(high_score=Max('score')).get('high_score')
-        
-        # 若從未提交過，回傳 0
-        if high_score is None:
-            high_score = 0
+
+        def fetch_high_score():
+            high_score = Submission.objects.filter(
+                problem_id=problem.id,
+                user=user
+            ).aggregate(high_score=Max('score')).get('high_score')
+            # 若從未提交過，回傳 0
+            return high_score if high_score is not None else 0
+
+        # 新提交或判題結果變更時由 submissions.cache.signals 清除
+        high_score = get_high_score_with_cache(problem.id, str(user.id), fetch_high_score)
         
         return api_response({"score": high_score}, "OK", status_code=200)
 
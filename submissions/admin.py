@@ -5,6 +5,7 @@ from .models import (
     SubmissionResult, 
     UserProblemStats, 
     UserProblemSolveStatus,
+    UserRanking,
     UserProblemQuota,
     CustomTest,
     Editorial,
@@ -206,6 +207,14 @@ class UserProblemSolveStatusAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(UserRanking)
+class UserRankingAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ac_problem_count', 'ac_submission_count', 'submission_count', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
+    ordering = ['-ac_problem_count', '-ac_submission_count', 'submission_count']
+
+
 @admin.register(UserProblemQuota)
 class UserProblemQuotaAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'problem_id', 'assignment_id', 'total_quota', 
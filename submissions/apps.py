@@ -8,6 +8,7 @@ class SubmissionsConfig(AppConfig):
     def ready(self):
         """Import signal handlers"""
         import submissions.cache.signals  # noqa
+        import submissions.signals  # noqa
         
-        # 註解: Bloom filter 會在第一次使用時自動延遲初始化
-        # 避免在 Django 啟動時訪問資料庫造成警告
+        # 註解: Bloom filter 存放在 Redis，由 `manage.py load_bloom_filter` 載入一次，
+        # 啟動時不訪問資料庫；載入完成前查詢一律放行
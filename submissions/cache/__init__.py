@@ -6,6 +6,7 @@ Submissions Cache Module
 - 布隆過濾器（防止快取穿透）
 - 分散式鎖（防止快取擊穿）
 - 超時降級機制
+- 速率限制（token bucket）
 - 監控系統
 """
 
@@ -13,6 +14,7 @@ from .keys import CacheKeys
 from .protection import CachePenetrationProtection
 from .lock import RedisDistributedLock
 from .fallback import CacheWithFallback
+from .rate_limit import RedisRateLimiter
 from .monitoring import CacheHitRateMonitor, RedisMemoryMonitor
 
 __all__ = [
@@ -20,6 +22,7 @@ __all__ = [
     'CachePenetrationProtection',
     'RedisDistributedLock',
     'CacheWithFallback',
+    'RedisRateLimiter',
     'CacheHitRateMonitor',
     'RedisMemoryMonitor',
 ]
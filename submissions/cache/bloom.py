@@ -0,0 +1,256 @@
+"""
+Redis 布隆過濾器模組
+
+以 Redis bitmap (SETBIT / GETBIT) 實作可擴展的布隆過濾器，
+所有 gunicorn worker 與 Celery worker 共用同一份資料，重啟後不需重新載入
+
+bitmap 不可被 Redis 淘汰：設定 BLOOM_FILTER_REDIS_URL 指向 maxmemory-policy 為
+noeviction / volatile-* 的 Redis，未設定時使用 cache 的連線（同樣需要此淘汰策略）。
+查詢時若發現 segment 遺失，會清除 ready 旗標改為一律放行，直到重新執行 load_bloom_filter
+"""
+
+import logging
+import math
+from typing import Iterable, List, Optional
+
+import redis
+import xxhash
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .keys import CacheKeys
+
+logger = logging.getLogger(__name__)
+
+
+class RedisBloomFilter:
+    """
+    可擴展的 Redis 布隆過濾器 (Scalable Bloom Filter)
+
+    資料以多個 segment 存放：每個 segment 是一個 Redis bitmap，
+    寫滿容量後自動建立下一個 segment，新 segment 的容量加倍、誤判率減半，
+    讓整體誤判率維持在 error_rate 以下。
+
+    meta hash 欄位：
+    - segments: 目前的 segment 數量
+    - count:{i}: 第 i 個 segment 已加入的項目數
+    - ready: 是否已由 load_bloom_filter 指令完整載入
+    """
+
+    GROWTH = 2          # 新 segment 的容量倍數
+    TIGHTENING = 0.5    # 新 segment 的誤判率倍數
+
+    def __init__(self, name: str, capacity: int = 1000000, error_rate: float = 0.001, client=None):
+        """
+        Args:
+            name: 過濾器名稱（用於 Redis 鍵）
+            capacity: 第一個 segment 的容量
+            error_rate: 目標誤判率
+            client: Redis client，None 則使用 BLOOM_FILTER_REDIS_URL，未設定時使用 django-redis 的 default 連線
+        """
+        self.name = name
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._client = client
+
+    @property
+    def redis(self):
+        if self._client is None:
+            url = getattr(settings, 'BLOOM_FILTER_REDIS_URL', '')
+            self._client = redis.Redis.from_url(url) if url else get_redis_connection("default")
+        return self._client
+
+    # ----- segment 參數 -----
+
+    def segment_capacity(self, index: int) -> int:
+        return self.capacity * (self.GROWTH ** index)
+
+    def segment_error_rate(self, index: int) -> float:
+        # 第一個 segment 取 error_rate 的一半，所有 segment 加總收斂於 error_rate
+        return self.error_rate * (1 - self.TIGHTENING) * (self.TIGHTENING ** index)
+
+    def segment_params(self, index: int):
+        """
+        Returns:
+            (bit 數 m, hash 數 k)
+        """
+        n = self.segment_capacity(index)
+        p = self.segment_error_rate(index)
+        m = int(math.ceil(-n * math.log(p) / (math.log(2) ** 2)))
+        k = max(1, int(round(m / n * math.log(2))))
+        return m, k
+
+    def positions(self, key: str, index: int) -> List[int]:
+        """以兩個 xxhash 做 double hashing 產生 k 個 bit 位置"""
+        m, k = self.segment_params(index)
+        data = str(key).encode('utf-8')
+        h1 = xxhash.xxh64_intdigest(data, seed=0)
+        h2 = xxhash.xxh64_intdigest(data, seed=1) | 1
+        return [(h1 + i * h2) % m for i in range(k)]
+
+    # ----- meta -----
+
+    def _meta_key(self) -> str:
+        return CacheKeys.bloom_meta(self.name)
+
+    def _segment_key(self, index: int) -> str:
+        return CacheKeys.bloom_segment(self.name, index)
+
+    def _segment_count(self) -> int:
+        return int(self.redis.hget(self._meta_key(), 'segments') or 1)
+
+    @property
+    def initialized(self) -> bool:
+        """是否已完整載入（未載入時無法判定「不存在」）"""
+        try:
+            return self.redis.hget(self._meta_key(), 'ready') in (b'1', '1')
+        except Exception as e:
+            logger.warning(f"Bloom filter {self.name} meta unavailable: {e}")
+            return False
+
+    def _ensure_segments(self, indexes):
+        """以 APPEND 空字串建立 segment 鍵（已存在則不變），讓查詢能分辨 segment 是否遺失"""
+        pipe = self.redis.pipeline(transaction=False)
+        for index in indexes:
+            pipe.append(self._segment_key(index), b'')
+        pipe.execute()
+
+    def mark_ready(self):
+        self._ensure_segments(range(self._segment_count()))
+        self.redis.hset(self._meta_key(), 'ready', 1)
+
+    def mark_dirty(self):
+        """清除 ready 旗標：之後的查詢一律放行，直到重新執行 load_bloom_filter"""
+        self.redis.hdel(self._meta_key(), 'ready')
+
+    def clear(self):
+        """刪除所有 segment 與 meta"""
+        segments = self._segment_count()
+        self.redis.delete(self._meta_key(), *[self._segment_key(i) for i in range(segments)])
+
+    # ----- 操作 -----
+
+    def add_many(self, keys: Iterable[str]) -> int:
+        """
+        批次加入多個 key（一次 pipeline 寫入）
+
+        Returns:
+            新加入的項目數（所有 bit 原本都已設定者視為已存在）
+        """
+        keys = [str(key) for key in keys]
+        if not keys:
+            return 0
+
+        index = self._segment_count() - 1
+        segment_key = self._segment_key(index)
+
+        pipe = self.redis.pipeline(transaction=False)
+        offsets = []
+        for key in keys:
+            positions = self.positions(key, index)
+            offsets.append(len(positions))
+            for pos in positions:
+                pipe.setbit(segment_key, pos, 1)
+        old_bits = pipe.execute()
+
+        added = 0
+        cursor = 0
+        for k in offsets:
+            if not all(old_bits[cursor:cursor + k]):
+                added += 1
+            cursor += k
+
+        if added:
+            self._record_added(index, added)
+        return added
+
+    def _record_added(self, index: int, added: int):
+        """累加 segment 計數，由跨過容量門檻的那個 worker 建立下一個 segment"""
+        capacity = self.segment_capacity(index)
+        count = self.redis.hincrby(self._meta_key(), f'count:{index}', added)
+        if count >= capacity > count - added:
+            self._ensure_segments([index + 1])
+            self.redis.hset(self._meta_key(), 'segments', index + 2)
+            logger.info(
+                f"Bloom filter {self.name} segment {index} reached capacity {capacity}, "
+                f"scaling to {index + 2} segments"
+            )
+
+    def add(self, key: str) -> bool:
+        return self.add_many([key]) > 0
+
+    def might_contain(self, key: str) -> bool:
+        """
+        供查詢路徑使用：尚未完整載入時一律回傳 True
+
+        ready 與 segment 數以一次 HMGET 取得，加上 GETBIT pipeline 共兩次往返；
+        segment 被淘汰或刪除時清除 ready 旗標並放行，避免把存在的資料判定為不存在
+        """
+        ready, segments = self.redis.hmget(self._meta_key(), 'ready', 'segments')
+        if ready not in (b'1', '1'):
+            return True
+        segments = int(segments or 1)
+        bits, ks, existing = self._probe(key, segments)
+        if existing < segments:
+            logger.error(
+                f"Bloom filter {self.name} lost {segments - existing} segment(s); "
+                f"failing open until load_bloom_filter is run"
+            )
+            self.mark_dirty()
+            return True
+        return self._any_segment_full(bits, ks)
+
+    def _probe(self, key: str, segments: int):
+        """
+        一次 pipeline 讀取每個 segment 的 k 個 bit，並計算仍存在的 segment 數
+
+        Returns:
+            (bits, 每個 segment 的 k, 存在的 segment 數)
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        ks = []
+        for index in range(segments):
+            positions = self.positions(key, index)
+            ks.append(len(positions))
+            for pos in positions:
+                pipe.getbit(self._segment_key(index), pos)
+        pipe.exists(*[self._segment_key(index) for index in range(segments)])
+        results = pipe.execute()
+        return results[:-1], ks, results[-1]
+
+    def contains(self, key: str, segments: Optional[int] = None) -> bool:
+        """任一 segment 的 k 個 bit 全部為 1 即視為可能存在"""
+        if segments is None:
+            segments = self._segment_count()
+        bits, ks, _ = self._probe(key, segments)
+        return self._any_segment_full(bits, ks)
+
+    @staticmethod
+    def _any_segment_full(bits, ks) -> bool:
+        cursor = 0
+        for k in ks:
+            if all(bits[cursor:cursor + k]):
+                return True
+            cursor += k
+        return False
+
+    def stats(self) -> dict:
+        """回傳各 segment 的容量與已加入數量"""
+        meta = self.redis.hgetall(self._meta_key())
+        meta = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in meta.items()
+        }
+        segments = int(meta.get('segments', 1))
+        return {
+            'ready': meta.get('ready') == '1',
+            'segments': [
+                {
+                    'index': i,
+                    'capacity': self.segment_capacity(i),
+                    'count': int(meta.get(f'count:{i}', 0)),
+                    'bits': self.segment_params(i)[0],
+                }
+                for i in range(segments)
+            ],
+        }
@@ -94,6 +94,29 @@ class CacheWithFallback:
             logger.error(f"Redis set failed for {key}: {e}")
             return False
     
+    def incr_safe(self, key: str, timeout: int = 300) -> Optional[int]:
+        """
+        安全遞增計數器（不存在時以 0 建立並設定 TTL），失敗不阻塞主流程
+        
+        Args:
+            key: 快取鍵
+            timeout: 計數器建立時的 TTL（秒）
+        
+        Returns:
+            遞增後的值，失敗時回傳 None
+        """
+        try:
+            cache.add(key, 0, timeout)
+            try:
+                return cache.incr(key)
+            except ValueError:
+                # add 與 incr 之間剛好過期
+                cache.set(key, 1, timeout)
+                return 1
+        except Exception as e:
+            logger.error(f"Cache incr failed for {key}: {e}")
+            return None
+    
     def delete_safe(self, key: str) -> bool:
         """
         安全刪除快取，失敗不阻塞主流程
@@ -111,6 +134,23 @@ class CacheWithFallback:
             logger.error(f"Redis delete failed for {key}: {e}")
             return False
     
+    def delete_many_safe(self, keys: list) -> bool:
+        """
+        安全刪除多個快取，失敗不阻塞主流程
+        
+        Args:
+            keys: 快取鍵列表
+        
+        Returns:
+            True/False 表示是否成功
+        """
+        try:
+            cache.delete_many(keys)
+            return True
+        except Exception as e:
+            logger.error(f"Redis delete_many failed for {keys}: {e}")
+            return False
+    
     def delete_pattern_safe(self, pattern: str) -> bool:
         """
         安全刪除符合模式的所有快取
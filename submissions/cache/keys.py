@@ -5,6 +5,7 @@
 """
 
 import hashlib
+from datetime import timedelta
 from typing import Any, Optional
 
 
@@ -19,6 +20,18 @@ class CacheKeys:
     PREFIX_PERMISSION = "SUBMISSION_PERMISSION"
     PREFIX_TOKEN = "TOKEN"
     PREFIX_RANKING = "RANKING"
+    PREFIX_BLOOM = "BLOOM"
+    PREFIX_PROBLEM_STATS = "PROBLEM_STATS"
+    PREFIX_RATE_LIMIT = "RATE_LIMIT"
+    
+    # 題目統計支援的時間範圍（all 為全部提交，不限制時間）
+    # ProblemStatsView 的驗證、查詢與快取失效都以此為準
+    PROBLEM_STATS_WINDOWS = {
+        'all': None,
+        '24h': timedelta(hours=24),
+        '7d': timedelta(days=7),
+        '30d': timedelta(days=30),
+    }
     
     @staticmethod
     def submission_list(user_id: str, **filters) -> str:
@@ -105,6 +118,19 @@ class CacheKeys:
         """
         return f"{CacheKeys.PREFIX_PERMISSION}:{submission_id}:{user_id}"
     
+    @staticmethod
+    def permission_user_pattern(user_id: str) -> str:
+        """
+        某用戶所有提交權限快取鍵模式（用於批量刪除）
+        
+        Args:
+            user_id: 用戶 ID
+        
+        Returns:
+            快取鍵模式
+        """
+        return f"{CacheKeys.PREFIX_PERMISSION}:*:{user_id}"
+    
     @staticmethod
     def token(submission_id: str) -> str:
         """
@@ -142,6 +168,77 @@ class CacheKeys:
         """
         return f"{CacheKeys.PREFIX_RANKING}:*"
     
+    @staticmethod
+    def bloom_meta(name: str) -> str:
+        """
+        布隆過濾器 meta hash 鍵
+        
+        Args:
+            name: 過濾器名稱
+        
+        Returns:
+            快取鍵字符串
+        """
+        return f"{CacheKeys.PREFIX_BLOOM}:{name}:meta"
+    
+    @staticmethod
+    def bloom_segment(name: str, index: int) -> str:
+        """
+        布隆過濾器 segment bitmap 鍵
+        
+        Args:
+            name: 過濾器名稱
+            index: segment 編號
+        
+        Returns:
+            快取鍵字符串
+        """
+        return f"{CacheKeys.PREFIX_BLOOM}:{name}:{index}"
+    
+    @staticmethod
+    def problem_stats(problem_id: int, window: str = 'all') -> str:
+        """
+        題目統計快取鍵
+        
+        Args:
+            problem_id: 題目 ID
+            window: 時間範圍（PROBLEM_STATS_WINDOWS 之一）
+        
+        Returns:
+            快取鍵字符串
+        """
+        return f"{CacheKeys.PREFIX_PROBLEM_STATS}:{problem_id}:{window}"
+    
+    @staticmethod
+    def problem_stats_all_windows(problem_id: int) -> list:
+        """
+        題目所有時間範圍的統計快取鍵（用於批量刪除，不依賴模式匹配）
+        
+        Args:
+            problem_id: 題目 ID
+        
+        Returns:
+            快取鍵列表
+        """
+        return [CacheKeys.problem_stats(problem_id, w) for w in CacheKeys.PROBLEM_STATS_WINDOWS]
+    
+    @staticmethod
+    def rate_limit(endpoint: str, identity: str, course_id: Optional[Any] = None) -> str:
+        """
+        速率限制 bucket 鍵（有課程覆寫時每個課程各自計算）
+        
+        Args:
+            endpoint: 端點名稱（RATE_LIMITS 的鍵）
+            identity: 限制對象（例如 user:<id>、ip:<addr>）
+            course_id: 套用課程覆寫時的課程 ID
+        
+        Returns:
+            快取鍵字符串
+        """
+        if course_id is not None:
+            return f"{CacheKeys.PREFIX_RATE_LIMIT}:{endpoint}:course={course_id}:{identity}"
+        return f"{CacheKeys.PREFIX_RATE_LIMIT}:{endpoint}:{identity}"
+    
     @staticmethod
     def lock(key: str) -> str:
         """
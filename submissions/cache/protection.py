@@ -2,13 +2,14 @@
 快取穿透保護模組
 
 使用布隆過濾器防止查詢不存在的資料造成快取穿透
+布隆過濾器存放在 Redis，所有 worker 共用（見 bloom.py）
 """
 
 import logging
 from typing import Optional, Callable, Any
-from pybloom_live import BloomFilter
 from django.core.cache import cache
 from django.http import Http404
+from .bloom import RedisBloomFilter
 
 logger = logging.getLogger(__name__)
 
@@ -23,51 +24,90 @@ class CachePenetrationProtection:
     # 用於表示快取空值的常數
     NULL_CACHE_VALUE = '__NULL__'
     
-    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001, name: str = 'submission'):
         """
         初始化布隆過濾器
         
         Args:
-            capacity: 預期容量（預設 100 萬）
+            capacity: 第一個 segment 的預期容量（預設 100 萬，寫滿後自動擴展）
             error_rate: 誤判率（預設 0.1%）
+            name: Redis 中的過濾器名稱
         """
-        self.bloom_filter = BloomFilter(capacity=capacity, error_rate=error_rate)
-        self.initialized = False
+        self.bloom_filter = RedisBloomFilter(name=name, capacity=capacity, error_rate=error_rate)
         logger.info(
-            f"Bloom filter initialized: capacity={capacity}, error_rate={error_rate}"
+            f"Bloom filter configured: name={name}, capacity={capacity}, error_rate={error_rate}"
         )
     
-    def initialize_from_db(self, model_class, id_field: str = 'id'):
+    @property
+    def initialized(self) -> bool:
+        """是否已由 load_bloom_filter 指令完整載入"""
+        return self.bloom_filter.initialized
+    
+    def initialize_from_db(self, model_class, id_field: str = 'id', chunk_size: int = 10000) -> int:
         """
-        從資料庫載入所有 ID 到布隆過濾器
+        從資料庫串流載入所有 ID 到布隆過濾器
         
         Args:
             model_class: Django Model 類別
             id_field: ID 欄位名稱（預設 'id'）
+            chunk_size: 每批讀取與寫入 Redis 的 ID 數量
+        
+        Returns:
+            載入的 ID 數量
         """
-        try:
-            ids = model_class.objects.values_list(id_field, flat=True)
-            count = 0
-            for obj_id in ids:
-                self.bloom_filter.add(str(obj_id))
-                count += 1
-            
-            self.initialized = True
-            logger.info(
-                f"Bloom filter loaded {count} IDs from {model_class.__name__}"
-            )
-        except Exception as e:
-            logger.error(f"Failed to initialize bloom filter: {e}")
-            self.initialized = False
+        ids = model_class.objects.order_by().values_list(id_field, flat=True)
+        count = 0
+        chunk = []
+        for obj_id in ids.iterator(chunk_size=chunk_size):
+            chunk.append(str(obj_id))
+            if len(chunk) >= chunk_size:
+                self.bloom_filter.add_many(chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            self.bloom_filter.add_many(chunk)
+            count += len(chunk)
+        
+        self.bloom_filter.mark_ready()
+        logger.info(
+            f"Bloom filter loaded {count} IDs from {model_class.__name__}"
+        )
+        return count
     
     def add(self, key: str):
         """
         將 key 加入布隆過濾器
         
+        寫入失敗時清除 ready 旗標，之後的查詢一律放行，
+        避免這筆資料被誤判為不存在，直到重新執行 load_bloom_filter
+        
         Args:
             key: 要加入的鍵
         """
-        self.bloom_filter.add(str(key))
+        self.add_many([key])
+    
+    def add_many(self, keys):
+        """
+        批次加入多個 key（bulk_create 等不會觸發 post_save 的寫入需自行呼叫）
+        
+        Args:
+            keys: 要加入的鍵
+        """
+        keys = [str(key) for key in keys]
+        try:
+            self.bloom_filter.add_many(keys)
+        except Exception as e:
+            logger.warning(f"Bloom filter add failed for {len(keys)} key(s): {e}")
+            self.mark_dirty()
+    
+    def mark_dirty(self):
+        """標記過濾器不完整，查詢改為一律放行"""
+        try:
+            self.bloom_filter.mark_dirty()
+        except Exception as e:
+            logger.error(
+                f"Bloom filter could not be marked dirty, run load_bloom_filter after Redis recovers: {e}"
+            )
     
     def might_exist(self, key: str) -> bool:
         """
@@ -80,7 +120,12 @@ class CachePenetrationProtection:
             True: 可能存在（需要進一步查詢）
             False: 確定不存在
         """
-        return str(key) in self.bloom_filter
+        # 尚未完整載入或 Redis 故障時無法判定不存在，一律放行
+        try:
+            return self.bloom_filter.might_contain(str(key))
+        except Exception as e:
+            logger.warning(f"Bloom filter check failed for {key}: {e}")
+            return True
     
     def get_safe(
         self, 
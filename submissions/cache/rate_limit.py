@@ -0,0 +1,154 @@
+"""
+Redis 速率限制模組
+
+以單一 Lua 腳本實作 token bucket：讀取、回補、扣除與設定 TTL 在 Redis 內原子完成，
+每次請求只需一次 round-trip，併發請求也不會超過上限。
+
+限制依端點（settings.RATE_LIMITS）設定，可用 RATE_LIMIT_COURSE_OVERRIDES 針對課程覆寫；
+每個限制對象（使用者、IP）各自一個 bucket。
+Redis 故障或超時時透過 cache_fallback 改用固定時間窗計數，cache 也不可用時放行。
+"""
+
+import logging
+import math
+import time
+from typing import Any, NamedTuple, Optional
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .fallback import cache_fallback
+from .keys import CacheKeys
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS[1]: bucket 鍵
+# ARGV[1]: 容量（limit）
+# ARGV[2]: 每回補一個 token 所需毫秒數
+# 回傳 {是否允許, 需等待毫秒數, 剩餘 token 數}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local refill_ms = tonumber(ARGV[2])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) / refill_ms)
+
+local allowed = 0
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait_ms = math.ceil((1 - tokens) * refill_ms)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * refill_ms))
+return {allowed, wait_ms, math.floor(tokens)}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    wait_for: int     # 需等待的秒數（允許時為 0）
+    remaining: int
+
+
+class RedisRateLimiter:
+    """
+    Token bucket 速率限制
+
+    bucket 容量為 limit，token 以 limit / period 的速率連續回補，
+    因此不會有固定時間窗在邊界瞬間放行兩倍請求的問題。
+    """
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis client，None 則使用 django-redis 的 default 連線
+        """
+        self._client = client
+        self._script = None
+
+    @property
+    def redis(self):
+        if self._client is None:
+            self._client = get_redis_connection("default")
+        return self._client
+
+    @property
+    def script(self):
+        # register_script 以 EVALSHA 執行，腳本未載入時自動改用 EVAL
+        if self._script is None:
+            self._script = self.redis.register_script(TOKEN_BUCKET_LUA)
+        return self._script
+
+    @staticmethod
+    def get_limit(endpoint: str, course_id: Optional[Any] = None):
+        """
+        取得端點（與課程覆寫）的限制設定
+
+        Returns:
+            (limit, period, 是否套用課程覆寫)
+        """
+        config = settings.RATE_LIMITS[endpoint]
+        if course_id is not None:
+            overrides = getattr(settings, 'RATE_LIMIT_COURSE_OVERRIDES', {})
+            course_config = overrides.get(str(course_id), {}).get(endpoint)
+            if course_config:
+                return int(course_config['limit']), int(course_config['period']), True
+        return int(config['limit']), int(config['period']), False
+
+    def hit(self, endpoint: str, identity: str, course_id: Optional[Any] = None) -> RateLimitResult:
+        """
+        消耗一個 token
+
+        Args:
+            endpoint: 端點名稱（RATE_LIMITS 的鍵）
+            identity: 限制對象，例如 user:<id>、ip:<addr>
+            course_id: 題目所屬課程，用於課程覆寫
+
+        Returns:
+            RateLimitResult
+        """
+        limit, period, per_course = self.get_limit(endpoint, course_id)
+        key = CacheKeys.rate_limit(endpoint, identity, course_id if per_course else None)
+
+        if limit <= 0:
+            return RateLimitResult(False, period, 0)
+
+        try:
+            refill_ms = period * 1000 / limit
+            allowed, wait_ms, remaining = self.script(keys=[key], args=[limit, refill_ms])
+            return RateLimitResult(bool(allowed), math.ceil(int(wait_ms) / 1000), int(remaining))
+        except Exception as e:
+            logger.warning(f"Rate limiter Redis unavailable for {key}: {e}, falling back to cache")
+            return self._hit_fallback(key, limit, period)
+
+    @staticmethod
+    def _hit_fallback(key: str, limit: int, period: int) -> RateLimitResult:
+        """以 cache 計數的固定時間窗限制（非 Lua 路徑，僅在 Redis 故障時使用）"""
+        now = time.time()
+        window = int(now // period)
+        count = cache_fallback.incr_safe(f"{key}:{window}", period)
+        if count is None:
+            # cache 也不可用：放行，不讓速率限制阻斷提交
+            return RateLimitResult(True, 0, 0)
+
+        if count > limit:
+            return RateLimitResult(False, max(1, math.ceil((window + 1) * period - now)), 0)
+        return RateLimitResult(True, 0, limit - count)
+
+
+# 全域實例
+rate_limiter = RedisRateLimiter()
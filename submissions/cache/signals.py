@@ -5,9 +5,11 @@
 """
 
 import logging
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from submissions.models import Submission
+from courses.models import Course_members
 from submissions.cache.keys import CacheKeys
 from submissions.cache.fallback import cache_fallback
 from submissions.cache.protection import submission_bloom_filter
@@ -64,6 +66,83 @@ def on_submission_created(sender, instance, created, **kwargs):
         logger.error(f"Error in on_submission_created signal: {e}")
 
 
+def invalidate_submission_caches(user_id, problem_id, submission_id):
+    """
+    清除單一提交狀態變更後受影響的快取
+    
+    清除範圍：
+    - 提交詳情快取
+    - 用戶提交列表快取
+    - 用戶統計快取
+    - 用戶題目高分快取
+    - 排行榜快取
+    - 題目統計快取（所有時間範圍）
+    """
+    try:
+        cache_fallback.delete_safe(CacheKeys.submission_detail(submission_id))
+        cache_fallback.delete_many_safe(CacheKeys.problem_stats_all_windows(problem_id))
+        cache_fallback.delete_pattern_safe(CacheKeys.submission_list_pattern(user_id))
+        cache_fallback.delete_safe(CacheKeys.user_stats(user_id))
+        cache_fallback.delete_safe(CacheKeys.high_score(problem_id, user_id))
+        cache_fallback.delete_pattern_safe(CacheKeys.ranking_pattern())
+        logger.debug(f"Cleared caches for updated submission {submission_id}")
+    except Exception as e:
+        logger.error(f"Error invalidating caches for submission {submission_id}: {e}")
+
+
+def invalidate_bulk_submission_caches(entries):
+    """
+    清除批次狀態變更（批次重新判題）後受影響的快取
+
+    與 invalidate_submission_caches 相同範圍，但相同的使用者、題目只清一次
+
+    Args:
+        entries: (user_id, problem_id, submission_id) 的可迭代物件
+    """
+    submission_keys = []
+    problem_ids = set()
+    user_ids = set()
+    high_score_keys = set()
+    for user_id, problem_id, submission_id in entries:
+        submission_keys.append(CacheKeys.submission_detail(str(submission_id)))
+        problem_ids.add(problem_id)
+        user_ids.add(str(user_id))
+        high_score_keys.add(CacheKeys.high_score(problem_id, str(user_id)))
+
+    try:
+        keys = submission_keys + list(high_score_keys)
+        for problem_id in problem_ids:
+            keys.extend(CacheKeys.problem_stats_all_windows(problem_id))
+        keys.extend(CacheKeys.user_stats(user_id) for user_id in user_ids)
+        cache_fallback.delete_many_safe(keys)
+        for user_id in user_ids:
+            cache_fallback.delete_pattern_safe(CacheKeys.submission_list_pattern(user_id))
+        cache_fallback.delete_pattern_safe(CacheKeys.ranking_pattern())
+        logger.debug(f"Cleared caches for {len(submission_keys)} updated submissions")
+    except Exception as e:
+        logger.error(f"Error invalidating caches for bulk update: {e}")
+
+
+@receiver(post_save, sender=Submission)
+def on_submission_updated(sender, instance, created, **kwargs):
+    """
+    提交更新後（判題 callback、重新判題、上傳程式碼）清除相關快取
+    
+    狀態、分數與執行結果都可能改變，因此每次更新都清除；
+    在交易提交後才執行，避免並行請求在提交前把舊資料寫回快取
+    """
+    if created:
+        return
+    
+    user_id = str(instance.user_id)
+    problem_id = instance.problem_id
+    submission_id = str(instance.id)
+    
+    transaction.on_commit(
+        lambda: invalidate_submission_caches(user_id, problem_id, submission_id)
+    )
+
+
 @receiver(post_delete, sender=Submission)
 def on_submission_deleted(sender, instance, **kwargs):
     """
@@ -88,3 +167,19 @@ def on_submission_deleted(sender, instance, **kwargs):
         
     except Exception as e:
         logger.error(f"Error in on_submission_deleted signal: {e}")
+
+
+@receiver(post_save, sender=Course_members)
+@receiver(post_delete, sender=Course_members)
+def on_course_member_changed(sender, instance, **kwargs):
+    """
+    課程成員或角色變更後清除該用戶的提交權限快取
+    """
+    user_id = str(instance.user_id_id)
+    
+    try:
+        pattern = CacheKeys.permission_user_pattern(user_id)
+        cache_fallback.delete_pattern_safe(pattern)
+        logger.debug(f"Cleared permission cache for user {user_id}")
+    except Exception as e:
+        logger.error(f"Error in on_course_member_changed signal: {e}")
@@ -16,6 +16,33 @@ from .monitoring import hit_rate_monitor
 logger = logging.getLogger(__name__)
 
 
+# 尚未判題完成的狀態 (Pending / No Code)，預設不快取
+PENDING_STATUSES = ('-1', '-2')
+
+
+def _get_or_fetch(
+    cache_type: str,
+    cache_key: str,
+    fetch_function: Callable[[], Any],
+    cache_timeout: int
+) -> Optional[Any]:
+    """
+    先讀快取，未命中時查詢資料庫並寫回
+
+    命中與否在讀取快取時判斷，讓監控數據反映真實流量
+    """
+    cached_data = cache_fallback.get_safe(cache_key)
+    if cached_data is not None:
+        hit_rate_monitor.record_hit(cache_type)
+        return cached_data
+
+    hit_rate_monitor.record_miss(cache_type)
+    result = fetch_function()
+    if result is not None:
+        cache_fallback.set_safe(cache_key, result, cache_timeout)
+    return result
+
+
 def get_submission_with_cache(
     submission_id: str,
     fetch_function: Callable[[], Any],
@@ -26,7 +53,7 @@ def get_submission_with_cache(
     
     Args:
         submission_id: 提交 ID
-        fetch_function: 查詢資料庫的函數
+        fetch_function: 查詢資料庫的函數，回傳序列化後的 dict（不存在時回傳 None）
         only_completed: 是否只快取已完成的提交
     
     Returns:
@@ -35,20 +62,31 @@ def get_submission_with_cache(
     cache_key = CacheKeys.submission_detail(submission_id)
     cache_timeout = settings.CACHE_TIMEOUTS.get('submission_detail', 120)
     
-    # 使用布隆過濾器保護
-    result = submission_bloom_filter.get_safe(
-        key=submission_id,
-        cache_key=cache_key,
-        fetch_function=fetch_function,
-        cache_timeout=cache_timeout,
-        raise_404=False
-    )
+    # 1. 布隆過濾器判定不存在時直接回傳
+    if not submission_bloom_filter.might_exist(submission_id):
+        return None
     
-    # 記錄監控
-    if result is not None:
+    # 2. 檢查快取（包含空值快取）
+    cached_data = cache_fallback.get_safe(cache_key)
+    if cached_data is not None:
         hit_rate_monitor.record_hit('submission_detail')
-    else:
-        hit_rate_monitor.record_miss('submission_detail')
+        if cached_data == submission_bloom_filter.NULL_CACHE_VALUE:
+            return None
+        return cached_data
+    
+    hit_rate_monitor.record_miss('submission_detail')
+    
+    # 3. 查詢資料庫
+    result = fetch_function()
+    
+    if result is None:
+        # 快取空值，防止重複查詢（較短 TTL）
+        cache_fallback.set_safe(cache_key, submission_bloom_filter.NULL_CACHE_VALUE, 60)
+        return None
+    
+    # 4. 判題中的提交狀態很快會變，預設不快取
+    if not only_completed or result.get('status') not in PENDING_STATUSES:
+        cache_fallback.set_safe(cache_key, result, cache_timeout)
     
     return result
 
@@ -124,14 +162,7 @@ def get_submission_list_with_cache(
     cache_key = CacheKeys.submission_list(user_id, **filters)
     cache_timeout = settings.CACHE_TIMEOUTS.get('submission_list', 30)
     
-    # 檢查快取
-    result = cache_fallback.get_safe(cache_key, fetch_function, cache_timeout)
-    
-    # 記錄監控
-    if result is not None and cache_fallback.get_safe(cache_key) is not None:
-        hit_rate_monitor.record_hit('submission_list')
-    else:
-        hit_rate_monitor.record_miss('submission_list')
+    result = _get_or_fetch('submission_list', cache_key, fetch_function, cache_timeout)
     
     return result or []
 
@@ -155,15 +186,7 @@ def get_high_score_with_cache(
     cache_key = CacheKeys.high_score(problem_id, user_id)
     cache_timeout = settings.CACHE_TIMEOUTS.get('high_score', 600)
     
-    result = cache_fallback.get_safe(cache_key, fetch_function, cache_timeout)
-    
-    # 記錄監控
-    if result is not None and cache_fallback.get_safe(cache_key) is not None:
-        hit_rate_monitor.record_hit('high_score')
-    else:
-        hit_rate_monitor.record_miss('high_score')
-    
-    return result
+    return _get_or_fetch('high_score', cache_key, fetch_function, cache_timeout)
 
 
 def get_permission_with_cache(
@@ -185,13 +208,7 @@ def get_permission_with_cache(
     cache_key = CacheKeys.permission(submission_id, user_id)
     cache_timeout = settings.CACHE_TIMEOUTS.get('permission', 60)
     
-    result = cache_fallback.get_safe(cache_key, check_function, cache_timeout)
-    
-    # 記錄監控
-    if result is not None and cache_fallback.get_safe(cache_key) is not None:
-        hit_rate_monitor.record_hit('permission')
-    else:
-        hit_rate_monitor.record_miss('permission')
+    result = _get_or_fetch('permission', cache_key, check_function, cache_timeout)
     
     return result or {}
 
@@ -0,0 +1,192 @@
+"""
+自訂測試的 Redis 暫存
+
+自訂測試不存資料庫，整個生命週期都記錄在同一筆 Redis JSON 紀錄：
+- submit_custom_test 建立 pending 紀錄
+- submit_selftest_to_sandbox_task 送出後改為 Sandbox 回傳的狀態（queued）
+- CustomTestCallbackAPIView 收到 Sandbox callback 後寫入結果，並 PUBLISH 完成事件
+- get_custom_test_result 只讀 Redis，可選擇訂閱完成事件做 long-poll，不再向 Sandbox 查詢
+
+callback 只帶 Sandbox 的 submission_id，以 index 鍵對應到使用者的紀錄鍵。
+"""
+
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 尚未完成的狀態，其餘狀態（含 Sandbox 判題結果與 failed）都視為已完成
+PENDING_STATUSES = {'pending', 'queued', 'judging', 'running'}
+
+
+def is_finished(test_info: Optional[Dict[str, Any]]) -> bool:
+    return bool(test_info) and test_info.get('status') not in PENDING_STATUSES
+
+
+class CustomTestStore:
+    """自訂測試紀錄的讀寫與完成通知"""
+
+    TTL = 1800          # 30 分鐘
+    RECENT_LIMIT = 10   # 每位使用者保留的最近測試數
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis client，None 則使用 CUSTOM_TEST_REDIS_URL
+        """
+        self._client = client
+
+    @property
+    def redis(self):
+        if self._client is None:
+            self._client = redis.Redis.from_url(settings.CUSTOM_TEST_REDIS_URL, decode_responses=True)
+        return self._client
+
+    # ----- 鍵 -----
+
+    @staticmethod
+    def record_key(user_id, test_id) -> str:
+        return f"custom_test:{user_id}:{test_id}"
+
+    @staticmethod
+    def index_key(sandbox_id) -> str:
+        return f"custom_test:index:{sandbox_id}"
+
+    @staticmethod
+    def recent_key(user_id) -> str:
+        return f"custom_tests:recent:{user_id}"
+
+    @staticmethod
+    def channel(test_id) -> str:
+        return f"custom_test:done:{test_id}"
+
+    # ----- 讀寫 -----
+
+    def create(self, user_id, test_info: Dict[str, Any]):
+        """建立 pending 紀錄、callback 用的 index 與最近測試列表"""
+        test_id = test_info['test_id']
+        key = self.record_key(user_id, test_id)
+        pipe = self.redis.pipeline()
+        pipe.setex(key, self.TTL, json.dumps(test_info))
+        pipe.setex(self.index_key(test_id), self.TTL, key)
+        pipe.lpush(self.recent_key(user_id), test_id)
+        pipe.ltrim(self.recent_key(user_id), 0, self.RECENT_LIMIT - 1)
+        pipe.expire(self.recent_key(user_id), self.TTL)
+        pipe.execute()
+
+    def get(self, user_id, test_id) -> Optional[Dict[str, Any]]:
+        cached = self.redis.get(self.record_key(user_id, test_id))
+        return json.loads(cached) if cached else None
+
+    def _update(self, key: str, mutate: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]):
+        """
+        以 WATCH 樂觀鎖更新紀錄，避免 Celery 任務與 callback 同時寫入時互相覆蓋
+
+        mutate 回傳 None 表示不需寫入
+        """
+        def apply(pipe):
+            cached = pipe.get(key)
+            if not cached:
+                return None
+            test_info = mutate(json.loads(cached))
+            if test_info is None:
+                return None
+            pipe.multi()
+            pipe.setex(key, self.TTL, json.dumps(test_info))
+            return test_info
+
+        return self.redis.transaction(apply, key, value_from_callable=True)
+
+    def mark_submitted(self, user_id, test_id, result: Dict[str, Any], submitted_at: str):
+        """
+        Sandbox 接受測試後記錄其 submission_id 與佇列狀態
+
+        callback 可能比這裡更早寫入結果，已完成的紀錄只補上 submission_id，不改回 queued
+        """
+        key = self.record_key(user_id, test_id)
+        sandbox_id = result['submission_id']
+
+        def mutate(test_info):
+            test_info['submission_id'] = sandbox_id
+            test_info['queue_position'] = result.get('queue_position')
+            test_info['submitted_at'] = submitted_at
+            if not is_finished(test_info):
+                test_info['status'] = result['status']
+            return test_info
+
+        if sandbox_id != test_id:
+            self.redis.setex(self.index_key(sandbox_id), self.TTL, key)
+        return self._update(key, mutate)
+
+    def mark_failed(self, user_id, test_id, error: str, failed_at: str):
+        def mutate(test_info):
+            if is_finished(test_info):
+                return None
+            test_info['status'] = 'failed'
+            test_info['error'] = error
+            test_info['failed_at'] = failed_at
+            return test_info
+
+        test_info = self._update(self.record_key(user_id, test_id), mutate)
+        if test_info is not None:
+            self.redis.publish(self.channel(test_id), 'failed')
+        return test_info
+
+    def complete(self, sandbox_id, result: Dict[str, Any], completed_at: str):
+        """
+        寫入 Sandbox callback 的結果並發布完成事件
+
+        Args:
+            sandbox_id: callback 中的 submission_id
+            result: 要合併進紀錄的結果欄位（須含 status）
+
+        Returns:
+            更新後的紀錄，紀錄不存在或已過期時回傳 None
+        """
+        key = self.redis.get(self.index_key(sandbox_id))
+        if not key:
+            return None
+
+        def mutate(test_info):
+            test_info.update(result)
+            test_info['completed_at'] = completed_at
+            return test_info
+
+        test_info = self._update(key, mutate)
+        if test_info is not None:
+            self.redis.publish(self.channel(test_info['test_id']), test_info['status'])
+        return test_info
+
+    def wait(self, user_id, test_id, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        讀取紀錄，尚未完成時訂閱完成事件最多等待 timeout 秒
+
+        先訂閱再重新讀取一次，避免在兩次讀取之間完成而錯過事件
+        """
+        test_info = self.get(user_id, test_id)
+        if test_info is None or is_finished(test_info) or timeout <= 0:
+            return test_info
+
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self.channel(test_id))
+            test_info = self.get(user_id, test_id)
+            deadline = time.monotonic() + timeout
+            while test_info is not None and not is_finished(test_info):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if pubsub.get_message(timeout=remaining) is not None:
+                    test_info = self.get(user_id, test_id)
+            return test_info
+        finally:
+            pubsub.close()
+
+
+# 全域實例
+custom_test_store = CustomTestStore()
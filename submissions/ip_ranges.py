@@ -0,0 +1,99 @@
+"""
+IP 位址的可排序表示與 CIDR 範圍查詢
+
+GenericIPAddressField 以文字儲存，無法在資料庫中判斷是否落在某個網段內。
+這裡把 IPv4/IPv6 統一轉成 16 bytes（IPv4 使用 IPv4-mapped IPv6 ::ffff:a.b.c.d）
+的 32 字元十六進位字串：字串順序與位址數值順序一致，
+一個 CIDR 網段就是一段連續的 [最小, 最大] 範圍，可直接使用索引做範圍查詢。
+
+提交的 ip_sort_key 與作業的 ip_whitelist 檢查共用這些函式。
+"""
+
+import ipaddress
+
+from django.db.models import Q
+
+# IPv4 映射到 ::ffff:0:0/96，與原生 IPv6 位址不重疊
+_IPV4_MAPPED_PREFIX = 0xFFFF << 32
+
+
+def _to_int(address):
+    """位址轉成 128 位元整數"""
+    if address.version == 4:
+        return _IPV4_MAPPED_PREFIX | int(address)
+    if address.ipv4_mapped is not None:
+        return _IPV4_MAPPED_PREFIX | int(address.ipv4_mapped)
+    return int(address)
+
+
+def _format(value):
+    return f'{value:032x}'
+
+
+def ip_sort_key(ip):
+    """
+    IP 字串轉成可排序的 32 字元十六進位字串
+
+    Returns:
+        str | None: 無效或空白的 IP 回傳 None
+    """
+    if not ip:
+        return None
+    try:
+        return _format(_to_int(ipaddress.ip_address(str(ip).strip())))
+    except ValueError:
+        return None
+
+
+def cidr_key_range(cidr):
+    """
+    CIDR 網段對應的 ip_sort_key 範圍（含兩端）
+
+    Raises:
+        ValueError: 網段格式錯誤
+    """
+    network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+    low = _to_int(network.network_address)
+    return _format(low), _format(low + network.num_addresses - 1)
+
+
+def parse_cidr_list(value):
+    """
+    解析以逗號或換行分隔的多筆 CIDR（作業 ip_whitelist 的格式）
+
+    Raises:
+        ValueError: 任一筆網段格式錯誤
+    """
+    parts = [p.strip() for p in (value or '').replace('\n', ',').split(',')]
+    return [ipaddress.ip_network(p, strict=False) for p in parts if p]
+
+
+def cidr_q(networks, field='ip_sort_key'):
+    """
+    組出「落在任一網段內」的查詢條件，每個網段是一個範圍比較
+
+    Args:
+        networks: CIDR 字串或 ip_network 的列表
+        field: 儲存 ip_sort_key 的欄位名稱
+
+    Returns:
+        Q: 沒有網段時回傳不符合任何資料的條件
+    """
+    condition = None
+    for network in networks:
+        low, high = cidr_key_range(network)
+        in_range = Q(**{f'{field}__gte': low, f'{field}__lte': high})
+        condition = in_range if condition is None else condition | in_range
+    return condition if condition is not None else Q(pk__in=[])
+
+
+def ip_in_networks(ip, networks):
+    """IP 是否落在任一網段內（無效 IP 視為不符合）"""
+    key = ip_sort_key(ip)
+    if key is None:
+        return False
+    for network in networks:
+        low, high = cidr_key_range(network)
+        if low <= key <= high:
+            return True
+    return False
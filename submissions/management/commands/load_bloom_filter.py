@@ -0,0 +1,50 @@
+"""
+載入提交 ID 布隆過濾器 Management Command
+
+將所有 Submission ID 分批串流寫入 Redis 布隆過濾器，完成後標記為可用。
+部署新環境或 Redis 資料遺失時執行一次即可，之後由 signal 增量加入。
+
+使用方式：
+    python manage.py load_bloom_filter
+    python manage.py load_bloom_filter --reset --chunk-size 20000
+"""
+
+from django.core.management.base import BaseCommand
+from submissions.cache.protection import submission_bloom_filter
+from submissions.models import Submission
+
+
+class Command(BaseCommand):
+    help = 'Bulk-load all submission IDs into the Redis bloom filter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Number of IDs streamed from the database and written to Redis per batch'
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Delete the existing filter before loading'
+        )
+
+    def handle(self, *args, **options):
+        bloom = submission_bloom_filter.bloom_filter
+
+        if options['reset']:
+            bloom.clear()
+            self.stdout.write(self.style.WARNING('Existing bloom filter deleted'))
+
+        count = submission_bloom_filter.initialize_from_db(
+            Submission, chunk_size=options['chunk_size']
+        )
+
+        stats = bloom.stats()
+        self.stdout.write(self.style.SUCCESS(f'Loaded {count} submission IDs into bloom filter'))
+        for segment in stats['segments']:
+            self.stdout.write(
+                f"  segment {segment['index']}: {segment['count']}/{segment['capacity']} "
+                f"({segment['bits']} bits)"
+            )
@@ -0,0 +1,56 @@
+"""
+重建作業統計（UserProblemStats）Management Command
+
+Catch-up 模式：Redis 緩衝遺失事件或首次啟用時，整份作業從 Submission 重算
+
+使用方式：
+    python manage.py rebuild_user_problem_stats
+    python manage.py rebuild_user_problem_stats --assignment 12 --assignment 13
+    python manage.py rebuild_user_problem_stats --course 3 --async
+"""
+
+from django.core.management.base import BaseCommand
+from assignments.models import Assignments
+from submissions.problem_stats import rebuild_user_problem_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-assignment user problem stats from submissions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--assignment',
+            type=int,
+            action='append',
+            help='Assignment ID to rebuild (repeatable, default: all)',
+        )
+        parser.add_argument(
+            '--course',
+            type=int,
+            help='Only rebuild assignments of this course',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='run_async',
+            help='Queue the rebuild as a Celery task instead of running inline',
+        )
+    
+    def handle(self, *args, **options):
+        """執行命令"""
+        assignments = Assignments.objects.order_by('id')
+        if options['assignment']:
+            assignments = assignments.filter(id__in=options['assignment'])
+        if options['course']:
+            assignments = assignments.filter(course_id=options['course'])
+        
+        if options['run_async']:
+            from submissions.tasks import rebuild_user_problem_stats_task
+            
+            assignment_ids = list(assignments.values_list('id', flat=True))
+            rebuild_user_problem_stats_task.delay(assignment_ids)
+            self.stdout.write(self.style.SUCCESS(f"Queued rebuild for {len(assignment_ids)} assignments"))
+            return
+        
+        written = rebuild_user_problem_stats(assignments)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} user problem stats rows"))
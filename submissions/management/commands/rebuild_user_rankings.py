@@ -0,0 +1,27 @@
+"""
+重建全域排行榜 Management Command
+
+使用方式：
+    python manage.py rebuild_user_rankings
+    python manage.py rebuild_user_rankings --batch-size 5000
+"""
+
+from django.core.management.base import BaseCommand
+from submissions.ranking import rebuild_user_rankings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed user ranking table from submissions'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows per bulk insert (default: 1000)',
+        )
+    
+    def handle(self, *args, **options):
+        """執行命令"""
+        written = rebuild_user_rankings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} user ranking rows"))
@@ -0,0 +1,90 @@
+"""
+批次重新判題 Management Command
+
+使用方式：
+    python manage.py rejudge_submissions --problem 2001
+    python manage.py rejudge_submissions --assignment 12 --status 1,3 --since 2025-01-01T00:00:00
+    python manage.py rejudge_submissions --problem 2001 --dry-run
+    python manage.py rejudge_submissions --problem 2001 --inline
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from submissions.models import Submission
+from submissions.rejudge import build_rejudge_queryset, create_rejudge_job, dispatch_rejudge_chunk
+
+
+class Command(BaseCommand):
+    help = 'Reset and rejudge submissions selected by problem, assignment, status or time range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, help='Problem ID')
+        parser.add_argument('--assignment', type=int, help='Assignment ID')
+        parser.add_argument('--status', help='Comma separated status codes, e.g. 1,3')
+        parser.add_argument('--since', help='Only submissions created at or after this ISO datetime')
+        parser.add_argument('--until', help='Only submissions created before this ISO datetime')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count matching submissions',
+        )
+        parser.add_argument(
+            '--inline',
+            action='store_true',
+            help='Dispatch chunks from this process instead of the rejudge worker',
+        )
+
+    def parse_datetime_option(self, options, key):
+        value = options[key]
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f'Invalid --{key}: {value}')
+        return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+    def handle(self, *args, **options):
+        """執行命令"""
+        statuses = [s for s in (options['status'] or '').split(',') if s]
+        valid_statuses = {code for code, _ in Submission.STATUS_CHOICES}
+        if any(s not in valid_statuses for s in statuses):
+            raise CommandError(f'Invalid --status: {options["status"]}')
+
+        filters = {
+            'problem_id': options['problem'],
+            'assignment_id': options['assignment'],
+            'statuses': statuses,
+            'since': self.parse_datetime_option(options, 'since'),
+            'until': self.parse_datetime_option(options, 'until'),
+        }
+        if filters['problem_id'] is None and filters['assignment_id'] is None:
+            raise CommandError('--problem or --assignment is required')
+
+        if options['dry_run']:
+            count = build_rejudge_queryset(**filters).count()
+            self.stdout.write(f'{count} submissions would be rejudged')
+            return
+
+        if not options['inline']:
+            job = create_rejudge_job(**filters)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rejudge job {job.id} created for {job.total_submissions} submissions'
+            ))
+            return
+
+        # --inline：不經由 dispatch_rejudge_job_task，由本程序依相同間隔分批送出
+        job = create_rejudge_job(dispatch=False, **filters)
+        self.stdout.write(f'Rejudge job {job.id}: {job.total_submissions} submissions')
+        while dispatch_rejudge_chunk(job.id):
+            job.refresh_from_db()
+            self.stdout.write(f'  dispatched {job.dispatched_submissions}/{job.total_submissions}')
+            time.sleep(settings.REJUDGE_CHUNK_INTERVAL)
+        job.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rejudge job {job.id} {job.status}: {job.dispatched_submissions}/{job.total_submissions}'
+        ))
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-17 07:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_user_rankings(apps, schema_editor):
+    Submission = apps.get_model('submissions', 'Submission')
+    UserRanking = apps.get_model('submissions', 'UserRanking')
+
+    rows = (
+        Submission.objects
+        .order_by()
+        .values('user_id')
+        .annotate(
+            total=Count('id'),
+            ac_total=Count('id', filter=Q(status='0')),
+            ac_problems=Count('problem_id', filter=Q(status='0'), distinct=True),
+        )
+    )
+    UserRanking.objects.bulk_create(
+        (
+            UserRanking(
+                user_id=row['user_id'],
+                submission_count=row['total'],
+                ac_submission_count=row['ac_total'],
+                ac_problem_count=row['ac_problems'],
+            )
+            for row in rows.iterator(chunk_size=1000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0005_alter_submissionresult_options_and_more'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRanking',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ac_problem_count', models.IntegerField(default=0)),
+                ('ac_submission_count', models.IntegerField(default=0)),
+                ('submission_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'user_rankings',
+                'ordering': ['-ac_problem_count', '-ac_submission_count', 'submission_count', 'user_id'],
+                'indexes': [models.Index(fields=['-ac_problem_count', '-ac_submission_count', 'submission_count'], name='user_ranking_order_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_user_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_missing_rankings(apps, schema_editor):
+    """0006 只為有提交的使用者建立排行榜列，補上其餘使用者（與 rebuild_user_rankings 一致）"""
+    User = apps.get_model('user', 'User')
+    UserRanking = apps.get_model('submissions', 'UserRanking')
+
+    missing = User.objects.filter(ranking__isnull=True).order_by().values_list('id', flat=True)
+    UserRanking.objects.bulk_create(
+        (UserRanking(user_id=user_id) for user_id in missing.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0006_user_ranking'),
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_rankings, migrations.RunPython.noop),
+    ]
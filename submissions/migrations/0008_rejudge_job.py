@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:44
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0007_user_ranking_all_users'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RejudgeJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filters', models.JSONField(default=dict)),
+                ('submission_ids', models.JSONField(default=list)),
+                ('status', models.CharField(choices=[('pending', '等待分派'), ('running', '分派中'), ('success', '完成'), ('failed', '失敗')], default='pending', max_length=20)),
+                ('error_message', models.TextField(blank=True)),
+                ('total_submissions', models.IntegerField(default=0)),
+                ('dispatched_submissions', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('requester', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'rejudge_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:53
+
+from django.db import migrations, models, transaction
+
+BACKFILL_CHUNK_SIZE = 2000
+
+
+def backfill_ip_sort_key(apps, schema_editor):
+    """
+    為既有提交計算 ip_sort_key
+
+    依主鍵分段讀取（ip_address 沒有索引，不以 IP 逐一 UPDATE），
+    在 Python 計算後每段以一次 bulk_update 寫入並各自 commit，不會長時間鎖住整張表
+    """
+    from submissions.ip_ranges import ip_sort_key
+
+    Submission = apps.get_model('submissions', 'Submission')
+    pending = Submission.objects.filter(ip_address__isnull=False, ip_sort_key__isnull=True).order_by('pk')
+    last_pk = None
+    while True:
+        chunk = pending if last_pk is None else pending.filter(pk__gt=last_pk)
+        rows = list(chunk.only('pk', 'ip_address')[:BACKFILL_CHUNK_SIZE])
+        if not rows:
+            break
+        last_pk = rows[-1].pk
+        for row in rows:
+            row.ip_sort_key = ip_sort_key(row.ip_address)
+        with transaction.atomic():
+            Submission.objects.bulk_update(
+                [row for row in rows if row.ip_sort_key is not None], ['ip_sort_key'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    # 回填分段 commit
+    atomic = False
+
+    dependencies = [
+        ('submissions', '0009_submission_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='ip_sort_key',
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['ip_sort_key'], name='submissions_ip_sort_3d4148_idx'),
+        ),
+        migrations.RunPython(backfill_ip_sort_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:56
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_solved_counts(apps, schema_editor):
+    """以 UserProblemSolveStatus 計算每位使用者的 fully_solved 題數並建立分布"""
+    UserProblemSolveStatus = apps.get_model('submissions', 'UserProblemSolveStatus')
+    UserRanking = apps.get_model('submissions', 'UserRanking')
+    SolvedCountBucket = apps.get_model('submissions', 'SolvedCountBucket')
+
+    solved = dict(
+        UserProblemSolveStatus.objects.filter(solve_status='fully_solved')
+        .order_by()
+        .values('user_id')
+        .annotate(cnt=Count('id'))
+        .values_list('user_id', 'cnt')
+    )
+    for user_id, solved_count in solved.items():
+        UserRanking.objects.filter(user_id=user_id).update(solved_problem_count=solved_count)
+    SolvedCountBucket.objects.bulk_create(
+        [
+            SolvedCountBucket(solved_count=solved_count, user_count=user_count)
+            for solved_count, user_count in Counter(solved.values()).items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submissions', '0010_submission_ip_sort_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolvedCountBucket',
+            fields=[
+                ('solved_count', models.IntegerField(primary_key=True, serialize=False)),
+                ('user_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'solved_count_buckets',
+                'ordering': ['solved_count'],
+            },
+        ),
+        migrations.AddField(
+            model_name='userranking',
+            name='solved_problem_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_solved_counts, migrations.RunPython.noop),
+    ]
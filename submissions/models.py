@@ -56,6 +56,8 @@ class Submission(models.Model):
 
     # Request info
     ip_address = models.GenericIPAddressField(null=True, blank=True)  # 支援 IPv4/IPv6
+    # ip_address 的可排序形式（見 submissions.ip_ranges），供 CIDR 範圍查詢使用索引
+    ip_sort_key = models.CharField(max_length=32, null=True, blank=True, editable=False)
     user_agent = models.CharField(max_length=500, null=True, blank=True)
 
     # Submission metadata
@@ -78,6 +80,9 @@ class Submission(models.Model):
         indexes = [
             models.Index(fields=['user', 'problem_id', 'created_at']),
             models.Index(fields=['status', 'created_at']),
+            # 提交列表 keyset 分頁的 (created_at, id) 排序
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['ip_sort_key']),
         ]
         
         # 排序
@@ -89,6 +94,16 @@ class Submission(models.Model):
     def __str__(self):
         return f"Submission {self.id} - {self.user.username} - {self.status}"
     
+    def save(self, *args, **kwargs):
+        """同步 ip_sort_key 與 ip_address"""
+        from .ip_ranges import ip_sort_key
+        
+        self.ip_sort_key = ip_sort_key(self.ip_address)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'ip_address' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'ip_sort_key'}
+        super().save(*args, **kwargs)
+    
     @property # 我的判斷是這不能被隨意更新跟刪除
     def is_judged(self):
         """檢查是否已經判題完成"""
@@ -291,6 +306,112 @@ class UserProblemSolveStatus(models.Model):
         return f"Solve Status {self.user.username} - Problem {self.problem_id}"
 
 
+class UserRanking(models.Model):
+    """使用者全域排行榜統計 - 由提交建立與判題 callback 增量維護"""
+
+    # Primary key - 一個使用者一筆
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking'
+    )
+
+    # Statistics（對應 NOJ 的 ACProblem / ACSubmission / Submission）
+    ac_problem_count = models.IntegerField(default=0)
+    ac_submission_count = models.IntegerField(default=0)
+    submission_count = models.IntegerField(default=0)
+    # UserProblemSolveStatus 為 fully_solved 的題數（/stats/user 的 total_solved 與 beats 百分比）
+    solved_problem_count = models.IntegerField(default=0)
+
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-ac_problem_count', '-ac_submission_count', 'submission_count'],
+                name='user_ranking_order_idx'
+            ),
+        ]
+        ordering = ['-ac_problem_count', '-ac_submission_count', 'submission_count', 'user_id']
+        db_table = 'user_rankings'
+
+    def __str__(self):
+        return f"Ranking {self.user_id} - AC {self.ac_problem_count}"
+
+
+class SolvedCountBucket(models.Model):
+    """
+    fully_solved 題數的分布：解了 solved_count 題的使用者共有 user_count 人
+
+    只記錄 solved_count >= 1 的使用者，與 beats 百分比的母數一致
+    """
+
+    solved_count = models.IntegerField(primary_key=True)
+    user_count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['solved_count']
+        db_table = 'solved_count_buckets'
+
+    def __str__(self):
+        return f"Solved {self.solved_count}: {self.user_count} users"
+
+
+class RejudgeJob(models.Model):
+    """
+    批次重新判題工作
+
+    建立時已將符合條件的提交一次重設為 Pending，
+    submission_ids 依序分批送進判題佇列，dispatched_submissions 記錄已送出的數量
+    """
+
+    STATUS_CHOICES = [
+        ('pending', '等待分派'),
+        ('running', '分派中'),
+        ('success', '完成'),
+        ('failed', '失敗'),
+    ]
+
+    # Primary key - UUID
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    requester = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+
+    # 篩選條件（problem_id / assignment_id / status / since / until）
+    filters = models.JSONField(default=dict)
+    submission_ids = models.JSONField(default=list)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    error_message = models.TextField(blank=True)
+
+    # 進度追蹤
+    total_submissions = models.IntegerField(default=0)
+    dispatched_submissions = models.IntegerField(default=0)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        db_table = 'rejudge_jobs'
+
+    @property
+    def progress(self):
+        """回傳已分派百分比 (0-100)"""
+        if self.status == 'success':
+            return 100
+        if not self.total_submissions:
+            return 0
+        return min(100, int(self.dispatched_submissions * 100 / self.total_submissions))
+
+    def __str__(self):
+        return f"RejudgeJob {self.id} - {self.dispatched_submissions}/{self.total_submissions}"
+
+
 class UserProblemQuota(models.Model):
     """使用者題目配額"""
     
@@ -0,0 +1,261 @@
+"""
+UserProblemStats（作業層級的每人每題統計）聚合
+
+HomeworkScoreboardView、HomeworkStatsView 與作業列表的 studentStatus 都讀 UserProblemStats。
+判題 callback 在 commit 後把提交 ID 放進 Redis 緩衝（RPUSH），
+由 Celery 任務 aggregate_user_problem_stats_task 每 flush_delay 秒取出一批（micro-batch）：
+一批內受影響的 (使用者, 題目) 依作業分組，每份作業一次 GROUP BY 從 Submission 重算後 upsert，
+因此重送、重新判題或亂序都會得到相同結果。
+
+Redis 無法使用時事件會遺失，以 catch-up 模式（rebuild_user_problem_stats 指令）整份作業重算補回。
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Min, OuterRef, Q, Subquery, When
+from django_redis import get_redis_connection
+
+from .models import Submission, UserProblemStats
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'user_problem_stats:pending'
+SCHEDULED_KEY = 'user_problem_stats:scheduled'
+
+# 未判題完成的提交不列入統計
+UNJUDGED_STATUSES = ('-1', '-2')
+
+STATS_FIELDS = [
+    'total_submissions', 'best_score', 'max_possible_score', 'best_submission',
+    'first_ac_time', 'last_submission_time', 'solve_status',
+    'best_execution_time', 'best_memory_usage', 'penalty_score', 'is_late',
+]
+
+
+def _effective_score(due_time, late_penalty):
+    """遲交提交的分數乘上 (1 - late_penalty%)，與原 update_user_assignment_stats 相同"""
+    if due_time is None or not late_penalty:
+        return F('score')
+    # late_penalty 最多兩位小數，以整數運算避免 Decimal 與 Integer 混合（整數除法即無條件捨去）
+    keep = 10000 - int(late_penalty * 100)
+    return Case(
+        When(created_at__gt=due_time, then=F('score') * keep / 10000),
+        default=F('score'),
+        output_field=IntegerField(),
+    )
+
+
+def recompute_assignment_stats(assignment, problem_ids=None, user_ids=None):
+    """
+    以一次 GROUP BY 從 Submission 重算作業的 UserProblemStats 並 upsert
+
+    Args:
+        assignment: Assignments 實例
+        problem_ids: 只重算這些題目（須在作業內），None 表示作業內全部題目
+        user_ids: 只重算這些使用者，None 表示所有提交過的使用者
+
+    Returns:
+        寫入的統計筆數
+    """
+    from assignments.models import Assignment_problems
+    from courses.models import Course_members
+
+    weights = dict(
+        Assignment_problems.objects.filter(assignment=assignment).values_list('problem_id', 'weight')
+    )
+    targets = set(weights) if problem_ids is None else set(weights) & set(problem_ids)
+    if not targets:
+        return 0
+
+    due_time = assignment.due_time
+    late_penalty = assignment.late_penalty or Decimal('0')
+    effective = _effective_score(due_time, late_penalty)
+
+    # 只計入課程成員在作業開始後的提交（題目可能是公開題或被多份作業共用）
+    in_scope = Q(user_id__in=Course_members.objects.filter(course_id=assignment.course_id).values('user_id'))
+    if assignment.start_time:
+        in_scope &= Q(created_at__gte=assignment.start_time)
+
+    judged = Submission.objects.filter(in_scope, problem_id__in=targets).exclude(status__in=UNJUDGED_STATUSES)
+    if user_ids is not None:
+        judged = judged.filter(user_id__in=user_ids)
+
+    late_q = Q(created_at__gt=due_time) if due_time else Q(pk__in=[])
+    best_submission = (
+        Submission.objects
+        .filter(in_scope, user_id=OuterRef('user_id'), problem_id=OuterRef('problem_id'))
+        .exclude(status__in=UNJUDGED_STATUSES)
+        .annotate(effective_score=effective)
+        .order_by('-effective_score', 'created_at')
+        .values('id')[:1]
+    )
+    rows = (
+        judged
+        .values('user_id', 'problem_id')
+        .annotate(
+            total=Count('id'),
+            best_score=Max(effective),
+            first_ac_time=Min('judged_at', filter=Q(status='0')),
+            last_submission_time=Max('created_at'),
+            best_execution_time=Min('execution_time', filter=Q(execution_time__gt=0)),
+            best_memory_usage=Min('memory_usage', filter=Q(memory_usage__gt=0)),
+            late_count=Count('id', filter=late_q),
+            best_submission_id=Subquery(best_submission),
+        )
+        .order_by()
+    )
+
+    stats = []
+    for row in rows:
+        weight = weights[row['problem_id']]
+        max_possible = int(weight * 100) if weight else 100
+        best_score = row['best_score'] or 0
+        is_late = row['late_count'] > 0
+        if best_score >= max_possible:
+            solve_status = 'solved'
+        elif best_score > 0:
+            solve_status = 'partial'
+        else:
+            solve_status = 'unsolved'
+        stats.append(UserProblemStats(
+            user_id=row['user_id'],
+            assignment_id=assignment.id,
+            problem_id=row['problem_id'],
+            total_submissions=row['total'],
+            best_score=best_score,
+            max_possible_score=max_possible,
+            best_submission_id=row['best_submission_id'],
+            first_ac_time=row['first_ac_time'],
+            last_submission_time=row['last_submission_time'],
+            solve_status=solve_status,
+            best_execution_time=row['best_execution_time'],
+            best_memory_usage=row['best_memory_usage'],
+            penalty_score=late_penalty if is_late else Decimal('0.00'),
+            is_late=is_late,
+        ))
+
+    UserProblemStats.objects.bulk_create(
+        stats,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['user', 'assignment_id', 'problem_id'],
+        update_fields=STATS_FIELDS + ['updated_at'],
+    )
+    return len(stats)
+
+
+def apply_judged_submissions(submission_ids):
+    """
+    重算一批已判題提交影響到的統計（每份包含這些題目的作業各一次 GROUP BY）
+
+    Returns:
+        寫入的統計筆數
+    """
+    from assignments.models import Assignment_problems, Assignments
+
+    users_by_problem = defaultdict(set)
+    for user_id, problem_id in Submission.objects.filter(id__in=submission_ids).values_list('user_id', 'problem_id'):
+        users_by_problem[problem_id].add(user_id)
+    if not users_by_problem:
+        return 0
+
+    problems_by_assignment = defaultdict(set)
+    for assignment_id, problem_id in Assignment_problems.objects.filter(
+        problem_id__in=users_by_problem
+    ).values_list('assignment_id', 'problem_id'):
+        problems_by_assignment[assignment_id].add(problem_id)
+
+    written = 0
+    for assignment in Assignments.objects.filter(id__in=problems_by_assignment):
+        problem_ids = problems_by_assignment[assignment.id]
+        user_ids = set().union(*(users_by_problem[pid] for pid in problem_ids))
+        written += recompute_assignment_stats(assignment, problem_ids=problem_ids, user_ids=user_ids)
+    return written
+
+
+def rebuild_user_problem_stats(assignments):
+    """
+    Catch-up 模式：整份作業重算（先清除該作業的統計，已不在作業內的題目、
+    已退出課程的使用者與不再計入的提交不會殘留）
+
+    Args:
+        assignments: Assignments 的 iterable
+
+    Returns:
+        寫入的統計筆數
+    """
+    written = 0
+    for assignment in assignments:
+        with transaction.atomic():
+            UserProblemStats.objects.filter(assignment_id=assignment.id).delete()
+            written += recompute_assignment_stats(assignment)
+    return written
+
+
+class UserProblemStatsAggregator:
+    """判題事件的 Redis 緩衝與 micro-batch 消費"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis client，None 則使用 django-redis 的 default 連線
+        """
+        self._client = client
+
+    @property
+    def redis(self):
+        if self._client is None:
+            self._client = get_redis_connection("default")
+        return self._client
+
+    def enqueue(self, submission_id) -> bool:
+        """
+        記錄一筆已判題的提交，必要時排程聚合任務（在 transaction.on_commit 中呼叫）
+
+        Returns:
+            是否成功寫入緩衝；失敗時由 catch-up 模式補回
+        """
+        try:
+            self.redis.rpush(PENDING_KEY, str(submission_id))
+            self.schedule()
+            return True
+        except Exception as e:
+            logger.warning(f'Failed to enqueue stats update for submission {submission_id}: {e}')
+            return False
+
+    def schedule(self, countdown=None):
+        """flush_delay 內只排程一次任務，期間的事件併入同一批"""
+        from .tasks import aggregate_user_problem_stats_task
+
+        delay = settings.USER_PROBLEM_STATS['flush_delay'] if countdown is None else countdown
+        if self.redis.set(SCHEDULED_KEY, 1, nx=True, ex=max(int(delay) * 2, 60)):
+            aggregate_user_problem_stats_task.apply_async(countdown=delay)
+
+    def drain(self):
+        """
+        取出一批提交 ID 並重算
+
+        Returns:
+            (處理的提交數, 緩衝剩餘數)
+        """
+        # 先釋放排程標記：處理期間的新事件會排程下一次任務
+        self.redis.delete(SCHEDULED_KEY)
+        batch = self.redis.lpop(PENDING_KEY, settings.USER_PROBLEM_STATS['batch_size']) or []
+        submission_ids = list(dict.fromkeys(
+            item.decode() if isinstance(item, bytes) else item for item in batch
+        ))
+        if submission_ids:
+            try:
+                apply_judged_submissions(submission_ids)
+            except Exception:
+                # 放回緩衝，由任務重試
+                self.redis.rpush(PENDING_KEY, *submission_ids)
+                raise
+        return len(submission_ids), self.redis.llen(PENDING_KEY)
+
+
+user_problem_stats = UserProblemStatsAggregator()
@@ -0,0 +1,292 @@
+"""
+全域排行榜維護模組
+
+UserRanking 是一張預先計算的統計表，取代 /ranking 每次對所有使用者
+逐一 COUNT 的做法：
+- 使用者建立時（post_save）建立全為 0 的列，與 rebuild 的結果一致
+- 提交建立時（post_save）增加提交數
+- 判題 callback / 重新判題造成 AC 狀態變化時調整 AC 統計
+- 提交刪除時（post_delete）重新計算該使用者的統計
+- 批次重新判題後以 refresh_user_rankings() 整批重新計算受影響的使用者
+- 題目進入 fully_solved 時增加 solved_problem_count，並調整 SolvedCountBucket 題數分布，
+  /stats/user 的 beats 百分比以分布表查詢，不需對 UserProblemSolveStatus 做 GROUP BY
+- rebuild_user_rankings() 以單次聚合查詢從 Submission 重建整張表
+"""
+
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from .models import SolvedCountBucket, Submission, UserProblemSolveStatus, UserRanking
+
+logger = logging.getLogger(__name__)
+
+AC_STATUS = '0'
+SOLVED_STATUS = 'fully_solved'
+
+
+def _lock_ranking_row(user_id):
+    """取得（必要時建立）使用者的排行榜列並加鎖，序列化同一使用者的更新"""
+    UserRanking.objects.get_or_create(user_id=user_id)
+    return UserRanking.objects.select_for_update().get(user_id=user_id)
+
+
+def _has_other_ac(submission):
+    """該使用者在同一題是否還有其他 AC 提交"""
+    return Submission.objects.filter(
+        user_id=submission.user_id,
+        problem_id=submission.problem_id,
+        status=AC_STATUS,
+    ).exclude(id=submission.id).exists()
+
+
+def record_submission_created(submission):
+    """
+    新提交建立後更新排行榜
+
+    Args:
+        submission: 剛建立的 Submission
+    """
+    with transaction.atomic():
+        _lock_ranking_row(submission.user_id)
+
+        updates = {'submission_count': F('submission_count') + 1}
+        if submission.status == AC_STATUS:
+            updates['ac_submission_count'] = F('ac_submission_count') + 1
+            if not _has_other_ac(submission):
+                updates['ac_problem_count'] = F('ac_problem_count') + 1
+
+        UserRanking.objects.filter(user_id=submission.user_id).update(**updates)
+
+
+def record_status_change(submission, old_status):
+    """
+    提交狀態變更後更新排行榜（只有進入或離開 AC 時才需要調整）
+
+    Args:
+        submission: 已寫入新狀態的 Submission
+        old_status: 變更前的狀態碼
+    """
+    was_ac = old_status == AC_STATUS
+    is_ac = submission.status == AC_STATUS
+    if was_ac == is_ac:
+        return
+
+    delta = 1 if is_ac else -1
+
+    with transaction.atomic():
+        _lock_ranking_row(submission.user_id)
+
+        updates = {'ac_submission_count': F('ac_submission_count') + delta}
+        # 同題已有其他 AC 時，AC 題數不變
+        if not _has_other_ac(submission):
+            updates['ac_problem_count'] = F('ac_problem_count') + delta
+
+        UserRanking.objects.filter(user_id=submission.user_id).update(**updates)
+
+    logger.debug(
+        f'Ranking updated for user {submission.user_id}: '
+        f'submission {submission.id} {old_status} -> {submission.status}'
+    )
+
+
+def ensure_user_ranking(user_id):
+    """為使用者建立排行榜列（已存在則不變）"""
+    UserRanking.objects.get_or_create(user_id=user_id)
+
+
+def record_submission_deleted(submission):
+    """
+    提交刪除後以該使用者剩餘的提交重新計算統計
+
+    批次或串聯刪除時，post_delete 在整批 DELETE 之後才送出，
+    無法用「同題是否還有其他 AC」判斷增減，因此直接重新聚合該使用者的提交。
+    只更新既有的列：使用者本身被刪除時不會重建排行榜列。
+
+    Args:
+        submission: 已刪除的 Submission
+    """
+    with transaction.atomic():
+        if not UserRanking.objects.select_for_update().filter(user_id=submission.user_id).exists():
+            return
+
+        stats = Submission.objects.filter(user_id=submission.user_id).aggregate(
+            total=Count('id'),
+            ac_total=Count('id', filter=Q(status=AC_STATUS)),
+            ac_problems=Count('problem_id', filter=Q(status=AC_STATUS), distinct=True),
+        )
+        UserRanking.objects.filter(user_id=submission.user_id).update(
+            submission_count=stats['total'],
+            ac_submission_count=stats['ac_total'],
+            ac_problem_count=stats['ac_problems'],
+        )
+
+
+def refresh_user_rankings(user_ids):
+    """
+    以單次 GROUP BY 重新計算多位使用者的統計
+
+    批次重新判題一次改變大量提交的狀態，逐筆呼叫 record_status_change
+    會對每筆提交各做一次加鎖與查詢，因此改為整批重新聚合。
+    只更新既有的列。
+
+    Args:
+        user_ids: 需要重新計算的使用者 ID
+
+    Returns:
+        int: 更新的排行榜列數
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return 0
+
+    with transaction.atomic():
+        rankings = list(UserRanking.objects.select_for_update().filter(user_id__in=user_ids))
+        stats = {
+            row['user_id']: row
+            for row in Submission.objects.filter(user_id__in=user_ids)
+            .order_by()
+            .values('user_id')
+            .annotate(
+                total=Count('id'),
+                ac_total=Count('id', filter=Q(status=AC_STATUS)),
+                ac_problems=Count('problem_id', filter=Q(status=AC_STATUS), distinct=True),
+            )
+        }
+        for ranking in rankings:
+            row = stats.get(ranking.user_id)
+            ranking.submission_count = row['total'] if row else 0
+            ranking.ac_submission_count = row['ac_total'] if row else 0
+            ranking.ac_problem_count = row['ac_problems'] if row else 0
+        UserRanking.objects.bulk_update(
+            rankings, ['submission_count', 'ac_submission_count', 'ac_problem_count']
+        )
+
+    return len(rankings)
+
+
+def _move_solved_bucket(old_count, new_count):
+    """使用者的 fully_solved 題數由 old_count 變為 new_count 時調整分布（0 題不記錄）"""
+    if old_count == new_count:
+        return
+    # 固定兩次查詢（補建新桶、一次 UPDATE 同時加減），與使用者原本解了幾題無關
+    if new_count > 0:
+        SolvedCountBucket.objects.bulk_create([SolvedCountBucket(solved_count=new_count)], ignore_conflicts=True)
+    SolvedCountBucket.objects.filter(solved_count__in=[old_count, new_count]).update(
+        user_count=F('user_count') + Case(When(solved_count=old_count, then=Value(-1)), default=Value(1))
+    )
+
+
+def record_problem_solved(user_id):
+    """
+    使用者有一題首次進入 fully_solved 後更新解題數與分布
+
+    Args:
+        user_id: 使用者 ID
+    """
+    with transaction.atomic():
+        ranking = _lock_ranking_row(user_id)
+        old_count = ranking.solved_problem_count
+        UserRanking.objects.filter(user_id=user_id).update(solved_problem_count=old_count + 1)
+        _move_solved_bucket(old_count, old_count + 1)
+
+
+def record_user_removed(user_id):
+    """使用者刪除前將其解題數移出分布（排行榜列隨使用者串聯刪除）"""
+    with transaction.atomic():
+        solved_count = (
+            UserRanking.objects.select_for_update()
+            .filter(user_id=user_id)
+            .values_list('solved_problem_count', flat=True)
+            .first()
+        )
+        if solved_count:
+            _move_solved_bucket(solved_count, 0)
+
+
+def solved_beats_percent(solved_count):
+    """
+    解題數少於 solved_count 的使用者佔所有解過題的使用者的百分比
+
+    以 SolvedCountBucket 的主鍵範圍加總，不掃描 UserProblemSolveStatus
+    """
+    totals = SolvedCountBucket.objects.aggregate(
+        total=Sum('user_count'),
+        lower=Sum('user_count', filter=Q(solved_count__lt=solved_count)),
+    )
+    if not totals['total']:
+        return 0.0
+    return (totals['lower'] or 0) / totals['total'] * 100.0
+
+
+def rebuild_user_rankings(batch_size=1000):
+    """
+    從 Submission 與 UserProblemSolveStatus 重建整張排行榜與解題數分布
+
+    所有統計由 GROUP BY 查詢取得，再以 bulk_create 分批寫入。
+
+    Args:
+        batch_size: bulk_create 批次大小
+
+    Returns:
+        int: 寫入的排行榜列數
+    """
+    from user.models import User
+
+    aggregated = (
+        Submission.objects
+        .order_by()
+        .values('user_id')
+        .annotate(
+            total=Count('id'),
+            ac_total=Count('id', filter=Q(status=AC_STATUS)),
+            ac_problems=Count('problem_id', filter=Q(status=AC_STATUS), distinct=True),
+        )
+    )
+    stats = {
+        row['user_id']: row for row in aggregated.iterator(chunk_size=batch_size)
+    }
+    solved = dict(
+        UserProblemSolveStatus.objects.filter(solve_status=SOLVED_STATUS)
+        .order_by()
+        .values('user_id')
+        .annotate(cnt=Count('id'))
+        .values_list('user_id', 'cnt')
+    )
+
+    written = 0
+    with transaction.atomic():
+        UserRanking.objects.all().delete()
+
+        batch = []
+        for user_id in User.objects.order_by().values_list('id', flat=True).iterator(chunk_size=batch_size):
+            row = stats.get(user_id)
+            batch.append(UserRanking(
+                user_id=user_id,
+                submission_count=row['total'] if row else 0,
+                ac_submission_count=row['ac_total'] if row else 0,
+                ac_problem_count=row['ac_problems'] if row else 0,
+                solved_problem_count=solved.get(user_id, 0),
+            ))
+            if len(batch) >= batch_size:
+                UserRanking.objects.bulk_create(batch, batch_size=batch_size)
+                written += len(batch)
+                batch = []
+
+        if batch:
+            UserRanking.objects.bulk_create(batch, batch_size=batch_size)
+            written += len(batch)
+
+        SolvedCountBucket.objects.all().delete()
+        SolvedCountBucket.objects.bulk_create(
+            [
+                SolvedCountBucket(solved_count=solved_count, user_count=user_count)
+                for solved_count, user_count in Counter(solved.values()).items()
+            ],
+            batch_size=batch_size,
+        )
+
+    logger.info(f'Rebuilt user rankings: {written} rows')
+    return written
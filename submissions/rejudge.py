@@ -0,0 +1,177 @@
+"""
+批次重新判題
+
+修正測資後需要重新判題的提交可能有數百筆，逐筆呼叫 /rejudge 會對每筆
+各自 save、刪除結果並送出任務。這裡改為：
+- 一次 DELETE 清除所有 SubmissionResult、一次 UPDATE 重設所有提交
+- 建立 RejudgeJob 記錄要送出的提交與進度
+- 交易提交後由 dispatch_rejudge_job_task 分批送進 REJUDGE_QUEUE
+"""
+
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from assignments.student_status import refresh_student_statuses
+from problems.services.counters import problem_counters
+from .models import RejudgeJob, Submission, SubmissionResult
+from .ranking import AC_STATUS, refresh_user_rankings
+
+logger = logging.getLogger(__name__)
+
+# 沒有程式碼的提交無法重新判題
+NO_CODE_STATUS = '-2'
+
+
+def build_rejudge_queryset(problem_id=None, assignment_id=None, statuses=None, since=None, until=None):
+    """
+    依篩選條件選出要重新判題的提交
+
+    至少需要指定題目或作業，避免誤將整個系統的提交重新判題
+
+    Args:
+        problem_id: 題目 ID
+        assignment_id: 作業 ID（作業中所有題目的提交）
+        statuses: 只選這些狀態碼
+        since: created_at 下限（含）
+        until: created_at 上限（不含）
+
+    Returns:
+        QuerySet: 符合條件的 Submission
+    """
+    from assignments.models import Assignment_problems
+
+    if problem_id is None and assignment_id is None:
+        raise ValueError('problem_id or assignment_id is required')
+
+    queryset = Submission.objects.exclude(status=NO_CODE_STATUS).filter(is_custom_test=False)
+    if problem_id is not None:
+        queryset = queryset.filter(problem_id=problem_id)
+    if assignment_id is not None:
+        queryset = queryset.filter(problem_id__in=Assignment_problems.objects.filter(
+            assignment_id=assignment_id,
+        ).values('problem_id'))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def create_rejudge_job(requester=None, problem_id=None, assignment_id=None, statuses=None,
+                       since=None, until=None, dispatch=True):
+    """
+    重設符合條件的提交並建立批次重新判題工作
+
+    交易提交後才清除快取並開始分派，確保 worker 讀到已重設的狀態；
+    dispatch=False 時由呼叫端自行以 dispatch_rejudge_chunk 分派
+
+    Returns:
+        RejudgeJob: 建立的工作
+    """
+    from .cache.signals import invalidate_bulk_submission_caches
+    from .tasks import dispatch_rejudge_job_task
+
+    queryset = build_rejudge_queryset(problem_id, assignment_id, statuses, since, until)
+    filters = {
+        'problem_id': problem_id,
+        'assignment_id': assignment_id,
+        'status': list(statuses or []),
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+    }
+
+    with transaction.atomic():
+        rows = list(
+            queryset.select_for_update()
+            .order_by('created_at', 'id')
+            .values_list('id', 'user_id', 'problem_id', 'status')
+        )
+        ids = [row[0] for row in rows]
+
+        # 篩選條件可能包含 status，必須在 UPDATE 改變狀態前以子查詢刪除結果
+        SubmissionResult.objects.filter(submission_id__in=queryset.values('id')).delete()
+        queryset.update(
+            status='-1', score=0, execution_time=-1, memory_usage=-1, judged_at=None,
+        )
+
+        job = RejudgeJob.objects.create(
+            requester=requester,
+            filters=filters,
+            submission_ids=[str(submission_id) for submission_id in ids],
+            total_submissions=len(ids),
+            status='pending' if ids else 'success',
+            finished_at=None if ids else timezone.now(),
+        )
+
+        # 原本 AC 的提交重設為 Pending 後，排行榜需扣除
+        refresh_user_rankings({user_id for _, user_id, _, old in rows if old == AC_STATUS})
+        accepted_by_problem = Counter(problem for _, _, problem, old in rows if old == AC_STATUS)
+        transaction.on_commit(lambda: problem_counters.record_rejudge_reset(accepted_by_problem))
+        # 作業 studentStatus 摘要改為 pending
+        reset_pairs = {(user_id, problem) for _, user_id, problem, _ in rows}
+        transaction.on_commit(lambda: refresh_student_statuses(reset_pairs))
+
+        entries = [(user_id, problem, submission_id) for submission_id, user_id, problem, _ in rows]
+        transaction.on_commit(lambda: invalidate_bulk_submission_caches(entries))
+        if ids and dispatch:
+            transaction.on_commit(lambda: dispatch_rejudge_job_task.delay(str(job.id)))
+
+    logger.info(f'Rejudge job {job.id} created: {len(ids)} submissions, filters={filters}')
+    return job
+
+
+def dispatch_rejudge_chunk(job_id, chunk_size=None):
+    """
+    送出工作的下一批提交
+
+    Args:
+        job_id: RejudgeJob ID
+        chunk_size: 每批數量，預設 settings.REJUDGE_CHUNK_SIZE
+
+    Returns:
+        bool: 是否還有尚未送出的提交
+    """
+    from .tasks import enqueue_rejudge
+
+    chunk_size = chunk_size or settings.REJUDGE_CHUNK_SIZE
+
+    with transaction.atomic():
+        try:
+            job = RejudgeJob.objects.select_for_update().get(id=job_id)
+        except RejudgeJob.DoesNotExist:
+            logger.error(f'Rejudge job not found: {job_id}')
+            return False
+        if job.status in ('success', 'failed'):
+            return False
+
+        start = job.dispatched_submissions
+        chunk = job.submission_ids[start:start + chunk_size]
+        sent = 0
+        try:
+            for submission_id in chunk:
+                enqueue_rejudge(submission_id)
+                sent += 1
+        except Exception as e:
+            logger.error(f'Failed to dispatch rejudge job {job_id}: {e}')
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.finished_at = timezone.now()
+
+        job.dispatched_submissions = start + sent
+        if job.status != 'failed':
+            if job.dispatched_submissions >= job.total_submissions:
+                job.status = 'success'
+                job.finished_at = timezone.now()
+            else:
+                job.status = 'running'
+        job.save(update_fields=[
+            'status', 'error_message', 'dispatched_submissions', 'finished_at', 'updated_at',
+        ])
+
+    return job.status == 'running'
@@ -4,10 +4,15 @@ Sandbox API Client
 封裝與 Sandbox 判題系統的 API 互動邏輯
 """
 
+import os
+import threading
 import requests
 import logging
+from collections import OrderedDict
 from io import BytesIO
 from django.conf import settings
+from django.db.models import Count, Max
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +20,50 @@ logger = logging.getLogger(__name__)
 SANDBOX_API_URL = getattr(settings, 'SANDBOX_API_URL', 'http://34.81.90.111:8000')
 SANDBOX_TIMEOUT = getattr(settings, 'SANDBOX_TIMEOUT', 30)  # 30 秒超時
 SANDBOX_API_KEY = getattr(settings, 'SANDBOX_API_KEY', '')  # API Key
+SANDBOX_POOL_MAXSIZE = getattr(settings, 'SANDBOX_POOL_MAXSIZE', 10)  # 每個程序保留的 keep-alive 連線數
+JUDGE_CONFIG_CACHE_SIZE = getattr(settings, 'JUDGE_CONFIG_CACHE_SIZE', 512)  # 程序內快取的題目判題設定數
+
+# 未設定子題時的預設限制
+DEFAULT_TIME_LIMIT = 1.0  # 秒
+DEFAULT_MEMORY_LIMIT = 262144  # 256 MB = 256 * 1024 KB
+
+
+# ===== 連線池 =====
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    取得程序共用的 requests.Session
+
+    Session 以 keep-alive 連線池重用 TCP/TLS 連線，同一個 worker 連續派送提交不必重新握手。
+    Celery prefork 子程序 fork 後 pid 改變，會重建自己的 Session，避免與父程序共用 socket。
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=SANDBOX_POOL_MAXSIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                if SANDBOX_API_KEY:
+                    session.headers['X-API-KEY'] = SANDBOX_API_KEY
+                else:
+                    logger.warning('SANDBOX_API_KEY is not set!')
+                _session = session
+                _session_pid = pid
+    return _session
+
+
+# ===== 判題設定快取 =====
+
+_judge_configs = OrderedDict()  # problem_id -> (version, config)
+_judge_configs_lock = threading.Lock()
 
 
 def convert_language_code(language_type):
@@ -106,6 +155,95 @@ def build_network_config(problem):
     return config
 
 
+def _judge_config_version(problem_id):
+    """
+    判題設定的版本：(updated_at, testcase_hash, 子題最後更新時間, 子題數)
+
+    子題的時間/記憶體限制不會更新 Problems.updated_at，因此一併納入；單次查詢取得
+    """
+    from problems.models import Problems
+
+    row = (
+        Problems.objects.filter(id=problem_id)
+        .annotate(subtasks_updated_at=Max('subtasks__updated_at'), subtask_count=Count('subtasks'))
+        .values_list('updated_at', 'testcase_hash', 'subtasks_updated_at', 'subtask_count')
+        .first()
+    )
+    if row is None:
+        raise Problems.DoesNotExist(f'Problem {problem_id} not found')
+    return row
+
+
+def build_judge_config(problem):
+    """
+    組出題目層級、與提交無關的判題參數
+
+    Returns:
+        dict: problem_hash、時間/記憶體限制、checker、靜態分析與網路設定
+    """
+    # 時間和記憶體限制（從第一個 subtask，如果沒有就用預設值）
+    subtask = problem.subtasks.order_by('id').first()
+    if subtask and subtask.time_limit_ms:
+        time_limit = subtask.time_limit_ms / 1000.0  # 轉換成秒
+    else:
+        time_limit = DEFAULT_TIME_LIMIT
+
+    if subtask and subtask.memory_limit_mb:
+        memory_limit = subtask.memory_limit_mb * 1024  # 轉換成 KB
+    else:
+        memory_limit = DEFAULT_MEMORY_LIMIT
+
+    config = {
+        # 測資包 hash（若無則使用 problem_id 作為 fallback）
+        'problem_hash': problem.testcase_hash or f'p{problem.id}',
+        'time_limit': time_limit,
+        'memory_limit': memory_limit,
+        # 只有在啟用自訂 checker 時才使用設定的 checker_name，否則強制使用 'diff'
+        'use_checker': problem.use_custom_checker,
+        'checker_name': problem.checker_name if problem.use_custom_checker else 'diff',
+        'use_static_analysis': problem.use_static_analysis,
+    }
+    # 靜態分析設定（從 problem.static_analysis_rules 和 forbidden_functions 組合）
+    config.update(build_static_analysis_config(problem))
+    # 網路設定（從 problem.allowed_network）
+    config.update(build_network_config(problem))
+    return config
+
+
+def get_judge_config(problem_id):
+    """
+    取得題目的判題設定（程序內 LRU 快取）
+
+    以 (problem_id, updated_at, testcase_hash, 子題版本) 判斷是否過期：
+    命中時只需一次輕量查詢，不必載入題目與子題；題目或測資更新後自動重建。
+
+    Raises:
+        Problems.DoesNotExist: 題目不存在
+    """
+    from problems.models import Problems
+
+    version = _judge_config_version(problem_id)
+    with _judge_configs_lock:
+        cached = _judge_configs.get(problem_id)
+        if cached is not None and cached[0] == version:
+            _judge_configs.move_to_end(problem_id)
+            return dict(cached[1])
+
+    problem = Problems.objects.get(id=problem_id)
+    config = build_judge_config(problem)
+    with _judge_configs_lock:
+        _judge_configs[problem_id] = (version, config)
+        _judge_configs.move_to_end(problem_id)
+        while len(_judge_configs) > JUDGE_CONFIG_CACHE_SIZE:
+            _judge_configs.popitem(last=False)
+    return dict(config)
+
+
+def clear_judge_config_cache():
+    with _judge_configs_lock:
+        _judge_configs.clear()
+
+
 def submit_to_sandbox(submission):
     """
     將 submission 提交到 Sandbox 進行判題
@@ -119,88 +257,48 @@ def submit_to_sandbox(submission):
     Raises:
         requests.RequestException: API 請求失敗
     """
-    from problems.models import Problems, Problem_subtasks
-    
+    from problems.models import Problems
+
     try:
-        # 1. 取得 Problem 資訊
-        problem = Problems.objects.select_related('course_id').get(id=submission.problem_id)
-        
-        # 2. 取得時間和記憶體限制（從第一個 subtask，如果沒有就用預設值）
-        subtask = problem.subtasks.first()
-        if subtask and subtask.time_limit_ms:
-            time_limit = subtask.time_limit_ms / 1000.0  # 轉換成秒
-        else:
-            time_limit = 1.0  # 預設 1 秒
-            
-        if subtask and subtask.memory_limit_mb:
-            memory_limit = subtask.memory_limit_mb * 1024  # 轉換成 KB
-        else:
-            memory_limit = 262144  # 預設 256 MB = 256 * 1024 KB
-        
-        # 3. 轉換語言代碼
+        # 1. 取得題目判題設定（時間/記憶體限制、測資 hash、checker、靜態分析、網路）
+        judge_config = get_judge_config(submission.problem_id)
+
+        # 2. 轉換語言代碼
         language = convert_language_code(submission.language_type)
-        
-        # 4. 取得測資包 hash（若無則使用 problem_id 作為 fallback）
-        problem_hash = problem.testcase_hash or f'p{submission.problem_id}'
-        
-        # 5. 組裝 payload（multipart/form-data）
+
+        # 3. 組裝 payload（multipart/form-data）
         data = {
             'submission_id': str(submission.id),
             'problem_id': str(submission.problem_id),
-            'problem_hash': problem_hash,
             'mode': 'normal',  # 目前只支援 single file
             'language': language,
             'file_hash': submission.code_hash,
-            'time_limit': time_limit,
-            'memory_limit': memory_limit,
-            # 只有在啟用自訂 checker 時才使用設定的 checker_name，否則強制使用 'diff'
-            'use_checker': problem.use_custom_checker,
-            'checker_name': problem.checker_name if problem.use_custom_checker else 'diff',
-            'use_static_analysis': problem.use_static_analysis,
             'priority': 0,  # 一般優先級
             'callback_url': settings.BACKEND_BASE_URL.rstrip('/'),  # Sandbox 判題完成後回傳結果的 URL（注意：是 submission 不是 submissions）
         }
-        
-        # 6. 靜態分析設定（從 problem.static_analysis_rules 和 forbidden_functions 組合）
-        static_analysis_config = build_static_analysis_config(problem)
-        data.update(static_analysis_config)
-        
-        # 7. 網路設定（從 problem.allowed_network）
-        network_config = build_network_config(problem)
-        data.update(network_config)
-        
-        # 8. 準備檔案
+        data.update(judge_config)
+
+        # 4. 準備檔案
         filename = f'solution.{get_file_extension(language)}'
         file_content = submission.source_code.encode('utf-8')
         files = {
             'file': (filename, BytesIO(file_content), 'text/plain')
         }
         
-        # 9. 發送請求
+        # 5. 發送請求（共用連線池，認證 header 已設定在 Session 上）
         url = f'{SANDBOX_API_URL}/api/v1/submissions'
         logger.info(f'Submitting to Sandbox: submission_id={submission.id}, problem_id={submission.problem_id}')
-        
-        # 準備 headers（包含認證）
-        headers = {}
-        if SANDBOX_API_KEY:
-            headers['X-API-KEY'] = SANDBOX_API_KEY
-            logger.info(f'Using API Key: {SANDBOX_API_KEY[:10]}...')  # 只顯示前 10 個字元
-        else:
-            logger.warning('SANDBOX_API_KEY is not set!')
-        
         logger.debug(f'Request URL: {url}')
         logger.debug(f'Request data: {data}')
-        logger.debug(f'Request headers: {headers}')
-        
-        response = requests.post(
+
+        response = get_session().post(
             url,
             data=data,
             files=files,
-            headers=headers,
             timeout=SANDBOX_TIMEOUT
         )
         
-        # 10. 檢查回應
+        # 6. 檢查回應
         logger.info(f'Sandbox response status: {response.status_code}')
         if response.status_code >= 400:
             logger.error(f'Sandbox error response: {response.text}')
@@ -223,7 +321,7 @@ def submit_to_sandbox(submission):
         raise
 
 
-def submit_selftest_to_sandbox(problem_id, language_type, source_code, stdin_data):
+def submit_selftest_to_sandbox(problem_id, language_type, source_code, stdin_data, test_id=None):
     """
     提交自定義測試到 Sandbox
     使用 /api/v1/selftest-submissions 端點
@@ -233,6 +331,7 @@ def submit_selftest_to_sandbox(problem_id, language_type, source_code, stdin_dat
         language_type: 語言類型（0=C, 1=C++, 2=Python, 3=Java, 4=JavaScript）
         source_code: 程式碼
         stdin_data: 標準輸入資料
+        test_id: 後端的自訂測試 ID，作為 Sandbox 的 submission_id（callback 以此對應紀錄）
     
     Returns:
         dict: Sandbox 回應，包含 submission_id 和 status
@@ -242,15 +341,15 @@ def submit_selftest_to_sandbox(problem_id, language_type, source_code, stdin_dat
     from problems.models import Problems
     
     try:
-        # 取得題目資訊（用於靜態分析設定）
+        # 取得題目判題設定（用於靜態分析與網路設定）
         try:
-            problem = Problems.objects.get(id=problem_id)
+            judge_config = get_judge_config(problem_id)
         except Problems.DoesNotExist:
             logger.error(f'Problem {problem_id} not found for selftest')
             return None
         
         # 產生臨時 ID（不存 DB，只用於追蹤）
-        temp_id = f"selftest-{uuid.uuid4()}"
+        temp_id = test_id or f"selftest-{uuid.uuid4()}"
         
         # 轉換語言代碼
         language = convert_language_code(language_type)
@@ -272,18 +371,15 @@ def submit_selftest_to_sandbox(problem_id, language_type, source_code, stdin_dat
             'memory_limit': 262144,  # 256 MB
             'use_checker': False,
             'checker_name': 'diff',
-            'use_static_analysis': problem.use_static_analysis,
+            'use_static_analysis': judge_config['use_static_analysis'],
             'priority': -1,  # 低優先級（自定義測試不影響正式提交）
             'callback_url': settings.BACKEND_BASE_URL.rstrip('/'),  # Custom test callback URL
         }
         
-        # 靜態分析設定（從 problem.static_analysis_rules 和 forbidden_functions 組合）
-        static_analysis_config = build_static_analysis_config(problem)
-        data.update(static_analysis_config)
-        
-        # 網路設定（從 problem.allowed_network）
-        network_config = build_network_config(problem)
-        data.update(network_config)
+        # 靜態分析與網路設定（自定義測試沿用題目設定，但不使用 checker 與題目的時間限制）
+        for key in ('static_analysis_config', 'forbidden_functions', 'allow_network', 'network_whitelist'):
+            if key in judge_config:
+                data[key] = judge_config[key]
         
         # 準備檔案
         filename = f'solution.{get_file_extension(language)}'
@@ -291,20 +387,14 @@ def submit_selftest_to_sandbox(problem_id, language_type, source_code, stdin_dat
             'file': (filename, BytesIO(file_content), 'text/plain')
         }
         
-        # 準備認證 header
-        headers = {}
-        if SANDBOX_API_KEY:
-            headers['X-API-KEY'] = SANDBOX_API_KEY
-        
-        # 發送到 selftest 端點
+        # 發送到 selftest 端點（共用連線池）
         url = f'{SANDBOX_API_URL}/api/v1/selftest-submissions'
         logger.info(f'Submitting selftest: temp_id={temp_id}, problem_id={problem_id}, language={language}')
         
-        response = requests.post(
+        response = get_session().post(
             url,
             data=data,
             files=files,
-            headers=headers,
             timeout=SANDBOX_TIMEOUT
         )
         
@@ -131,8 +131,8 @@ class SubmissionCreateSerializer(serializers.ModelSerializer):
         submission = super().create(validated_data)
         
         # 觸發 Celery 任務送到 Sandbox
-        from .tasks import submit_to_sandbox_task
-        submit_to_sandbox_task.delay(str(submission.id))
+        from .tasks import enqueue_submission
+        enqueue_submission(submission)
         logger.info(f'Queued submission {submission.id} for Sandbox judging')
         
         return submission
@@ -454,11 +454,11 @@ class SubmissionCodeUploadSerializer(serializers.ModelSerializer):
         
         使用 Celery 異步任務，避免阻塞 API 回應
         """
-        from .tasks import submit_to_sandbox_task
+        from .tasks import enqueue_submission
         
         try:
             # 異步提交到 Sandbox（立即返回，不等待結果）
-            submit_to_sandbox_task.delay(str(submission.id))
+            enqueue_submission(submission)
             
             import logging
             logger = logging.getLogger(__name__)
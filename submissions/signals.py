@@ -0,0 +1,66 @@
+"""
+Submission 統計維護 Signal Handlers
+
+提交建立、刪除與使用者建立後同步更新預先計算的統計表
+"""
+
+import logging
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from assignments.student_status import schedule_student_status_refresh
+from submissions.models import Submission
+from submissions.ranking import (
+    ensure_user_ranking, record_submission_created, record_submission_deleted, record_user_removed,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Submission)
+def on_submission_created_update_ranking(sender, instance, created, **kwargs):
+    """提交建立後更新使用者排行榜統計"""
+    if not created:
+        return
+
+    try:
+        record_submission_created(instance)
+    except Exception as e:
+        # 排行榜可由 rebuild_user_rankings 重建，不阻擋提交建立
+        logger.error(f"Error updating ranking for submission {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Submission)
+def on_submission_deleted_update_ranking(sender, instance, **kwargs):
+    """提交刪除後（含使用者刪除的串聯刪除）重新計算使用者排行榜統計"""
+    try:
+        record_submission_deleted(instance)
+    except Exception as e:
+        logger.error(f"Error updating ranking after deleting submission {instance.id}: {e}")
+
+
+@receiver(post_delete, sender=Submission)
+def on_submission_deleted_refresh_student_status(sender, instance, **kwargs):
+    """提交刪除後從作業 studentStatus 摘要移除（commit 後重算）"""
+    schedule_student_status_refresh(instance.user_id, instance.problem_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def on_user_created_create_ranking(sender, instance, created, **kwargs):
+    """新使用者建立排行榜列，與 rebuild_user_rankings 一樣包含沒有提交的使用者"""
+    if not created:
+        return
+
+    try:
+        ensure_user_ranking(instance.pk)
+    except Exception as e:
+        logger.error(f"Error creating ranking row for user {instance.pk}: {e}")
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def on_user_deleted_update_solved_histogram(sender, instance, **kwargs):
+    """使用者刪除前將其解題數移出 beats 百分比的分布（排行榜列會被串聯刪除）"""
+    try:
+        record_user_removed(instance.pk)
+    except Exception as e:
+        logger.error(f"Error updating solved histogram for deleted user {instance.pk}: {e}")
@@ -0,0 +1,284 @@
+"""
+判題狀態推播
+
+SubmissionCallbackAPIView 在交易 commit 後把狀態 PUBLISH 到 Redis 的 submission_status 頻道，
+ASGI 的 SSE 端點（/submission/stream/、/submission/<id>/stream/）把事件推給客戶端，
+取代客戶端反覆 GET /submission/<id>/ 輪詢。
+
+分送採有界設計：
+- 每個 process（event loop）只有一條 Redis 訂閱連線，由 SubmissionStatusHub 依 user_id 分送
+- 每個 process 的連線數與每位使用者的連線數有上限，超過時回 503，客戶端退回輪詢
+- 每條連線的事件佇列有上限，慢速客戶端只會丟掉舊事件，不會拖慢其他連線
+- 沒有任何連線時關閉訂閱，不佔用 Redis 連線
+- 新連線等 Redis 確認訂閱後才讀取提交目前狀態，確認之後的事件都會收到
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+STATUS_CHANNEL = 'submission_status'
+PENDING_STATUS = '-1'
+
+_publisher = None
+
+
+def submission_status_event(submission) -> dict:
+    """callback 寫入後推播的欄位"""
+    return {
+        'submission_id': str(submission.id),
+        'user_id': str(submission.user_id),
+        'problem_id': submission.problem_id,
+        'status': submission.status,
+        'score': submission.score,
+        'execution_time': submission.execution_time,
+        'memory_usage': submission.memory_usage,
+        'judged_at': submission.judged_at.isoformat() if submission.judged_at else None,
+    }
+
+
+def publish_submission_status(event: dict):
+    """
+    發布判題狀態事件（在 transaction.on_commit 中呼叫）
+
+    推播失敗不影響 callback，客戶端仍可輪詢取得結果
+    """
+    global _publisher
+    try:
+        if _publisher is None:
+            _publisher = redis.Redis.from_url(settings.SUBMISSION_STREAM_REDIS_URL)
+        _publisher.publish(STATUS_CHANNEL, json.dumps(event))
+    except Exception as e:
+        logger.warning(f"Failed to publish status for submission {event.get('submission_id')}: {e}")
+
+
+async def redis_status_messages(on_subscribed: Callable[[], None]) -> AsyncIterator[str]:
+    """
+    訂閱 submission_status 頻道，逐筆產生訊息內容
+
+    Args:
+        on_subscribed: 收到 Redis 的 subscribe 確認時呼叫，之後發布的事件都會收到
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(settings.SUBMISSION_STREAM_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        await pubsub.subscribe(STATUS_CHANNEL)
+        async for message in pubsub.listen():
+            if message.get('type') == 'subscribe':
+                on_subscribed()
+            elif message.get('type') == 'message':
+                yield message['data']
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+class StreamFull(Exception):
+    """連線數已達上限"""
+
+
+class StreamUnavailable(Exception):
+    """Redis 訂閱未在期限內確認"""
+
+
+class StatusSubscription:
+    """一條串流連線：訂閱某位使用者的所有提交，或其中一筆提交"""
+
+    def __init__(self, user_id, submission_id=None, queue_size=16, viewer_id=None):
+        self.user_id = str(user_id)
+        self.submission_id = str(submission_id) if submission_id else None
+        # 開啟連線的使用者（老師/助教可訂閱學生的提交），連線上限依此計算
+        self.viewer_id = str(viewer_id) if viewer_id is not None else self.user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, event: dict) -> bool:
+        return self.submission_id is None or event.get('submission_id') == self.submission_id
+
+    def push(self, event: dict):
+        # 佇列滿時丟棄最舊的事件：客戶端只需要最新狀態
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class SubmissionStatusHub:
+    """
+    單一 event loop 內的事件分送
+
+    Redis 事件依 user_id 找到該使用者的連線，分送成本與線上連線總數無關
+    """
+
+    RECONNECT_DELAY = 1.0
+
+    def __init__(
+        self,
+        source: Optional[Callable[[], AsyncIterator[str]]] = None,
+        max_clients: Optional[int] = None,
+        max_per_user: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            source: 產生原始訊息的 async iterator 工廠（參數為訂閱確認的 callback），None 則訂閱 Redis
+            max_clients: 連線總數上限
+            max_per_user: 每位使用者的連線上限
+            queue_size: 每條連線的事件佇列大小
+        """
+        config = settings.SUBMISSION_STREAM
+        self.source = source or redis_status_messages
+        self.max_clients = max_clients if max_clients is not None else config['max_clients']
+        self.max_per_user = max_per_user if max_per_user is not None else config['max_per_user']
+        self.queue_size = queue_size if queue_size is not None else config['queue_size']
+        self.subscribers: Dict[str, Set[StatusSubscription]] = {}
+        self.viewer_counts: Dict[str, int] = {}
+        self.client_count = 0
+        self._listener: Optional[asyncio.Task] = None
+        # 目前的訂閱已由 Redis 確認；斷線重連期間清除
+        self._subscribed = asyncio.Event()
+
+    def subscribe(self, user_id, submission_id=None, viewer_id=None) -> StatusSubscription:
+        """
+        Args:
+            user_id: 提交者（事件依此分送）
+            submission_id: 只訂閱單筆提交時指定
+            viewer_id: 開啟連線的使用者，預設為提交者本人
+
+        Raises:
+            StreamFull: 超過總連線或單一使用者的連線上限
+        """
+        subscription = StatusSubscription(user_id, submission_id, self.queue_size, viewer_id)
+        if (
+            self.client_count >= self.max_clients
+            or self.viewer_counts.get(subscription.viewer_id, 0) >= self.max_per_user
+        ):
+            raise StreamFull()
+
+        self.subscribers.setdefault(subscription.user_id, set()).add(subscription)
+        self.viewer_counts[subscription.viewer_id] = self.viewer_counts.get(subscription.viewer_id, 0) + 1
+        self.client_count += 1
+
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription):
+        user_subs = self.subscribers.get(subscription.user_id)
+        if not user_subs or subscription not in user_subs:
+            return
+        user_subs.discard(subscription)
+        if not user_subs:
+            del self.subscribers[subscription.user_id]
+        self.viewer_counts[subscription.viewer_id] -= 1
+        if not self.viewer_counts[subscription.viewer_id]:
+            del self.viewer_counts[subscription.viewer_id]
+        self.client_count -= 1
+
+        if self.client_count == 0 and self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+            self._subscribed.clear()
+
+    async def wait_subscribed(self, timeout: float):
+        """
+        等待 Redis 確認訂閱；確認前發布的事件不會送到連線，讀取目前狀態須在此之後
+
+        Raises:
+            StreamUnavailable: 逾時仍未確認（Redis 無法連線）
+        """
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise StreamUnavailable()
+
+    def dispatch(self, event: dict) -> int:
+        """把事件交給該使用者的相符連線，回傳收到的連線數"""
+        delivered = 0
+        for subscription in self.subscribers.get(str(event.get('user_id')), ()):
+            if subscription.matches(event):
+                subscription.push(event)
+                delivered += 1
+        return delivered
+
+    async def _listen(self):
+        while True:
+            try:
+                async for raw in self.source(self._subscribed.set):
+                    try:
+                        event = json.loads(raw)
+                    except (TypeError, ValueError):
+                        logger.warning(f"Invalid submission status message: {raw!r}")
+                        continue
+                    self.dispatch(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Submission status subscription failed: {e}, reconnecting")
+            self._subscribed.clear()
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, SubmissionStatusHub]" = weakref.WeakKeyDictionary()
+
+
+def get_status_hub() -> SubmissionStatusHub:
+    """目前 event loop 的 hub（ASGI 下每個 process 一個）"""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = SubmissionStatusHub()
+    return hub
+
+
+def format_sse(event: dict, name: str = 'status') -> str:
+    payload = {k: v for k, v in event.items() if k != 'user_id'}
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def stream_status_events(hub, subscription, initial_events=(), close_on_final=False):
+    """
+    SSE 內容產生器
+
+    Args:
+        hub: 取消訂閱用的 SubmissionStatusHub
+        subscription: 已建立的訂閱
+        initial_events: 訂閱後先送出的事件（目前狀態），避免訂閱前剛完成而漏掉
+        close_on_final: 單筆提交的串流在收到最終狀態後結束
+    """
+    config = settings.SUBMISSION_STREAM
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config['max_duration']
+    try:
+        yield "retry: 3000\n\n"
+        for event in initial_events:
+            yield format_sse(event)
+            if close_on_final and event['status'] != PENDING_STATUS:
+                return
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), timeout=min(config['heartbeat'], remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            yield format_sse(event)
+            if close_on_final and event['status'] != PENDING_STATUS:
+                return
+    finally:
+        hub.unsubscribe(subscription)
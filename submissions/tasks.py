@@ -5,12 +5,61 @@ Submissions 異步任務
 """
 
 import logging
+from datetime import timedelta
+
 from celery import shared_task
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
 
+def judge_priority(submission, rejudge=False):
+    """
+    決定判題任務的 Celery 優先級（數字越小越優先）
+
+    題目屬於即將截止（JUDGE_DEADLINE_WINDOW 內）的進行中作業時，提交可插隊；
+    重新判題一律使用較低的優先級
+    """
+    from assignments.models import Assignment_problems, Assignments
+
+    priorities = settings.JUDGE_TASK_PRIORITIES
+    if rejudge:
+        return priorities['rejudge']
+    now = timezone.now()
+    near_deadline = Assignment_problems.objects.filter(
+        problem_id=submission.problem_id,
+        is_active=True,
+        assignment__status=Assignments.Status.ACTIVE,
+        assignment__due_time__gte=now,
+        assignment__due_time__lte=now + timedelta(seconds=settings.JUDGE_DEADLINE_WINDOW),
+    ).exists()
+    return priorities['deadline'] if near_deadline else priorities['submission']
+
+
+def enqueue_submission(submission, rejudge=False):
+    """
+    將提交送進判題佇列
+
+    一般提交走 CELERY_TASK_ROUTES 設定的 judge 佇列，重新判題走 REJUDGE_QUEUE
+    """
+    if rejudge:
+        return enqueue_rejudge(submission.id)
+    return submit_to_sandbox_task.apply_async(
+        args=(str(submission.id),), priority=judge_priority(submission),
+    )
+
+
+def enqueue_rejudge(submission_id):
+    """將重新判題送進 REJUDGE_QUEUE（不需載入 Submission）"""
+    return submit_to_sandbox_task.apply_async(
+        args=(str(submission_id),),
+        priority=settings.JUDGE_TASK_PRIORITIES['rejudge'],
+        queue=settings.REJUDGE_QUEUE,
+    )
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def submit_to_sandbox_task(self, submission_id):
     """
@@ -73,6 +122,65 @@ def submit_to_sandbox_task(self, submission_id):
         return {'status': 'error', 'reason': str(exc)}
 
 
+@shared_task
+def dispatch_rejudge_job_task(job_id):
+    """
+    分派批次重新判題的下一批提交
+
+    每批送出 REJUDGE_CHUNK_SIZE 筆後，延遲 REJUDGE_CHUNK_INTERVAL 秒再排程下一批，
+    避免一次塞滿 Sandbox
+    """
+    from .rejudge import dispatch_rejudge_chunk
+
+    if dispatch_rejudge_chunk(job_id):
+        dispatch_rejudge_job_task.apply_async(
+            args=(str(job_id),), countdown=settings.REJUDGE_CHUNK_INTERVAL,
+        )
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=10)
+def aggregate_user_problem_stats_task(self):
+    """
+    取出一批判題事件並重算作業統計（UserProblemStats）
+
+    緩衝還有剩餘時立即排程下一批；重算失敗的事件會放回緩衝後重試
+    """
+    from .problem_stats import user_problem_stats
+
+    try:
+        processed, remaining = user_problem_stats.drain()
+    except Exception as exc:
+        logger.error(f'Failed to aggregate user problem stats: {str(exc)}')
+        raise self.retry(exc=exc)
+
+    logger.info(f'Aggregated stats for {processed} submissions, {remaining} pending')
+    if remaining:
+        user_problem_stats.schedule(countdown=0)
+    return {'processed': processed, 'remaining': remaining}
+
+
+@shared_task
+def rebuild_user_problem_stats_task(assignment_ids=None):
+    """Catch-up 模式：整份作業從 Submission 重算統計"""
+    from assignments.models import Assignments
+    from .problem_stats import rebuild_user_problem_stats
+
+    assignments = Assignments.objects.order_by('id')
+    if assignment_ids is not None:
+        assignments = assignments.filter(id__in=assignment_ids)
+    return rebuild_user_problem_stats(assignments)
+
+
+def _mark_selftest_failed(user_id, test_id, exc):
+    """更新 Redis 狀態為 failed 並通知等待中的查詢"""
+    from .custom_test_store import custom_test_store
+
+    try:
+        custom_test_store.mark_failed(user_id, test_id, str(exc), str(timezone.now()))
+    except Exception as redis_error:
+        logger.error(f'Failed to update Redis: {str(redis_error)}')
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=30)
 def submit_selftest_to_sandbox_task(self, test_id, user_id, problem_id, language_type, source_code, stdin_data):
     """
@@ -89,44 +197,22 @@ def submit_selftest_to_sandbox_task(self, test_id, user_id, problem_id, language
     Returns:
         dict: Sandbox 的回應結果
     """
-    import redis
-    import json
-    from django.utils import timezone
+    from .custom_test_store import custom_test_store
     from .sandbox_client import submit_selftest_to_sandbox
     
-    # 初始化 Redis
-    try:
-        redis_client = redis.Redis(
-            host='127.0.0.1',
-            port=6379,
-            db=2,
-            decode_responses=True
-        )
-    except Exception as e:
-        logger.error(f'Redis connection failed in task: {str(e)}')
-        return {'status': 'error', 'reason': 'redis_unavailable'}
-    
-    cache_key = f"custom_test:{user_id}:{test_id}"
-    
     try:
-        # 1. 提交到 Sandbox
+        # 1. 提交到 Sandbox（以 test_id 作為 Sandbox 的 submission_id，callback 可直接對應紀錄）
         logger.info(f'Submitting selftest to Sandbox: {test_id}')
         result = submit_selftest_to_sandbox(
             problem_id=problem_id,
             language_type=language_type,
             source_code=source_code,
-            stdin_data=stdin_data
+            stdin_data=stdin_data,
+            test_id=test_id,
         )
         
         # 2. 更新 Redis（狀態改為 queued 或 Sandbox 返回的狀態）
-        cached = redis_client.get(cache_key)
-        if cached:
-            test_info = json.loads(cached)
-            test_info['submission_id'] = result['submission_id']
-            test_info['status'] = result['status']
-            test_info['queue_position'] = result.get('queue_position')
-            test_info['submitted_at'] = str(timezone.now())
-            redis_client.setex(cache_key, 1800, json.dumps(test_info))
+        custom_test_store.mark_submitted(user_id, test_id, result, str(timezone.now()))
         
         logger.info(f'Selftest submitted successfully: {test_id}')
         return result
@@ -134,25 +220,15 @@ def submit_selftest_to_sandbox_task(self, test_id, user_id, problem_id, language
     except Exception as exc:
         logger.error(f'Error submitting selftest: {str(exc)}')
         
-        # 更新 Redis 狀態為 failed
-        try:
-            cached = redis_client.get(cache_key)
-            if cached:
-                test_info = json.loads(cached)
-                test_info['status'] = 'failed'
-                test_info['error'] = str(exc)
-                test_info['failed_at'] = str(timezone.now())
-                redis_client.setex(cache_key, 1800, json.dumps(test_info))
-        except Exception as redis_error:
-            logger.error(f'Failed to update Redis: {str(redis_error)}')
-        
-        # 如果是網路錯誤，重試
+        # 如果是網路錯誤，重試（重試期間維持 pending，避免 long-poll 的客戶端提早收到 failed）
         if 'RequestException' in str(type(exc).__name__):
             try:
                 # 重試（較短的 backoff）
                 raise self.retry(exc=exc, countdown=30 * (2 ** self.request.retries))
             except self.MaxRetriesExceededError:
                 logger.error(f'Max retries exceeded for selftest {test_id}')
+                _mark_selftest_failed(user_id, test_id, exc)
                 return {'status': 'error', 'reason': 'max_retries_exceeded'}
         
+        _mark_selftest_failed(user_id, test_id, exc)
         return {'status': 'error', 'reason': str(exc)}
@@ -0,0 +1,159 @@
+# submissions/test_file/loadtest_submission_stream.py - 判題狀態推播壓力測試
+"""
+對執行中的 ASGI 伺服器開啟大量 /submission/stream/ 連線，
+直接對 Redis 的 submission_status 頻道發布事件，量測推播延遲與遺失
+
+使用方式（需先以 uvicorn / daphne 啟動後端）:
+    python submissions/test_file/loadtest_submission_stream.py \\
+        --tokens-file tokens.txt --connections 2000 --rate 2000 --duration 10
+
+tokens.txt 每行一個 JWT access token；每位使用者的連線數受
+SUBMISSION_STREAM['max_per_user'] 限制，連線會平均分配給各 token
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+import uuid
+from urllib.parse import urlparse
+
+import redis.asyncio as aioredis
+
+STATUS_CHANNEL = 'submission_status'
+
+
+def token_user_id(token):
+    """取出 JWT payload 中的 user_id（不驗證簽章）"""
+    payload = token.split('.')[1]
+    payload += '=' * (-len(payload) % 4)
+    return str(json.loads(base64.urlsafe_b64decode(payload))['user_id'])
+
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.rejected = 0
+        self.failed = 0
+        self.received = 0
+        self.latencies = []
+
+
+async def open_stream(base_url, token, stats, stop):
+    """開啟一條 SSE 連線並讀取事件直到結束"""
+    url = urlparse(base_url)
+    port = url.port or (443 if url.scheme == 'https' else 80)
+    try:
+        reader, writer = await asyncio.open_connection(url.hostname, port, ssl=url.scheme == 'https')
+    except OSError:
+        stats.failed += 1
+        return
+
+    writer.write((
+        f"GET /submission/stream/ HTTP/1.1\r\n"
+        f"Host: {url.netloc}\r\n"
+        f"Authorization: Bearer {token}\r\n"
+        f"Accept: text/event-stream\r\n"
+        f"\r\n"
+    ).encode())
+    await writer.drain()
+
+    try:
+        status_line = await reader.readline()
+        if b' 200 ' not in status_line:
+            if b' 503 ' in status_line:
+                stats.rejected += 1
+            else:
+                stats.failed += 1
+            return
+        stats.connected += 1
+
+        while not stop.is_set():
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout=1)
+            except asyncio.TimeoutError:
+                continue
+            if not line:
+                break
+            # chunked 編碼下 data 行前後夾著長度行，只取 data 行
+            if line.startswith(b'data: '):
+                event = json.loads(line[6:])
+                if 'sent_at' in event:
+                    stats.received += 1
+                    stats.latencies.append(time.time() - event['sent_at'])
+    except (OSError, ValueError):
+        stats.failed += 1
+    finally:
+        writer.close()
+
+
+async def publish_events(redis_url, user_ids, rate, duration):
+    """以固定速率發布事件，回傳發布總數"""
+    client = aioredis.Redis.from_url(redis_url)
+    published = 0
+    interval = 1 / rate
+    started = time.monotonic()
+    try:
+        while time.monotonic() - started < duration:
+            event = {
+                'submission_id': str(uuid.uuid4()),
+                'user_id': user_ids[published % len(user_ids)],
+                'status': '0',
+                'score': 100,
+                'sent_at': time.time(),
+            }
+            await client.publish(STATUS_CHANNEL, json.dumps(event))
+            published += 1
+            delay = started + published * interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    finally:
+        await client.aclose()
+    return published
+
+
+async def main(args):
+    with open(args.tokens_file) as f:
+        tokens = [line.strip() for line in f if line.strip()]
+    user_ids = [token_user_id(token) for token in tokens]
+
+    stats = Stats()
+    stop = asyncio.Event()
+    clients = [
+        asyncio.create_task(open_stream(args.base_url, tokens[i % len(tokens)], stats, stop))
+        for i in range(args.connections)
+    ]
+
+    await asyncio.sleep(args.warmup)
+    print(f"連線成功 {stats.connected}，被拒 {stats.rejected}，失敗 {stats.failed}")
+
+    published = await publish_events(args.redis_url, user_ids, args.rate, args.duration)
+    await asyncio.sleep(2)
+    stop.set()
+    await asyncio.gather(*clients, return_exceptions=True)
+
+    # 每筆事件會送到該使用者的所有連線
+    per_user = stats.connected / len(tokens) if tokens else 0
+    expected = int(published * per_user)
+    print(f"發布 {published} 筆，預期收到 {expected} 筆，實際收到 {stats.received} 筆")
+    if stats.latencies:
+        latencies = sorted(stats.latencies)
+        p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+        print(
+            f"延遲 ms: 平均 {statistics.mean(latencies) * 1000:.1f}"
+            f" p50 {p(0.50):.1f} p95 {p(0.95):.1f} p99 {p(0.99):.1f} 最大 {latencies[-1] * 1000:.1f}"
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='判題狀態推播壓力測試')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/1')
+    parser.add_argument('--tokens-file', required=True)
+    parser.add_argument('--connections', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=1000, help='每秒發布事件數')
+    parser.add_argument('--duration', type=float, default=10, help='發布秒數')
+    parser.add_argument('--warmup', type=float, default=3, help='建立連線的等待秒數')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,226 @@
+# submissions/test_file/test_bulk_rejudge.py - 測試批次重新判題
+"""
+測試批次重新判題：篩選條件、單次 UPDATE/DELETE 重設、
+分批送出判題任務與進度、API 權限與 management command
+"""
+
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from assignments.models import Assignment_problems, Assignments
+from ..models import RejudgeJob, Submission, SubmissionResult, UserRanking
+from ..rejudge import build_rejudge_queryset, create_rejudge_job, dispatch_rejudge_chunk
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+@pytest.mark.django_db
+class BulkRejudgeTests(SubmissionAPITestSetup, TestCase):
+    """測試批次重新判題"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.client = APIClient()
+
+        self.ac = self.make_submission(self.problem1, self.student1, '0', score=100)
+        self.wa = self.make_submission(self.problem1, self.student2, '1', score=20)
+        self.other = self.make_submission(self.problem2, self.student2, '0', score=100)
+        self.no_code = self.make_submission(self.problem1, self.student1, '-2')
+        for submission in (self.ac, self.wa, self.other):
+            SubmissionResult.objects.create(
+                submission=submission, subtask_id=1, test_case_index=1,
+                problem_id=submission.problem_id, status='accepted',
+            )
+        UserRanking.objects.filter(user=self.student1).update(ac_submission_count=1, ac_problem_count=1)
+
+    def make_submission(self, problem, user, status_code, score=0):
+        return Submission.objects.create(
+            problem_id=problem.id, user=user, language_type=2, source_code='print(1)',
+            status=status_code, score=score, execution_time=10, memory_usage=1024,
+            judged_at=timezone.now() if status_code not in ('-1', '-2') else None,
+        )
+
+    def test_queryset_filters(self):
+        ids = set(build_rejudge_queryset(problem_id=self.problem1.id).values_list('id', flat=True))
+        self.assertEqual(ids, {self.ac.id, self.wa.id})
+
+        ids = set(build_rejudge_queryset(problem_id=self.problem1.id, statuses=['1']).values_list('id', flat=True))
+        self.assertEqual(ids, {self.wa.id})
+
+        future = timezone.now() + timedelta(minutes=1)
+        self.assertFalse(build_rejudge_queryset(problem_id=self.problem1.id, since=future).exists())
+
+        with self.assertRaises(ValueError):
+            build_rejudge_queryset()
+
+    def test_queryset_by_assignment(self):
+        now = timezone.now()
+        assignment = Assignments.objects.create(
+            title='HW', course=self.course1, creator=self.teacher,
+            start_time=now - timedelta(days=1), due_time=now + timedelta(days=1),
+        )
+        Assignment_problems.objects.create(assignment=assignment, problem=self.problem2, order_index=1)
+
+        ids = set(build_rejudge_queryset(assignment_id=assignment.id).values_list('id', flat=True))
+        self.assertEqual(ids, {self.other.id})
+
+    def test_create_job_resets_in_bulk(self):
+        """重設只用一次 UPDATE 與一次 DELETE，不逐筆 save"""
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay') as delay, \
+                patch('submissions.models.Submission.save') as save, \
+                self.captureOnCommitCallbacks(execute=True):
+            job = create_rejudge_job(requester=self.teacher, problem_id=self.problem1.id, statuses=['0', '1'])
+
+        save.assert_not_called()
+        delay.assert_called_once_with(str(job.id))
+        self.assertEqual(job.total_submissions, 2)
+        self.assertEqual(job.submission_ids, [str(self.ac.id), str(self.wa.id)])
+        self.assertEqual(job.status, 'pending')
+
+        for submission in (self.ac, self.wa):
+            submission.refresh_from_db()
+            self.assertEqual(submission.status, '-1')
+            self.assertEqual(submission.score, 0)
+            self.assertEqual(submission.execution_time, -1)
+            self.assertIsNone(submission.judged_at)
+        self.assertFalse(SubmissionResult.objects.filter(submission__problem_id=self.problem1.id).exists())
+        # 其他題目不受影響
+        self.assertTrue(SubmissionResult.objects.filter(submission=self.other).exists())
+        self.no_code.refresh_from_db()
+        self.assertEqual(self.no_code.status, '-2')
+
+        ranking = UserRanking.objects.get(user=self.student1)
+        self.assertEqual((ranking.ac_submission_count, ranking.ac_problem_count), (0, 0))
+
+    def test_create_job_query_count_is_constant(self):
+        """查詢數不隨提交數增加"""
+        def run():
+            with patch('submissions.tasks.dispatch_rejudge_job_task.delay'), \
+                    CaptureQueriesContext(connection) as queries:
+                create_rejudge_job(problem_id=self.problem1.id, statuses=['1'])
+            return len(queries)
+
+        baseline = run()
+        for _ in range(20):
+            self.make_submission(self.problem1, self.student2, '1')
+        self.assertEqual(run(), baseline)
+
+    def test_empty_job_finishes_immediately(self):
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            job = create_rejudge_job(problem_id=self.problem1.id, statuses=['3'])
+        delay.assert_not_called()
+        self.assertEqual(job.status, 'success')
+        self.assertEqual(job.progress, 100)
+
+    def test_dispatch_in_chunks(self):
+        for _ in range(3):
+            self.make_submission(self.problem1, self.student2, '1')
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay'):
+            job = create_rejudge_job(problem_id=self.problem1.id)
+
+        with patch('submissions.tasks.submit_to_sandbox_task.apply_async') as apply_async:
+            self.assertTrue(dispatch_rejudge_chunk(job.id, chunk_size=2))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.dispatched_submissions, job.progress), ('running', 2, 40))
+
+            self.assertTrue(dispatch_rejudge_chunk(job.id, chunk_size=2))
+            self.assertFalse(dispatch_rejudge_chunk(job.id, chunk_size=2))
+            # 已完成的工作不會重複送出
+            self.assertFalse(dispatch_rejudge_chunk(job.id, chunk_size=2))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.dispatched_submissions), ('success', 5))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(apply_async.call_count, 5)
+        self.assertEqual(
+            [call.kwargs['args'][0] for call in apply_async.call_args_list], job.submission_ids
+        )
+        self.assertEqual(apply_async.call_args.kwargs['queue'], settings.REJUDGE_QUEUE)
+        self.assertEqual(apply_async.call_args.kwargs['priority'], settings.JUDGE_TASK_PRIORITIES['rejudge'])
+
+    def test_dispatch_failure_marks_job_failed(self):
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay'):
+            job = create_rejudge_job(problem_id=self.problem1.id)
+
+        with patch('submissions.tasks.submit_to_sandbox_task.apply_async', side_effect=[None, OSError('broker down')]):
+            self.assertFalse(dispatch_rejudge_chunk(job.id, chunk_size=10))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.dispatched_submissions), ('failed', 1))
+        self.assertIn('broker down', job.error_message)
+
+    def test_dispatch_task_reschedules_with_interval(self):
+        from ..tasks import dispatch_rejudge_job_task
+
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay'):
+            job = create_rejudge_job(problem_id=self.problem1.id)
+
+        with patch('submissions.rejudge.settings.REJUDGE_CHUNK_SIZE', 1), \
+                patch('submissions.tasks.submit_to_sandbox_task.apply_async'), \
+                patch('submissions.tasks.dispatch_rejudge_job_task.apply_async') as reschedule:
+            dispatch_rejudge_job_task(str(job.id))
+
+        reschedule.assert_called_once_with(args=(str(job.id),), countdown=settings.REJUDGE_CHUNK_INTERVAL)
+
+    def test_api_creates_job(self):
+        self.client.force_authenticate(user=self.teacher)
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay'):
+            response = self.client.post(
+                '/submission/rejudge/', {'problem_id': self.problem1.id, 'status': ['1']}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['data']['total'], 1)
+
+        job_id = response.data['data']['jobId']
+        response = self.client.get(f'/submission/rejudge/{job_id}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['status'], 'pending')
+        self.assertEqual(response.data['data']['progress'], 0)
+
+    def test_api_validation(self):
+        self.client.force_authenticate(user=self.teacher)
+        for body in ({}, {'problem_id': 'x'}, {'problem_id': self.problem1.id, 'status': ['9']},
+                     {'problem_id': self.problem1.id, 'since': 'yesterday'}):
+            response = self.client.post('/submission/rejudge/', body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body)
+        self.assertFalse(RejudgeJob.objects.exists())
+
+    def test_api_requires_course_staff(self):
+        self.client.force_authenticate(user=self.student1)
+        response = self.client.post('/submission/rejudge/', {'problem_id': self.problem1.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.ac.refresh_from_db()
+        self.assertEqual(self.ac.status, '0')
+
+        with patch('submissions.tasks.dispatch_rejudge_job_task.delay'):
+            job = create_rejudge_job(requester=self.teacher, problem_id=self.problem1.id)
+        response = self.client.get(f'/submission/rejudge/{job.id}/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('rejudge_submissions', '--problem', str(self.problem1.id), '--dry-run', stdout=out)
+        self.assertIn('2 submissions would be rejudged', out.getvalue())
+        self.assertFalse(RejudgeJob.objects.exists())
+
+        with patch('submissions.management.commands.rejudge_submissions.time.sleep'), \
+                patch('submissions.tasks.submit_to_sandbox_task.apply_async') as apply_async, \
+                patch('submissions.tasks.dispatch_rejudge_job_task.delay') as delay:
+            call_command('rejudge_submissions', '--problem', str(self.problem1.id), '--inline', stdout=out)
+
+        delay.assert_not_called()
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(RejudgeJob.objects.get().status, 'success')
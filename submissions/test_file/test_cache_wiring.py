@@ -0,0 +1,136 @@
+# submissions/test_file/test_cache_wiring.py - 測試讀取端點走快取層
+"""
+測試 submissions/cache/utils 的快取函數已接上實際端點：
+提交詳情、使用者統計、題目高分、提交權限，
+以及判題 callback 造成狀態變更時的快取失效
+"""
+
+import pytest
+from unittest.mock import patch
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from courses.models import Course_members
+from ..models import Submission
+from ..cache.keys import CacheKeys
+from ..cache.monitoring import hit_rate_monitor
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+@pytest.mark.django_db
+class TestReadEndpointCaching(SubmissionAPITestSetup, APITestCase):
+    """測試讀取端點的快取命中與失效"""
+
+    def setUp(self):
+        cache.clear()
+        hit_rate_monitor.stats.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.submission = Submission.objects.create(
+            problem_id=self.problem1.id,
+            user=self.student1,
+            language_type=2,
+            source_code='print(1)',
+            status='1',
+            score=40,
+        )
+        self.client = APIClient()
+
+    def post_callback(self, judge_status, score):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/submission/callback/', {
+                'submission_id': str(self.submission.id),
+                'status': judge_status,
+                'score': score,
+                'execution_time': 10,
+                'memory_usage': 100,
+                'test_results': [],
+            }, format='json')
+
+    def test_submission_detail_cached(self):
+        """第二次讀取提交詳情命中快取"""
+        self.client.force_authenticate(user=self.student1)
+
+        first = self.client.get(f'/submission/{self.submission.id}/')
+        second = self.client.get(f'/submission/{self.submission.id}/')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['data'], first.data['data'])
+        self.assertEqual(hit_rate_monitor.stats['submission_detail'], {'hits': 1, 'misses': 1})
+
+    def test_pending_submission_not_cached(self):
+        """判題中的提交不寫入快取"""
+        pending = Submission.objects.create(
+            problem_id=self.problem1.id,
+            user=self.student1,
+            language_type=2,
+            source_code='print(1)',
+            status='-1',
+        )
+        self.client.force_authenticate(user=self.student1)
+
+        self.client.get(f'/submission/{pending.id}/')
+
+        self.assertIsNone(cache.get(CacheKeys.submission_detail(str(pending.id))))
+
+    def test_callback_invalidates_submission_detail(self):
+        """callback 變更狀態後，提交詳情回傳新結果"""
+        self.client.force_authenticate(user=self.student1)
+        self.client.get(f'/submission/{self.submission.id}/')
+
+        self.post_callback('accepted', 100)
+        response = self.client.get(f'/submission/{self.submission.id}/')
+
+        self.assertEqual(response.data['data']['status'], '0')
+        self.assertEqual(response.data['data']['score'], 100)
+
+    def test_permission_cached_for_course_staff(self):
+        """TA 的查看權限判斷結果會被快取"""
+        self.client.force_authenticate(user=self.ta)
+
+        self.client.get(f'/submission/{self.submission.id}/')
+        response = self.client.get(f'/submission/{self.submission.id}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(hit_rate_monitor.stats['permission'], {'hits': 1, 'misses': 1})
+
+    @patch('submissions.cache.signals.cache_fallback.delete_pattern_safe')
+    def test_membership_removal_clears_permission_cache(self, mock_delete_pattern):
+        """TA 被移出課程時清除該使用者的權限快取（LocMem 不支援模式刪除，只驗證呼叫）"""
+        Course_members.objects.filter(course_id=self.course1, user_id=self.ta).delete()
+
+        mock_delete_pattern.assert_called_once_with(
+            CacheKeys.permission_user_pattern(str(self.ta.id))
+        )
+
+    def test_high_score_cached_and_invalidated(self):
+        """題目高分命中快取，callback 後更新"""
+        self.client.force_authenticate(user=self.student1)
+        url = f'/problem/{self.problem1.id}/high-score'
+
+        self.assertEqual(self.client.get(url).data['data']['score'], 40)
+        self.client.get(url)
+        self.assertEqual(hit_rate_monitor.stats['high_score'], {'hits': 1, 'misses': 1})
+
+        self.post_callback('accepted', 100)
+        self.assertEqual(self.client.get(url).data['data']['score'], 100)
+
+    @patch('submissions.cache.utils.distributed_lock')
+    def test_user_stats_cached_and_invalidated(self, mock_lock):
+        """使用者統計命中快取，callback 後重新計算"""
+        mock_lock.acquire.return_value = 'lock-id'
+        self.client.force_authenticate(user=self.student1)
+        url = f'/stats/user/{self.student1.id}/'
+
+        first = self.client.get(url)
+        with self.assertNumQueries(2):
+            # 只剩權限檢查與查找使用者
+            self.client.get(url)
+        self.assertEqual(first.data['data']['user_stats']['accept_percent'], 0.0)
+
+        self.post_callback('accepted', 100)
+        response = self.client.get(url)
+        self.assertEqual(response.data['data']['user_stats']['accept_percent'], 100.0)
@@ -0,0 +1,159 @@
+# submissions/test_file/test_callback_batch_writes.py - 測試 callback 批次寫入
+"""
+測試 SubmissionCallbackAPIView 的 SubmissionResult 批次寫入
+包括：subtask 對照、CE/AC fallback、重複 callback 的 upsert，
+以及每次 callback 的查詢數不隨測資數量成長（benchmark）
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from problems.models import Problem_subtasks, Test_cases
+from ..models import Submission, SubmissionResult
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+@pytest.mark.django_db
+class TestCallbackBatchWrites(SubmissionAPITestSetup, APITestCase):
+    """測試 callback 以單一 upsert 寫入所有測資結果"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.client = APIClient()
+
+    def create_test_cases(self, problem, subtasks, cases_per_subtask):
+        for no in range(1, subtasks + 1):
+            subtask = Problem_subtasks.objects.create(problem_id=problem, subtask_no=no)
+            for idx in range(1, cases_per_subtask + 1):
+                Test_cases.objects.create(subtask_id=subtask, idx=idx)
+
+    def create_pending_submission(self, problem):
+        return Submission.objects.create(
+            problem_id=problem.id,
+            user=self.student1,
+            language_type=2,
+            source_code='print(1)',
+            status='-1',
+        )
+
+    def build_test_results(self, subtasks, cases_per_subtask, result_status='accepted'):
+        return [
+            {
+                'test_case_id': no,
+                'test_case_index': idx,
+                'status': result_status,
+                'execution_time': 5,
+                'memory_usage': 64,
+                'score': 2,
+                'max_score': 2,
+            }
+            for no in range(1, subtasks + 1)
+            for idx in range(1, cases_per_subtask + 1)
+        ]
+
+    def post_callback(self, submission, judge_status, test_results):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/submission/callback/', {
+                'submission_id': str(submission.id),
+                'status': judge_status,
+                'score': 100,
+                'execution_time': 50,
+                'memory_usage': 64,
+                'test_results': test_results,
+            }, format='json')
+        return response, len(ctx.captured_queries)
+
+    def test_normal_results_written_in_bulk(self):
+        """一般結果依 subtask_no 對應到 subtask_id 並回報寫入筆數"""
+        self.create_test_cases(self.problem1, subtasks=2, cases_per_subtask=3)
+        submission = self.create_pending_submission(self.problem1)
+
+        response, _ = self.post_callback(submission, 'accepted', self.build_test_results(2, 3))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['data']['results_written'], 6)
+        subtask_ids = set(
+            Problem_subtasks.objects.filter(problem_id=self.problem1).values_list('id', flat=True)
+        )
+        results = SubmissionResult.objects.filter(submission=submission)
+        self.assertEqual(results.count(), 6)
+        self.assertEqual(set(results.values_list('subtask_id', flat=True)), subtask_ids)
+
+    def test_zero_based_subtask_no_is_shifted(self):
+        """Sandbox 從 0 開始編號時改用 subtask_no + 1"""
+        self.create_test_cases(self.problem1, subtasks=1, cases_per_subtask=2)
+        submission = self.create_pending_submission(self.problem1)
+        test_results = [
+            {'test_case_id': 0, 'test_case_index': 1, 'status': 'accepted'},
+            {'test_case_id': 0, 'test_case_index': 2, 'status': 'wrong_answer'},
+        ]
+
+        response, _ = self.post_callback(submission, 'wrong_answer', test_results)
+
+        self.assertEqual(response.data['data']['results_written'], 2)
+        subtask = Problem_subtasks.objects.get(problem_id=self.problem1, subtask_no=1)
+        self.assertEqual(
+            SubmissionResult.objects.filter(submission=submission, subtask_id=subtask.id).count(), 2
+        )
+
+    def test_repeated_callback_updates_existing_rows(self):
+        """重複 callback 覆寫既有結果而非新增"""
+        self.create_test_cases(self.problem1, subtasks=1, cases_per_subtask=3)
+        submission = self.create_pending_submission(self.problem1)
+
+        self.post_callback(submission, 'accepted', self.build_test_results(1, 3))
+        self.post_callback(submission, 'wrong_answer', self.build_test_results(1, 3, 'wrong_answer'))
+
+        results = SubmissionResult.objects.filter(submission=submission)
+        self.assertEqual(results.count(), 3)
+        self.assertEqual(set(results.values_list('status', flat=True)), {'wrong_answer'})
+
+    def test_compile_error_fills_all_test_cases(self):
+        """CE 時為所有測資寫入相同錯誤"""
+        self.create_test_cases(self.problem1, subtasks=2, cases_per_subtask=2)
+        submission = self.create_pending_submission(self.problem1)
+
+        response, _ = self.post_callback(
+            submission, 'compile_error', [{'error_message': 'syntax error'}]
+        )
+
+        self.assertEqual(response.data['data']['results_written'], 4)
+        results = SubmissionResult.objects.filter(submission=submission)
+        self.assertEqual(set(results.values_list('error_message', flat=True)), {'syntax error'})
+
+    def test_accepted_without_results_fills_all_test_cases(self):
+        """AC 但沒有 test_results 時為所有測資寫入 AC"""
+        self.create_test_cases(self.problem1, subtasks=2, cases_per_subtask=2)
+        submission = self.create_pending_submission(self.problem1)
+
+        response, _ = self.post_callback(submission, 'accepted', [])
+
+        self.assertEqual(response.data['data']['results_written'], 4)
+        results = SubmissionResult.objects.filter(submission=submission)
+        self.assertEqual(set(results.values_list('score', flat=True)), {25})
+
+    def test_query_count_independent_of_test_case_count(self):
+        """Benchmark：5 筆與 50 筆測資的 callback 查詢數相同（改寫前 50 筆約 360 次查詢）"""
+        self.create_test_cases(self.problem1, subtasks=1, cases_per_subtask=5)
+        self.create_test_cases(self.problem2, subtasks=5, cases_per_subtask=10)
+
+        counts = {}
+        for problem, subtasks, cases in [(self.problem1, 1, 5), (self.problem2, 5, 10)]:
+            for judge_status, test_results in [
+                ('wrong_answer', self.build_test_results(subtasks, cases, 'wrong_answer')),
+                ('compile_error', []),
+                ('accepted', []),
+            ]:
+                submission = self.create_pending_submission(problem)
+                response, queries = self.post_callback(submission, judge_status, test_results)
+                self.assertEqual(response.data['data']['results_written'], subtasks * cases)
+                counts[(subtasks * cases, judge_status)] = queries
+
+        for judge_status in ['wrong_answer', 'compile_error', 'accepted']:
+            self.assertEqual(counts[(5, judge_status)], counts[(50, judge_status)])
+            self.assertLess(counts[(50, judge_status)], 25)
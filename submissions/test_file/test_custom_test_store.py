@@ -0,0 +1,243 @@
+# submissions/test_file/test_custom_test_store.py - 測試自訂測試的 Redis 紀錄與 callback
+"""
+測試自訂測試結果改由 Sandbox callback 推送：
+callback 寫入 submit_custom_test 建立的 Redis 紀錄並發布完成事件，
+查詢端點只讀 Redis（可 long-poll），不再向 Sandbox 查詢
+
+測試環境沒有 Redis，使用只實作自訂測試用到指令的記憶體替身
+"""
+
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..custom_test_store import CustomTestStore
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class FakeRedis:
+    """只支援自訂測試紀錄用到的指令（含 WATCH 交易與 pub/sub）"""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value
+
+    def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists.get(key, [])[start:end + 1]
+
+    def expire(self, key, ttl):
+        pass
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        with self.lock:
+            pipe = FakePipeline(self)
+            value = func(pipe)
+            pipe.execute()
+        return value if value_from_callable else None
+
+    def publish(self, channel, message):
+        for queue in self.subscribers.get(channel, []):
+            queue.append({'type': 'message', 'channel': channel, 'data': message})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+class FakePipeline:
+    """multi() 之前的 get 立即執行，之後的指令延後到 execute"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+        self.buffered = False
+
+    def get(self, key):
+        return self.redis.get(key)
+
+    def multi(self):
+        self.buffered = True
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append((name, args))
+        return call
+
+    def execute(self):
+        for name, args in self.calls:
+            getattr(self.redis, name)(*args)
+        self.calls = []
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.queue = []
+        self.channels = []
+
+    def subscribe(self, channel):
+        self.channels.append(channel)
+        self.redis.subscribers.setdefault(channel, []).append(self.queue)
+
+    def get_message(self, timeout=0):
+        deadline = time.monotonic() + timeout
+        while not self.queue and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.queue.pop(0) if self.queue else None
+
+    def close(self):
+        for channel in self.channels:
+            self.redis.subscribers[channel].remove(self.queue)
+
+
+def pending_info(test_id='selftest-1'):
+    return {
+        'test_id': test_id, 'problem_id': 1, 'language': 2,
+        'submission_id': test_id, 'status': 'pending', 'created_at': 'now',
+    }
+
+
+class CustomTestStoreTests(SimpleTestCase):
+    """測試紀錄的狀態轉換與完成事件"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.store = CustomTestStore(client=self.redis)
+        self.store.create('u1', pending_info())
+
+    def test_callback_completes_record(self):
+        self.store.mark_submitted('u1', 'selftest-1', {'submission_id': 'selftest-1', 'status': 'queued'}, 't1')
+        self.assertEqual(self.store.get('u1', 'selftest-1')['status'], 'queued')
+
+        info = self.store.complete('selftest-1', {'status': 'AC', 'stdout': '3\n'}, 't2')
+        self.assertEqual(info['status'], 'AC')
+        self.assertEqual(self.store.get('u1', 'selftest-1')['stdout'], '3\n')
+
+    def test_late_submitted_update_keeps_result(self):
+        """callback 先於 Celery 任務寫入時，任務不會把狀態改回 queued"""
+        self.store.complete('selftest-1', {'status': 'AC'}, 't1')
+        self.store.mark_submitted('u1', 'selftest-1', {'submission_id': 'sandbox-9', 'status': 'queued'}, 't2')
+
+        info = self.store.get('u1', 'selftest-1')
+        self.assertEqual(info['status'], 'AC')
+        self.assertEqual(info['submission_id'], 'sandbox-9')
+
+    def test_callback_by_sandbox_id(self):
+        self.store.mark_submitted('u1', 'selftest-1', {'submission_id': 'sandbox-9', 'status': 'queued'}, 't1')
+        self.assertIsNotNone(self.store.complete('sandbox-9', {'status': 'WA'}, 't2'))
+        self.assertEqual(self.store.get('u1', 'selftest-1')['status'], 'WA')
+
+    def test_unknown_test(self):
+        self.assertIsNone(self.store.complete('selftest-missing', {'status': 'AC'}, 't'))
+        self.assertIsNone(self.store.wait('u1', 'selftest-missing', 1))
+
+    def test_wait_returns_on_completion_event(self):
+        timer = threading.Timer(0.1, self.store.complete, args=('selftest-1', {'status': 'AC'}, 't'))
+        timer.start()
+        started = time.monotonic()
+        info = self.store.wait('u1', 'selftest-1', 5)
+        timer.join()
+
+        self.assertEqual(info['status'], 'AC')
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(self.redis.subscribers['custom_test:done:selftest-1'], [])
+
+    def test_wait_times_out(self):
+        info = self.store.wait('u1', 'selftest-1', 0.1)
+        self.assertEqual(info['status'], 'pending')
+
+
+@pytest.mark.django_db
+class CustomTestPushTests(SubmissionAPITestSetup, TestCase):
+    """測試 callback 與查詢端點共用 Redis 紀錄"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.store = CustomTestStore(client=FakeRedis())
+        patcher = patch('submissions.views.custom_test_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student1)
+        with patch('submissions.tasks.submit_selftest_to_sandbox_task'):
+            response = self.client.post(
+                f'/submission/{self.problem1.id}/custom-test/',
+                {'language': 2, 'source_code': 'print(1)', 'stdin': ''},
+                format='json',
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.test_id = response.data['data']['test_id']
+        self.result_url = f'/submission/custom-test/{self.test_id}/result/'
+
+    def post_callback(self):
+        return APIClient().post('/submission/custom-test-callback/', {
+            'submission_id': self.test_id,
+            'status': 'AC',
+            'stdout': '1\n',
+            'stderr': '',
+            'execution_time': 12,
+            'memory_usage': 2048,
+            'exit_code': 0,
+        }, format='json')
+
+    @patch('submissions.sandbox_client.get_session')
+    def test_result_served_from_redis(self, mock_session):
+        pending = self.client.get(self.result_url)
+        self.assertEqual(pending.data['data']['status'], 'pending')
+
+        self.assertEqual(self.post_callback().status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.result_url)
+        data = response.data['data']
+        self.assertEqual(data['status'], 'AC')
+        self.assertEqual(data['stdout'], '1\n')
+        self.assertEqual(data['time'], 12)
+        self.assertEqual(data['memory'], 2048)
+        mock_session.assert_not_called()
+
+    def test_result_long_poll(self):
+        timer = threading.Timer(0.1, self.store.complete, args=(self.test_id, {'status': 'AC', 'stdout': '1\n'}, 't'))
+        timer.start()
+        response = self.client.get(self.result_url, {'wait': 5})
+        timer.join()
+
+        self.assertEqual(response.data['data']['status'], 'AC')
+
+    def test_other_user_cannot_read(self):
+        self.post_callback()
+        self.client.force_authenticate(user=self.student2)
+        response = self.client.get(self.result_url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_callback_unknown_test(self):
+        response = APIClient().post('/submission/custom-test-callback/', {
+            'submission_id': 'selftest-unknown', 'status': 'AC',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_wait(self):
+        response = self.client.get(self.result_url, {'wait': 'soon'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(json.loads(response.content)['message'], 'wait 必須是數字')
@@ -78,7 +78,7 @@ class TestCustomTestAPI:
         
         # Mock Celery 任務（正確的模組路徑）
         with patch('submissions.tasks.submit_selftest_to_sandbox_task') as mock_task:
-            mock_task.delay.return_value = MagicMock()
+            mock_task.apply_async.return_value = MagicMock()
             
             response = self.client.post(url, data, format='json')
             
@@ -92,7 +92,7 @@ class TestCustomTestAPI:
             assert response_data['status'] == 'pending'
             
             # 檢查 Celery 任務是否被調用
-            mock_task.delay.assert_called_once()
+            mock_task.apply_async.assert_called_once()
     
     def test_submit_custom_test_missing_source_code(self):
         """測試缺少 source_code 欄位"""
@@ -159,7 +159,7 @@ class TestCustomTestAPI:
         }
         
         with patch('submissions.tasks.submit_selftest_to_sandbox_task') as mock_task:
-            mock_task.delay.return_value = MagicMock()
+            mock_task.apply_async.return_value = MagicMock()
             
             response = self.client.post(url, data, format='json')
             
@@ -176,7 +176,7 @@ class TestCustomTestAPI:
         }
         
         with patch('submissions.tasks.submit_selftest_to_sandbox_task') as mock_task:
-            mock_task.delay.return_value = MagicMock()
+            mock_task.apply_async.return_value = MagicMock()
             
             response = self.client.post(url, data, format='json')
             
@@ -251,10 +251,11 @@ class TestSandboxClient:
         assert get_file_extension('javascript') == 'js'
         assert get_file_extension('unknown') == 'txt'  # 預設值
     
-    @patch('submissions.sandbox_client.requests.post')
-    def test_submit_selftest_to_sandbox(self, mock_post):
+    @patch('submissions.sandbox_client.get_session')
+    def test_submit_selftest_to_sandbox(self, mock_session):
         """測試提交自定義測試到 Sandbox"""
         from submissions.sandbox_client import submit_selftest_to_sandbox
+        mock_post = mock_session.return_value.post
         
         # Mock HTTP 回應
         mock_response = MagicMock()
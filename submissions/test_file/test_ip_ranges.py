@@ -0,0 +1,147 @@
+# submissions/test_file/test_ip_ranges.py - 測試 IP 範圍查詢
+"""
+測試 ip_sort_key 的排序性質、CIDR 範圍查詢，
+以及提交列表 ip_prefix 與作業 ip_whitelist 共用的範圍條件
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from assignments.models import Assignments
+from ..ip_ranges import cidr_key_range, cidr_q, ip_in_networks, ip_sort_key, parse_cidr_list
+from ..models import Submission
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class IpSortKeyTests(SimpleTestCase):
+    """測試可排序的 IP 表示"""
+
+    def test_order_matches_numeric_order(self):
+        ips = ['9.255.255.255', '10.0.0.0', '10.0.0.255', '10.0.1.0', '192.168.1.2', '2001:db8::1', 'fe80::1']
+        keys = [ip_sort_key(ip) for ip in ips]
+        self.assertEqual(keys, sorted(keys))
+        self.assertTrue(all(len(key) == 32 for key in keys))
+
+    def test_ipv4_mapped_matches_ipv4(self):
+        self.assertEqual(ip_sort_key('::ffff:10.0.0.1'), ip_sort_key('10.0.0.1'))
+
+    def test_invalid_ip(self):
+        self.assertIsNone(ip_sort_key(None))
+        self.assertIsNone(ip_sort_key('unknown'))
+
+    def test_cidr_range(self):
+        low, high = cidr_key_range('192.168.1.77/24')
+        self.assertEqual(low, ip_sort_key('192.168.1.0'))
+        self.assertEqual(high, ip_sort_key('192.168.1.255'))
+
+        low, high = cidr_key_range('2001:db8::/32')
+        self.assertEqual(low, ip_sort_key('2001:db8::'))
+        self.assertEqual(high, ip_sort_key('2001:db8:ffff:ffff:ffff:ffff:ffff:ffff'))
+
+        with self.assertRaises(ValueError):
+            cidr_key_range('10.0.0.0/33')
+
+    def test_ip_in_networks(self):
+        networks = parse_cidr_list('10.0.0.0/8,\n 2001:db8::/32')
+        self.assertTrue(ip_in_networks('10.20.30.40', networks))
+        self.assertTrue(ip_in_networks('2001:db8::5', networks))
+        self.assertFalse(ip_in_networks('11.0.0.1', networks))
+        self.assertFalse(ip_in_networks('garbage', networks))
+
+
+@pytest.mark.django_db
+class CidrFilterTests(SubmissionAPITestSetup, TestCase):
+    """測試資料庫中的 CIDR 範圍查詢"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.subs = {
+            ip: Submission.objects.create(
+                problem_id=self.problem1.id, user=self.student1, language_type=2,
+                source_code='print(1)', ip_address=ip,
+            )
+            for ip in ('192.168.1.10', '192.168.2.10', '10.0.0.1', '2001:db8::1')
+        }
+
+    def test_save_keeps_sort_key_in_sync(self):
+        submission = self.subs['10.0.0.1']
+        self.assertEqual(submission.ip_sort_key, ip_sort_key('10.0.0.1'))
+
+        submission.ip_address = '10.0.0.2'
+        submission.save(update_fields=['ip_address'])
+        submission.refresh_from_db()
+        self.assertEqual(submission.ip_sort_key, ip_sort_key('10.0.0.2'))
+
+    def test_backfill_migration(self):
+        from importlib import import_module
+        from unittest.mock import patch
+        from django.apps import apps
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Submission.objects.update(ip_sort_key=None)
+        migration = import_module('submissions.migrations.0010_submission_ip_sort_key')
+        # 每段 2 筆，跨多段依主鍵推進；寫入為整段 bulk_update，不依 ip_address 逐一 UPDATE
+        with patch.object(migration, 'BACKFILL_CHUNK_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            migration.backfill_ip_sort_key(apps, None)
+        self.assertFalse(any(
+            q['sql'].startswith('UPDATE') and 'WHERE "submissions"."ip_address"' in q['sql']
+            for q in queries.captured_queries
+        ))
+
+        for ip, submission in self.subs.items():
+            submission.refresh_from_db()
+            self.assertEqual(submission.ip_sort_key, ip_sort_key(ip))
+
+    def test_cidr_q(self):
+        matched = Submission.objects.filter(cidr_q(['192.168.0.0/16', '2001:db8::/32']))
+        self.assertEqual(
+            set(matched.values_list('ip_address', flat=True)),
+            {'192.168.1.10', '192.168.2.10', '2001:db8::1'},
+        )
+        self.assertFalse(Submission.objects.filter(cidr_q([])).exists())
+
+    def test_cidr_filter_is_range_predicate(self):
+        """CIDR 過濾是資料庫端的範圍比較，不先取出所有提交"""
+        queryset = Submission.objects.filter(cidr_q(['192.168.1.0/24']))
+        sql = str(queryset.query)
+        self.assertIn('"submissions"."ip_sort_key" >=', sql)
+        self.assertIn('"submissions"."ip_sort_key" <=', sql)
+        self.assertIn('ip_sort', queryset.explain())
+
+    def test_list_view_cidr_filter(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+
+        # 沒有分頁參數時回傳完整列表，不另外 COUNT
+        with self.assertNumQueries(2):
+            response = client.get('/submission/', {'ip_prefix': '192.168.1.0/24'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['data']['results']
+        self.assertEqual([sub['ipAddr'] for sub in results], ['192.168.1.10'])
+
+    def test_assignment_whitelist(self):
+        now = timezone.now()
+        assignment = Assignments.objects.create(
+            title='HW', course=self.course1, creator=self.teacher,
+            start_time=now, due_time=now + timedelta(days=1),
+            ip_whitelist='192.168.1.0/24\n2001:db8::/32',
+        )
+        self.assertTrue(assignment.allows_ip('192.168.1.99'))
+        self.assertFalse(assignment.allows_ip('10.0.0.1'))
+        self.assertEqual(
+            set(Submission.objects.filter(assignment.whitelisted_submissions_q()).values_list('ip_address', flat=True)),
+            {'192.168.1.10', '2001:db8::1'},
+        )
+
+        assignment.ip_whitelist = ''
+        self.assertTrue(assignment.allows_ip('10.0.0.1'))
+        self.assertEqual(Submission.objects.filter(assignment.whitelisted_submissions_q()).count(), 4)
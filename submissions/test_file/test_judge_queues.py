@@ -0,0 +1,103 @@
+# submissions/test_file/test_judge_queues.py - 測試判題任務的佇列與優先級
+"""
+測試 enqueue_submission 依作業截止時間與重新判題決定佇列與優先級，
+以及 celeryd_init 依佇列套用 worker 設定
+"""
+
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.test import TestCase
+from django.utils import timezone
+
+from assignments.models import Assignment_problems, Assignments
+from back_end.celery import app, apply_queue_worker_options
+from ..models import Submission
+from ..tasks import enqueue_submission, judge_priority
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+@pytest.mark.django_db
+class JudgePriorityTests(SubmissionAPITestSetup, TestCase):
+    """測試判題優先級"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.submission = Submission.objects.create(
+            problem_id=self.problem1.id, user=self.student1, language_type=2, source_code='print(1)'
+        )
+
+    def add_assignment(self, due_in, status=Assignments.Status.ACTIVE):
+        now = timezone.now()
+        assignment = Assignments.objects.create(
+            title='HW', course=self.course1, creator=self.teacher,
+            start_time=now - timedelta(days=1), due_time=now + due_in, status=status,
+        )
+        Assignment_problems.objects.create(assignment=assignment, problem=self.problem1, order_index=1)
+
+    def test_normal_submission(self):
+        self.assertEqual(judge_priority(self.submission), settings.JUDGE_TASK_PRIORITIES['submission'])
+
+    def test_deadline_submission_jumps_ahead(self):
+        self.add_assignment(timedelta(minutes=10))
+        self.assertEqual(judge_priority(self.submission), settings.JUDGE_TASK_PRIORITIES['deadline'])
+
+    def test_far_or_inactive_deadline_not_prioritized(self):
+        self.add_assignment(timedelta(days=3))
+        self.add_assignment(timedelta(minutes=10), status=Assignments.Status.DRAFT)
+        self.assertEqual(judge_priority(self.submission), settings.JUDGE_TASK_PRIORITIES['submission'])
+
+    def test_rejudge_uses_rejudge_queue(self):
+        self.add_assignment(timedelta(minutes=10))
+        with patch('submissions.tasks.submit_to_sandbox_task.apply_async') as apply_async:
+            enqueue_submission(self.submission, rejudge=True)
+        apply_async.assert_called_once_with(
+            args=(str(self.submission.id),),
+            priority=settings.JUDGE_TASK_PRIORITIES['rejudge'],
+            queue=settings.REJUDGE_QUEUE,
+        )
+
+    def test_submission_routed_to_judge_queue(self):
+        self.add_assignment(timedelta(minutes=10))
+        with patch('submissions.tasks.submit_to_sandbox_task.apply_async') as apply_async:
+            enqueue_submission(self.submission)
+        apply_async.assert_called_once_with(
+            args=(str(self.submission.id),), priority=settings.JUDGE_TASK_PRIORITIES['deadline'],
+        )
+
+
+class QueueRoutingTests(TestCase):
+    """測試佇列路由與 worker 設定"""
+
+    def route(self, name, **options):
+        return app.amqp.router.route(options, name)
+
+    def test_task_routes(self):
+        judge = self.route('submissions.tasks.submit_to_sandbox_task')
+        self.assertEqual(judge['queue'].name, 'judge')
+        self.assertEqual(judge['priority'], settings.JUDGE_TASK_PRIORITIES['submission'])
+        self.assertEqual(self.route('submissions.tasks.submit_selftest_to_sandbox_task')['queue'].name, 'selftest')
+
+    def test_explicit_options_override_route(self):
+        options = self.route('submissions.tasks.submit_to_sandbox_task', queue='rejudge', priority=6)
+        self.assertEqual(options['queue'].name, 'rejudge')
+        self.assertEqual(options['priority'], 6)
+
+    def test_worker_options_applied_for_single_queue(self):
+        conf = SimpleNamespace(worker_concurrency=None, worker_prefetch_multiplier=4)
+        apply_queue_worker_options(conf=conf, options={'queues': ['judge']})
+        self.assertEqual(conf.worker_concurrency, settings.WORKER_QUEUE_OPTIONS['judge']['concurrency'])
+        self.assertEqual(conf.worker_prefetch_multiplier, 1)
+
+    def test_command_line_options_win(self):
+        conf = SimpleNamespace(worker_concurrency=None, worker_prefetch_multiplier=4)
+        apply_queue_worker_options(conf=conf, options={'queues': ['judge'], 'concurrency': 3})
+        self.assertIsNone(conf.worker_concurrency)
+
+        apply_queue_worker_options(conf=conf, options={'queues': ['judge', 'selftest']})
+        self.assertIsNone(conf.worker_concurrency)
@@ -0,0 +1,230 @@
+# submissions/test_file/test_problem_stats.py - 測試作業統計聚合
+"""
+測試 UserProblemStats 的 micro-batch 聚合：
+callback commit 後寫入 Redis 緩衝、任務取出一批依作業 GROUP BY 重算（含遲交扣分），
+以及 catch-up 模式整份作業重算
+
+測試環境沒有 Redis，使用只實作緩衝用到指令的記憶體替身
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from assignments.models import Assignment_problems, Assignments
+from courses.models import Course_members
+from ..models import Submission, UserProblemStats
+from ..problem_stats import (
+    PENDING_KEY, SCHEDULED_KEY, UserProblemStatsAggregator, apply_judged_submissions,
+)
+from ..tasks import aggregate_user_problem_stats_task
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class FakeRedis:
+    """只支援緩衝用到的 list 與 SET NX 指令"""
+
+    def __init__(self):
+        self.lists = {}
+        self.values = {}
+
+    def rpush(self, key, *values):
+        self.lists.setdefault(key, []).extend(str(v) for v in values)
+
+    def lpop(self, key, count):
+        items = self.lists.get(key, [])
+        batch, self.lists[key] = items[:count], items[count:]
+        return batch or None
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+@pytest.mark.django_db
+@override_settings(USER_PROBLEM_STATS={'batch_size': 3, 'flush_delay': 2})
+class UserProblemStatsAggregationTests(SubmissionAPITestSetup, TestCase):
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        Course_members.objects.create(
+            course_id=self.course1, user_id=self.student2, role=Course_members.Role.STUDENT,
+        )
+        self.due = timezone.now() - timedelta(days=1)
+        self.start = self.due - timedelta(days=7)
+        self.hw = Assignments.objects.create(
+            title='HW1', course=self.course1, creator=self.teacher,
+            start_time=self.start, due_time=self.due, late_penalty=Decimal('20.00'),
+        )
+        Assignment_problems.objects.create(assignment=self.hw, problem=self.problem1, order_index=1)
+        Assignment_problems.objects.create(
+            assignment=self.hw, problem=self.problem2, order_index=2, weight=Decimal('0.50'),
+        )
+
+    def judged(self, user, problem, status_code, score, late=False, created_at=None):
+        submission = Submission.objects.create(
+            problem_id=problem.id, user=user, language_type=2, source_code='print(1)',
+            status=status_code, score=score, execution_time=10, memory_usage=100,
+            judged_at=timezone.now(),
+        )
+        if created_at is None:
+            created_at = self.due + timedelta(hours=1) if late else self.due - timedelta(hours=1)
+        Submission.objects.filter(id=submission.id).update(created_at=created_at)
+        return submission
+
+    def stats(self, user, problem):
+        return UserProblemStats.objects.get(user=user, assignment_id=self.hw.id, problem_id=problem.id)
+
+    def test_batch_applies_late_penalty(self):
+        on_time = self.judged(self.student1, self.problem1, '1', 60)
+        late = self.judged(self.student1, self.problem1, '0', 100, late=True)
+        half = self.judged(self.student2, self.problem2, '0', 50)
+
+        self.assertEqual(apply_judged_submissions([on_time.id, late.id, half.id]), 2)
+
+        stats = self.stats(self.student1, self.problem1)
+        self.assertEqual(stats.total_submissions, 2)
+        self.assertEqual(stats.best_score, 80)
+        self.assertEqual(stats.best_submission_id, late.id)
+        self.assertTrue(stats.is_late)
+        self.assertEqual(stats.penalty_score, Decimal('20.00'))
+        self.assertEqual(stats.solve_status, 'partial')
+        self.assertIsNotNone(stats.first_ac_time)
+
+        # weight 0.5 的題目滿分為 50
+        stats = self.stats(self.student2, self.problem2)
+        self.assertEqual(stats.max_possible_score, 50)
+        self.assertEqual(stats.solve_status, 'solved')
+        self.assertFalse(stats.is_late)
+
+    def test_reapplying_is_idempotent(self):
+        submission = self.judged(self.student1, self.problem1, '0', 100)
+        apply_judged_submissions([submission.id])
+        apply_judged_submissions([submission.id, submission.id])
+
+        stats = self.stats(self.student1, self.problem1)
+        self.assertEqual(stats.total_submissions, 1)
+        self.assertEqual(stats.solve_status, 'solved')
+        self.assertEqual(UserProblemStats.objects.count(), 1)
+
+    def test_pending_submissions_not_counted(self):
+        judged = self.judged(self.student1, self.problem1, '1', 0)
+        self.judged(self.student1, self.problem1, '-1', 0)
+        apply_judged_submissions([judged.id])
+        self.assertEqual(self.stats(self.student1, self.problem1).total_submissions, 1)
+
+    def test_only_course_members_after_start_counted(self):
+        # 作業開始前已解過（公開題或其他作業）的提交不算
+        early = self.judged(self.student1, self.problem1, '0', 100, created_at=self.start - timedelta(days=1))
+        attempt = self.judged(self.student1, self.problem1, '1', 30)
+        # 非課程成員的提交不產生統計
+        outsider = self.judged(self.admin, self.problem1, '0', 100)
+
+        apply_judged_submissions([early.id, attempt.id, outsider.id])
+
+        stats = self.stats(self.student1, self.problem1)
+        self.assertEqual(stats.total_submissions, 1)
+        self.assertEqual(stats.best_score, 30)
+        self.assertEqual(stats.best_submission_id, attempt.id)
+        self.assertEqual(stats.solve_status, 'partial')
+        self.assertIsNone(stats.first_ac_time)
+        self.assertFalse(UserProblemStats.objects.filter(user=self.admin).exists())
+
+    def test_buffer_drained_in_micro_batches(self):
+        client = FakeRedis()
+        aggregator = UserProblemStatsAggregator(client=client)
+        submissions = [self.judged(self.student1, self.problem1, '1', score) for score in (10, 20, 30, 40)]
+
+        with patch('submissions.tasks.aggregate_user_problem_stats_task.apply_async') as mock_task:
+            for submission in submissions:
+                self.assertTrue(aggregator.enqueue(submission.id))
+        # flush_delay 內只排程一次
+        mock_task.assert_called_once_with(countdown=2)
+
+        self.assertEqual(aggregator.drain(), (3, 1))
+        self.assertNotIn(SCHEDULED_KEY, client.values)
+        self.assertEqual(aggregator.drain(), (1, 0))
+        self.assertEqual(self.stats(self.student1, self.problem1).best_score, 40)
+
+    def test_task_reschedules_remaining_events(self):
+        client = FakeRedis()
+        aggregator = UserProblemStatsAggregator(client=client)
+        for score in (10, 20, 30, 40):
+            client.rpush(PENDING_KEY, self.judged(self.student1, self.problem1, '1', score).id)
+
+        with patch('submissions.problem_stats.user_problem_stats', aggregator), \
+                patch('submissions.tasks.aggregate_user_problem_stats_task.apply_async') as mock_task:
+            result = aggregate_user_problem_stats_task.apply().get()
+
+        self.assertEqual(result, {'processed': 3, 'remaining': 1})
+        mock_task.assert_called_once_with(countdown=0)
+
+    def test_failed_batch_returns_to_buffer(self):
+        client = FakeRedis()
+        aggregator = UserProblemStatsAggregator(client=client)
+        client.rpush(PENDING_KEY, self.judged(self.student1, self.problem1, '1', 10).id)
+
+        with patch('submissions.problem_stats.apply_judged_submissions', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                aggregator.drain()
+        self.assertEqual(client.llen(PENDING_KEY), 1)
+
+    def test_callback_enqueues_after_commit(self):
+        submission = Submission.objects.create(
+            problem_id=self.problem1.id, user=self.student1, language_type=2,
+            source_code='print(1)', status='-1',
+        )
+        with patch('submissions.views.user_problem_stats') as mock_stats:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                response = APIClient().post('/submission/callback/', {
+                    'submission_id': str(submission.id),
+                    'status': 'accepted',
+                    'score': 100,
+                    'execution_time': 10,
+                    'memory_usage': 100,
+                    'test_results': [],
+                }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            mock_stats.enqueue.assert_not_called()
+
+            for callback in callbacks:
+                callback()
+            mock_stats.enqueue.assert_called_once_with(submission.id)
+
+    def test_catch_up_matches_incremental(self):
+        submissions = [
+            self.judged(self.student1, self.problem1, '1', 40),
+            self.judged(self.student1, self.problem1, '0', 100, late=True),
+            self.judged(self.student2, self.problem2, '1', 20),
+        ]
+        apply_judged_submissions([s.id for s in submissions])
+        incremental = list(UserProblemStats.objects.order_by('id').values(
+            'user_id', 'problem_id', 'best_score', 'total_submissions', 'solve_status', 'is_late',
+        ))
+
+        # 移除的題目在 catch-up 時一併清除
+        UserProblemStats.objects.create(user=self.student1, assignment_id=self.hw.id, problem_id=9999)
+        UserProblemStats.objects.filter(problem_id=self.problem1.id).delete()
+        call_command('rebuild_user_problem_stats', '--assignment', str(self.hw.id), stdout=open('/dev/null', 'w'))
+
+        rebuilt = list(UserProblemStats.objects.order_by('problem_id').values(
+            'user_id', 'problem_id', 'best_score', 'total_submissions', 'solve_status', 'is_late',
+        ))
+        self.assertEqual(sorted(rebuilt, key=str), sorted(incremental, key=str))
@@ -0,0 +1,137 @@
+# submissions/test_file/test_rate_limit.py - 測試速率限制
+"""
+測試 token bucket 速率限制：Lua 路徑只需一次 Redis 呼叫、
+課程覆寫、Redis 故障時透過 cache_fallback 降級，以及提交與自訂測試端點的 429 回應
+
+測試環境沒有 Redis，Lua 路徑以記錄呼叫的替身驗證
+"""
+
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..cache.rate_limit import RedisRateLimiter, rate_limiter
+from .test_submission_views_api import SubmissionAPITestSetup
+
+RATE_LIMITS = {
+    'submission': {'limit': 2, 'period': 60},
+    'custom_test': {'limit': 1, 'period': 60},
+}
+
+
+class FakeScriptRedis:
+    """只支援 register_script，腳本回傳預先設定的結果"""
+
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+        self.registered = []
+
+    def register_script(self, source):
+        self.registered.append(source)
+
+        def run(keys, args):
+            self.calls.append((keys, args))
+            return self.result
+        return run
+
+
+class BrokenRedis:
+    def register_script(self, source):
+        raise ConnectionError('timeout')
+
+
+@override_settings(RATE_LIMITS=RATE_LIMITS, RATE_LIMIT_COURSE_OVERRIDES={'7': {'submission': {'limit': 5, 'period': 10}}})
+class RedisRateLimiterTests(SimpleTestCase):
+    """測試限制設定與 Lua / 降級兩條路徑"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lua_single_round_trip(self):
+        client = FakeScriptRedis([0, 2500, 0])
+        limiter = RedisRateLimiter(client=client)
+
+        result = limiter.hit('submission', 'user:1')
+
+        self.assertFalse(result.allowed)
+        self.assertEqual(result.wait_for, 3)
+        self.assertEqual(len(client.calls), 1)
+        keys, args = client.calls[0]
+        self.assertEqual(keys, ['RATE_LIMIT:submission:user:1'])
+        self.assertEqual(args, [2, 30000.0])
+
+        limiter.hit('submission', 'user:1')
+        self.assertEqual(len(client.registered), 1)
+
+    def test_course_override(self):
+        self.assertEqual(RedisRateLimiter.get_limit('submission', 7), (5, 10, True))
+        self.assertEqual(RedisRateLimiter.get_limit('submission', 8), (2, 60, False))
+        self.assertEqual(RedisRateLimiter.get_limit('custom_test', 7), (1, 60, False))
+
+        client = FakeScriptRedis([1, 0, 4])
+        RedisRateLimiter(client=client).hit('submission', 'user:1', course_id=7)
+        self.assertEqual(client.calls[0][0], ['RATE_LIMIT:submission:course=7:user:1'])
+
+    def test_fallback_when_redis_unavailable(self):
+        limiter = RedisRateLimiter(client=BrokenRedis())
+
+        self.assertTrue(limiter.hit('submission', 'user:1').allowed)
+        self.assertTrue(limiter.hit('submission', 'user:1').allowed)
+        blocked = limiter.hit('submission', 'user:1')
+        self.assertFalse(blocked.allowed)
+        self.assertTrue(1 <= blocked.wait_for <= 60)
+
+        # 不同對象各自計算
+        self.assertTrue(limiter.hit('submission', 'user:2').allowed)
+
+    def test_fail_open_when_cache_unavailable(self):
+        limiter = RedisRateLimiter(client=BrokenRedis())
+        with patch('submissions.cache.fallback.cache.add', side_effect=ConnectionError('down')):
+            for _ in range(5):
+                self.assertTrue(limiter.hit('submission', 'user:1').allowed)
+
+
+@pytest.mark.django_db
+@override_settings(RATE_LIMITS=RATE_LIMITS, RATE_LIMIT_COURSE_OVERRIDES={})
+class RateLimitedEndpointTests(SubmissionAPITestSetup, TestCase):
+    """測試端點共用同一個速率限制"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student1)
+
+    def test_submission_returns_wait_for(self):
+        for _ in range(2):
+            rate_limiter.hit('submission', f'user:{self.student1.id}')
+
+        response = self.client.post('/submission/', {
+            'problem_id': self.problem1.id,
+            'language_type': 2,
+            'source_code': 'print(1)',
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(response.data['data']['waitFor'], 1)
+
+    def test_custom_test_returns_wait_for(self):
+        url = f'/submission/{self.problem1.id}/custom-test/'
+        data = {'language': 2, 'source_code': 'print(1)', 'stdin': ''}
+
+        with patch('submissions.tasks.submit_selftest_to_sandbox_task') as mock_task, \
+                patch('submissions.views.custom_test_store'):
+            first = self.client.post(url, data, format='json')
+            second = self.client.post(url, data, format='json')
+
+        self.assertEqual(first.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(second.data['data']['waitFor'], 1)
+        self.assertEqual(mock_task.apply_async.call_count, 1)
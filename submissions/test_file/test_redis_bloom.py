@@ -0,0 +1,219 @@
+# submissions/test_file/test_redis_bloom.py - 測試 Redis 布隆過濾器
+"""
+測試 RedisBloomFilter 的 bitmap 操作、自動擴展與 load_bloom_filter 指令
+
+測試環境沒有 Redis，使用只實作 bitmap / hash 指令的記憶體替身
+"""
+
+import pytest
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from ..cache.bloom import RedisBloomFilter
+from ..cache.protection import CachePenetrationProtection
+from ..models import Submission
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class FakeRedis:
+    """只支援布隆過濾器用到的指令"""
+
+    def __init__(self):
+        self.bitmaps = {}
+        self.hashes = {}
+
+    def setbit(self, key, offset, value):
+        bits = self.bitmaps.setdefault(key, set())
+        old = int(offset in bits)
+        if value:
+            bits.add(offset)
+        else:
+            bits.discard(offset)
+        return old
+
+    def getbit(self, key, offset):
+        return int(offset in self.bitmaps.get(key, set()))
+
+    def hget(self, key, field):
+        value = self.hashes.get(key, {}).get(field)
+        return None if value is None else str(value).encode()
+
+    def hmget(self, key, *fields):
+        return [self.hget(key, field) for field in fields]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hdel(self, key, field):
+        return int(self.hashes.get(key, {}).pop(field, None) is not None)
+
+    def append(self, key, value):
+        self.bitmaps.setdefault(key, set())
+
+    def exists(self, *keys):
+        return sum(key in self.bitmaps for key in keys)
+
+    def hincrby(self, key, field, amount):
+        data = self.hashes.setdefault(key, {})
+        data[field] = int(data.get(field, 0)) + amount
+        return data[field]
+
+    def hgetall(self, key):
+        return {f.encode(): str(v).encode() for f, v in self.hashes.get(key, {}).items()}
+
+    def delete(self, *keys):
+        for key in keys:
+            self.bitmaps.pop(key, None)
+            self.hashes.pop(key, None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((name, args))
+        return queue
+
+    def execute(self):
+        results = [getattr(self.redis, name)(*args) for name, args in self.calls]
+        self.calls = []
+        return results
+
+
+class RedisBloomFilterTests(SimpleTestCase):
+    """測試 RedisBloomFilter"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.bloom = RedisBloomFilter('test', capacity=100, error_rate=0.01, client=self.redis)
+
+    def test_added_keys_are_found(self):
+        """加入的 key 一定存在（無假陰性）"""
+        keys = [f'sub-{i}' for i in range(50)]
+        self.assertEqual(self.bloom.add_many(keys), 50)
+        for key in keys:
+            self.assertTrue(self.bloom.contains(key))
+
+    def test_false_positive_rate(self):
+        """未加入的 key 誤判率接近設定值"""
+        self.bloom.add_many(f'sub-{i}' for i in range(100))
+        false_positives = sum(self.bloom.contains(f'other-{i}') for i in range(2000))
+        self.assertLess(false_positives / 2000, 0.03)
+
+    def test_duplicate_add_not_counted(self):
+        """重複加入不增加計數"""
+        self.bloom.add('sub-1')
+        self.assertFalse(self.bloom.add('sub-1'))
+        self.assertEqual(self.bloom.stats()['segments'][0]['count'], 1)
+
+    def test_scales_to_new_segment(self):
+        """超過容量後建立新 segment，舊資料仍可查到"""
+        keys = [f'sub-{i}' for i in range(250)]
+        for start in range(0, 250, 25):
+            self.bloom.add_many(keys[start:start + 25])
+
+        segments = self.bloom.stats()['segments']
+        self.assertEqual(len(segments), 2)
+        self.assertEqual(segments[1]['capacity'], 200)
+        self.assertGreater(segments[1]['bits'], segments[0]['bits'])
+        for key in keys:
+            self.assertTrue(self.bloom.contains(key))
+
+    def test_might_contain_before_ready(self):
+        """完整載入前一律回傳可能存在"""
+        self.assertTrue(self.bloom.might_contain('missing'))
+        self.bloom.mark_ready()
+        self.assertFalse(self.bloom.might_contain('missing'))
+
+    def test_evicted_segment_fails_open(self):
+        """segment 被淘汰時清除 ready 旗標，改為放行而不是回報不存在"""
+        self.bloom.add('sub-1')
+        self.bloom.mark_ready()
+        self.assertFalse(self.bloom.might_contain('missing'))
+
+        self.redis.bitmaps.clear()
+
+        self.assertTrue(self.bloom.might_contain('sub-1'))
+        self.assertFalse(self.bloom.initialized)
+
+    def test_new_segment_created_on_scale(self):
+        """擴展時立即建立新 segment，空的 segment 不會被誤判為遺失"""
+        self.bloom.mark_ready()
+        self.bloom.add_many(f'sub-{i}' for i in range(100))
+        self.assertTrue(self.bloom.initialized)
+        self.assertFalse(self.bloom.might_contain('missing'))
+        self.assertTrue(self.bloom.initialized)
+
+    def test_shared_between_instances(self):
+        """不同 worker 的實例共用同一份 Redis 資料"""
+        other = RedisBloomFilter('test', capacity=100, error_rate=0.01, client=self.redis)
+        self.bloom.add('sub-1')
+        self.assertTrue(other.contains('sub-1'))
+
+
+class CachePenetrationProtectionFallbackTests(SimpleTestCase):
+    """Redis 不可用時的降級行為"""
+
+    def test_redis_unavailable_fails_open(self):
+        """無法連線 Redis 時 add 不拋錯、might_exist 放行"""
+        protection = CachePenetrationProtection(capacity=100, error_rate=0.01)
+        with patch('submissions.cache.bloom.get_redis_connection', side_effect=NotImplementedError):
+            protection.add('sub-1')
+            self.assertTrue(protection.might_exist('anything'))
+
+    def test_add_failure_marks_filter_dirty(self):
+        """寫入失敗後不再判定不存在，避免真實資料永久回 404"""
+        protection = CachePenetrationProtection(capacity=100, error_rate=0.01)
+        redis = FakeRedis()
+        protection.bloom_filter._client = redis
+        protection.bloom_filter.mark_ready()
+        self.assertFalse(protection.might_exist('sub-1'))
+
+        with patch.object(protection.bloom_filter, 'add_many', side_effect=ConnectionError):
+            protection.add('sub-1')
+
+        self.assertFalse(protection.initialized)
+        self.assertTrue(protection.might_exist('sub-1'))
+
+
+@pytest.mark.django_db
+class LoadBloomFilterCommandTests(SubmissionAPITestSetup, TestCase):
+    """測試 load_bloom_filter 指令"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.submissions = [
+            Submission.objects.create(
+                problem_id=self.problem1.id,
+                user=self.student1,
+                language_type=2,
+                source_code=f'print({i})',
+            )
+            for i in range(5)
+        ]
+        self.protection = CachePenetrationProtection(capacity=100, error_rate=0.01, name='cmd-test')
+        self.protection.bloom_filter._client = FakeRedis()
+
+    def test_command_streams_ids_in_chunks(self):
+        """指令分批載入所有提交 ID 並標記為可用"""
+        out = StringIO()
+        with patch('submissions.management.commands.load_bloom_filter.submission_bloom_filter', self.protection):
+            with patch.object(self.protection.bloom_filter, 'add_many', wraps=self.protection.bloom_filter.add_many) as add_many:
+                call_command('load_bloom_filter', '--chunk-size', '2', stdout=out)
+
+        self.assertEqual(add_many.call_count, 3)
+        self.assertTrue(self.protection.initialized)
+        for submission in self.submissions:
+            self.assertTrue(self.protection.might_exist(str(submission.id)))
+        self.assertIn('Loaded 5 submission IDs', out.getvalue())
@@ -0,0 +1,101 @@
+# submissions/test_file/test_sandbox_client_pool.py - 測試 Sandbox 連線池與判題設定快取
+"""
+測試 sandbox_client 共用 requests.Session，
+以及 get_judge_config 的程序內快取與失效條件
+"""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from problems.models import Problem_subtasks
+from .. import sandbox_client
+from ..models import Submission
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class SandboxSessionTests(TestCase):
+    """測試共用 Session"""
+
+    def setUp(self):
+        sandbox_client._session = None
+        sandbox_client._session_pid = None
+
+    def test_session_reused_within_process(self):
+        self.assertIs(sandbox_client.get_session(), sandbox_client.get_session())
+
+    def test_session_rebuilt_after_fork(self):
+        """fork 後的子程序使用自己的 Session"""
+        first = sandbox_client.get_session()
+        with patch('submissions.sandbox_client.os.getpid', return_value=-1):
+            second = sandbox_client.get_session()
+        self.assertIsNot(first, second)
+
+    def test_pool_size_from_settings(self):
+        adapter = sandbox_client.get_session().get_adapter('http://sandbox')
+        self.assertEqual(adapter._pool_maxsize, sandbox_client.SANDBOX_POOL_MAXSIZE)
+
+
+@pytest.mark.django_db
+class JudgeConfigCacheTests(SubmissionAPITestSetup, TestCase):
+    """測試判題設定快取"""
+
+    def setUp(self):
+        sandbox_client.clear_judge_config_cache()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.subtask = Problem_subtasks.objects.create(
+            problem_id=self.problem1, subtask_no=1, weight=100, time_limit_ms=2000, memory_limit_mb=64
+        )
+
+    def test_config_values(self):
+        config = sandbox_client.get_judge_config(self.problem1.id)
+        self.assertEqual(config['time_limit'], 2.0)
+        self.assertEqual(config['memory_limit'], 64 * 1024)
+        self.assertEqual(config['problem_hash'], f'p{self.problem1.id}')
+        self.assertEqual(config['checker_name'], 'diff')
+        self.assertFalse(config['allow_network'])
+
+    def test_cache_hit_uses_single_query(self):
+        sandbox_client.get_judge_config(self.problem1.id)
+        with self.assertNumQueries(1):
+            sandbox_client.get_judge_config(self.problem1.id)
+
+    def test_testcase_hash_change_invalidates(self):
+        sandbox_client.get_judge_config(self.problem1.id)
+        self.problem1.testcase_hash = 'a' * 64
+        self.problem1.save(update_fields=['testcase_hash'])
+
+        self.assertEqual(sandbox_client.get_judge_config(self.problem1.id)['problem_hash'], 'a' * 64)
+
+    def test_subtask_change_invalidates(self):
+        sandbox_client.get_judge_config(self.problem1.id)
+        self.subtask.time_limit_ms = 500
+        self.subtask.save()
+
+        self.assertEqual(sandbox_client.get_judge_config(self.problem1.id)['time_limit'], 0.5)
+
+    def test_cache_is_bounded(self):
+        with patch.object(sandbox_client, 'JUDGE_CONFIG_CACHE_SIZE', 1):
+            sandbox_client.get_judge_config(self.problem1.id)
+            sandbox_client.get_judge_config(self.problem2.id)
+        self.assertEqual(list(sandbox_client._judge_configs), [self.problem2.id])
+
+    def test_submit_uses_pooled_session(self):
+        submission = Submission.objects.create(
+            problem_id=self.problem1.id, user=self.student1, language_type=2, source_code='print(1)'
+        )
+        session = MagicMock()
+        session.post.return_value.status_code = 202
+        session.post.return_value.json.return_value = {'status': 'queued'}
+
+        with patch('submissions.sandbox_client.get_session', return_value=session):
+            sandbox_client.submit_to_sandbox(submission)
+            sandbox_client.submit_to_sandbox(submission)
+
+        self.assertEqual(session.post.call_count, 2)
+        data = session.post.call_args.kwargs['data']
+        self.assertEqual(data['time_limit'], 2.0)
+        self.assertEqual(data['submission_id'], str(submission.id))
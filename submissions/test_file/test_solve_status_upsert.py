@@ -0,0 +1,264 @@
+# submissions/test_file/test_solve_status_upsert.py - 測試解題統計的條件式 UPDATE
+"""
+測試 update_user_problem_stats 以單一條件式 UPDATE 在資料庫內計算統計：
+查詢次數、欄位合併規則，以及同一使用者同一題的平行 callback 不會遺失更新
+"""
+
+import threading
+from itertools import product
+from unittest import skipUnless
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models.query import QuerySet
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ..models import SolvedCountBucket, Submission, UserProblemSolveStatus, UserRanking
+from ..views import update_user_problem_stats
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+def judged(user, problem, score, execution_time=0, memory_usage=0):
+    return Submission.objects.create(
+        problem_id=problem.id, user=user, language_type=2, source_code='print(1)',
+        status='0' if score >= 100 else '1', score=score,
+        execution_time=execution_time, memory_usage=memory_usage,
+    )
+
+
+@pytest.mark.django_db
+class SolveStatusUpsertTests(SubmissionAPITestSetup, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+
+    def stats(self):
+        return UserProblemSolveStatus.objects.get(user=self.student1, problem_id=self.problem1.id)
+
+    def test_merges_in_database(self):
+        update_user_problem_stats(judged(self.student1, self.problem1, 40, execution_time=30, memory_usage=500))
+        update_user_problem_stats(judged(self.student1, self.problem1, 0))
+        stats = self.stats()
+        self.assertEqual(stats.solve_status, 'partial_solved')
+        self.assertIsNone(stats.first_solve_time)
+
+        update_user_problem_stats(judged(self.student1, self.problem1, 100, execution_time=20, memory_usage=700))
+        update_user_problem_stats(judged(self.student1, self.problem1, 60, execution_time=50, memory_usage=300))
+
+        stats = self.stats()
+        self.assertEqual(stats.total_submissions, 4)
+        self.assertEqual(stats.ac_submissions, 1)
+        self.assertEqual(stats.best_score, 100)
+        self.assertEqual(stats.solve_status, 'fully_solved')
+        self.assertIsNotNone(stats.first_solve_time)
+        self.assertEqual(stats.best_execution_time, 20)
+        self.assertEqual(stats.best_memory_usage, 300)
+        self.assertEqual(stats.total_execution_time, 100)
+
+    def test_zero_score_is_attempted(self):
+        update_user_problem_stats(judged(self.student1, self.problem1, 0))
+        update_user_problem_stats(judged(self.student1, self.problem1, 0))
+        self.assertEqual(self.stats().solve_status, 'attempted')
+
+    def test_single_update_for_existing_row(self):
+        update_user_problem_stats(judged(self.student1, self.problem1, 40))
+        submission = judged(self.student1, self.problem1, 60)
+
+        with CaptureQueriesContext(connection) as queries:
+            update_user_problem_stats(submission)
+
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(queries.captured_queries[0]['sql'].startswith('UPDATE'))
+
+    def test_concurrent_insert_falls_back_to_update(self):
+        """UPDATE 時另一個 callback 尚未建立列，INSERT 撞到唯一鍵後改走 UPDATE"""
+        first = judged(self.student1, self.problem1, 40)
+        second = judged(self.student1, self.problem1, 100)
+        real_update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            # first 的 UPDATE 沒有更新到列，接著 second 搶先完成 INSERT
+            if queryset.model is UserProblemSolveStatus and not raced:
+                raced.append(True)
+                update_user_problem_stats(second)
+                return 0
+            return real_update(queryset, **kwargs)
+
+        with patch.object(QuerySet, 'update', racing_update):
+            update_user_problem_stats(first)
+
+        stats = self.stats()
+        self.assertEqual(stats.total_submissions, 2)
+        self.assertEqual(stats.best_score, 100)
+        self.assertEqual(stats.solve_status, 'fully_solved')
+        self.assertEqual(UserRanking.objects.get(user=self.student1).solved_problem_count, 1)
+
+    def test_repeat_full_score_does_not_recount(self):
+        update_user_problem_stats(judged(self.student1, self.problem1, 100))
+        update_user_problem_stats(judged(self.student1, self.problem1, 100))
+        self.assertEqual(UserRanking.objects.get(user=self.student1).solved_problem_count, 1)
+        self.assertEqual(self.stats().ac_submissions, 2)
+
+
+@pytest.mark.django_db
+class InterleavedCallbackTests(SubmissionAPITestSetup, TestCase):
+    """
+    同一使用者同一題兩個 callback 的所有交錯順序
+
+    SQLite 測試資料庫不允許平行寫入，改為在第一個 callback 的每個 UPDATE / INSERT 之後
+    插入第二個 callback 的完整執行（等同資料庫依序執行兩者的語句），結果必須與依序執行相同
+    """
+
+    SNAPSHOT_FIELDS = (
+        'total_submissions', 'ac_submissions', 'best_score', 'solve_status',
+        'best_execution_time', 'best_memory_usage', 'total_execution_time',
+    )
+
+    def setUp(self):
+        cache.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+
+    def snapshot(self):
+        stats = UserProblemSolveStatus.objects.filter(user=self.student1, problem_id=self.problem1.id)
+        row = stats.values(*self.SNAPSHOT_FIELDS).first()
+        solved_at = stats.values_list('first_solve_time', flat=True).first()
+        return row, solved_at is not None, UserRanking.objects.get(user=self.student1).solved_problem_count
+
+    def isolated(self, *steps):
+        """在 savepoint 內執行後取結果並回滾，每種交錯從相同狀態開始"""
+        with transaction.atomic():
+            for step in steps:
+                step()
+            result = self.snapshot()
+            transaction.set_rollback(True)
+        return result
+
+    def interleave(self, first, second, after_statement):
+        """
+        執行 first，在它第 after_statement 個 UserProblemSolveStatus 語句完成後完整執行 second
+
+        Returns:
+            second 是否有執行（after_statement 超過 first 的語句數時為 False）
+        """
+        real_update, real_create = QuerySet.update, QuerySet.create
+        statements = []
+
+        def run_second():
+            statements.append(True)
+            if len(statements) == after_statement:
+                with patch.object(QuerySet, 'update', real_update), \
+                        patch.object(QuerySet, 'create', real_create):
+                    update_user_problem_stats(second)
+
+        def update(queryset, **kwargs):
+            result = real_update(queryset, **kwargs)
+            if queryset.model is UserProblemSolveStatus:
+                run_second()
+            return result
+
+        def create(queryset, **kwargs):
+            obj = real_create(queryset, **kwargs)
+            if queryset.model is UserProblemSolveStatus:
+                run_second()
+            return obj
+
+        with patch.object(QuerySet, 'update', update), patch.object(QuerySet, 'create', create):
+            update_user_problem_stats(first)
+        return len(statements) >= after_statement
+
+    def test_every_interleaving_matches_serial(self):
+        for prior_score, first_score, second_score in product((None, 40, 100), (0, 40, 100), (0, 60, 100)):
+            prior = judged(self.student1, self.problem1, prior_score) if prior_score is not None else None
+            first = judged(self.student1, self.problem1, first_score, execution_time=30, memory_usage=500)
+            second = judged(self.student1, self.problem1, second_score, execution_time=20, memory_usage=700)
+
+            def setup():
+                if prior is not None:
+                    update_user_problem_stats(prior)
+
+            expected = self.isolated(
+                setup, lambda: update_user_problem_stats(first), lambda: update_user_problem_stats(second),
+            )
+            after_statement = 1
+            while True:
+                ran = []
+                result = self.isolated(setup, lambda: ran.append(self.interleave(first, second, after_statement)))
+                if not ran[0]:
+                    break
+                with self.subTest(prior=prior_score, first=first_score, second=second_score, after=after_statement):
+                    self.assertEqual(result, expected)
+                after_statement += 1
+
+
+@pytest.mark.django_db(transaction=True)
+@skipUnless(connection.vendor == 'postgresql', 'SQLite 測試資料庫（shared cache）不允許平行寫入')
+class ParallelCallbackTests(SubmissionAPITestSetup, TransactionTestCase):
+    """同一使用者同一題同時收到多個 callback"""
+
+    WORKERS = 8
+
+    def setUp(self):
+        cache.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+
+    def run_parallel(self, submissions, scores):
+        barrier = threading.Barrier(len(submissions))
+        responses = []
+
+        def callback(submission, score):
+            try:
+                barrier.wait()
+                responses.append(APIClient().post('/submission/callback/', {
+                    'submission_id': str(submission.id),
+                    'status': 'accepted' if score >= 100 else 'wrong_answer',
+                    'score': score,
+                    'execution_time': 10,
+                    'memory_usage': 100,
+                    'test_results': [],
+                }, format='json').status_code)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=callback, args=pair) for pair in zip(submissions, scores)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def test_parallel_callbacks_keep_every_update(self):
+        scores = [100, 40, 100, 70, 0, 100, 20, 100][:self.WORKERS]
+        submissions = [
+            Submission.objects.create(
+                problem_id=self.problem1.id, user=self.student1, language_type=2,
+                source_code='print(1)', status='-1',
+            )
+            for _ in scores
+        ]
+
+        responses = self.run_parallel(submissions, scores)
+
+        self.assertEqual(responses, [200] * len(scores))
+        stats = UserProblemSolveStatus.objects.get(user=self.student1, problem_id=self.problem1.id)
+        self.assertEqual(stats.total_submissions, len(scores))
+        self.assertEqual(stats.ac_submissions, scores.count(100))
+        self.assertEqual(stats.best_score, 100)
+        self.assertEqual(stats.solve_status, 'fully_solved')
+        # 只有一個 callback 會讓這題首次進入 fully_solved
+        self.assertEqual(UserRanking.objects.get(user=self.student1).solved_problem_count, 1)
+        self.assertEqual(
+            dict(SolvedCountBucket.objects.filter(user_count__gt=0).values_list('solved_count', 'user_count')),
+            {1: 1},
+        )
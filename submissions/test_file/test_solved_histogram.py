@@ -0,0 +1,135 @@
+# submissions/test_file/test_solved_histogram.py - 測試解題數分布
+"""
+測試 SolvedCountBucket 解題數分布的維護，
+以及 /stats/user 以分布表計算 beats 百分比
+"""
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ..models import SolvedCountBucket, Submission, UserProblemSolveStatus, UserRanking
+from ..ranking import (
+    rebuild_user_rankings, record_problem_solved, solved_beats_percent,
+)
+from ..views import update_user_problem_stats
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+def buckets():
+    return dict(SolvedCountBucket.objects.filter(user_count__gt=0).values_list('solved_count', 'user_count'))
+
+
+@pytest.mark.django_db
+class SolvedHistogramTests(SubmissionAPITestSetup, TestCase):
+    """測試解題數分布的增量維護與重建"""
+
+    def setUp(self):
+        cache.clear()
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+
+    def solve(self, user, problem, score=100):
+        submission = Submission.objects.create(
+            problem_id=problem.id, user=user, language_type=2,
+            source_code='print(1)', status='0' if score >= 100 else '1', score=score,
+        )
+        update_user_problem_stats(submission)
+        return submission
+
+    def test_record_problem_solved_moves_bucket(self):
+        record_problem_solved(self.student1.id)
+        record_problem_solved(self.student2.id)
+        self.assertEqual(buckets(), {1: 2})
+
+        record_problem_solved(self.student1.id)
+        self.assertEqual(buckets(), {1: 1, 2: 1})
+        self.assertEqual(UserRanking.objects.get(user=self.student1).solved_problem_count, 2)
+
+    def test_beats_percent(self):
+        self.assertEqual(solved_beats_percent(3), 0.0)
+
+        record_problem_solved(self.student1.id)
+        record_problem_solved(self.student1.id)
+        record_problem_solved(self.student2.id)
+        record_problem_solved(self.ta.id)
+
+        self.assertEqual(solved_beats_percent(2), pytest.approx(200 / 3))
+        self.assertEqual(solved_beats_percent(1), 0.0)
+
+    def test_only_first_fully_solved_counts(self):
+        self.solve(self.student1, self.problem1, score=50)
+        self.assertEqual(buckets(), {})
+
+        self.solve(self.student1, self.problem1)
+        self.solve(self.student1, self.problem1)
+        self.assertEqual(buckets(), {1: 1})
+
+        self.solve(self.student1, self.problem2)
+        self.assertEqual(buckets(), {2: 1})
+        self.assertEqual(UserRanking.objects.get(user=self.student1).solved_problem_count, 2)
+
+    def test_user_deleted_leaves_histogram(self):
+        self.solve(self.student1, self.problem1)
+        self.solve(self.student2, self.problem1)
+        self.assertEqual(buckets(), {1: 2})
+
+        self.student2.delete()
+        self.assertEqual(buckets(), {1: 1})
+
+    def test_rebuild_matches_incremental(self):
+        self.solve(self.student1, self.problem1)
+        self.solve(self.student1, self.problem2)
+        self.solve(self.student2, self.problem1)
+        incremental = buckets()
+
+        SolvedCountBucket.objects.all().delete()
+        UserRanking.objects.update(solved_problem_count=0)
+        rebuild_user_rankings()
+
+        self.assertEqual(buckets(), incremental)
+        self.assertEqual(UserRanking.objects.get(user=self.student1).solved_problem_count, 2)
+
+    def test_backfill_migration(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        self.solve(self.student1, self.problem1)
+        self.solve(self.student2, self.problem1)
+        self.solve(self.student2, self.problem2)
+        SolvedCountBucket.objects.all().delete()
+        UserRanking.objects.update(solved_problem_count=0)
+
+        migration = import_module('submissions.migrations.0011_solved_count_histogram')
+        migration.backfill_solved_counts(apps, None)
+
+        self.assertEqual(buckets(), {1: 1, 2: 1})
+        self.assertEqual(UserRanking.objects.get(user=self.student2).solved_problem_count, 2)
+
+    def test_user_stats_reads_histogram(self):
+        self.solve(self.student1, self.problem1)
+        self.solve(self.student1, self.problem2)
+        self.solve(self.student2, self.problem1)
+        cache.clear()
+
+        client = APIClient()
+        client.force_authenticate(user=self.student1)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(f'/stats/user/{self.student1.id}/')
+
+        stats = response.data['data']['user_stats']
+        self.assertEqual(stats['total_solved'], 2)
+        self.assertEqual(stats['beats_percent'], 50.0)
+
+        # beats 不再對 UserProblemSolveStatus 做 GROUP BY user_id
+        solve_status_table = UserProblemSolveStatus._meta.db_table
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            self.assertFalse(
+                solve_status_table in sql and 'GROUP BY "{}"."user_id"'.format(solve_status_table) in sql,
+                sql,
+            )
@@ -0,0 +1,292 @@
+# submissions/test_file/test_status_stream.py - 測試判題狀態推播
+"""
+測試 SubmissionStatusHub 的有界分送、callback commit 後的推播，
+以及 /submission/stream/ 的 SSE 回應
+
+測試環境沒有 Redis，hub 的訊息來源以 asyncio.Queue 替身取代
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ..models import Submission
+from ..status_stream import StreamFull, StreamUnavailable, SubmissionStatusHub
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class QueueSource:
+    """以 asyncio.Queue 模擬 Redis 訂閱，記錄建立的訂閱數"""
+
+    def __init__(self, confirm=True):
+        self.queue = None
+        self.opened = 0
+        # False 時不確認訂閱，模擬 Redis 無法連線
+        self.confirm = confirm
+
+    def __call__(self, on_subscribed):
+        self.opened += 1
+        return self.messages(on_subscribed)
+
+    async def messages(self, on_subscribed):
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        if self.confirm:
+            on_subscribed()
+        while True:
+            yield await self.queue.get()
+
+    async def publish(self, event):
+        while self.queue is None:
+            await asyncio.sleep(0)
+        await self.queue.put(json.dumps(event))
+
+
+def event(user_id, submission_id, status_code='0', score=100):
+    return {'user_id': str(user_id), 'submission_id': str(submission_id), 'status': status_code, 'score': score}
+
+
+class SubmissionStatusHubTests(SimpleTestCase):
+    """測試分送路由與上限"""
+
+    def test_dispatch_routes_by_owner_and_submission(self):
+        async def scenario():
+            hub = SubmissionStatusHub(source=QueueSource(), max_clients=10, max_per_user=5, queue_size=4)
+            all_subs = hub.subscribe('u1')
+            one_sub = hub.subscribe('u1', submission_id='s1')
+            other = hub.subscribe('u2')
+
+            self.assertEqual(hub.dispatch(event('u1', 's2')), 1)
+            self.assertEqual(hub.dispatch(event('u1', 's1')), 2)
+            self.assertEqual(all_subs.queue.qsize(), 2)
+            self.assertEqual(one_sub.queue.qsize(), 1)
+            self.assertEqual(other.queue.qsize(), 0)
+
+            for sub in (all_subs, one_sub, other):
+                hub.unsubscribe(sub)
+
+        asyncio.run(scenario())
+
+    def test_connection_limits(self):
+        async def scenario():
+            hub = SubmissionStatusHub(source=QueueSource(), max_clients=3, max_per_user=2, queue_size=4)
+            first = hub.subscribe('u1')
+            hub.subscribe('u1')
+            with self.assertRaises(StreamFull):
+                hub.subscribe('u1')
+
+            # 老師訂閱學生的提交，依開啟連線的使用者計算上限
+            hub.subscribe('u1', submission_id='s1', viewer_id='teacher')
+            with self.assertRaises(StreamFull):
+                hub.subscribe('u2')
+
+            hub.unsubscribe(first)
+            hub.subscribe('u2')
+            self.assertEqual(hub.client_count, 3)
+
+        asyncio.run(scenario())
+
+    def test_slow_client_keeps_latest_events(self):
+        async def scenario():
+            hub = SubmissionStatusHub(source=QueueSource(), max_clients=10, max_per_user=5, queue_size=4)
+            sub = hub.subscribe('u1')
+            for score in range(20):
+                hub.dispatch(event('u1', 's1', score=score))
+
+            self.assertEqual(sub.queue.qsize(), 4)
+            self.assertEqual(sub.dropped, 16)
+            self.assertEqual(sub.queue.get_nowait()['score'], 16)
+            hub.unsubscribe(sub)
+
+        asyncio.run(scenario())
+
+    def test_single_subscription_per_hub(self):
+        """多條連線共用一條訂閱，最後一條連線關閉時停止訂閱"""
+        async def scenario():
+            source = QueueSource()
+            hub = SubmissionStatusHub(source=source, max_clients=10, max_per_user=5, queue_size=4)
+            subs = [hub.subscribe(f'u{i}') for i in range(5)]
+
+            await source.publish(event('u3', 's1'))
+            received = await asyncio.wait_for(subs[3].queue.get(), timeout=1)
+            self.assertEqual(received['submission_id'], 's1')
+            self.assertEqual(source.opened, 1)
+
+            listener = hub._listener
+            for sub in subs:
+                hub.unsubscribe(sub)
+            await asyncio.sleep(0)
+            self.assertTrue(listener.cancelled() or listener.done())
+
+        asyncio.run(scenario())
+
+    def test_wait_subscribed(self):
+        """訂閱確認前不回傳；重連期間清除確認狀態"""
+        async def scenario():
+            hub = SubmissionStatusHub(source=QueueSource(confirm=False), max_clients=10, max_per_user=5, queue_size=4)
+            sub = hub.subscribe('u1')
+            with self.assertRaises(StreamUnavailable):
+                await hub.wait_subscribed(timeout=0.05)
+            hub.unsubscribe(sub)
+
+            source = QueueSource()
+            hub = SubmissionStatusHub(source=source, max_clients=10, max_per_user=5, queue_size=4)
+            sub = hub.subscribe('u1')
+            await hub.wait_subscribed(timeout=1)
+            hub.unsubscribe(sub)
+            self.assertFalse(hub._subscribed.is_set())
+
+        asyncio.run(scenario())
+
+    def test_fan_out_load(self):
+        """2000 條連線、每秒數千筆事件時，分送只碰到該使用者的連線"""
+        async def scenario():
+            hub = SubmissionStatusHub(source=QueueSource(), max_clients=2000, max_per_user=5, queue_size=16)
+            subs = [hub.subscribe(f'u{i % 1000}') for i in range(2000)]
+
+            started = time.perf_counter()
+            delivered = sum(hub.dispatch(event(f'u{i % 1000}', f's{i}')) for i in range(5000))
+            elapsed = time.perf_counter() - started
+
+            self.assertEqual(delivered, 10000)
+            self.assertLess(elapsed, 1.0)
+            self.assertTrue(all(sub.queue.qsize() == 5 for sub in subs))
+            for sub in subs:
+                hub.unsubscribe(sub)
+
+        asyncio.run(scenario())
+
+
+@pytest.mark.django_db
+class SubmissionStatusStreamTests(SubmissionAPITestSetup, TestCase):
+    """測試 callback 推播與 SSE 端點"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.submission = Submission.objects.create(
+            problem_id=self.problem1.id, user=self.student1, language_type=2,
+            source_code='print(1)', status='-1',
+        )
+
+    def auth_header(self, user):
+        return {'headers': {'Authorization': f'Bearer {AccessToken.for_user(user)}'}}
+
+    @patch('submissions.views.publish_submission_status')
+    def test_callback_publishes_after_commit(self, mock_publish):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response = APIClient().post('/submission/callback/', {
+                'submission_id': str(self.submission.id),
+                'status': 'wrong_answer',
+                'score': 40,
+                'execution_time': 10,
+                'memory_usage': 100,
+                'test_results': [],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_publish.assert_not_called()
+
+        for callback in callbacks:
+            callback()
+        published = mock_publish.call_args.args[0]
+        self.assertEqual(published['submission_id'], str(self.submission.id))
+        self.assertEqual(published['user_id'], str(self.student1.id))
+        self.assertEqual(published['status'], '1')
+        self.assertEqual(published['score'], 40)
+
+    def test_stream_requires_authentication(self):
+        response = self.client.get('/submission/stream/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stream_permission_checked(self):
+        response = self.client.get(f'/submission/{self.submission.id}/stream/', **self.auth_header(self.student2))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_finished_submission_streams_once(self):
+        from django.test import AsyncClient
+
+        await Submission.objects.filter(id=self.submission.id).aupdate(status='0', score=100)
+
+        hub = SubmissionStatusHub(source=QueueSource(), max_clients=10, max_per_user=5, queue_size=4)
+        with patch('submissions.status_stream.get_status_hub', return_value=hub):
+            response = await AsyncClient().get(
+                f'/submission/{self.submission.id}/stream/', **self.auth_header(self.student1)
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertIn('event: status', body)
+        payload = json.loads(body.split('data: ')[1].split('\n')[0])
+        self.assertEqual(payload['status'], '0')
+        self.assertNotIn('user_id', payload)
+        self.assertEqual(hub.client_count, 0)
+
+    async def test_pending_submission_receives_push(self):
+        from django.test import AsyncClient
+
+        source = QueueSource()
+        hub = SubmissionStatusHub(source=source, max_clients=10, max_per_user=5, queue_size=4)
+        with patch('submissions.status_stream.get_status_hub', return_value=hub):
+            response = await AsyncClient().get(
+                f'/submission/{self.submission.id}/stream/', **self.auth_header(self.student1)
+            )
+            chunks = response.streaming_content
+            self.assertEqual((await anext(chunks)).decode(), 'retry: 3000\n\n')
+            initial = (await anext(chunks)).decode()
+            self.assertIn('"status": "-1"', initial)
+
+            await source.publish(event(self.student1.id, self.submission.id, score=100))
+            pushed = (await asyncio.wait_for(anext(chunks), timeout=2)).decode()
+            self.assertIn('"score": 100', pushed)
+
+            # 收到最終狀態後串流結束並釋放連線
+            with self.assertRaises(StopAsyncIteration):
+                await anext(chunks)
+            self.assertEqual(hub.client_count, 0)
+
+    async def test_state_read_after_subscription_confirmed(self):
+        """判題在確認訂閱前完成時，確認後讀取的目前狀態已包含結果"""
+        from django.test import AsyncClient
+
+        confirmations = []
+
+        class DelayedSource(QueueSource):
+            async def messages(inner, on_subscribed):
+                inner.queue = asyncio.Queue()
+                # 確認前完成判題：這次發布訂閱收不到
+                await Submission.objects.filter(id=self.submission.id).aupdate(status='0', score=100)
+                confirmations.append(True)
+                on_subscribed()
+                while True:
+                    yield await inner.queue.get()
+
+        hub = SubmissionStatusHub(source=DelayedSource(), max_clients=10, max_per_user=5, queue_size=4)
+        with patch('submissions.status_stream.get_status_hub', return_value=hub):
+            response = await AsyncClient().get(
+                f'/submission/{self.submission.id}/stream/', **self.auth_header(self.student1)
+            )
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(confirmations, [True])
+        self.assertIn('"status": "0"', body)
+        self.assertEqual(hub.client_count, 0)
+
+    async def test_unconfirmed_subscription_returns_503(self):
+        from django.test import AsyncClient
+
+        hub = SubmissionStatusHub(source=QueueSource(confirm=False), max_clients=10, max_per_user=5, queue_size=4)
+        with patch('submissions.status_stream.get_status_hub', return_value=hub), \
+                self.settings(SUBMISSION_STREAM={**settings.SUBMISSION_STREAM, 'subscribe_timeout': 0.05}):
+            response = await AsyncClient().get(
+                f'/submission/{self.submission.id}/stream/', **self.auth_header(self.student1)
+            )
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertEqual(hub.client_count, 0)
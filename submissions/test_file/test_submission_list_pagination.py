@@ -0,0 +1,103 @@
+# submissions/test_file/test_submission_list_pagination.py - 測試提交列表分頁
+"""
+測試 GET /submission/ 的 keyset 分頁、舊版頁碼分頁與有上限的 count，
+以及沒有分頁參數時維持回傳全部資料；回應維持 NOJ 格式的 results / count
+"""
+
+import pytest
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ..models import Submission
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+@pytest.mark.django_db
+class SubmissionListPaginationTests(SubmissionAPITestSetup, TestCase):
+    """測試提交列表分頁"""
+
+    url = '/submission/'
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        for user in (self.student1, self.student2, self.student1):
+            Submission.objects.create(
+                problem_id=self.problem1.id, user=user, language_type=2, source_code='print(1)'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def get_data(self, *args, **kwargs):
+        response = self.client.get(*args, **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['data']
+
+    def test_cursor_pages(self):
+        """keyset 分頁：依 next 連結逐頁取得，不重複也不遺漏"""
+        data = self.get_data(self.url, {'page_size': 2})
+        self.assertEqual(data['count'], 3)
+        self.assertFalse(data['count_capped'])
+        self.assertIn('cursor=', data['next'])
+        self.assertIsNone(data['previous'])
+        seen = [sub['submissionId'] for sub in data['results']]
+
+        data = self.get_data(data['next'])
+        seen += [sub['submissionId'] for sub in data['results']]
+        self.assertIsNone(data['next'])
+
+        expected = Submission.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, [str(sid) for sid in expected])
+
+    def test_cursor_page_uses_keyset_filter(self):
+        """下一頁以 created_at 比較定位，不使用 OFFSET 跳過前面的資料"""
+        data = self.get_data(self.url, {'page_size': 1})
+
+        with self.assertNumQueries(3) as queries:
+            self.get_data(data['next'])
+        page_sql = [q['sql'] for q in queries.captured_queries if 'LIMIT' in q['sql'] and 'COUNT' not in q['sql']]
+        self.assertTrue(page_sql)
+        self.assertIn('"submissions"."created_at" <', page_sql[-1])
+        self.assertNotIn('OFFSET', page_sql[-1])
+
+    def test_legacy_page(self):
+        """帶 page 參數時沿用頁碼分頁，回應格式相同"""
+        data = self.get_data(self.url, {'page': 2, 'page_size': 2})
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNone(data['next'])
+
+    def test_count_capped(self):
+        """count 超過上限時只回傳上限值，不做完整 COUNT"""
+        with patch('submissions.views.SUBMISSION_LIST_COUNT_CAP', 2):
+            data = self.get_data(self.url, {'page_size': 20})
+
+        self.assertEqual(data['count'], 2)
+        self.assertTrue(data['count_capped'])
+        self.assertEqual(len(data['results']), 3)
+
+    def test_legacy_request_returns_full_list(self):
+        """沒有分頁參數的舊版請求維持回傳全部資料與精確的 count"""
+        with patch('submissions.views.SubmissionCursorPagination.page_size', 1):
+            data = self.get_data(self.url)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 3)
+        self.assertNotIn('next', data)
+
+    @override_settings(SUBMISSION_LIST_PAGINATE_BY_DEFAULT=True)
+    def test_paginate_by_default(self):
+        with patch('submissions.views.SubmissionCursorPagination.page_size', 1):
+            data = self.get_data(self.url)
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 1)
+        self.assertIn('cursor=', data['next'])
+
+    def test_student_sees_own_submissions(self):
+        self.client.force_authenticate(user=self.student2)
+        data = self.get_data(self.url)
+        self.assertEqual(data['count'], 1)
+        self.assertEqual(data['results'][0]['user']['username'], 'api_student2')
@@ -316,6 +316,35 @@ class BasePermissionMixinUnitTests(TestCase, PermissionTestSetup):
         for other_id in other_ids:
             self.assertNotIn(other_id, viewable_ids)
 
+    def test_get_viewable_submissions_single_query(self):
+        """可查看範圍在同一條 SQL 內完成，不預先查詢課程與題目"""
+        all_submissions = Submission.objects.all()
+
+        with self.assertNumQueries(1):
+            viewable_ids = {sub.id for sub in self.mixin.get_viewable_submissions(self.teacher1, all_submissions)}
+
+        # teacher1 是 course1、course3 的主要老師，也是 course2 的成員老師
+        self.assertEqual(viewable_ids, set(Submission.objects.values_list('id', flat=True)))
+
+    def test_get_viewable_submissions_query_plan(self):
+        """查詢計畫：以 EXISTS 子查詢過濾，沒有 DISTINCT，參數數量不隨課程題目數增加"""
+        all_submissions = Submission.objects.all()
+        viewable = self.mixin.get_viewable_submissions(self.ta1, all_submissions)
+        sql, params = viewable.query.sql_with_params()
+
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+        self.assertNotIn('DISTINCT', viewable.explain())
+
+        for i in range(20):
+            Problems.objects.create(
+                id=3100 + i, title=f'課程1題目{i}', description='課程1的題目',
+                course_id=self.course1, difficulty=Problems.Difficulty.EASY,
+                creator_id=self.teacher1
+            )
+        viewable = self.mixin.get_viewable_submissions(self.ta1, all_submissions)
+        self.assertEqual(len(viewable.query.sql_with_params()[1]), len(params))
+
 
 @pytest.mark.django_db
 class PermissionIntegrationTests(APITestCase, PermissionTestSetup):
@@ -0,0 +1,234 @@
+# submissions/test_file/test_user_ranking.py - 測試預先計算的排行榜
+"""
+測試 UserRanking 的增量維護與 GET /ranking/ 讀取
+包括：使用者建立、提交建立與刪除、判題 callback、重新判題、rebuild 指令與分頁排序
+"""
+
+import pytest
+from unittest.mock import patch
+
+from django.core.management import call_command
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from ..models import Submission, UserRanking
+from ..ranking import rebuild_user_rankings
+from .test_submission_views_api import SubmissionAPITestSetup
+
+
+class RankingTestSetup(SubmissionAPITestSetup):
+    """排行榜測試資料：student1 一題 AC 一次 WA，student2 一次 WA"""
+
+    def create_ranking_submissions(self):
+        self.submission_wa = Submission.objects.create(
+            problem_id=self.problem1.id,
+            user=self.student1,
+            language_type=2,
+            source_code='print(0)',
+            status='1',
+        )
+        self.submission_ac = Submission.objects.create(
+            problem_id=self.problem1.id,
+            user=self.student1,
+            language_type=2,
+            source_code='print(1)',
+            status='0',
+            score=100,
+        )
+        Submission.objects.create(
+            problem_id=self.problem2.id,
+            user=self.student2,
+            language_type=1,
+            source_code='int main(){}',
+            status='1',
+        )
+
+
+@pytest.mark.django_db
+class TestUserRankingMaintenance(RankingTestSetup, APITestCase):
+    """測試 UserRanking 的增量維護"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.create_ranking_submissions()
+        self.client = APIClient()
+
+    def get_ranking(self, user):
+        return UserRanking.objects.get(user=user)
+
+    def post_callback(self, submission, judge_status, score):
+        return self.client.post('/submission/callback/', {
+            'submission_id': str(submission.id),
+            'status': judge_status,
+            'score': score,
+            'execution_time': 10,
+            'memory_usage': 100,
+            'test_results': [],
+        }, format='json')
+
+    def test_submission_creation_updates_ranking(self):
+        """建立提交時更新總提交數與 AC 統計"""
+        ranking = self.get_ranking(self.student1)
+        self.assertEqual(ranking.submission_count, 2)
+        self.assertEqual(ranking.ac_submission_count, 1)
+        self.assertEqual(ranking.ac_problem_count, 1)
+
+    def test_callback_accepted_updates_ranking(self):
+        """callback 判為 AC 時 AC 題數與 AC 提交數增加"""
+        pending = Submission.objects.create(
+            problem_id=self.problem2.id,
+            user=self.student2,
+            language_type=2,
+            source_code='print(1)',
+            status='-1',
+        )
+
+        response = self.post_callback(pending, 'accepted', 100)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ranking = self.get_ranking(self.student2)
+        self.assertEqual(ranking.submission_count, 2)
+        self.assertEqual(ranking.ac_submission_count, 1)
+        self.assertEqual(ranking.ac_problem_count, 1)
+
+    def test_second_ac_on_same_problem_does_not_add_problem(self):
+        """同一題第二次 AC 只增加 AC 提交數"""
+        pending = Submission.objects.create(
+            problem_id=self.problem1.id,
+            user=self.student1,
+            language_type=2,
+            source_code='print(1)',
+            status='-1',
+        )
+
+        self.post_callback(pending, 'accepted', 100)
+
+        ranking = self.get_ranking(self.student1)
+        self.assertEqual(ranking.ac_submission_count, 2)
+        self.assertEqual(ranking.ac_problem_count, 1)
+
+    @patch('submissions.tasks.submit_to_sandbox_task.apply_async')
+    def test_rejudge_removes_ac(self, mock_delay):
+        """重新判題把 AC 提交重設為 Pending 時扣除 AC 統計"""
+        self.client.force_authenticate(user=self.teacher)
+        response = self.client.get(f'/submission/{self.submission_ac.id}/rejudge/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        ranking = self.get_ranking(self.student1)
+        self.assertEqual(ranking.submission_count, 2)
+        self.assertEqual(ranking.ac_submission_count, 0)
+        self.assertEqual(ranking.ac_problem_count, 0)
+
+    def test_new_user_gets_ranking_row(self):
+        """新使用者建立時即有排行榜列，與 rebuild 的成員一致"""
+        from user.models import User
+        user = User.objects.create_user(username='newcomer', email='newcomer@example.com', password='pw12345678')
+        ranking = self.get_ranking(user)
+        self.assertEqual(
+            (ranking.ac_problem_count, ranking.ac_submission_count, ranking.submission_count), (0, 0, 0)
+        )
+
+    def test_deleting_submission_updates_ranking(self):
+        """刪除提交後扣除提交數與 AC 統計"""
+        self.submission_ac.delete()
+
+        ranking = self.get_ranking(self.student1)
+        self.assertEqual(ranking.submission_count, 1)
+        self.assertEqual(ranking.ac_submission_count, 0)
+        self.assertEqual(ranking.ac_problem_count, 0)
+
+    def test_bulk_delete_counts_problem_once(self):
+        """同題多筆 AC 一起刪除時，AC 題數只扣一次"""
+        Submission.objects.create(
+            problem_id=self.problem1.id, user=self.student1, language_type=2,
+            source_code='print(2)', status='0', score=100,
+        )
+        Submission.objects.create(
+            problem_id=self.problem2.id, user=self.student1, language_type=2,
+            source_code='print(3)', status='0', score=100,
+        )
+        self.assertEqual(self.get_ranking(self.student1).ac_problem_count, 2)
+
+        Submission.objects.filter(user=self.student1, problem_id=self.problem1.id).delete()
+
+        ranking = self.get_ranking(self.student1)
+        self.assertEqual(
+            (ranking.ac_problem_count, ranking.ac_submission_count, ranking.submission_count), (1, 1, 1)
+        )
+
+    def test_deleting_user_removes_ranking(self):
+        """刪除使用者時串聯刪除提交，不會重建排行榜列"""
+        user_id = self.student2.id
+        self.student2.delete()
+        self.assertFalse(UserRanking.objects.filter(user_id=user_id).exists())
+
+    def test_rebuild_matches_incremental_counts(self):
+        """rebuild 的結果與增量維護一致，且包含沒有提交的使用者"""
+        expected = {
+            r.user_id: (r.ac_problem_count, r.ac_submission_count, r.submission_count)
+            for r in UserRanking.objects.all()
+        }
+        self.assertEqual(len(expected), 5)
+        UserRanking.objects.all().delete()
+
+        written = rebuild_user_rankings(batch_size=2)
+
+        self.assertEqual(written, 5)
+        for user_id, counts in expected.items():
+            r = UserRanking.objects.get(user_id=user_id)
+            self.assertEqual((r.ac_problem_count, r.ac_submission_count, r.submission_count), counts)
+        self.assertEqual(self.get_ranking(self.teacher).submission_count, 0)
+
+    def test_rebuild_command(self):
+        """management command 可以重建排行榜"""
+        UserRanking.objects.all().delete()
+        call_command('rebuild_user_rankings', '--batch-size', '10')
+        self.assertEqual(self.get_ranking(self.student1).ac_problem_count, 1)
+
+
+@pytest.mark.django_db
+class TestRankingEndpoint(RankingTestSetup, APITestCase):
+    """測試 GET /ranking/ 排序與分頁"""
+
+    def setUp(self):
+        self.create_test_users()
+        self.create_test_courses()
+        self.create_test_problems()
+        self.create_ranking_submissions()
+        rebuild_user_rankings()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.student1)
+
+    def test_ranking_sorted_by_ac_problems(self):
+        """依 AC 題數排序，並附上名次"""
+        response = self.client.get('/ranking/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['data']
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['ranking'][0]['user']['username'], 'api_student1')
+        self.assertEqual(data['ranking'][0]['rank'], 1)
+        ac_counts = [row['ACProblem'] for row in data['ranking']]
+        self.assertEqual(ac_counts, sorted(ac_counts, reverse=True))
+
+    def test_ranking_pagination(self):
+        """支援 page / page_size 參數"""
+        response = self.client.get('/ranking/', {'page': 2, 'page_size': 2})
+
+        data = response.data['data']
+        self.assertEqual(len(data['ranking']), 2)
+        self.assertEqual(data['ranking'][0]['rank'], 3)
+        self.assertIsNotNone(data['previous'])
+        self.assertIsNotNone(data['next'])
+
+    def test_ranking_query_count_is_constant(self):
+        """查詢數不隨使用者數量增加（權限檢查 + COUNT + 單頁 SELECT）"""
+        with self.assertNumQueries(3):
+            self.client.get('/ranking/')
+
+    def test_ranking_invalid_page(self):
+        """超出範圍的頁碼回傳 404"""
+        response = self.client.get('/ranking/', {'page': 99})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
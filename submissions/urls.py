@@ -6,10 +6,14 @@ app_name = 'submissions'
 urlpatterns = [
     # ===== Submission APIs =====
     path('', views.SubmissionListCreateView.as_view(), name='submission-list-create'),
+    path('stream/', views.submission_status_stream_view, name='submission-status-stream'),
     path('<uuid:id>/', views.SubmissionRetrieveUpdateView.as_view(), name='submission-retrieve-update'),
+    path('<uuid:id>/stream/', views.submission_status_stream_view, name='submission-status-stream-detail'),
     path('<uuid:id>/code/', views.SubmissionCodeView.as_view(), name='submission-code'),
     path('<uuid:id>/stdout/', views.SubmissionStdoutView.as_view(), name='submission-stdout'),
     path('<uuid:id>/rejudge/', views.submission_rejudge, name='submission-rejudge'),
+    path('rejudge/', views.bulk_rejudge_view, name='submission-bulk-rejudge'),
+    path('rejudge/<uuid:job_id>/', views.rejudge_job_view, name='submission-rejudge-job'),
     # Note: user_stats_view is registered at root level in back_end/urls.py as /stats/user/<uuid:user_id>/
     path('<uuid:id>/output/<int:task_no>/<int:case_no>/', views.submission_output_view, name='submission-output'),
     
@@ -8,6 +8,7 @@ from rest_framework.exceptions import PermissionDenied, NotFound, ValidationErro
 from django.utils import timezone
 from django.db.models import Count
 from rest_framework.views import APIView
+from rest_framework.pagination import PageNumberPagination
 from problems.models import Problems, Problem_subtasks, Test_cases
 from user.models import User
 import uuid
@@ -32,7 +33,14 @@ def api_response(data=None, message="OK", status_code=200):
         "status": status_str,
     }, status=status_code)
 
-from .models import Editorial, EditorialLike, UserProblemSolveStatus
+from .models import Editorial, EditorialLike, UserProblemSolveStatus, UserRanking
+from .ranking import record_problem_solved, record_status_change, solved_beats_percent
+from .status_stream import publish_submission_status, submission_status_event
+from .problem_stats import user_problem_stats
+from .cache.rate_limit import rate_limiter
+from .cache.utils import (
+    get_permission_with_cache, get_submission_with_cache, get_user_stats_with_cache,
+)
 from .serializers import (
     EditorialSerializer, 
     EditorialCreateSerializer, 
@@ -41,6 +49,42 @@ from .serializers import (
 )
 from problems.models import Problems
 from courses.models import Courses, Course_members
+from assignments.student_status import schedule_student_status_refresh
+from problems.services.counters import problem_counters
+
+
+def check_rate_limit(endpoint, user, problem_id):
+    """
+    提交類端點的速率限制（每位使用者一個 token bucket）
+
+    只有設定了課程覆寫時才查詢題目所屬課程，預設設定下不增加資料庫查詢
+
+    Returns:
+        RateLimitResult
+    """
+    from django.conf import settings
+
+    course_id = None
+    if getattr(settings, 'RATE_LIMIT_COURSE_OVERRIDES', None):
+        course_id = Problems.objects.filter(id=problem_id).values_list('course_id', flat=True).first()
+    return rate_limiter.hit(endpoint, f"user:{user.id}", course_id=course_id)
+
+
+def _solve_status_after(score):
+    """
+    新增一筆 score 分的提交後的解題狀態（以 UPDATE 前的 best_score 判斷）
+
+    新的最佳分數為 max(原 best_score, score)，且提交數至少為 1（不會是 never_tried）
+    """
+    from django.db.models import Case, Value, When
+
+    if score >= 100:
+        return Value('fully_solved')
+    whens = [When(best_score__gte=100, then=Value('fully_solved'))]
+    if score > 0:
+        return Case(*whens, default=Value('partial_solved'))
+    whens.append(When(best_score__gt=0, then=Value('partial_solved')))
+    return Case(*whens, default=Value('attempted'))
 
 
 def update_user_problem_stats(submission):
@@ -55,75 +99,85 @@ def update_user_problem_stats(submission):
     - 最後提交時間
     - 解題狀態（never_tried/attempted/partial_solved/fully_solved）
     - 最佳執行時間和記憶體使用
+    
+    以單一條件式 UPDATE 在資料庫內計算（GREATEST / LEAST / CASE），
+    不先讀出再寫回，平行 callback 不會互相覆蓋；第一次提交時 UPDATE 不到列才 INSERT。
+    滿分提交以 best_score < 100 / >= 100 兩個互斥條件 UPDATE，前者成功即代表首次進入 fully_solved；
+    兩者都沒更新到列（另一個 callback 可能正好 INSERT）時才 INSERT，撞到唯一鍵就重新 UPDATE。
     """
-    from django.utils import timezone
-    from django.db.models import F
+    from django.db.models import F, Value
+    from django.db.models.functions import Coalesce, Greatest, Least
     
-    try:
-        # 取得或創建 UserProblemSolveStatus
-        stats, created = UserProblemSolveStatus.objects.get_or_create(
-            user=submission.user,
-            problem_id=submission.problem_id,
-            defaults={
-                'total_submissions': 0,
-                'ac_submissions': 0,
-                'best_score': 0,
-                'solve_status': 'never_tried',
-            }
+    logger = logging.getLogger(__name__)
+    score = submission.score or 0
+    is_ac = submission.status == '0'
+    execution_time = submission.execution_time if submission.execution_time > 0 else None
+    memory_usage = submission.memory_usage if submission.memory_usage > 0 else None
+    solve_time = (submission.judged_at or timezone.now()) if is_ac else None
+    
+    changes = {
+        'total_submissions': F('total_submissions') + 1,
+        'best_score': Greatest(F('best_score'), Value(score)),
+        'last_submission_time': submission.created_at,
+        'solve_status': _solve_status_after(score),
+        'updated_at': timezone.now(),
+    }
+    if is_ac:
+        changes['ac_submissions'] = F('ac_submissions') + 1
+        changes['first_solve_time'] = Coalesce(F('first_solve_time'), Value(solve_time))
+    # 只在有效時更新最佳執行時間和記憶體使用（LEAST 遇 NULL 的行為依資料庫而異，以 COALESCE 補回）
+    if execution_time is not None:
+        changes['total_execution_time'] = F('total_execution_time') + execution_time
+        changes['best_execution_time'] = Coalesce(
+            Least(F('best_execution_time'), Value(execution_time)), Value(execution_time)
         )
+    if memory_usage is not None:
+        changes['best_memory_usage'] = Coalesce(
+            Least(F('best_memory_usage'), Value(memory_usage)), Value(memory_usage)
+        )
+    
+    stats = UserProblemSolveStatus.objects.filter(user_id=submission.user_id, problem_id=submission.problem_id)
+    
+    try:
+        newly_solved = False
+        for _ in range(2):
+            if score >= 100:
+                if stats.filter(best_score__lt=100).update(**changes):
+                    newly_solved = True
+                    break
+                if stats.filter(best_score__gte=100).update(**changes):
+                    break
+            elif stats.update(**changes):
+                break
+            try:
+                with transaction.atomic():
+                    UserProblemSolveStatus.objects.create(
+                        user_id=submission.user_id,
+                        problem_id=submission.problem_id,
+                        total_submissions=1,
+                        ac_submissions=int(is_ac),
+                        best_score=score,
+                        first_solve_time=solve_time,
+                        last_submission_time=submission.created_at,
+                        solve_status='fully_solved' if score >= 100 else 'partial_solved' if score > 0 else 'attempted',
+                        total_execution_time=execution_time or 0,
+                        best_execution_time=execution_time,
+                        best_memory_usage=memory_usage,
+                    )
+                newly_solved = score >= 100
+                break
+            except IntegrityError:
+                # 平行的 callback 先建立了這一列，改走 UPDATE
+                continue
         
-        # 更新總提交數
-        stats.total_submissions = F('total_submissions') + 1
-        
-        # 更新最後提交時間
-        stats.last_submission_time = submission.created_at
-        
-        # 如果是 AC (status='0')
-        if submission.status == '0':
-            stats.ac_submissions = F('ac_submissions') + 1
-            
-            # 更新首次解題時間（如果是第一次 AC）
-            if not stats.first_solve_time:
-                stats.first_solve_time = submission.judged_at or timezone.now()
-        
-        # 先保存以計算 F() 表達式
-        stats.save()
-        stats.refresh_from_db()
-        
-        # 更新最佳分數
-        if submission.score > stats.best_score:
-            stats.best_score = submission.score
-        
-        # 更新最佳執行時間（只在有效時更新）
-        if submission.execution_time > 0:
-            if stats.best_execution_time is None or submission.execution_time < stats.best_execution_time:
-                stats.best_execution_time = submission.execution_time
-            stats.total_execution_time += submission.execution_time
-        
-        # 更新最佳記憶體使用（只在有效時更新）
-        if submission.memory_usage > 0:
-            if stats.best_memory_usage is None or submission.memory_usage < stats.best_memory_usage:
-                stats.best_memory_usage = submission.memory_usage
-        
-        # 更新解題狀態
-        if stats.best_score >= 100:
-            stats.solve_status = 'fully_solved'
-        elif stats.best_score > 0:
-            stats.solve_status = 'partial_solved'
-        elif stats.total_submissions == 0:
-            stats.solve_status = 'never_tried'
-        else:
-            stats.solve_status = 'attempted'
-        
-        stats.save()
+        # 首次進入 fully_solved 時更新 beats 百分比使用的解題數分布
+        if newly_solved:
+            record_problem_solved(submission.user_id)
         
-        logger = logging.getLogger(__name__)
-        logger.info(f'Updated solve status for user {submission.user.id} problem {submission.problem_id}: '
-                   f'status={stats.solve_status}, best_score={stats.best_score}, '
-                   f'total_submissions={stats.total_submissions}')
+        logger.info(f'Updated solve status for user {submission.user_id} problem {submission.problem_id}: '
+                   f'score={score}, newly_solved={newly_solved}')
         
     except Exception as e:
-        logger = logging.getLogger(__name__)
         logger.error(f'Failed to update user problem solve status: {str(e)}', exc_info=True)
 
 ''' 這邊不再需要了，算成績的部分交給前端處理
@@ -268,17 +322,34 @@ class BasePermissionMixin:
     
     def check_submission_view_permission(self, user, submission):
         """檢查是否有查看提交的權限"""
+        return self.check_view_permission_by_owner(user, submission.id, submission.user_id, submission.problem_id)
+
+    def check_view_permission_by_owner(self, user, submission_id, owner_id, problem_id):
+        """
+        以提交者與題目 ID 檢查查看權限
+
+        管理員與提交者本人不需查詢資料庫；課程老師/TA 的判斷結果透過快取保存
+        """
         # 0. 管理員和 staff 可以查看所有提交
         if user.is_staff or user.is_superuser:
             return True
         
         # 1. 如果是提交者本人，可以查看
-        if submission.user == user:
+        if str(owner_id) == str(user.id):
             return True
         
         # 2. 檢查是否為該問題所屬課程的老師或 TA
+        permission = get_permission_with_cache(
+            str(submission_id),
+            str(user.id),
+            lambda: {'can_view': self._is_problem_course_staff(user, problem_id)}
+        )
+        return bool(permission.get('can_view'))
+
+    def _is_problem_course_staff(self, user, problem_id):
+        """是否為該題所屬課程的老師或 TA（題目未關聯課程時允許）"""
         try:
-            problem = Problems.objects.select_related('course_id').get(id=submission.problem_id)
+            problem = Problems.objects.select_related('course_id').get(id=problem_id)
             
             # 如果題目沒有關聯課程，暫時允許查看
             if not problem.course_id:
@@ -303,54 +374,32 @@ class BasePermissionMixin:
             return False
     
     def get_viewable_submissions(self, user, queryset):
-        """獲取該用戶可以查看的提交"""
+        """
+        獲取該用戶可以查看的提交
+
+        課程老師/TA 的可見範圍以關聯 EXISTS 子查詢表示，整個過濾在同一條 SQL 內完成，
+        不需先取出課程與題目 ID 組成 IN 清單；每筆提交最多比對一次，也不需要 DISTINCT
+        """
         if user.is_staff or user.is_superuser:
             return queryset
         
-        # 實作完整權限檢查
-        from django.db.models import Q
-        from problems.models import Problems
-        from courses.models import Course_members
-        
-        # 構建複合查詢條件
-        viewable_conditions = Q()
-        
-        # 1. 用戶自己的提交永遠可見
-        viewable_conditions |= Q(user=user)
+        from django.db.models import Exists, OuterRef, Q
         
-        # 2. 獲取用戶作為老師/TA的所有課程ID
-        teaching_courses = Course_members.objects.filter(
+        # 用戶作為成員老師/TA 的課程
+        staff_courses = Course_members.objects.filter(
             user_id=user,
             role__in=[Course_members.Role.TEACHER, Course_members.Role.TA]
-        ).values_list('course_id', flat=True)
-        
-        # 3. 獲取用戶作為主要老師的課程ID
-        from courses.models import Courses
-        primary_teaching_courses = Courses.objects.filter(
-            teacher_id=user
-        ).values_list('id', flat=True)
-        
-        # 4. 合併所有有教學權限的課程
-        all_teaching_courses = list(teaching_courses) + list(primary_teaching_courses)
-        
-        if all_teaching_courses:
-            # 5. 獲取這些課程下所有題目的ID
-            course_problems = Problems.objects.filter(
-                course_id__in=all_teaching_courses
-            ).values_list('id', flat=True)
-            
-            if course_problems:
-                # 6. 可以查看這些題目的所有提交
-                viewable_conditions |= Q(problem_id__in=course_problems)
+        ).values('course_id')
         
-        # 7. 對於沒有關聯課程的題目，根據系統策略決定
-        # 這裡採用保守策略：只有管理員可以查看無課程題目的提交
-        # 如果要允許所有人查看，可以加上：
-        # orphan_problems = Problems.objects.filter(course_id__isnull=True).values_list('id', flat=True)
-        # if orphan_problems:
-        #     viewable_conditions |= Q(problem_id__in=orphan_problems)
+        # 提交的題目屬於用戶主要授課或擔任老師/TA 的課程
+        staff_problem = Problems.objects.filter(
+            Q(course_id__teacher_id=user) | Q(course_id__in=staff_courses),
+            id=OuterRef('problem_id'),
+        )
         
-        return queryset.filter(viewable_conditions).distinct()
+        # 用戶自己的提交永遠可見
+        # 沒有關聯課程的題目採保守策略：只有管理員可以查看其他人的提交
+        return queryset.filter(Q(user=user) | Exists(staff_problem))
 
 
 class EditorialListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
@@ -635,6 +684,104 @@ from .serializers import (
     SubmissionCodeSerializer,
     SubmissionStdoutSerializer
 )
+from rest_framework.pagination import CursorPagination
+
+# 提交列表回應中 count 的上限，避免大表上的完整 COUNT
+SUBMISSION_LIST_COUNT_CAP = 10000
+
+
+def capped_submission_count(queryset):
+    """計算筆數，最多數到 SUBMISSION_LIST_COUNT_CAP + 1 即停止"""
+    return queryset.order_by()[:SUBMISSION_LIST_COUNT_CAP + 1].count()
+
+
+def submission_list_response(paginator, data):
+    """NOJ 格式的提交列表回應：results 與 count（超過上限時回傳上限值），附上翻頁連結"""
+    return api_response(
+        data={
+            'results': data,
+            'count': min(paginator.count, SUBMISSION_LIST_COUNT_CAP),
+            'count_capped': paginator.count > SUBMISSION_LIST_COUNT_CAP,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        },
+        message='here you are, bro',
+        status_code=status.HTTP_200_OK
+    )
+
+
+class SubmissionCursorPagination(CursorPagination):
+    """
+    提交列表的 keyset 分頁：以 (created_at, id) 定位下一頁，深分頁不需 OFFSET 掃描
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = capped_submission_count(queryset)
+        return super().paginate_queryset(queryset, request, view=view)
+
+    def get_paginated_response(self, data):
+        return submission_list_response(self, data)
+
+
+class SubmissionPagePagination(PageNumberPagination):
+    """舊版頁碼分頁（?page=），count 同樣有上限"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def django_paginator_class(self, object_list, per_page, *args, **kwargs):
+        from django.core.paginator import Paginator
+
+        paginator = Paginator(object_list, per_page, *args, **kwargs)
+        # Paginator.count 是 cached_property，預先填入有上限的筆數
+        paginator.count = capped_submission_count(object_list)
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset.order_by('-created_at', '-id'), request, view=view)
+        self.count = self.page.paginator.count
+        return page
+
+    def get_paginated_response(self, data):
+        return submission_list_response(self, data)
+
+
+# 帶任一參數的請求才分頁；其餘依 SUBMISSION_LIST_PAGINATE_BY_DEFAULT 決定
+SUBMISSION_LIST_PAGING_PARAMS = ('cursor', 'page', 'page_size')
+
+
+def paginate_submission_list(view, request, queryset):
+    """
+    帶 page 參數時使用頁碼分頁，帶 cursor / page_size 時使用 keyset 分頁
+
+    沒有分頁參數的舊版請求在 SUBMISSION_LIST_PAGINATE_BY_DEFAULT 關閉時
+    維持原本回傳全部資料的格式（results 與精確的 count），待前端改用分頁後再開啟
+    """
+    from django.conf import settings
+
+    if not any(param in request.query_params for param in SUBMISSION_LIST_PAGING_PARAMS) \
+            and not settings.SUBMISSION_LIST_PAGINATE_BY_DEFAULT:
+        serializer = view.get_serializer(queryset, many=True)
+        return api_response(
+            data={
+                'results': serializer.data,
+                'count': queryset.count()
+            },
+            message='here you are, bro',
+            status_code=status.HTTP_200_OK
+        )
+
+    if 'page' in request.query_params:
+        paginator = SubmissionPagePagination()
+    else:
+        paginator = SubmissionCursorPagination()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    serializer = view.get_serializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 class SubmissionListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
@@ -652,7 +799,7 @@ class SubmissionListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
         return SubmissionListSerializer
     
     def get_queryset(self):
-        queryset = Submission.objects.select_related('user').order_by('-created_at')
+        queryset = Submission.objects.select_related('user').order_by('-created_at', '-id')
         
         # 篩選參數
         problem_id = self.request.query_params.get('problem_id')
@@ -712,26 +859,9 @@ class SubmissionListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
             try:
                 # 支援 CIDR 格式 (例如 192.168.1.0/24) 或簡單前綴 (例如 192.168.)
                 if '/' in ip_prefix:
-                    # CIDR 格式：使用 ipaddress 模組進行正確的 IP 範圍過濾
-                    import ipaddress
-                    from django.db.models import Q
-                    import struct
-                    import socket
-                    
-                    network = ipaddress.ip_network(ip_prefix, strict=False)
-                    
-                    # 使用 Django ORM 的自定義過濾
-                    # 由於 IP 地址存儲為字符串，我們需要逐一檢查
-                    matching_ips = []
-                    for submission in queryset:
-                        try:
-                            ip_obj = ipaddress.ip_address(submission.ip_address)
-                            if ip_obj in network:
-                                matching_ips.append(submission.id)
-                        except (ValueError, AttributeError):
-                            continue
-                    
-                    queryset = queryset.filter(id__in=matching_ips)
+                    # CIDR 格式：轉成 ip_sort_key 的範圍，在資料庫以索引比較
+                    from .ip_ranges import cidr_q
+                    queryset = queryset.filter(cidr_q([ip_prefix]))
                 else:
                     # 簡單前綴匹配：例如 "192.168." 會匹配所有 192.168.x.x
                     queryset = queryset.filter(ip_address__startswith=ip_prefix)
@@ -809,24 +939,15 @@ class SubmissionListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
                     status_code=status.HTTP_401_UNAUTHORIZED,
                 )
             
-            # 1. Rate Limiting - 提交速率限制（每分鐘最多 10 次）
-            from django.core.cache import cache
-            rate_limit_key = f"submission_rate:{user.id}"
-            current_count = cache.get(rate_limit_key, 0)
-            
-            if current_count >= 10:
-                # 計算等待時間
-                ttl = cache.ttl(rate_limit_key)
-                wait_for = max(ttl, 1) if ttl else 60
+            # 1. Rate Limiting - 提交速率限制（settings.RATE_LIMITS['submission']）
+            rate_limit = check_rate_limit('submission', user, problem_id)
+            if not rate_limit.allowed:
                 return api_response(
-                    data={'waitFor': wait_for},
+                    data={'waitFor': rate_limit.wait_for},
                     message="Submit too fast!",
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS
                 )
             
-            # 增加計數
-            cache.set(rate_limit_key, current_count + 1, 60)  # 60 秒過期
-            
             # 2. IP 黑名單檢查
             client_ip = self.get_client_ip(request)
             if self.is_ip_blacklisted(client_ip):
@@ -957,6 +1078,8 @@ class SubmissionListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
                 
                 # Save submission within the same transaction to ensure atomicity
                 submission = serializer.save()
+                schedule_student_status_refresh(submission.user_id, submission.problem_id)
+                transaction.on_commit(lambda: problem_counters.record_submission(submission.problem_id))
             
             # NOJ 格式響應
             return api_response(
@@ -982,31 +1105,7 @@ class SubmissionListCreateView(BasePermissionMixin, generics.ListCreateAPIView):
     def list(self, request, *args, **kwargs):
         """獲取提交列表 (NOJ 兼容版本)"""
         queryset = self.filter_queryset(self.get_queryset())
-        
-        # 支援分頁參數
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            # NOJ 格式響應（分頁版本）
-            return api_response(
-                data={
-                    'results': serializer.data,
-                    'count': queryset.count()
-                },
-                message='here you are, bro',
-                status_code=status.HTTP_200_OK
-            )
-        
-        serializer = self.get_serializer(queryset, many=True)
-        # NOJ 格式響應
-        return api_response(
-            data={
-                'results': serializer.data,
-                'count': queryset.count()
-            },
-            message='here you are, bro',
-            status_code=status.HTTP_200_OK
-        )
+        return paginate_submission_list(self, request, queryset)
 
 
 class SubmissionRetrieveUpdateView(BasePermissionMixin, generics.RetrieveUpdateAPIView):
@@ -1034,22 +1133,27 @@ class SubmissionRetrieveUpdateView(BasePermissionMixin, generics.RetrieveUpdateA
     def retrieve(self, request, *args, **kwargs):
         """獲取提交詳情 (NOJ 兼容版本)"""
         try:
-            # 先嘗試找到提交對象（不考慮權限過濾）
-            submission_id = kwargs.get('id')
-            try:
-                submission = Submission.objects.select_related('user').get(id=submission_id)
-            except Submission.DoesNotExist:
+            # 先嘗試找到提交對象（不考慮權限過濾），序列化結果走快取
+            submission_id = str(kwargs.get('id'))
+
+            def fetch_submission():
+                try:
+                    submission = Submission.objects.select_related('user').get(id=submission_id)
+                except Submission.DoesNotExist:
+                    return None
+                return dict(self.get_serializer(submission).data)
+
+            data = get_submission_with_cache(submission_id, fetch_submission)
+            if data is None:
                 return api_response(data=None, message="can not find submission", status_code=status.HTTP_404_NOT_FOUND)
             
             # 再檢查查看權限
-            if not self.check_submission_view_permission(request.user, submission):
+            if not self.check_view_permission_by_owner(request.user, submission_id, data['user']['id'], data['problemId']):
                 return api_response(data=None, message="no permission", status_code=status.HTTP_403_FORBIDDEN)
             
-            serializer = self.get_serializer(submission)
-            
             # NOJ 格式響應：添加 message 字段
             return api_response(
-                data=serializer.data,
+                data=data,
                 message='here you are, bro',
                 status_code=status.HTTP_200_OK
             )
@@ -1100,6 +1204,7 @@ class SubmissionRetrieveUpdateView(BasePermissionMixin, generics.RetrieveUpdateA
                 return api_response(data=None, message="can not find the source file", status_code=status.HTTP_400_BAD_REQUEST)
             
             updated_submission = serializer.save()
+            schedule_student_status_refresh(updated_submission.user_id, updated_submission.problem_id)
             
             # NOJ 格式響應 - 對程式題回應判題開始
             return api_response(
@@ -1222,35 +1327,13 @@ class SubmissionListView(BasePermissionMixin, generics.ListAPIView):
     serializer_class = SubmissionListSerializer
     
     def get_queryset(self):
-        queryset = Submission.objects.select_related('user').order_by('-created_at')
+        queryset = Submission.objects.select_related('user').order_by('-created_at', '-id')
         return self.get_viewable_submissions(self.request.user, queryset)
     
     def list(self, request, *args, **kwargs):
         """獲取提交列表 (NOJ 兼容版本)"""
         queryset = self.filter_queryset(self.get_queryset())
-        
-        # 支援分頁參數
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return api_response(
-                data={
-                    'results': serializer.data,
-                    'count': queryset.count()
-                },
-                message="here you are, bro",
-                status_code=status.HTTP_200_OK
-            )
-        
-        serializer = self.get_serializer(queryset, many=True)
-        return api_response(
-            data={
-                'results': serializer.data,
-                'count': queryset.count()
-            },
-            message='here you are, bro',
-            status_code=status.HTTP_200_OK
-        )
+        return paginate_submission_list(self, request, queryset)
 
 
 class SubmissionDetailView(BasePermissionMixin, generics.RetrieveAPIView):
@@ -1373,6 +1456,7 @@ def submission_rejudge(request, id):
             return api_response(data=None, message="can not find the source file", status_code=status.HTTP_400_BAD_REQUEST)
         
         # 重設判題狀態
+        old_status = submission.status
         submission.status = '-1'  # Pending
         submission.score = 0
         submission.execution_time = -1
@@ -1380,13 +1464,18 @@ def submission_rejudge(request, id):
         submission.judged_at = None
         submission.save()
         
+        # 原本 AC 的提交重設後需從排行榜與題目通過數扣除
+        record_status_change(submission, old_status)
+        problem_counters.record_judge_result(submission.problem_id, old_status, submission.status)
+        schedule_student_status_refresh(submission.user_id, submission.problem_id)
+        
         # 清除舊的判題結果
         SubmissionResult.objects.filter(submission=submission).delete()
         
         # 發送到 Sandbox 重新判題
-        from .tasks import submit_to_sandbox_task
+        from .tasks import enqueue_submission
         try:
-            submit_to_sandbox_task.delay(str(submission.id))
+            enqueue_submission(submission, rejudge=True)
             import logging
             logger = logging.getLogger(__name__)
             logger.info(f'Rejudge queued for submission: {submission.id}')
@@ -1403,44 +1492,166 @@ def submission_rejudge(request, id):
         return api_response(data=None, message="Some error occurred, please contact the admin", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _serialize_rejudge_job(job):
+    """RejudgeJob 的回應格式"""
+    return {
+        'jobId': str(job.id),
+        'status': job.status,
+        'filters': job.filters,
+        'total': job.total_submissions,
+        'dispatched': job.dispatched_submissions,
+        'progress': job.progress,
+        'errorMessage': job.error_message,
+        'createdAt': job.created_at.isoformat(),
+        'finishedAt': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _parse_rejudge_filters(data):
+    """
+    解析批次重新判題的篩選條件
+
+    Raises:
+        ValueError: 條件格式錯誤或缺少題目/作業
+    """
+    from django.utils.dateparse import parse_datetime
+
+    filters = {}
+    for key in ('problem_id', 'assignment_id'):
+        value = data.get(key)
+        filters[key] = int(value) if value not in (None, '') else None
+    if filters['problem_id'] is None and filters['assignment_id'] is None:
+        raise ValueError('problem_id or assignment_id is required')
+
+    statuses = data.get('status') or []
+    if isinstance(statuses, str):
+        statuses = [s for s in statuses.split(',') if s]
+    valid_statuses = {code for code, _ in Submission.STATUS_CHOICES}
+    if any(str(s) not in valid_statuses for s in statuses):
+        raise ValueError('invalid status')
+    filters['statuses'] = [str(s) for s in statuses]
+
+    for key in ('since', 'until'):
+        value = data.get(key)
+        if not value:
+            filters[key] = None
+            continue
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'invalid {key}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        filters[key] = parsed
+    return filters
+
+
+def _can_rejudge(user, problem_id, assignment_id):
+    """staff，或題目/作業所屬課程的老師、TA 才能批次重新判題"""
+    from assignments.models import Assignments
+
+    if user.is_staff:
+        return True
+    mixin = BasePermissionMixin()
+    if problem_id is not None:
+        try:
+            mixin.check_teacher_permission(user, problem_id)
+        except (PermissionDenied, NotFound):
+            return False
+    if assignment_id is not None:
+        assignment = Assignments.objects.select_related('course').filter(id=assignment_id).first()
+        if assignment is None:
+            return False
+        if assignment.course.teacher_id_id != user.id and not Course_members.objects.filter(
+            course_id=assignment.course,
+            user_id=user,
+            role__in=[Course_members.Role.TEACHER, Course_members.Role.TA],
+        ).exists():
+            return False
+    return True
+
+
+@api_view(['POST'])
+def bulk_rejudge_view(request):
+    """
+    POST /submission/rejudge/ - 批次重新判題
+
+    Body: problem_id / assignment_id（至少一項）、status（狀態碼列表）、since / until（ISO 8601）
+    提交在回應前已重設為 Pending，實際判題由背景任務分批送出，
+    進度以 GET /submission/rejudge/{jobId}/ 查詢
+    """
+    from .rejudge import create_rejudge_job
+
+    try:
+        filters = _parse_rejudge_filters(request.data)
+    except (TypeError, ValueError) as e:
+        return api_response(data=None, message=str(e), status_code=status.HTTP_400_BAD_REQUEST)
+
+    if not _can_rejudge(request.user, filters['problem_id'], filters['assignment_id']):
+        return api_response(data=None, message="no permission", status_code=status.HTTP_403_FORBIDDEN)
+
+    job = create_rejudge_job(requester=request.user, **filters)
+    return api_response(
+        data=_serialize_rejudge_job(job),
+        message=f"{job.total_submissions} submissions queued for rejudge.",
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(['GET'])
+def rejudge_job_view(request, job_id):
+    """GET /submission/rejudge/{jobId}/ - 查詢批次重新判題進度"""
+    from .models import RejudgeJob
+
+    try:
+        job = RejudgeJob.objects.get(id=job_id)
+    except RejudgeJob.DoesNotExist:
+        return api_response(data=None, message="can not find rejudge job", status_code=status.HTTP_404_NOT_FOUND)
+
+    if not request.user.is_staff and job.requester_id != request.user.id:
+        return api_response(data=None, message="no permission", status_code=status.HTTP_403_FORBIDDEN)
+
+    return api_response(data=_serialize_rejudge_job(job), message='here you are, bro', status_code=status.HTTP_200_OK)
+
+
+class RankingPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
 @api_view(['GET'])
 def ranking_view(request):
-    """GET /ranking - 獲取排行榜"""
+    """
+    GET /ranking - 獲取排行榜
+    
+    從預先計算的 UserRanking 表讀取，依 AC 題數、AC 提交數（多者優先）、
+    總提交數（少者優先）排序。
+    支援分頁: ?page=1&page_size=50
+    """
     
     try:
-        # 實作排行榜邏輯 - 參照 NOJ 舊有格式
-        # 遍歷系統中所有用戶並返回統計資料，不進行排序（由前端處理）
+        queryset = UserRanking.objects.select_related('user', 'user__userprofile').order_by(
+            '-ac_problem_count', '-ac_submission_count', 'submission_count', 'user_id'
+        )
         
-        from django.db.models import Count, Q
+        paginator = RankingPagination()
+        page = paginator.paginate_queryset(queryset, request)
+        offset = (paginator.page.number - 1) * paginator.page.paginator.per_page
         
-        # 獲取所有用戶的提交統計
-        users = User.objects.all()
         ranking_data = []
-        
-        for user in users:
-            # 計算該用戶的統計資料
-            user_submissions = Submission.objects.filter(user=user)
-            
-            # AC 的提交數量 (status='0' 表示 Accepted)
-            ac_submissions = user_submissions.filter(status='0')
-            ac_submission_count = ac_submissions.count()
-            
-            # AC 的題目數量 (去重複的 problem_id)
-            ac_problems = ac_submissions.values('problem_id').distinct()
-            ac_problem_count = ac_problems.count()
-            
-            # 總提交數量
-            total_submission_count = user_submissions.count()
+        for position, ranking in enumerate(page, start=offset + 1):
+            user = ranking.user
             
             # 獲取用戶頭像
             try:
                 profile = user.userprofile
                 avatar_url = profile.avatar.url if profile.avatar else None
-            except:
+            except Exception:
                 avatar_url = None
             
             # 組裝用戶資料（參照 NOJ 格式）
-            user_data = {
+            ranking_data.append({
+                'rank': position,
                 'user': {
                     'id': user.id,
                     'username': user.username,
@@ -1450,22 +1661,29 @@ def ranking_view(request):
                     'is_active': user.is_active,
                     'date_joined': user.date_joined.isoformat() if user.date_joined else None
                 },
-                'ACProblem': ac_problem_count,      # AC 的題目數量
-                'ACSubmission': ac_submission_count, # AC 的提交數量  
-                'Submission': total_submission_count # 總提交數量
-            }
-            
-            ranking_data.append(user_data)
+                'ACProblem': ranking.ac_problem_count,       # AC 的題目數量
+                'ACSubmission': ranking.ac_submission_count, # AC 的提交數量
+                'Submission': ranking.submission_count       # 總提交數量
+            })
         
-        # NOJ 格式：返回所有用戶資料，不進行排序（由前端處理）
         return api_response(
-            data={'ranking': ranking_data},
-            message='Ranking data retrieved successfully',
+            data={
+                'ranking': ranking_data,
+                'count': paginator.page.paginator.count,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+            },
+            message='here you are, bro',
             status_code=status.HTTP_200_OK
         )
     
+    except NotFound:
+        return api_response(data=None, message="Invalid page.", status_code=status.HTTP_404_NOT_FOUND)
+    
     except Exception as e:
         return api_response(data=None, message="Some error occurred, please contact the admin", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['GET'])
 def user_stats_view(request, user_id):
     """
@@ -1483,110 +1701,191 @@ def user_stats_view(request, user_id):
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    # 2. 提交統計
-    user_submissions = Submission.objects.filter(user=user)
-    total_submissions = user_submissions.count()
+    # 2-4. 統計計算較重，結果以 user_stats 快取（提交建立或狀態變更時由 signal 清除）
+    def calculate_user_stats():
+        # 2. 提交統計與解題數：讀取預先計算的 UserRanking
+        ranking = UserRanking.objects.filter(user_id=user.id).first()
+        total_submissions = ranking.submission_count if ranking else 0
+        ac_submissions = ranking.ac_submission_count if ranking else 0
+        total_solved = ranking.solved_problem_count if ranking else 0
 
-    
-    ac_submissions = user_submissions.filter(status='0').count()
+        if total_submissions > 0:
+            acceptance_percent = ac_submissions / total_submissions * 100.0
+        else:
+            acceptance_percent = 0.0
+
+        # 3. 難度分布
+        solved_problem_ids = UserProblemSolveStatus.objects.filter(
+            user_id=user.id,
+            solve_status='fully_solved',  # 對應 schema 裡的 enum 值
+        ).values('problem_id')
+
+        difficulty_counts = {
+            row['difficulty']: row['cnt']
+            for row in Problems.objects.filter(id__in=solved_problem_ids)
+            .order_by()
+            .values('difficulty')
+            .annotate(cnt=Count('id'))
+        }
 
-    if total_submissions > 0:
-        acceptance_percent = ac_submissions / total_submissions * 100.0
-    else:
-        acceptance_percent = 0.0
+        easy_cnt = difficulty_counts.get('easy', 0)
+        medium_cnt = difficulty_counts.get('medium', 0)
+        hard_cnt = difficulty_counts.get('hard', 0)
+
+        # 4. Beats：以 fully_solved 題數當基準，查詢維護中的解題數分布
+        beats_percent = solved_beats_percent(total_solved)
+
+        payload = {
+            "user_id": user.id,
+            "username": user.username,
+            "total_solved": total_solved,
+            "total_submissions": total_submissions,
+            "accept_percent": round(acceptance_percent, 2),
+            "difficulty": {
+                "easy": easy_cnt,
+                "medium": medium_cnt,
+                "hard": hard_cnt,
+            },
+            "beats_percent": round(beats_percent, 2),
+        }
 
-    # 3. 解題數 + 難度分布
-    solved_qs = UserProblemSolveStatus.objects.filter(
-        user_id=user.id,
-        solve_status='fully_solved',  # 對應 schema 裡的 enum 值
-    )
-    total_solved = solved_qs.count()
+        return dict(UserStatusSerializer(payload).data)
 
-    solved_problem_ids = solved_qs.values_list('problem_id', flat=True)
+    user_stats = get_user_stats_with_cache(str(user.id), calculate_user_stats)
 
-    difficulty_counts = (
-        Problems.objects.filter(id__in=solved_problem_ids)
-        .values('difficulty')
-        .annotate(cnt=Count('id'))
+    return api_response(
+        data={"user_stats": user_stats},
+        message="here you are, bro",
+        status_code=status.HTTP_200_OK
     )
 
-    def get_diff_count(name):
-        for row in difficulty_counts:
-            if row['difficulty'] == name:
-                return row['cnt']
-        return 0
 
-    easy_cnt = get_diff_count('easy')
-    medium_cnt = get_diff_count('medium')
-    hard_cnt = get_diff_count('hard')
-
-    # 4. Beats：以 fully_solved 題數當基準（優化版：直接在 DB 層過濾）
-    # 先計算所有有解題的使用者總數
-    total_users = (
-        UserProblemSolveStatus.objects
-        .filter(solve_status='fully_solved')
-        .values('user_id')
-        .distinct()
-        .count()
+# ==================== Submission Status Stream ====================
+
+def _authenticate_stream_request(request):
+    """
+    以 REST_FRAMEWORK 的預設認證與權限檢查串流請求（串流端點不是 DRF view）
+
+    Returns:
+        通過認證的使用者，失敗時回傳 None
+    """
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+    from user.permissions import IsEmailVerified
+
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
     )
-    
-    if total_users > 0:
-        # 只計算 solved_count < total_solved 的使用者數量（在 DB 層級過濾）
-        lower_users = (
-            UserProblemSolveStatus.objects
-            .filter(solve_status='fully_solved')
-            .values('user_id')
-            .annotate(solved_count=Count('problem_id'))
-            .filter(solved_count__lt=total_solved)
-            .count()
-        )
-        beats_percent = lower_users / total_users * 100.0
+    try:
+        user = drf_request.user
+    except Exception:
+        return None
+    if not IsEmailVerified().has_permission(drf_request, None):
+        return None
+    return user
+
+
+STREAM_EVENT_FIELDS = ('id', 'user_id', 'problem_id', 'status', 'score', 'execution_time', 'memory_usage', 'judged_at')
+
+
+def _current_status_event(submission_id):
+    """提交目前狀態的事件，不存在時回傳 None"""
+    submission = Submission.objects.only(*STREAM_EVENT_FIELDS).filter(id=submission_id).first()
+    return submission_status_event(submission) if submission is not None else None
+
+
+def _check_stream_permission(user, submission_id):
+    """
+    檢查單筆提交的查看權限（每條串流只檢查一次，之後的狀態由推播取得）
+
+    Returns:
+        (提交者 ID, HTTP 狀態碼)：找不到或無權限時提交者 ID 為 None
+    """
+    submission = Submission.objects.only(*STREAM_EVENT_FIELDS).filter(id=submission_id).first()
+    if submission is None:
+        return None, status.HTTP_404_NOT_FOUND
+    if not BasePermissionMixin().check_submission_view_permission(user, submission):
+        return None, status.HTTP_403_FORBIDDEN
+    return submission.user_id, status.HTTP_200_OK
+
+
+def _stream_error(message, status_code):
+    from django.http import JsonResponse
+
+    return JsonResponse({"data": None, "message": message, "status": "error"}, status=status_code)
+
+
+async def submission_status_stream_view(request, id=None):
+    """
+    GET /submission/stream/ - 推播目前使用者所有提交的判題狀態（Server-Sent Events）
+    GET /submission/{id}/stream/ - 推播單筆提交的判題狀態，收到最終狀態後結束
+
+    需以 ASGI 伺服器執行（例如 uvicorn back_end.asgi:application）。
+    事件格式：event: status、data 為 submission_id / status / score / execution_time /
+    memory_usage / judged_at。連線數超過上限或 Redis 訂閱未確認時回傳 503，客戶端應退回輪詢。
+    """
+    from asgiref.sync import sync_to_async
+    from django.http import StreamingHttpResponse
+    from django.conf import settings
+    from .status_stream import StreamFull, StreamUnavailable, get_status_hub, stream_status_events
+
+    if request.method != 'GET':
+        return _stream_error("Method not allowed", status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    user = await sync_to_async(_authenticate_stream_request)(request)
+    if user is None or not user.is_authenticated:
+        return _stream_error("Authentication credentials were not provided.", status.HTTP_401_UNAUTHORIZED)
+
+    hub = get_status_hub()
+    initial_events = []
+
+    if id is None:
+        owner_id = user.id
     else:
-        beats_percent = 0.0
+        owner_id, status_code = await sync_to_async(_check_stream_permission)(user, id)
+        if owner_id is None:
+            message = "submission not found" if status_code == status.HTTP_404_NOT_FOUND else "no permission"
+            return _stream_error(message, status_code)
 
-    payload = {
-        "user_id": user.id,
-        "username": user.username,
-        "total_solved": total_solved,
-        "total_submissions": total_submissions,
-        "accept_percent": round(acceptance_percent, 2),
-        "difficulty": {
-            "easy": easy_cnt,
-            "medium": medium_cnt,
-            "hard": hard_cnt,
-        },
-        "beats_percent": round(beats_percent, 2),
-    }
+    try:
+        subscription = hub.subscribe(owner_id, submission_id=id, viewer_id=user.id)
+    except StreamFull:
+        response = _stream_error("Too many status streams, please poll instead", status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = '5'
+        return response
 
-    serializer = UserStatusSerializer(payload)
-    return api_response(
-        data={"user_stats": serializer.data},
-        message="here you are, bro",
-        status_code=status.HTTP_200_OK
+    try:
+        # 等 Redis 確認訂閱後再讀一次目前狀態，避免在權限檢查與訂閱之間完成判題而漏掉事件
+        await hub.wait_subscribed(settings.SUBMISSION_STREAM['subscribe_timeout'])
+        if id is not None:
+            event = await sync_to_async(_current_status_event)(id)
+            if event is not None:
+                initial_events.append(event)
+    except StreamUnavailable:
+        hub.unsubscribe(subscription)
+        response = _stream_error("Status stream unavailable, please poll instead", status.HTTP_503_SERVICE_UNAVAILABLE)
+        response['Retry-After'] = '5'
+        return response
+    except BaseException:
+        hub.unsubscribe(subscription)
+        raise
+
+    response = StreamingHttpResponse(
+        stream_status_events(hub, subscription, initial_events, close_on_final=id is not None),
+        content_type='text/event-stream',
     )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 # ==================== Custom Test API ====================
 
-import redis
 import json
+import redis
 from django.core.cache import cache
-from .sandbox_client import submit_selftest_to_sandbox
-
-# 初始化 Redis client (使用 database 2，避免與 Celery 和 cache 衝突)
-try:
-    redis_client = redis.Redis(
-        host='127.0.0.1',
-        port=6379,
-        db=2,
-        decode_responses=True
-    )
-    redis_client.ping()  # 測試連接
-except Exception as e:
-    import logging
-    logger = logging.getLogger(__name__)
-    logger.error(f'Redis connection failed: {str(e)}')
-    redis_client = None
+from .custom_test_store import custom_test_store, is_finished
 
 
 @api_view(['POST'])
@@ -1611,6 +1910,8 @@ def submit_custom_test(request, problem_id):
         "message": "測試已提交"
     }
     """
+    logger = logging.getLogger(__name__)
+    
     try:
         # 1. 驗證用戶狀態
         if not request.user.is_active:
@@ -1620,23 +1921,14 @@ def submit_custom_test(request, problem_id):
                 status_code=status.HTTP_403_FORBIDDEN
             )
         
-        # 2. 速率限制：每分鐘最多 5 次
-        if redis_client:
-            rate_limit_key = f"custom_test_rate:{request.user.id}"
-            current_count = redis_client.get(rate_limit_key)
-            
-            if current_count and int(current_count) >= 5:
-                return api_response(
-                    data=None,
-                    message='提交過於頻繁，請稍後再試（每分鐘最多 5 次）',
-                    status_code=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            
-            # 增加計數
-            pipe = redis_client.pipeline()
-            pipe.incr(rate_limit_key)
-            pipe.expire(rate_limit_key, 60)  # 60 秒過期
-            pipe.execute()
+        # 2. 速率限制（settings.RATE_LIMITS['custom_test']）
+        rate_limit = check_rate_limit('custom_test', request.user, problem_id)
+        if not rate_limit.allowed:
+            return api_response(
+                data={'waitFor': rate_limit.wait_for},
+                message='提交過於頻繁，請稍後再試',
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS
+            )
         
         # 3. 驗證輸入
         language_type = request.data.get('language')
@@ -1698,55 +1990,56 @@ def submit_custom_test(request, problem_id):
             )
         
         # 8. 異步提交到 Sandbox（使用 Celery 任務）
+        from django.conf import settings
         from .tasks import submit_selftest_to_sandbox_task
         import uuid
         
         # 產生臨時測試 ID
         test_id = f"selftest-{uuid.uuid4()}"
         
-        # 先儲存到 Redis（狀態為 pending）
-        if redis_client:
-            cache_key = f"custom_test:{request.user.id}:{test_id}"
-            
-            test_info = {
-                'test_id': test_id,
-                'problem_id': problem_id,
-                'language': language_type,
-                'submission_id': test_id,  # 暫時使用 test_id
-                'status': 'pending',  # 等待提交
-                'created_at': str(timezone.now()),
-                'stdin': stdin_data[:100],  # 只儲存前 100 字元
-            }
-            
-            redis_client.setex(
-                cache_key,
-                1800,  # 30 分鐘
-                json.dumps(test_info)
+        # 先儲存到 Redis（狀態為 pending），callback 與查詢都使用同一筆紀錄
+        test_info = {
+            'test_id': test_id,
+            'problem_id': problem_id,
+            'language': language_type,
+            'submission_id': test_id,  # Sandbox 以 test_id 作為 submission_id
+            'status': 'pending',  # 等待提交
+            'created_at': str(timezone.now()),
+            'stdin': stdin_data[:100],  # 只儲存前 100 字元
+        }
+        try:
+            custom_test_store.create(request.user.id, test_info)
+        except redis.RedisError as redis_error:
+            logger.error(f'Failed to store custom test {test_id}: {redis_error}')
+            return api_response(
+                data=None,
+                message='Redis 服務不可用',
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE
             )
-            
-            # 記錄到最近測試列表
-            recent_key = f"custom_tests:recent:{request.user.id}"
-            redis_client.lpush(recent_key, test_id)
-            redis_client.ltrim(recent_key, 0, 9)  # 只保留最近 10 個
-            redis_client.expire(recent_key, 1800)
         
         # 9. 異步調用 Celery 任務
         try:
-            submit_selftest_to_sandbox_task.delay(
-                test_id=test_id,
-                user_id=request.user.id,
-                problem_id=problem_id,
-                language_type=language_type,
-                source_code=source_code,
-                stdin_data=stdin_data
+            # 自訂測試在 Sandbox 端為 priority = -1，佇列中同樣排在正式提交之後
+            submit_selftest_to_sandbox_task.apply_async(
+                kwargs={
+                    'test_id': test_id,
+                    'user_id': request.user.id,
+                    'problem_id': problem_id,
+                    'language_type': language_type,
+                    'source_code': source_code,
+                    'stdin_data': stdin_data,
+                },
+                priority=settings.JUDGE_TASK_PRIORITIES['selftest'],
             )
         except Exception as celery_error:
             logger.error(f'Failed to queue custom test task: {str(celery_error)}')
             # 更新 Redis 狀態為失敗
-            if redis_client:
-                test_info['status'] = 'failed'
-                test_info['error'] = 'Failed to queue task'
-                redis_client.setex(cache_key, 1800, json.dumps(test_info))
+            try:
+                custom_test_store.mark_failed(
+                    request.user.id, test_id, 'Failed to queue task', str(timezone.now())
+                )
+            except redis.RedisError as redis_error:
+                logger.error(f'Failed to update custom test {test_id}: {redis_error}')
             
             return api_response(
                 data=None,
@@ -1766,8 +2059,6 @@ def submit_custom_test(request, problem_id):
         )
         
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f'Custom test submission error: {str(e)}')
         return api_response(
             data=None,
@@ -1781,7 +2072,10 @@ def get_custom_test_result(request, custom_test_id):
     """
     查詢自定義測試結果
     
-    GET /submissions/custom-test/{custom_test_id}/result/
+    GET /submissions/custom-test/{custom_test_id}/result/?wait=10
+    
+    結果由 Sandbox callback 寫入 Redis，這裡只讀取 Redis，不向 Sandbox 查詢。
+    帶 wait（秒，上限 CUSTOM_TEST_LONG_POLL_TIMEOUT）時，測試尚未完成會等待完成事件再回應。
     
     Response:
     {
@@ -1795,6 +2089,8 @@ def get_custom_test_result(request, custom_test_id):
         "message": "Score: 100"
     }
     """
+    logger = logging.getLogger(__name__)
+    
     try:
         # 1. 驗證用戶狀態
         if not request.user.is_active:
@@ -1804,34 +2100,45 @@ def get_custom_test_result(request, custom_test_id):
                 status_code=status.HTTP_403_FORBIDDEN
             )
         
-        # 2. 從 Redis 取得測試資訊
-        if not redis_client:
+        # 2. 解析 long-poll 等待秒數
+        from django.conf import settings
+        try:
+            wait = float(request.query_params.get('wait', 0))
+        except ValueError:
+            return api_response(
+                data=None,
+                message='wait 必須是數字',
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        wait = min(max(wait, 0), settings.CUSTOM_TEST_LONG_POLL_TIMEOUT)
+        
+        # 3. 從 Redis 取得測試資訊（未完成時可等待 callback 的完成事件）
+        try:
+            test_info = custom_test_store.wait(request.user.id, custom_test_id, wait)
+        except redis.RedisError as redis_error:
+            logger.error(f'Failed to read custom test {custom_test_id}: {redis_error}')
             return api_response(
                 data=None,
                 message='Redis 服務不可用',
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE
             )
         
-        cache_key = f"custom_test:{request.user.id}:{custom_test_id}"
-        cached = redis_client.get(cache_key)
-        
-        if not cached:
+        if test_info is None:
             return api_response(
                 data=None,
                 message='測試結果不存在或已過期（30 分鐘有效期）',
                 status_code=status.HTTP_404_NOT_FOUND
             )
         
-        test_info = json.loads(cached)
-        
-        # 如果狀態是 pending，表示還在處理中
-        if test_info.get('status') == 'pending':
+        # 尚未收到 Sandbox callback，表示還在處理中
+        if not is_finished(test_info):
             return api_response(
                 data={
                     'test_id': custom_test_id,
                     'problem_id': test_info['problem_id'],
                     'language': test_info['language'],
-                    'status': 'pending',
+                    'status': test_info['status'],
+                    'queue_position': test_info.get('queue_position'),
                     'created_at': test_info.get('created_at'),
                 },
                 message='測試正在處理中',
@@ -1851,45 +2158,21 @@ def get_custom_test_result(request, custom_test_id):
                 status_code=status.HTTP_200_OK
             )
         
-        submission_id = test_info['submission_id']
-        
-        # 3. 從 Sandbox 查詢實際結果
-        import requests
-        from .sandbox_client import SANDBOX_API_URL, SANDBOX_API_KEY
-        
-        url = f'{SANDBOX_API_URL}/api/v1/submissions/{submission_id}'
-        headers = {'X-API-KEY': SANDBOX_API_KEY}
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            sandbox_result = response.json()
-        except requests.RequestException as e:
-            return api_response(
-                data=None,
-                message=f'無法從 Sandbox 取得結果: {str(e)}',
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-        
-        # 4. 更新 Redis 中的狀態
-        test_info['status'] = sandbox_result.get('status', 'unknown')
-        test_info['last_updated'] = str(timezone.now())
-        redis_client.setex(cache_key, 1800, json.dumps(test_info))
-        
-        # 5. 返回結果（使用 api_response）
+        # 4. 返回 callback 寫入的結果（使用 api_response）
         return api_response(
             data={
                 'test_id': custom_test_id,
                 'problem_id': test_info['problem_id'],
                 'language': test_info['language'],
-                'status': sandbox_result.get('status'),
-                'stdout': sandbox_result.get('stdout', ''),
-                'stderr': sandbox_result.get('stderr', ''),
-                'time': sandbox_result.get('time'),
-                'memory': sandbox_result.get('memory'),
-                'message': sandbox_result.get('message', ''),
-                'compile_info': sandbox_result.get('compile_info'),
+                'status': test_info['status'],
+                'stdout': test_info.get('stdout', ''),
+                'stderr': test_info.get('stderr', ''),
+                'time': test_info.get('time'),
+                'memory': test_info.get('memory'),
+                'message': test_info.get('message', ''),
+                'compile_info': test_info.get('compile_info'),
                 'created_at': test_info.get('created_at'),
+                'completed_at': test_info.get('completed_at'),
             },
             message='here you are, bro',
             status_code=status.HTTP_200_OK
@@ -1902,8 +2185,6 @@ def get_custom_test_result(request, custom_test_id):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
     except Exception as e:
-        import logging
-        logger = logging.getLogger(__name__)
         logger.error(f'Get custom test result error: {str(e)}')
         return api_response(
             data=None,
@@ -1916,6 +2197,53 @@ def get_custom_test_result(request, custom_test_id):
 # Sandbox Callback API
 # ====================
 
+# bulk upsert 時衝突後要覆寫的欄位（對應原本 update_or_create 的 defaults）
+SUBMISSION_RESULT_UPSERT_FIELDS = [
+    'problem_id', 'test_case_id', 'status', 'execution_time',
+    'memory_usage', 'score', 'max_score', 'error_message',
+]
+
+
+def get_problem_test_case_keys(problem_id):
+    """
+    以單一查詢取得題目所有測資的 (subtask_id, idx)，依 subtask_no、idx 排序
+    """
+    return list(
+        Test_cases.objects.filter(subtask_id__problem_id=problem_id)
+        .order_by('subtask_id__subtask_no', 'idx')
+        .values_list('subtask_id', 'idx')
+    )
+
+
+def bulk_upsert_submission_results(rows):
+    """
+    以單一 INSERT ... ON CONFLICT DO UPDATE 寫入多筆 SubmissionResult
+    
+    衝突鍵為 (submission, subtask_id, test_case_index)；同一批次內重複的鍵
+    以最後一筆為準（與逐筆 update_or_create 的結果相同）。
+    
+    Args:
+        rows: 未儲存的 SubmissionResult 列表
+    
+    Returns:
+        int: 寫入（新增或更新）的列數
+    """
+    deduped = {}
+    for row in rows:
+        deduped[(row.subtask_id, row.test_case_index)] = row
+    
+    if not deduped:
+        return 0
+    
+    SubmissionResult.objects.bulk_create(
+        list(deduped.values()),
+        update_conflicts=True,
+        unique_fields=['submission', 'subtask_id', 'test_case_index'],
+        update_fields=SUBMISSION_RESULT_UPSERT_FIELDS,
+    )
+    return len(deduped)
+
+
 class SubmissionCallbackAPIView(APIView):
     """
     接收 Sandbox 判題結果的 callback endpoint
@@ -2007,6 +2335,7 @@ class SubmissionCallbackAPIView(APIView):
                     'memory_limit_exceeded': '4',  # MLE
                     'runtime_error': '5',  # RE
                 }
+                old_status = submission.status
                 submission.status = status_map.get(judge_status, '-1')  # 預設 -1 (pending)
                 submission.score = total_score
                 submission.execution_time = execution_time
@@ -2014,19 +2343,22 @@ class SubmissionCallbackAPIView(APIView):
                 submission.judged_at = timezone.now()
                 submission.save()
                 
+                # 更新全域排行榜（AC 狀態變化時）
+                record_status_change(submission, old_status)
+                new_status = submission.status
+                transaction.on_commit(
+                    lambda: problem_counters.record_judge_result(submission.problem_id, old_status, new_status)
+                )
+                
                 logger.info(f'Updated submission {submission_id}: status={submission.status}, score={total_score}')
                 
-                # 4. 建立 SubmissionResult 記錄
-                from problems.models import Problem_subtasks, Test_cases
+                # 4. 建立 SubmissionResult 記錄（一次查詢對應 subtask，一次 bulk upsert）
+                result_rows = []
                 
                 # 特殊處理：如果是 CE/SE 且 test_results 數量不足，為所有測資創建相同的錯誤記錄
                 if judge_status in ['compile_error', 'system_error']:
                     # 取得該題目的所有測資
-                    all_test_cases = []
-                    subtasks = Problem_subtasks.objects.filter(problem_id=submission.problem_id).order_by('subtask_no')
-                    for subtask in subtasks:
-                        test_cases = Test_cases.objects.filter(subtask_id=subtask.id).order_by('idx')
-                        all_test_cases.extend(test_cases)
+                    all_test_cases = get_problem_test_case_keys(submission.problem_id)
                     
                     # 取得錯誤訊息（從第一筆 test_result 或使用預設值）
                     error_message = data.get('error_message', f'{judge_status.replace("_", " ").title()}')
@@ -2034,54 +2366,42 @@ class SubmissionCallbackAPIView(APIView):
                         error_message = test_results[0].get('error_message', error_message)
                     
                     # 為每個測資創建或更新錯誤記錄
-                    for test_case in all_test_cases:
-                        SubmissionResult.objects.update_or_create(
+                    for subtask_id, case_idx in all_test_cases:
+                        result_rows.append(SubmissionResult(
                             submission=submission,
-                            subtask_id=test_case.subtask_id.id,
-                            test_case_index=test_case.idx,
-                            defaults={
-                                'problem_id': submission.problem_id,
-                                'test_case_id': None,  # CE/SE 時不關聯具體測資
-                                'status': judge_status,
-                                'execution_time': 0,
-                                'memory_usage': 0,
-                                'score': 0,
-                                'max_score': 100,
-                                'error_message': error_message,
-                            }
-                        )
-                    
-                    logger.info(f'Created {len(all_test_cases)} {judge_status} results for all test cases of submission {submission_id}')
+                            subtask_id=subtask_id,
+                            test_case_index=case_idx,
+                            problem_id=submission.problem_id,
+                            test_case_id=None,  # CE/SE 時不關聯具體測資
+                            status=judge_status,
+                            execution_time=0,
+                            memory_usage=0,
+                            score=0,
+                            max_score=100,
+                            error_message=error_message,
+                        ))
                 elif judge_status == 'accepted' and len(test_results) == 0:
                     # 特殊處理：AC 但沒有回傳 test_results，為所有測資創建 AC 記錄
                     logger.info(f'Processing test_result: specail AC with no test_results')
-                    all_test_cases = []
-                    subtasks = Problem_subtasks.objects.filter(problem_id=submission.problem_id).order_by('subtask_no')
-                    for subtask in subtasks:
-                        test_cases = Test_cases.objects.filter(subtask_id=subtask.id).order_by('idx')
-                        all_test_cases.extend(test_cases)
+                    all_test_cases = get_problem_test_case_keys(submission.problem_id)
                     
                     total_cases = len(all_test_cases)
                     score_per_case = submission.max_score // total_cases if total_cases > 0 else 0
                     
-                    for test_case in all_test_cases:
-                        SubmissionResult.objects.update_or_create(
+                    for subtask_id, case_idx in all_test_cases:
+                        result_rows.append(SubmissionResult(
                             submission=submission,
-                            subtask_id=test_case.subtask_id.id,
-                            test_case_index=test_case.idx,
-                            defaults={
-                                'problem_id': submission.problem_id,
-                                'test_case_id': None,
-                                'status': 'accepted',
-                                'execution_time': execution_time // total_cases if total_cases > 0 else execution_time,
-                                'memory_usage': memory_usage,
-                                'score': score_per_case,
-                                'max_score': score_per_case,
-                                'error_message': None,
-                            }
-                        )
-                    
-                    logger.info(f'Created {len(all_test_cases)} accepted results for all test cases of submission {submission_id}')
+                            subtask_id=subtask_id,
+                            test_case_index=case_idx,
+                            problem_id=submission.problem_id,
+                            test_case_id=None,
+                            status='accepted',
+                            execution_time=execution_time // total_cases if total_cases > 0 else execution_time,
+                            memory_usage=memory_usage,
+                            score=score_per_case,
+                            max_score=score_per_case,
+                            error_message=None,
+                        ))
                 else:
                     # 正常情況：處理每個測資結果
                     logger.info(f'Processing {len(test_results)} test results normally')
@@ -2089,6 +2409,12 @@ class SubmissionCallbackAPIView(APIView):
                     if len(test_results) == 0:
                         logger.warning(f'Submission {submission_id} has status={judge_status} but test_results is empty!')
                     
+                    # 一次取得 subtask_no -> subtask_id 對照表
+                    subtask_map = dict(
+                        Problem_subtasks.objects.filter(problem_id=submission.problem_id)
+                        .values_list('subtask_no', 'id')
+                    )
+                    
                     for test_result in test_results:
                         # 轉換 status 為字串格式（SubmissionResult 使用字串）
                         result_status = test_result.get('status', 'runtime_error')
@@ -2099,8 +2425,6 @@ class SubmissionCallbackAPIView(APIView):
                         subtask_no = test_result.get('test_case_id')  # Sandbox 用這個欄位傳 subtask 編號
                         test_case_index = test_result.get('test_case_index', 1)  # 測資編號
                         
-                        logger.info(f'Processing test_result: subtask_no={subtask_no} (type={type(subtask_no)}), test_case_index={test_case_index}, status={result_status}')
-                        
                         if subtask_no is None:
                             logger.warning(f'Missing subtask_no (test_case_id) in test_result')
                             continue
@@ -2113,61 +2437,47 @@ class SubmissionCallbackAPIView(APIView):
                             continue
                         
                         # 根據 subtask_no 找到實際的 subtask_id
-                        try:
-                            subtask = Problem_subtasks.objects.get(
-                                problem_id=submission.problem_id,
-                                subtask_no=subtask_no
-                            )
-                            subtask_id = subtask.id
-                            logger.info(f'Found subtask: subtask_no={subtask_no} -> subtask_id={subtask_id}')
-                        except Problem_subtasks.DoesNotExist:
+                        subtask_id = subtask_map.get(subtask_no)
+                        if subtask_id is None:
                             # 容錯：如果找不到，嘗試 subtask_no+1（因為 Sandbox 可能從 0 開始）
-                            try:
-                                logger.warning(f'Subtask not found with subtask_no={subtask_no}, trying subtask_no={subtask_no+1}')
-                                subtask = Problem_subtasks.objects.get(
-                                    problem_id=submission.problem_id,
-                                    subtask_no=subtask_no + 1
-                                )
-                                subtask_id = subtask.id
-                                logger.info(f'Found subtask with adjusted index: subtask_no={subtask_no+1} -> subtask_id={subtask_id}')
-                            except Problem_subtasks.DoesNotExist:
+                            subtask_id = subtask_map.get(subtask_no + 1)
+                            if subtask_id is None:
                                 logger.error(f'Subtask not found even with adjusted index: problem_id={submission.problem_id}, subtask_no={subtask_no} or {subtask_no+1}')
                                 continue
+                            logger.debug(f'Found subtask with adjusted index: subtask_no={subtask_no+1} -> subtask_id={subtask_id}')
                         
-                        # 創建或更新記錄
-                        result, created = SubmissionResult.objects.update_or_create(
+                        result_rows.append(SubmissionResult(
                             submission=submission,
                             subtask_id=subtask_id,
                             test_case_index=test_case_index,
-                            defaults={
-                                'problem_id': submission.problem_id,
-                                'test_case_id': None,  # 實際的 test_case_id 不使用
-                                'status': result_status,
-                                'execution_time': test_result.get('execution_time', 0),
-                                'memory_usage': test_result.get('memory_usage', 0),
-                                'score': test_result.get('score', 0),
-                                'max_score': test_result.get('max_score', 100),
-                                'error_message': test_result.get('error_message'),
-                            }
-                        )
-                        logger.info(f'SubmissionResult {"created" if created else "updated"}: subtask_id={subtask_id}, test_case_index={test_case_index}')
-                    
-                    logger.info(f'Created {len(test_results)} test results for submission {submission_id}')
+                            problem_id=submission.problem_id,
+                            test_case_id=None,  # 實際的 test_case_id 不使用
+                            status=result_status,
+                            execution_time=test_result.get('execution_time', 0),
+                            memory_usage=test_result.get('memory_usage', 0),
+                            score=test_result.get('score', 0),
+                            max_score=test_result.get('max_score', 100),
+                            error_message=test_result.get('error_message'),
+                        ))
+                
+                results_written = bulk_upsert_submission_results(result_rows)
+                logger.info(f'Wrote {results_written} {judge_status} results for submission {submission_id}')
                 
                 # 5. 更新 UserProblemSolveStatus（全域層級）
                 update_user_problem_stats(submission)
-                '''這邊也不需要了，算成績的部分交給前端處理
-
-                    # 6. 更新 UserProblemStats（作業層級）
-                    # 嘗試從 submission 找到對應的 assignment_id
-                    # submission model 需要加上 assignment_id 欄位，或者從 context 傳入
-                    # 目前先跳過，等 submission model 更新後再啟用
-                    # if hasattr(submission, 'assignment_id') and submission.assignment_id:
-                    #     update_user_assignment_stats(submission, submission.assignment_id)
+                schedule_student_status_refresh(submission.user_id, submission.problem_id)
+                
+                # 6. commit 後推播狀態給 /submission/stream/ 的訂閱者
+                status_event = submission_status_event(submission)
+                transaction.on_commit(lambda: publish_submission_status(status_event))
 
-                '''
+                # 7. commit 後交給作業統計（UserProblemStats）的 micro-batch 聚合
+                transaction.on_commit(lambda: user_problem_stats.enqueue(submission.id))
             return api_response(
-                data={'submission_id': str(submission_id)},
+                data={
+                    'submission_id': str(submission_id),
+                    'results_written': results_written,
+                },
                 message='Callback processed successfully',
                 status_code=status.HTTP_200_OK
             )
@@ -2188,6 +2498,9 @@ class CustomTestCallbackAPIView(APIView):
     
     Sandbox 完成自定義測試後會 POST 到這個 endpoint
     URL: POST /api/submissions/custom-test-callback/
+    
+    結果寫入 custom_test_store 的 Redis 紀錄（自訂測試不存資料庫），
+    查詢端點直接讀取，不需再向 Sandbox 查詢
     """
     permission_classes = [permissions.AllowAny]  # Sandbox 不需要 JWT 認證
     
@@ -2207,7 +2520,6 @@ class CustomTestCallbackAPIView(APIView):
         }
         """
         import logging
-        from .models import CustomTest
         from django.conf import settings
         
         logger = logging.getLogger(__name__)
@@ -2242,30 +2554,26 @@ class CustomTestCallbackAPIView(APIView):
                     status_code=status.HTTP_400_BAD_REQUEST
                 )
             
-            # 3. 更新 CustomTest
-            with transaction.atomic():
-                try:
-                    custom_test = CustomTest.objects.select_for_update().get(id=test_id)
-                except CustomTest.DoesNotExist:
-                    logger.error(f'CustomTest not found: {test_id}')
-                    return api_response(
-                        message='CustomTest not found',
-                        status_code=status.HTTP_404_NOT_FOUND
-                    )
-                
-                # 更新測試結果（CustomTest 使用字串狀態碼）
-                custom_test.status = 'completed' if test_status == 'completed' else 'error'
-                custom_test.actual_output = stdout
-                custom_test.execution_time = execution_time
-                custom_test.memory_usage = memory_usage
-                custom_test.completed_at = timezone.now()
-                
-                if stderr or exit_code != 0:
-                    custom_test.error_message = stderr or f'Exit code: {exit_code}'
-                
-                custom_test.save()
-                
-                logger.info(f'Updated custom test {test_id}: status={custom_test.status}')
+            # 3. 寫入 submit_custom_test 建立的 Redis 紀錄，並通知 long-poll 中的查詢
+            result = {
+                'status': test_status or 'error',
+                'stdout': stdout,
+                'stderr': stderr,
+                'time': execution_time,
+                'memory': memory_usage,
+                'exit_code': exit_code,
+                'message': data.get('message') or (f'Exit code: {exit_code}' if exit_code else ''),
+                'compile_info': data.get('compile_info'),
+            }
+            test_info = custom_test_store.complete(test_id, result, str(timezone.now()))
+            if test_info is None:
+                logger.error(f'Custom test not found or expired: {test_id}')
+                return api_response(
+                    message='Custom test not found',
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
+            
+            logger.info(f'Updated custom test {test_id}: status={test_info["status"]}')
             
             return api_response(
                 data={'test_id': str(test_id)},